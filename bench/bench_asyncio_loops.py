@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: asyncio.uring_events against the selector event loop.
+
+Two workloads run over TCP on 127.0.0.1 in a single process:
+
+* echo: ``--clients`` connections each send ``--messages`` messages of
+  ``--size`` bytes through StreamWriter and wait for the echo with
+  readexactly().  Reported in round trips per second.
+* file: the server answers each connection with a file of ``--file-size``
+  MB, read in 64 KB chunks -- with ``loop.file_read()`` on the io_uring
+  loop and with a plain (page cached) ``f.read()`` on the selector loop.
+  Reported in MB/s received by the clients.  With ``--cold`` the file is
+  dropped from the page cache before each run, so that reads go to disk:
+  a blocking read stalls every connection of the selector event loop.
+
+Only the 3.7 tree has asyncio.  The io_uring loop is skipped when the
+interpreter was built without _uring or the kernel lacks io_uring.
+
+    python3 bench/bench_asyncio_loops.py --python /opt/spython/bin/python3
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import benchutil
+
+# 在目标解释器中执行
+RUNNER = r'''
+import asyncio, os, sys, time
+from asyncio import uring_events
+
+kind, workload, clients, number, size, path, repeat, cold = sys.argv[1:]
+clients, number, size, repeat = int(clients), int(number), int(size), int(repeat)
+cold = cold == '1'
+CHUNK = 65536
+
+
+async def echo_handler(reader, writer):
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+
+async def echo_client(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    message = b'x' * size
+    for _ in range(number):
+        writer.write(message)
+        await reader.readexactly(size)
+    writer.close()
+
+
+async def file_handler(reader, writer):
+    loop = asyncio.get_event_loop()
+    with open(path, 'rb', buffering=0) as f:
+        offset = 0
+        while True:
+            if kind == 'uring':
+                data = await loop.file_read(f, CHUNK, offset)
+            else:
+                data = f.read(CHUNK)
+            if not data:
+                break
+            offset += len(data)
+            writer.write(data)
+            await writer.drain()
+    writer.close()
+
+
+async def file_client(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    total = 0
+    while True:
+        data = await reader.read(262144)
+        if not data:
+            break
+        total += len(data)
+    writer.close()
+    return total
+
+
+def evict(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+async def run_once():
+    if cold and workload == 'file':
+        evict(path)
+    handler, client = {'echo': (echo_handler, echo_client),
+                       'file': (file_handler, file_client)}[workload]
+    server = await asyncio.start_server(handler, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    t0 = time.perf_counter()
+    totals = await asyncio.gather(*[client(port) for _ in range(clients)])
+    elapsed = time.perf_counter() - t0
+    server.close()
+    await server.wait_closed()
+    if workload == 'echo':
+        return clients * number / elapsed
+    return sum(totals) / elapsed / (1 << 20)
+
+
+if kind == 'uring':
+    loop = uring_events.UringEventLoop()
+else:
+    loop = asyncio.SelectorEventLoop()
+asyncio.set_event_loop(loop)
+best = max(loop.run_until_complete(run_once()) for _ in range(repeat))
+loop.close()
+sys.stdout.write('%r\n' % best)
+'''
+
+CHECK_URING = r'''
+import sys
+from asyncio import uring_events
+try:
+    uring_events.UringProactor().close()
+except OSError as exc:
+    sys.stdout.write('%s\n' % exc)
+'''
+
+UNITS = {'echo': 'round trips/s', 'file': 'MB/s'}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', action='append', dest='pythons',
+                        help='interpreter to measure (repeatable), '
+                             'default: the current one')
+    parser.add_argument('--workloads', default='echo,file')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--messages', type=int, default=2000,
+                        help='messages per echo client')
+    parser.add_argument('--size', type=int, default=1024,
+                        help='echo message size in bytes')
+    parser.add_argument('--file-size', type=int, default=16,
+                        help='size of the served file in MB')
+    parser.add_argument('--cold', action='store_true',
+                        help='serve the file from disk, not the page cache')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    pythons = args.pythons or [sys.executable]
+    workloads = args.workloads.split(',')
+
+    fd, path = tempfile.mkstemp(prefix='spython-bench-', suffix='.dat')
+    try:
+        os.write(fd, os.urandom(args.file_size << 20))
+        os.close(fd)
+        results = []
+        for python in pythons:
+            row = {'python': python, 'uring': None, 'results': {}}
+            unavailable = benchutil.run_python(python, CHECK_URING)
+            kinds = ['selector']
+            if unavailable:
+                row['uring'] = unavailable
+            else:
+                kinds.append('uring')
+            for workload in workloads:
+                clients = args.clients if workload == 'echo' else 4
+                row['results'][workload] = {
+                    kind: float(benchutil.run_python(
+                        python, RUNNER, kind, workload, clients,
+                        args.messages, args.size, path, args.repeat,
+                        int(args.cold)))
+                    for kind in kinds}
+            results.append(row)
+    finally:
+        os.unlink(path)
+
+    if args.json:
+        print(json.dumps({'benchmark': 'asyncio_loops', 'units': UNITS,
+                          'pythons': pythons, 'results': results}, indent=2))
+        return
+    for row in results:
+        print(row['python'])
+        if row['uring']:
+            print('  io_uring unavailable: %s' % row['uring'])
+        for workload in workloads:
+            rates = row['results'][workload]
+            for kind in sorted(rates):
+                print('  %-6s %-10s %12.1f %s  (%.2fx)'
+                      % (workload, kind, rates[kind], UNITS[workload],
+                         rates[kind] / rates['selector']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: TLS throughput of asyncio streams on the selector event loop.
+
+Server and clients run in one process over 127.0.0.1, so every byte is
+encrypted and decrypted by the measured interpreter:
+
+* bulk: the server sends ``--mb`` MB to each of ``--clients`` connections
+  in 64 KB writes.  Reported in MB/s received by the clients.
+* echo: each connection sends ``--messages`` messages of ``--size`` bytes
+  and waits for the echo with readexactly().  Reported in round trips/s.
+
+Each workload runs three times: without TLS (``plain``), with TLS through
+sslproto.SSLProtocol and its MemoryBIO pair (``bio``), and with TLS done
+on the socket by _SelectorSslTransport (``socket``, the default).  The
+certificate is a self-signed one made with the openssl command for the
+run, or Lib/test/keycert.pem when openssl is not installed.
+
+    python3 bench/bench_asyncio_tls.py --python /opt/spython/bin/python3
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import benchutil
+
+# 在目标解释器中执行
+RUNNER = r'''
+import asyncio, ssl, sys, time
+from asyncio import constants
+
+mode, workload, clients, number, size, certfile, keyfile, repeat = sys.argv[1:]
+clients, number, size, repeat = int(clients), int(number), int(size), int(repeat)
+CHUNK = 65536
+
+if mode == 'plain':
+    server_ssl = client_ssl = None
+else:
+    constants.SSL_SOCKET_TRANSPORT = mode == 'socket'
+    server_ssl = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_ssl.load_cert_chain(certfile, keyfile)
+    client_ssl = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_ssl.check_hostname = False
+    client_ssl.verify_mode = ssl.CERT_NONE
+
+
+async def bulk_handler(reader, writer):
+    data = b'x' * CHUNK
+    for _ in range(number * (1 << 20) // CHUNK):
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+
+async def bulk_client(port):
+    reader, writer = await asyncio.open_connection(
+        '127.0.0.1', port, ssl=client_ssl)
+    total = 0
+    while True:
+        data = await reader.read(262144)
+        if not data:
+            break
+        total += len(data)
+    writer.close()
+    return total
+
+
+async def echo_handler(reader, writer):
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+
+async def echo_client(port):
+    reader, writer = await asyncio.open_connection(
+        '127.0.0.1', port, ssl=client_ssl)
+    message = b'x' * size
+    for _ in range(number):
+        writer.write(message)
+        await reader.readexactly(size)
+    writer.close()
+    return 0
+
+
+async def run_once():
+    handler, client = {'bulk': (bulk_handler, bulk_client),
+                       'echo': (echo_handler, echo_client)}[workload]
+    handlers = []
+
+    def serve(reader, writer):
+        handlers.append(asyncio.ensure_future(handler(reader, writer)))
+
+    server = await asyncio.start_server(serve, '127.0.0.1', 0,
+                                        ssl=server_ssl)
+    port = server.sockets[0].getsockname()[1]
+    t0 = time.perf_counter()
+    totals = await asyncio.gather(*[client(port) for _ in range(clients)])
+    elapsed = time.perf_counter() - t0
+    await asyncio.gather(*handlers)
+    server.close()
+    await server.wait_closed()
+    if workload == 'echo':
+        return clients * number / elapsed
+    return sum(totals) / elapsed / (1 << 20)
+
+
+loop = asyncio.SelectorEventLoop()
+asyncio.set_event_loop(loop)
+best = max(loop.run_until_complete(run_once()) for _ in range(repeat))
+loop.close()
+sys.stdout.write('%r\n' % best)
+'''
+
+UNITS = {'bulk': 'MB/s', 'echo': 'round trips/s'}
+MODES = ('plain', 'bio', 'socket')
+
+
+def make_cert(tmpdir):
+    """Return (certfile, keyfile) of a self-signed certificate."""
+    certfile = os.path.join(tmpdir, 'cert.pem')
+    keyfile = os.path.join(tmpdir, 'key.pem')
+    try:
+        subprocess.check_call(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+             '-days', '1', '-subj', '/CN=localhost',
+             '-keyout', keyfile, '-out', certfile],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        # 没有openssl命令时使用测试用例中的自签名证书
+        keycert = os.path.join(benchutil.LIB_37, 'test', 'keycert.pem')
+        return keycert, keycert
+    return certfile, keyfile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', action='append', dest='pythons',
+                        help='interpreter to measure (repeatable), '
+                             'default: the current one')
+    parser.add_argument('--workloads', default='bulk,echo')
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--mb', type=int, default=64,
+                        help='MB sent to each bulk client')
+    parser.add_argument('--messages', type=int, default=2000,
+                        help='messages per echo client')
+    parser.add_argument('--size', type=int, default=1024,
+                        help='echo message size in bytes')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    pythons = args.pythons or [sys.executable]
+    workloads = args.workloads.split(',')
+
+    tmpdir = tempfile.mkdtemp(prefix='spython-bench-')
+    try:
+        certfile, keyfile = make_cert(tmpdir)
+        results = []
+        for python in pythons:
+            row = {'python': python, 'results': {}}
+            for workload in workloads:
+                number = args.mb if workload == 'bulk' else args.messages
+                row['results'][workload] = {
+                    mode: float(benchutil.run_python(
+                        python, RUNNER, mode, workload, args.clients,
+                        number, args.size, certfile, keyfile, args.repeat))
+                    for mode in MODES}
+            results.append(row)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if args.json:
+        print(json.dumps({'benchmark': 'asyncio_tls', 'units': UNITS,
+                          'pythons': pythons, 'results': results}, indent=2))
+        return
+    for row in results:
+        print(row['python'])
+        for workload in workloads:
+            rates = row['results'][workload]
+            for mode in MODES:
+                print('  %-5s %-7s %12.1f %s  (%.2fx bio)'
+                      % (workload, mode, rates[mode], UNITS[workload],
+                         rates[mode] / rates['bio']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: many small writes through asyncio socket transports.
+
+``--clients`` connections to a server on 127.0.0.1 (selector event loop,
+one process) each send ``--bursts`` bursts and wait for drain() after each
+one.  The server only counts the bytes.  Two workloads:
+
+* small: a burst is ``--burst`` messages of ``--size`` bytes.
+* frames: a burst is ``--burst`` frames of a 16 byte header and a body of
+  ``--body`` bytes.
+
+and three ways to hand a burst to the transport:
+
+* write: one write() call per message, or per header and per body;
+* join: one write() of the joined burst;
+* writelines: one writelines() call with all the pieces.
+
+Reported in messages (or frames) per second.
+
+    python3 bench/bench_asyncio_writes.py --python /opt/spython/bin/python3
+"""
+import argparse
+import json
+import sys
+
+import benchutil
+
+# 在目标解释器中执行
+RUNNER = r'''
+import asyncio, sys, time
+
+kind, workload, clients, bursts, burst, size, repeat = sys.argv[1:]
+clients, bursts, burst, size, repeat = (
+    int(clients), int(bursts), int(burst), int(size), int(repeat))
+
+if workload == 'small':
+    pieces = [b'x' * size for _ in range(burst)]
+else:
+    header, body = b'h' * 16, b'b' * size
+    pieces = [header, body] * burst
+joined = b''.join(pieces)
+
+
+async def handler(reader, writer):
+    total = 0
+    while True:
+        data = await reader.read(262144)
+        if not data:
+            break
+        total += len(data)
+    writer.close()
+    return total
+
+
+async def client(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for _ in range(bursts):
+        if kind == 'write':
+            for data in pieces:
+                writer.write(data)
+        elif kind == 'join':
+            writer.write(b''.join(pieces))
+        else:
+            writer.writelines(pieces)
+        await writer.drain()
+    writer.close()
+
+
+async def run_once():
+    handlers = []
+
+    def serve(reader, writer):
+        handlers.append(asyncio.ensure_future(handler(reader, writer)))
+
+    server = await asyncio.start_server(serve, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    t0 = time.perf_counter()
+    await asyncio.gather(*[client(port) for _ in range(clients)])
+    totals = await asyncio.gather(*handlers)
+    elapsed = time.perf_counter() - t0
+    server.close()
+    await server.wait_closed()
+    assert sum(totals) == clients * bursts * len(joined), totals
+    return clients * bursts * burst / elapsed
+
+
+loop = asyncio.SelectorEventLoop()
+asyncio.set_event_loop(loop)
+best = max(loop.run_until_complete(run_once()) for _ in range(repeat))
+loop.close()
+sys.stdout.write('%r\n' % best)
+'''
+
+UNITS = {'small': 'messages/s', 'frames': 'frames/s'}
+KINDS = ('write', 'join', 'writelines')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', action='append', dest='pythons',
+                        help='interpreter to measure (repeatable), '
+                             'default: the current one')
+    parser.add_argument('--workloads', default='small,frames')
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--bursts', type=int, default=500)
+    parser.add_argument('--burst', type=int, default=64,
+                        help='messages or frames per burst')
+    parser.add_argument('--size', type=int, default=64,
+                        help='size of the small messages in bytes')
+    parser.add_argument('--body', type=int, default=4096,
+                        help='size of the frame bodies in bytes')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    pythons = args.pythons or [sys.executable]
+    workloads = args.workloads.split(',')
+
+    results = []
+    for python in pythons:
+        row = {'python': python, 'results': {}}
+        for workload in workloads:
+            size = args.size if workload == 'small' else args.body
+            row['results'][workload] = {
+                kind: float(benchutil.run_python(
+                    python, RUNNER, kind, workload, args.clients,
+                    args.bursts, args.burst, size, args.repeat))
+                for kind in KINDS}
+        results.append(row)
+
+    if args.json:
+        print(json.dumps({'benchmark': 'asyncio_writes', 'units': UNITS,
+                          'pythons': pythons, 'results': results}, indent=2))
+        return
+    for row in results:
+        print(row['python'])
+        for workload in workloads:
+            rates = row['results'][workload]
+            for kind in KINDS:
+                print('  %-6s %-10s %12.1f %s  (%.2fx write)'
+                      % (workload, kind, rates[kind], UNITS[workload],
+                         rates[kind] / rates['write']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: concurrent decrypt-on-open from many threads.
+
+``--modules`` generated modules are encrypted with libencfile.so into a
+scratch directory.  For every thread count in ``--threads`` a fresh
+interpreter splits the files between that many threads, which then either
+``open(path, 'rb').read()`` every file ``--rounds`` times (``--mode open``)
+or import their share of the modules (``--mode import``).
+
+dopen() runs with the GIL released and keeps no shared state besides the
+decrypted-source cache, so on a machine with enough cores the open mode
+should scale close to linearly.  The cache is disabled unless ``--cache``
+is given, otherwise repeated rounds would not decrypt anything.  Imports
+compile with the GIL held, so only their decryption part runs in parallel.
+
+    python3 bench/bench_concurrent_open.py --python /opt/spython/bin/python3
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import benchutil
+from bench_decrypt_throughput import make_module
+
+# 在目标解释器中执行，需要同时兼容python2和python3
+WORKER = r'''
+import os, sys, threading, time
+mode, tree = sys.argv[1], sys.argv[2]
+nthreads, rounds = int(sys.argv[3]), int(sys.argv[4])
+names = sorted(n[:-3] for n in os.listdir(tree) if n.endswith('.py'))
+sys.path.insert(0, tree)
+sys.dont_write_bytecode = True
+
+def read_files(chunk):
+    for _ in range(rounds):
+        for name in chunk:
+            f = open(os.path.join(tree, name + '.py'), 'rb')
+            try:
+                f.read()
+            finally:
+                f.close()
+
+def import_modules(chunk):
+    for name in chunk:
+        __import__(name)
+
+work = read_files if mode == 'open' else import_modules
+go = threading.Event()
+def run(chunk):
+    go.wait()
+    work(chunk)
+threads = [threading.Thread(target=run, args=(names[i::nthreads],))
+           for i in range(nthreads)]
+for t in threads:
+    t.start()
+t0 = time.time()
+go.set()
+for t in threads:
+    t.join()
+done = len(names) * (rounds if mode == 'open' else 1)
+sys.stdout.write('%r %d\n' % (time.time() - t0, done))
+'''
+
+
+def measure(python, mode, tree, nthreads, rounds, repeat, env):
+    best, files = None, 0
+    for _ in range(repeat):
+        out = benchutil.run_python(python, WORKER, mode, tree, nthreads,
+                                   rounds, flags=['-S'], env=env)
+        seconds, files = out.split()
+        seconds = float(seconds)
+        best = seconds if best is None else min(best, seconds)
+    return best, int(files)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', default=sys.executable,
+                        help='patched interpreter to measure')
+    parser.add_argument('--libencfile', default=None,
+                        help='path to libencfile.so')
+    parser.add_argument('--mode', choices=('open', 'import'), default='open')
+    parser.add_argument('--threads', default='1,2,4,8,16,32',
+                        help='comma separated thread counts')
+    parser.add_argument('--modules', type=int, default=256,
+                        help='number of encrypted modules')
+    parser.add_argument('--size', type=int, default=32 * 1024,
+                        help='approximate size of each module in bytes')
+    parser.add_argument('--rounds', type=int, default=4,
+                        help='times every file is read in --mode open')
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the decrypted-source cache enabled')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    counts = [int(n) for n in args.threads.split(',')]
+    env = dict(os.environ)
+    if not args.cache:
+        env['PYTHONDECRYPTCACHESIZE'] = '0'
+
+    lib = benchutil.load_libencfile(args.libencfile)
+    scratch = tempfile.mkdtemp(prefix='spython-bench-')
+    try:
+        plain = os.path.join(scratch, 'plain.py')
+        make_module(plain, args.size)
+        tree = os.path.join(scratch, 'encrypted')
+        os.mkdir(tree)
+        for i in range(args.modules):
+            lib.encrypt_file(plain.encode(),
+                             os.path.join(tree, 'mod%05d.py' % i).encode())
+        results = []
+        for n in counts:
+            seconds, files = measure(args.python, args.mode, tree, n,
+                                     args.rounds, args.repeat, env)
+            results.append({'threads': n, 'seconds': seconds,
+                            'files_per_sec': files / seconds})
+    finally:
+        shutil.rmtree(scratch)
+
+    for r in results:
+        r['speedup'] = results[0]['seconds'] / r['seconds']
+    result = {
+        'benchmark': 'concurrent_open',
+        'python': args.python,
+        'mode': args.mode,
+        'modules': args.modules,
+        'module_size': args.size,
+        'cpus': os.cpu_count() if hasattr(os, 'cpu_count') else None,
+        'cache': args.cache,
+        'results': results,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print('%s, %d modules of %d bytes, %s CPUs'
+          % (args.mode, args.modules, args.size, result['cpus']))
+    for r in results:
+        print('%3d threads  %8.3f s  %9.1f files/s  %5.2fx'
+              % (r['threads'], r['seconds'], r['files_per_sec'],
+                 r['speedup']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: decrypt-on-open throughput in MB/s.
+
+A large generated module is written once in plain text and once encrypted
+with libencfile.so; the target interpreter then times
+``open(path, 'rb').read()`` on both.  The encrypted figure is the end-to-end
+rate of dopen(): header sniff, bulk AES decryption and the in-memory fd.
+
+    python3 bench/bench_decrypt_throughput.py --python /opt/spython/bin/python3
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import benchutil
+
+# 在目标解释器中执行，需要同时兼容python2和python3
+READER = r'''
+import sys, timeit
+path, repeat = sys.argv[1], int(sys.argv[2])
+def op():
+    f = open(path, 'rb')
+    try:
+        return len(f.read())
+    finally:
+        f.close()
+size = op()
+best = min(timeit.repeat(op, number=1, repeat=repeat))
+sys.stdout.write('%r %d\n' % (best, size))
+'''
+
+
+def make_module(path, size):
+    """Write roughly *size* bytes of generated Python source to *path*."""
+    with open(path, 'w') as f:
+        written, i = 0, 0
+        while written < size:
+            line = 'TABLE_%06d = (%d, %r, %r)\n' % (i, i * 7, 'x' * (i % 40),
+                                                    float(i) / 3)
+            f.write(line)
+            written += len(line)
+            i += 1
+
+
+def read_rate(python, path, repeat):
+    seconds, size = benchutil.run_python(python, READER, path,
+                                         repeat).split()
+    seconds, size = float(seconds), int(size)
+    return size / seconds / (1 << 20), size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', default=sys.executable,
+                        help='patched interpreter to measure')
+    parser.add_argument('--libencfile', default=None,
+                        help='path to libencfile.so')
+    parser.add_argument('--size', type=float, default=16,
+                        help='module size in MiB')
+    parser.add_argument('-r', '--repeat', type=int, default=10)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    lib = benchutil.load_libencfile(args.libencfile)
+    scratch = tempfile.mkdtemp(prefix='spython-bench-')
+    try:
+        plain = os.path.join(scratch, 'big_plain.py')
+        encrypted = os.path.join(scratch, 'big_encrypted.py')
+        make_module(plain, int(args.size * (1 << 20)))
+        lib.encrypt_file(plain.encode(), encrypted.encode())
+        os.chmod(encrypted, 0o644)
+        plain_rate, size = read_rate(args.python, plain, args.repeat)
+        enc_rate, _ = read_rate(args.python, encrypted, args.repeat)
+    finally:
+        shutil.rmtree(scratch)
+
+    result = {
+        'benchmark': 'decrypt_throughput',
+        'python': args.python,
+        'bytes': size,
+        'unit': 'MB/s',
+        'plain': plain_rate,
+        'encrypted': enc_rate,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print('%.1f MiB module' % (size / float(1 << 20)))
+    print('plain      %10.1f MB/s' % plain_rate)
+    print('encrypted  %10.1f MB/s' % enc_rate)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: encryption throughput in MB/s.
+
+Times encrypt_file() from libencfile.so, which spython-enc calls for every
+file of a deployment, on a generated module of ``--size`` MiB, going
+file to file through the page cache.  Every interpreter given with
+``--python`` additionally times ``_spython.encrypt_bytes()`` on the same
+data, the in-memory encryption used for archives and the bytecode cache.
+
+    python3 bench/bench_encrypt_throughput.py --python /opt/spython/bin/python3 \\
+                                              --python /opt/spython2/bin/python
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import benchutil
+from bench_decrypt_throughput import make_module
+
+# 在目标解释器中执行，需要同时兼容python2和python3
+ENCRYPTER = r'''
+import sys, timeit, _spython
+path, repeat = sys.argv[1], int(sys.argv[2])
+f = open(path, 'rb')
+try:
+    data = f.read()
+finally:
+    f.close()
+best = min(timeit.repeat(lambda: _spython.encrypt_bytes(data), number=1,
+                         repeat=repeat))
+sys.stdout.write('%r\n' % best)
+'''
+
+
+def time_encrypt_file(lib, source, target, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        if lib.encrypt_file(source.encode(), target.encode()) != 0:
+            raise OSError('encrypt_file(%r) failed' % source)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', action='append', dest='pythons',
+                        default=[], help='interpreter whose '
+                        '_spython.encrypt_bytes() to measure (repeatable)')
+    parser.add_argument('--libencfile', default=None,
+                        help='path to libencfile.so')
+    parser.add_argument('--size', type=float, default=16,
+                        help='module size in MiB')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    lib = benchutil.load_libencfile(args.libencfile)
+    scratch = tempfile.mkdtemp(prefix='spython-bench-')
+    try:
+        plain = os.path.join(scratch, 'big_plain.py')
+        make_module(plain, int(args.size * (1 << 20)))
+        size = os.path.getsize(plain)
+        seconds = time_encrypt_file(lib, plain,
+                                    os.path.join(scratch, 'big_enc.py'),
+                                    args.repeat)
+        encrypt_bytes = {}
+        for python in args.pythons:
+            t = benchutil.best_time(python, ENCRYPTER, plain, args.repeat,
+                                    repeat=1)
+            encrypt_bytes[python] = size / t / (1 << 20)
+    finally:
+        shutil.rmtree(scratch)
+
+    result = {
+        'benchmark': 'encrypt_throughput',
+        'bytes': size,
+        'unit': 'MB/s',
+        'encrypt_file': size / seconds / (1 << 20),
+        'encrypt_bytes': encrypt_bytes,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print('%.1f MiB module' % (size / float(1 << 20)))
+    print('%-40s %10.1f MB/s' % ('libencfile encrypt_file',
+                                 result['encrypt_file']))
+    for python in args.pythons:
+        print('%-40s %10.1f MB/s' % (python + ' encrypt_bytes',
+                                     encrypt_bytes[python]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Microbenchmark: io.FileIO open/close latency on an unencrypted file.
+
+Every read-only open in the patched interpreters goes through dopen(), which
+sniffs the file header before handing the descriptor back.  For plain files
+that cost has to stay in the noise compared to a stock CPython, so this
+script times ``io.FileIO(path, 'rb').close()`` in each interpreter given on
+the command line and prints the per-open latency side by side.
+
+    python3 bench/bench_fileio_open.py --python /opt/spython/bin/python3 \\
+                                       --python /usr/bin/python3.7
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# 在目标解释器中执行，需要同时兼容python2和python3
+TIMER = r'''
+import io, sys, timeit
+path, number, repeat = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+def op():
+    io.FileIO(path, 'rb').close()
+best = min(timeit.repeat(op, number=number, repeat=repeat))
+sys.stdout.write('%r\n' % (best / number))
+'''
+
+
+def time_open(python, path, number, repeat):
+    out = subprocess.check_output([python, '-c', TIMER, path,
+                                   str(number), str(repeat)])
+    return float(out.decode().strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', action='append', dest='pythons',
+                        help='interpreter to measure (repeatable), '
+                             'default: the current one')
+    parser.add_argument('--size', type=int, default=4096,
+                        help='size of the plain file in bytes')
+    parser.add_argument('-n', '--number', type=int, default=20000)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = parser.parse_args(argv)
+    pythons = args.pythons or [sys.executable]
+
+    fd, path = tempfile.mkstemp(prefix='spython-bench-', suffix='.csv')
+    try:
+        os.write(fd, b'x' * args.size)
+        os.close(fd)
+        results = {}
+        for python in pythons:
+            results[python] = time_open(python, path, args.number,
+                                        args.repeat)
+    finally:
+        os.unlink(path)
+
+    if args.json:
+        print(json.dumps({'benchmark': 'fileio_open',
+                          'unit': 'seconds/open',
+                          'results': results}, indent=2))
+        return
+    base = results[pythons[-1]]
+    for python in pythons:
+        t = results[python]
+        print('%-40s %8.2f us/open  (%.2fx)' % (python, t * 1e6, t / base))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: Python 2 imports of encrypted modules behind a deep sys.path.
+
+The 2.7.15 ``Lib/`` tree (or the one given with ``--lib``) is copied
+encrypted into a scratch directory, and ``--depth`` directories that do not
+contain any of the imported modules are put in front of it on ``sys.path``,
+the way a deployment with many site directories looks.  Each top-level
+module is then imported in a fresh interpreter.
+
+Besides wall time, the number of "# trying" lines printed under ``-vv`` is
+reported: every one of them is a file find_module() actually opened.  Give
+``--baseline`` an interpreter built from an older import.c to compare.
+
+    make && python3 bench/bench_find_module.py --python /opt/spython2/bin/python
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import benchutil
+
+IMPORTER = r'''
+import sys, time
+depth = int(sys.argv[1])
+tree = sys.argv[2]
+names = sys.argv[3].split(',')
+sys.path[:0] = [tree + '.miss%d' % i for i in range(depth)] + [tree]
+sys.dont_write_bytecode = True
+t0 = time.time()
+ok = 0
+for name in names:
+    try:
+        __import__(name)
+        ok += 1
+    except Exception:
+        pass
+sys.stdout.write('%r %d\n' % (time.time() - t0, ok))
+'''
+
+
+def make_miss_dirs(tree, depth):
+    # 目录的mtime需要早于当前时间，否则import.c不会缓存目录列表
+    old = time.time() - 3600
+    for i in range(depth):
+        path = '%s.miss%d' % (tree, i)
+        os.makedirs(path)
+        with open(os.path.join(path, 'unrelated.py'), 'w') as f:
+            f.write('')
+        os.utime(path, (old, old))
+
+
+def measure(python, tree, names, depth, repeat):
+    best, imported = None, 0
+    for _ in range(repeat):
+        out = benchutil.run_python(python, IMPORTER, str(depth), tree,
+                                   ','.join(names),
+                                   flags=['-S', '-E', '-W', 'ignore'])
+        elapsed, imported = out.split()
+        elapsed = float(elapsed)
+        best = elapsed if best is None else min(best, elapsed)
+    verbose = benchutil.run_python(python, IMPORTER, str(depth), tree,
+                                   ','.join(names),
+                                   flags=['-S', '-E', '-W', 'ignore', '-vv'],
+                                   stderr=True)
+    probes = sum(1 for line in verbose.splitlines()
+                 if line.startswith('# trying '))
+    return {'seconds': best, 'imported': int(imported), 'probes': probes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', default='python2',
+                        help='patched 2.7 interpreter to measure')
+    parser.add_argument('--baseline', default=None,
+                        help='interpreter to compare against')
+    parser.add_argument('--lib', default=benchutil.LIB_27,
+                        help='stdlib tree to import (must match --python)')
+    parser.add_argument('--libencfile', default=None,
+                        help='path to libencfile.so')
+    parser.add_argument('--depth', type=int, default=50,
+                        help='sys.path entries in front of the modules')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    lib = benchutil.load_libencfile(args.libencfile)
+    scratch = tempfile.mkdtemp(prefix='spython-bench-')
+    try:
+        tree = os.path.join(scratch, 'encrypted')
+        nfiles = benchutil.copy_tree(args.lib, tree, encrypt_with=lib)
+        names = benchutil.top_level_modules(tree)
+        make_miss_dirs(tree, args.depth)
+        results = {'python': measure(args.python, tree, names, args.depth,
+                                     args.repeat)}
+        if args.baseline:
+            results['baseline'] = measure(args.baseline, tree, names,
+                                          args.depth, args.repeat)
+    finally:
+        shutil.rmtree(scratch)
+
+    result = {
+        'benchmark': 'find_module',
+        'python': args.python,
+        'baseline': args.baseline,
+        'files': nfiles,
+        'modules': len(names),
+        'depth': args.depth,
+        'results': results,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print('%d files, %d top-level modules, %d sys.path entries in front'
+          % (nfiles, len(names), args.depth))
+    for label in ('baseline', 'python'):
+        if label in results:
+            r = results[label]
+            print('%-9s %8.3f s  %6d files opened  (%d imported)'
+                  % (label, r['seconds'], r['probes'], r['imported']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: importing the whole stdlib from a plain and an encrypted copy.
+
+The 3.7.3 ``Lib/`` tree (or the one given with ``--lib``) is copied twice
+into a scratch directory, once as-is and once encrypted with libencfile.so,
+the library behind spython-enc.  Each top-level module is then imported in
+a fresh interpreter with the copy first on ``sys.path``; the difference
+between the two runs is what decrypt-on-open costs at import time.
+
+Warm runs reuse the page cache.  For cold runs the pages of the copy are
+dropped with posix_fadvise() before every interpreter starts, so the
+sources are read from disk again.  ``--baseline`` adds a stock CPython of
+the same version, which can only import the plain copy.
+
+    make && python3 bench/bench_import_lib.py --python /opt/spython/bin/python3
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import benchutil
+
+# 在目标解释器中执行，需要同时兼容python2和python3
+IMPORTER = r'''
+import sys, time
+tree = sys.argv[1]
+names = sys.argv[2].split(',')
+sys.path.insert(0, tree)
+sys.dont_write_bytecode = True
+t0 = time.time()
+ok = 0
+for name in names:
+    try:
+        __import__(name)
+        ok += 1
+    except Exception:
+        pass
+sys.stdout.write('%r %d\n' % (time.time() - t0, ok))
+'''
+
+
+def time_imports(python, tree, names, repeat, cold=False):
+    best, imported = None, 0
+    for _ in range(repeat):
+        if cold and not benchutil.evict_page_cache(tree):
+            return None, 0
+        out = benchutil.run_python(python, IMPORTER, tree, ','.join(names),
+                                   flags=['-S', '-E', '-W', 'ignore'])
+        elapsed, imported = out.split()
+        elapsed = float(elapsed)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, int(imported)
+
+
+def measure(python, tree, names, repeat):
+    warm, imported = time_imports(python, tree, names, repeat)
+    cold, _ = time_imports(python, tree, names, repeat, cold=True)
+    return {'seconds': warm, 'cold_seconds': cold, 'imported': imported}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', default=sys.executable,
+                        help='patched interpreter to measure')
+    parser.add_argument('--baseline', default=None,
+                        help='stock interpreter to compare against')
+    parser.add_argument('--lib', default=benchutil.LIB_37,
+                        help='stdlib tree to import (must match --python)')
+    parser.add_argument('--libencfile', default=None,
+                        help='path to libencfile.so')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    lib = benchutil.load_libencfile(args.libencfile)
+    scratch = tempfile.mkdtemp(prefix='spython-bench-')
+    try:
+        plain = os.path.join(scratch, 'plain')
+        encrypted = os.path.join(scratch, 'encrypted')
+        nfiles = benchutil.copy_tree(args.lib, plain)
+        benchutil.copy_tree(args.lib, encrypted, encrypt_with=lib)
+        names = benchutil.top_level_modules(plain)
+        r_plain = measure(args.python, plain, names, args.repeat)
+        r_enc = measure(args.python, encrypted, names, args.repeat)
+        r_base = None
+        if args.baseline:
+            r_base = measure(args.baseline, plain, names, args.repeat)
+    finally:
+        shutil.rmtree(scratch)
+
+    result = {
+        'benchmark': 'import_lib',
+        'python': args.python,
+        'baseline': args.baseline,
+        'files': nfiles,
+        'modules': len(names),
+        'plain': r_plain,
+        'encrypted': r_enc,
+    }
+    if r_base is not None:
+        result['baseline_plain'] = r_base
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print('%d files, %d top-level modules' % (nfiles, len(names)))
+    print('%-10s %10s  %10s' % ('', 'warm', 'cold'))
+    for label, key in (('baseline', 'baseline_plain'), ('plain', 'plain'),
+                       ('encrypted', 'encrypted')):
+        if key in result:
+            r = result[key]
+            cold = ('%8.3f s' % r['cold_seconds']
+                    if r['cold_seconds'] is not None else '       -')
+            print('%-10s %8.3f s  %s  (%d imported)'
+                  % (label, r['seconds'], cold, r['imported']))
+    t_plain, t_enc = r_plain['seconds'], r_enc['seconds']
+    print('overhead   %8.3f s  (%.2fx)' % (t_enc - t_plain, t_enc / t_plain))
+
+
+if __name__ == '__main__':
+    main()
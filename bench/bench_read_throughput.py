@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: open()/read() throughput on plain data files.
+
+Data files (CSV, JSON, images...) are never encrypted, but every read-only
+open in the patched interpreters still goes through dopen() and the header
+sniff in the patched fileio.c.  For each size in ``--sizes`` a file of
+random bytes is written, and every interpreter given with ``--python``
+times ``open(path, 'rb').read()`` on it.  Give a stock CPython of the same
+version as the last ``--python`` to see what the patch costs.
+
+    python3 bench/bench_read_throughput.py --python /opt/spython/bin/python3 \\
+                                           --python /usr/bin/python3.7
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import benchutil
+
+# 在目标解释器中执行，需要同时兼容python2和python3
+READER = r'''
+import sys, timeit
+path, number, repeat = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+def op():
+    f = open(path, 'rb')
+    try:
+        f.read()
+    finally:
+        f.close()
+best = min(timeit.repeat(op, number=number, repeat=repeat))
+sys.stdout.write('%r\n' % (best / number))
+'''
+
+
+def parse_size(text):
+    units = {'k': 1 << 10, 'm': 1 << 20}
+    if text[-1].lower() in units:
+        return int(text[:-1]) * units[text[-1].lower()]
+    return int(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', action='append', dest='pythons',
+                        help='interpreter to measure (repeatable), '
+                             'default: the current one')
+    parser.add_argument('--sizes', default='4k,64k,1m,16m',
+                        help='comma separated file sizes (k/m suffixes)')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    pythons = args.pythons or [sys.executable]
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+
+    results = []
+    for size in sizes:
+        fd, path = tempfile.mkstemp(prefix='spython-bench-', suffix='.dat')
+        try:
+            os.write(fd, os.urandom(size))
+            os.close(fd)
+            # 每轮大约读64MB，小文件多读几次
+            number = max(1, (64 << 20) // size)
+            row = {'bytes': size, 'number': number, 'mb_per_sec': {}}
+            for python in pythons:
+                seconds = benchutil.best_time(python, READER, path, number,
+                                              args.repeat, repeat=1)
+                row['mb_per_sec'][python] = size / seconds / (1 << 20)
+            results.append(row)
+        finally:
+            os.unlink(path)
+
+    if args.json:
+        print(json.dumps({'benchmark': 'read_throughput', 'unit': 'MB/s',
+                          'pythons': pythons, 'results': results}, indent=2))
+        return
+    base = pythons[-1]
+    for row in results:
+        print('%d bytes' % row['bytes'])
+        for python in pythons:
+            rate = row['mb_per_sec'][python]
+            print('  %-40s %10.1f MB/s  (%.2fx)'
+                  % (python, rate, rate / row['mb_per_sec'][base]))
+
+
+if __name__ == '__main__':
+    main()
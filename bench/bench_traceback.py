@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Benchmark: formatting tracebacks through encrypted modules.
+
+Showing a source line in a traceback opens the module file again, so each
+frame in an encrypted module costs a decryption unless the decrypted-source
+cache already holds it.  A generated module with ``--depth`` nested calls
+that end in a raise is written once in plain text and once encrypted; the
+target interpreter imports each copy and times:
+
+  excepthook  the interpreter's own printer (sys.__excepthook__, i.e.
+              Python/traceback.c), which reopens the file for every frame
+  cold        traceback.format_exc() with linecache cleared before each call
+  warm        traceback.format_exc() with the lines already in linecache
+
+Python 2 only decrypts in the C printer; its linecache reads the raw file,
+so cold/warm are not reported there.
+
+    python3 bench/bench_traceback.py --python /opt/spython/bin/python3
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import benchutil
+
+# 在目标解释器中执行，需要同时兼容python2和python3
+FORMATTER = r'''
+import linecache, sys, timeit, traceback
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from StringIO import StringIO
+tree, number, repeat = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+sys.path.insert(0, tree)
+sys.dont_write_bytecode = True
+import tbmod
+def best(op):
+    return min(timeit.repeat(op, number=number, repeat=repeat)) / number
+def hook():
+    saved, sys.stderr = sys.stderr, StringIO()
+    try:
+        sys.__excepthook__(*info)
+        return sys.stderr.getvalue()
+    finally:
+        sys.stderr = saved
+def cold():
+    linecache.clearcache()
+    traceback.format_exc()
+def warm():
+    traceback.format_exc()
+try:
+    tbmod.f0()
+except ValueError:
+    info = sys.exc_info()
+    lines = len(hook().splitlines())
+    t_hook = best(hook)
+    t_cold = t_warm = None
+    if sys.version_info[0] >= 3:
+        t_cold, t_warm = best(cold), best(warm)
+sys.stdout.write('%r %r %r %d\n' % (t_hook, t_cold, t_warm, lines))
+'''
+
+
+def make_module(path, depth, padding):
+    """Write a module whose f0() calls f1() ... which raises ValueError.
+    *padding* filler lines between the functions make the file bigger."""
+    with open(path, 'w') as f:
+        for i in range(depth):
+            f.write('def f%d():\n' % i)
+            if i == depth - 1:
+                f.write('    raise ValueError(%d)\n' % i)
+            else:
+                f.write('    return f%d() + 1\n' % (i + 1))
+            for j in range(padding):
+                f.write('PAD_%d_%d = %d\n' % (i, j, j))
+
+
+def measure(python, tree, number, repeat):
+    out = benchutil.run_python(python, FORMATTER, tree, number, repeat,
+                               flags=['-S', '-E'])
+    hook, cold, warm, lines = out.split()
+    return {'excepthook_seconds': float(hook),
+            'cold_seconds': None if cold == 'None' else float(cold),
+            'warm_seconds': None if warm == 'None' else float(warm),
+            'lines': int(lines)}
+
+
+def usec(seconds):
+    if seconds is None:
+        return '%12s' % '-'
+    return '%9.1f us' % (seconds * 1e6)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python', default=sys.executable,
+                        help='patched interpreter to measure')
+    parser.add_argument('--libencfile', default=None,
+                        help='path to libencfile.so')
+    parser.add_argument('--depth', type=int, default=20,
+                        help='frames in the traceback')
+    parser.add_argument('--padding', type=int, default=50,
+                        help='filler lines after each function')
+    parser.add_argument('-n', '--number', type=int, default=200)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    lib = benchutil.load_libencfile(args.libencfile)
+    scratch = tempfile.mkdtemp(prefix='spython-bench-')
+    try:
+        plain = os.path.join(scratch, 'plain')
+        encrypted = os.path.join(scratch, 'encrypted')
+        os.mkdir(plain)
+        os.mkdir(encrypted)
+        source = os.path.join(plain, 'tbmod.py')
+        make_module(source, args.depth, args.padding)
+        size = os.path.getsize(source)
+        lib.encrypt_file(source.encode(),
+                         os.path.join(encrypted, 'tbmod.py').encode())
+        results = {}
+        for label, tree in (('plain', plain), ('encrypted', encrypted)):
+            results[label] = measure(args.python, tree, args.number,
+                                     args.repeat)
+    finally:
+        shutil.rmtree(scratch)
+
+    result = {
+        'benchmark': 'traceback',
+        'python': args.python,
+        'depth': args.depth,
+        'module_size': size,
+        'unit': 'seconds/traceback',
+        'results': results,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print('%d frames, %d byte module' % (args.depth, size))
+    for label in ('plain', 'encrypted'):
+        r = results[label]
+        print('%-10s excepthook %s  cold %s  warm %s'
+              % (label, usec(r['excepthook_seconds']), usec(r['cold_seconds']),
+                 usec(r['warm_seconds'])))
+
+
+if __name__ == '__main__':
+    main()
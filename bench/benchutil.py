@@ -0,0 +1,116 @@
+# coding=utf-8
+"""Helpers shared by the spython benchmarks."""
+import ctypes
+import os
+import shutil
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+LIB_37 = os.path.join(REPO_DIR, 'spython-3.7.3', 'Python-3.7.3-has-modified',
+                      'Lib')
+LIB_27 = os.path.join(REPO_DIR, 'spython-2.7.15', 'Python-2.7.15-has-modified',
+                      'Lib')
+
+# 不参与import基准测试的目录/模块(测试用例、GUI、会产生副作用的模块)
+SKIP_NAMES = frozenset([
+    'test', 'tests', 'idlelib', 'tkinter', 'lib-tk', 'turtledemo', 'turtle',
+    'ensurepip', 'venv', 'antigravity', 'this', '__phello__.foo',
+    'site-packages', 'lib2to3', 'pydoc_data', 'plat-linux2', 'msilib',
+])
+
+
+def load_libencfile(path=None):
+    """Load libencfile.so the same way spython-enc does."""
+    candidates = [path] if path else [os.path.join(REPO_DIR, 'libencfile.so'),
+                                      './libencfile.so', 'libencfile.so']
+    error = None
+    for candidate in candidates:
+        try:
+            lib = ctypes.CDLL(candidate)
+        except OSError as exc:
+            error = exc
+            continue
+        lib.encrypt_file.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
+        return lib
+    raise error
+
+
+def copy_tree(src, dst, encrypt_with=None):
+    """Copy the .py files of *src* to *dst*, encrypting them if a
+    libencfile handle is given.  Returns the number of files written."""
+    count = 0
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [d for d in dirs if d not in SKIP_NAMES]
+        out_dir = os.path.join(dst, os.path.relpath(root, src))
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+        for name in files:
+            if not name.endswith('.py'):
+                continue
+            src_path = os.path.join(root, name)
+            dst_path = os.path.join(out_dir, name)
+            if encrypt_with is None:
+                shutil.copyfile(src_path, dst_path)
+            else:
+                encrypt_with.encrypt_file(src_path.encode(),
+                                          dst_path.encode())
+                os.chmod(dst_path, 0o644)
+            count += 1
+    return count
+
+
+def evict_page_cache(tree):
+    """Ask the kernel to drop the cached pages of every file below *tree*,
+    so the next run reads them from disk again (a cold import).  Needs no
+    privileges, but only works where os.posix_fadvise is available."""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for root, dirs, files in os.walk(tree):
+        for name in files:
+            fd = os.open(os.path.join(root, name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def best_time(python, code, *args, **kwargs):
+    """Run *code* *repeat* times and return the smallest of the float
+    values it prints."""
+    repeat = kwargs.pop('repeat', 5)
+    return min(float(run_python(python, code, *args, **kwargs))
+               for _ in range(repeat))
+
+
+def top_level_modules(tree):
+    """Names of the importable top-level modules and packages in *tree*."""
+    names = []
+    for name in sorted(os.listdir(tree)):
+        path = os.path.join(tree, name)
+        if name.endswith('.py'):
+            name = name[:-3]
+        elif not os.path.isfile(os.path.join(path, '__init__.py')):
+            continue
+        if name in SKIP_NAMES or name.startswith('__'):
+            continue
+        names.append(name)
+    return names
+
+
+def run_python(python, code, *args, **kwargs):
+    """Run *code* with *python* and return its stripped stdout as text
+    (its stderr instead with ``stderr=True``)."""
+    env = kwargs.pop('env', None)
+    cmd = ([python] + list(kwargs.pop('flags', [])) +
+           ['-c', code] + [str(a) for a in args])
+    if not kwargs.pop('stderr', False):
+        return subprocess.check_output(cmd, env=env).decode().strip()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    err = proc.communicate()[1]
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return err.decode('utf-8', 'replace').strip()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# coding=utf-8
+"""
+Run the spython benchmark suite and write the results as one JSON document.
+
+Each benchmark of this directory is run with ``--json`` against the patched
+2.7.15 and/or 3.7.3 interpreters, next to a stock CPython of the same
+version where one is given, so that results from different commits can be
+compared for regressions.  Everything runs offline on generated data and on
+the Lib/ trees of this repository.
+
+    make
+    python3 bench/run_suite.py --python3 /opt/spython/bin/python3 \\
+        --stock3 /usr/bin/python3.7 --python2 /opt/spython2/bin/python \\
+        --output bench-results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import benchutil
+
+TREES = (
+    # (名称, 被修改的解释器参数, 原版解释器参数, 标准库)
+    ('3.7.3', 'python3', 'stock3', benchutil.LIB_37),
+    ('2.7.15', 'python2', 'stock2', benchutil.LIB_27),
+)
+
+
+def tree_benchmarks(python, stock, lib, libencfile, quick):
+    """(name, script, arguments) of the benchmarks run for one tree."""
+    repeat = ['-r', '2' if quick else '5']
+    enc = ['--libencfile', libencfile] if libencfile else []
+    with_stock = ['--python', python] + (['--python', stock] if stock else [])
+    benchmarks = [
+        ('import_lib', 'bench_import_lib.py',
+         ['--python', python, '--lib', lib] + enc + repeat +
+         (['--baseline', stock] if stock else [])),
+        ('read_throughput', 'bench_read_throughput.py',
+         with_stock + repeat + (['--sizes', '4k,1m'] if quick else [])),
+        ('fileio_open', 'bench_fileio_open.py',
+         with_stock + repeat + (['-n', '2000'] if quick else [])),
+        ('traceback', 'bench_traceback.py',
+         ['--python', python] + enc + repeat +
+         (['-n', '20'] if quick else [])),
+    ]
+    if lib == benchutil.LIB_37:
+        # Python 2的open()不经过dopen，不会解密
+        benchmarks.append(
+            ('decrypt_throughput', 'bench_decrypt_throughput.py',
+             ['--python', python] + enc + repeat +
+             (['--size', '2'] if quick else [])))
+        # 只有3.7有asyncio
+        benchmarks.append(
+            ('asyncio_loops', 'bench_asyncio_loops.py',
+             ['--python', python] + repeat +
+             (['--messages', '200', '--file-size', '4'] if quick else [])))
+        benchmarks.append(
+            ('asyncio_tls', 'bench_asyncio_tls.py',
+             ['--python', python] + repeat +
+             (['--messages', '200', '--mb', '8'] if quick else [])))
+        benchmarks.append(
+            ('asyncio_writes', 'bench_asyncio_writes.py',
+             ['--python', python] + repeat +
+             (['--bursts', '100'] if quick else [])))
+    else:
+        benchmarks.append(
+            ('find_module', 'bench_find_module.py',
+             ['--python', python, '--lib', lib] + enc + repeat))
+    return benchmarks
+
+
+def run_benchmark(script, args):
+    cmd = [sys.executable, os.path.join(benchutil.BENCH_DIR, script)]
+    cmd += list(args) + ['--json']
+    try:
+        out = subprocess.check_output(cmd, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as exc:
+        lines = exc.stderr.decode('utf-8', 'replace').strip().splitlines()
+        return {'error': lines[-1] if lines else str(exc), 'command': cmd}
+    return json.loads(out.decode())
+
+
+def git_revision():
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                      cwd=benchutil.REPO_DIR,
+                                      stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode().strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--python3', help='patched 3.7.3 interpreter')
+    parser.add_argument('--stock3', help='stock CPython 3.7 to compare with')
+    parser.add_argument('--python2', help='patched 2.7.15 interpreter')
+    parser.add_argument('--stock2', help='stock CPython 2.7 to compare with')
+    parser.add_argument('--libencfile', default=None,
+                        help='path to libencfile.so')
+    parser.add_argument('--only', default=None,
+                        help='comma separated benchmark names to run')
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer repetitions and smaller inputs')
+    parser.add_argument('-o', '--output', default=None,
+                        help='write the JSON here instead of stdout')
+    args = parser.parse_args(argv)
+    if not (args.python3 or args.python2):
+        parser.error('give at least one of --python3 and --python2')
+    only = set(args.only.split(',')) if args.only else None
+
+    result = {
+        'suite': 'spython',
+        'started': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'revision': git_revision(),
+        'host': {'platform': platform.platform(),
+                 'machine': platform.machine(),
+                 'cpus': os.cpu_count()},
+        'quick': args.quick,
+        'trees': {},
+    }
+    for name, patched, stock, lib in TREES:
+        python = getattr(args, patched)
+        if not python:
+            continue
+        stock = getattr(args, stock)
+        tree = {'python': python, 'stock': stock, 'benchmarks': {}}
+        for bench, script, bench_args in tree_benchmarks(
+                python, stock, lib, args.libencfile, args.quick):
+            if only is None or bench in only:
+                sys.stderr.write('%s: %s\n' % (name, bench))
+                tree['benchmarks'][bench] = run_benchmark(script, bench_args)
+        result['trees'][name] = tree
+
+    if only is None or 'encrypt_throughput' in only:
+        sys.stderr.write('encrypt_throughput\n')
+        bench_args = (['--libencfile', args.libencfile]
+                      if args.libencfile else [])
+        for python in (args.python3, args.python2):
+            if python:
+                bench_args += ['--python', python]
+        if args.quick:
+            bench_args += ['-r', '2', '--size', '2']
+        result['encrypt_throughput'] = run_benchmark(
+            'bench_encrypt_throughput.py', bench_args)
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
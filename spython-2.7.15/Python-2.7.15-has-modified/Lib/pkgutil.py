@@ -3,6 +3,7 @@
 import os
 import sys
 import imp
+import _spython
 import os.path
 from types import ModuleType
 
@@ -249,8 +250,8 @@ class ImpLoader:
         return mod
 
     def get_data(self, pathname):
-        with open(pathname, "rb") as file:
-            return file.read()
+        # Decrypts encrypted data files, open() would return the ciphertext.
+        return _spython.read_data(pathname)
 
     def _reopen(self):
         if self.file and self.file.closed:
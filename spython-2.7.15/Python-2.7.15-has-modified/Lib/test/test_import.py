@@ -665,9 +665,124 @@ class TestSymbolicallyLinkedPackage(unittest.TestCase):
             shutil.rmtree(self.tagged)
         sys.path[:] = self.orig_sys_path
 
+class EncryptedSourceTests(unittest.TestCase):
+    # spython: find_module() probes through cached directory listings and
+    # leaves decryption to load_source_module().
+
+    source = "secret = 'spam'\n"
+
+    def setUp(self):
+        import _spython
+        self.encrypt = _spython.encrypt_bytes
+        self.dir = TESTFN + "_encrypted"
+        os.mkdir(self.dir)
+        sys.path.insert(0, self.dir)
+        self.name = "encrypted_mod"
+        self.path = os.path.join(self.dir, self.name + os.extsep + "py")
+
+    def tearDown(self):
+        sys.path.remove(self.dir)
+        unload(self.name)
+        rmtree(self.dir)
+
+    def write_encrypted(self):
+        with open(self.path, "wb") as f:
+            f.write(self.encrypt(self.source))
+
+    def age_dir(self):
+        # Listings of recently modified directories are never cached.
+        old = os.stat(self.dir).st_mtime - 3600
+        os.utime(self.dir, (old, old))
+
+    def test_import_encrypted(self):
+        self.write_encrypted()
+        mod = __import__(self.name)
+        self.assertEqual(mod.secret, "spam")
+        self.assertEqual(mod.__file__, self.path)
+
+    def test_find_module_returns_plaintext(self):
+        self.write_encrypted()
+        f, path, description = imp.find_module(self.name, [self.dir])
+        try:
+            self.assertEqual(f.read(), self.source)
+        finally:
+            f.close()
+        self.assertEqual(path, self.path)
+        self.assertEqual(description[2], imp.PY_SOURCE)
+
+    def test_load_source_encrypted(self):
+        self.write_encrypted()
+        mod = imp.load_source(self.name, self.path)
+        self.assertEqual(mod.secret, "spam")
+
+    def test_listing_sees_new_module(self):
+        self.age_dir()
+        self.assertRaises(ImportError, __import__, self.name)
+        # Creating the file changes the mtime of the cached directory.
+        self.write_encrypted()
+        mod = __import__(self.name)
+        self.assertEqual(mod.secret, "spam")
+
+    def test_listing_sees_removed_module(self):
+        self.write_encrypted()
+        self.age_dir()
+        __import__(self.name)
+        unload(self.name)
+        os.unlink(self.path)
+        self.assertRaises(ImportError, __import__, self.name)
+
+    def test_listing_follows_chdir(self):
+        # Relative sys.path entries are cached by absolute name: a
+        # directory with the same mtime doesn't reuse the old listing.
+        dir_a = os.path.join(self.dir, "a")
+        dir_b = os.path.join(self.dir, "b")
+        os.mkdir(dir_a)
+        os.mkdir(dir_b)
+        with open(os.path.join(dir_b, self.name + os.extsep + "py"),
+                  "wb") as f:
+            f.write(self.encrypt(self.source))
+        old = os.stat(self.dir).st_mtime - 3600
+        for d in (dir_a, dir_b):
+            os.utime(d, (old, old))
+        cwd = os.getcwd()
+        sys.path.insert(0, "")
+        try:
+            os.chdir(dir_a)
+            self.assertRaises(ImportError, __import__, self.name)
+            os.chdir(os.path.join(os.pardir, "b"))
+            mod = __import__(self.name)
+        finally:
+            os.chdir(cwd)
+            sys.path.remove("")
+        self.assertEqual(mod.secret, "spam")
+
+    def test_encrypted_cache_rejects_plaintext(self):
+        import hashlib
+        spath = os.path.join(self.dir, self.name + ".spyc")
+        self.write_encrypted()
+        with EnvironmentVarGuard() as env:
+            env["PYTHONENCRYPTEDCACHE"] = "1"
+            __import__(self.name)
+            unload(self.name)
+            with open(spath, "rb") as f:
+                self.assertEqual(f.read(6), "SPYENC")
+            # A plaintext file under the cache name matching the source
+            # is not trusted: it must decrypt.
+            code = compile("secret = 'planted'\n", self.path, "exec")
+            with open(spath, "wb") as f:
+                f.write(imp.get_magic() +
+                        hashlib.sha256(self.source).digest() +
+                        marshal.dumps(code))
+            mod = __import__(self.name)
+        self.assertEqual(mod.secret, "spam")
+        with open(spath, "rb") as f:
+            self.assertEqual(f.read(6), "SPYENC")
+
+
 def test_main(verbose=None):
     run_unittest(ImportTests, PycRewritingTests, PathsTests,
-        RelativeImportTests, TestSymbolicallyLinkedPackage)
+        RelativeImportTests, TestSymbolicallyLinkedPackage,
+        EncryptedSourceTests)
 
 if __name__ == '__main__':
     # Test needs to be a package, so we can do relative imports.
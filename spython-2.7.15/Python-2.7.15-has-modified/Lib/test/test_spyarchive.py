@@ -0,0 +1,141 @@
+import os
+import pkgutil
+import sys
+import traceback
+import unittest
+
+from test import test_support
+from test.test_importhooks import ImportHooksBaseTestCase
+
+import spyarchive
+
+TEMP_ARCHIVE = os.path.abspath(test_support.TESTFN + ".spya")
+
+TESTPACK = "spyatestpackage"
+
+pack_src = """\
+from . import util
+from .sub import deep
+VALUE = util.f() + deep.G
+"""
+util_src = "def f():\n    return 40\n"
+deep_src = """\
+# coding: utf-8
+G = 2
+S = u"\xc3\xa9"
+def do_raise():
+    raise TypeError
+"""
+
+
+class ArchiveImportTestCase(ImportHooksBaseTestCase):
+
+    members = [
+        (TESTPACK + "/__init__.py", pack_src),
+        (TESTPACK + "/util.py", util_src),
+        (TESTPACK + "/sub/__init__.py", ""),
+        (TESTPACK + "/sub/deep.py", deep_src),
+        (TESTPACK + "/data.bin", "\0\1\2\0"),
+    ]
+
+    def setUp(self):
+        ImportHooksBaseTestCase.setUp(self)
+        spyarchive.write_archive(TEMP_ARCHIVE, self.members)
+        self.finder = spyarchive.install(TEMP_ARCHIVE)
+
+    def tearDown(self):
+        ImportHooksBaseTestCase.tearDown(self)
+        self.finder.archive.close()
+        test_support.unlink(TEMP_ARCHIVE)
+
+    def test_archive_is_encrypted(self):
+        with open(TEMP_ARCHIVE, "rb") as f:
+            data = f.read()
+        self.assertTrue(data.startswith(spyarchive.ARCHIVE_MAGIC))
+        self.assertNotIn("do_raise", data)
+        self.assertNotIn(TESTPACK, data)
+
+    def test_import_package(self):
+        mod = __import__(TESTPACK + ".sub.deep")
+        self.assertEqual(mod.VALUE, 42)
+        self.assertEqual(mod.sub.deep.S, u"\xe9")
+        self.assertEqual(mod.__file__,
+                         os.path.join(TEMP_ARCHIVE, TESTPACK, "__init__.py"))
+        self.assertEqual(mod.__path__,
+                         [os.path.join(TEMP_ARCHIVE, TESTPACK)])
+        self.assertIs(mod.__loader__, self.finder)
+        self.assertEqual(mod.sub.deep.__package__, TESTPACK + ".sub")
+
+    def test_unknown_module(self):
+        self.assertIsNone(self.finder.find_module(TESTPACK + ".missing"))
+        self.assertIsNone(self.finder.find_module(TESTPACK + ".data"))
+        with self.assertRaises(ImportError):
+            __import__(TESTPACK + ".missing")
+
+    def test_loader_api(self):
+        name = TESTPACK + ".sub.deep"
+        self.assertFalse(self.finder.is_package(name))
+        self.assertTrue(self.finder.is_package(TESTPACK + ".sub"))
+        self.assertEqual(self.finder.get_source(name), deep_src)
+        self.assertEqual(self.finder.get_filename(name),
+                         os.path.join(TEMP_ARCHIVE, TESTPACK, "sub",
+                                      "deep.py"))
+        self.assertRaises(ImportError, self.finder.get_source, "missing")
+
+    def test_get_data(self):
+        path = os.path.join(TEMP_ARCHIVE, TESTPACK, "data.bin")
+        self.assertEqual(self.finder.get_data(path), "\0\1\2\0")
+        self.assertRaises(IOError, self.finder.get_data, path + "x")
+        self.assertEqual(pkgutil.get_data(TESTPACK, "data.bin"), "\0\1\2\0")
+
+    def test_resource_reader(self):
+        reader = self.finder.get_resource_reader(TESTPACK)
+        with reader.open_resource("data.bin") as f:
+            self.assertEqual(f.read(), "\0\1\2\0")
+        self.assertTrue(reader.is_resource("data.bin"))
+        self.assertFalse(reader.is_resource("sub"))
+        self.assertEqual(set(reader.contents()),
+                         {"__init__.py", "util.py", "sub", "data.bin"})
+        self.assertRaises(IOError, reader.open_resource, "missing")
+        self.assertRaises(IOError, reader.resource_path, "data.bin")
+        self.assertIsNone(
+            self.finder.get_resource_reader(TESTPACK + ".util"))
+
+    def test_traceback(self):
+        mod = __import__(TESTPACK + ".sub.deep", fromlist=["deep"])
+        try:
+            mod.do_raise()
+        except TypeError:
+            tb = traceback.extract_tb(sys.exc_info()[2])
+        filename, lineno, name, line = tb[-1]
+        self.assertEqual(filename, mod.__file__)
+        self.assertEqual(line, "raise TypeError")
+
+    def test_not_an_archive(self):
+        with open(TEMP_ARCHIVE, "wb") as f:
+            f.write("PK\3\4" + "\0" * 100)
+        self.assertRaises(spyarchive.ArchiveError,
+                          spyarchive.ArchiveFinder, TEMP_ARCHIVE)
+
+    def test_tampered_member(self):
+        archive = self.finder.archive
+        offset, size = archive._members[TESTPACK + "/util.py"]
+        with open(TEMP_ARCHIVE, "r+b") as f:
+            f.seek(offset + size // 2)
+            byte = f.read(1)
+            f.seek(-1, 1)
+            f.write(chr(ord(byte) ^ 1))
+        finder = spyarchive.ArchiveFinder(TEMP_ARCHIVE)
+        try:
+            self.assertRaises(spyarchive.ArchiveError,
+                              finder.get_code, TESTPACK + ".util")
+        finally:
+            finder.archive.close()
+
+
+def test_main():
+    test_support.run_unittest(ArchiveImportTestCase)
+
+
+if __name__ == "__main__":
+    test_main()
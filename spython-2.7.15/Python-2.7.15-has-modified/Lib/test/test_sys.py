@@ -446,6 +446,81 @@ class SysModuleTest(unittest.TestCase):
     def test_clear_type_cache(self):
         sys._clear_type_cache()
 
+    @test.test_support.cpython_only
+    def test_decrypt_cache(self):
+        import _spython
+        import imp
+        self.addCleanup(sys._set_decrypt_cache_size,
+                        sys._decrypt_cache_info()["maxsize"])
+        sys._set_decrypt_cache_size(0)
+        sys._set_decrypt_cache_size(1 << 20)
+        path = test.test_support.TESTFN + ".py"
+        self.addCleanup(test.test_support.unlink, path)
+        self.addCleanup(sys.modules.pop, "decryptcachemod", None)
+
+        def write(data):
+            with open(path, "wb") as f:
+                f.write(_spython.encrypt_bytes(data))
+
+        def load():
+            return imp.load_source("decryptcachemod", path).x
+
+        write(b"x = 1\n")
+        before = sys._decrypt_cache_info()
+        # The first decryption is only remembered, the second one is cached.
+        for i in range(3):
+            self.assertEqual(load(), 1)
+        info = sys._decrypt_cache_info()
+        self.assertEqual(info["hits"] - before["hits"], 1)
+        self.assertEqual(info["misses"] - before["misses"], 2)
+        self.assertEqual(info["entries"], 1)
+        self.assertEqual(info["size"], 6)
+
+        # A modified file is never served from the cache.
+        write(b"x = 22\n")
+        self.assertEqual(load(), 22)
+        self.assertEqual(sys._decrypt_cache_info()["hits"], info["hits"])
+        self.assertEqual(sys._decrypt_cache_info()["entries"], 0)
+
+        sys._set_decrypt_cache_size(0)
+        info = sys._decrypt_cache_info()
+        self.assertEqual((info["entries"], info["size"], info["maxsize"]),
+                         (0, 0, 0))
+        self.assertRaises(ValueError, sys._set_decrypt_cache_size, -1)
+
+    def test_decrypt_stats(self):
+        import _spython
+        import imp
+        path = test.test_support.TESTFN + ".py"
+        self.addCleanup(test.test_support.unlink, path)
+        self.addCleanup(sys.modules.pop, "decryptstatsmod", None)
+        with open(path, "wb") as f:
+            f.write(_spython.encrypt_bytes(b"x = 1\n"))
+        before = sys._decrypt_stats()
+        self.assertEqual(imp.load_source("decryptstatsmod", path).x, 1)
+        stats = sys._decrypt_stats()
+        self.assertEqual(stats["files"] - before["files"], 1)
+        self.assertEqual(stats["plain_bytes"] - before["plain_bytes"], 6)
+        self.assertGreater(stats["bytes"] - before["bytes"], 6)
+        self.assertGreater(stats["decrypt_ns"], before["decrypt_ns"])
+
+    def test_decrypt_time(self):
+        import _spython
+        tmpdir = test.test_support.TESTFN + "_dir"
+        os.mkdir(tmpdir)
+        self.addCleanup(test.test_support.rmtree, tmpdir)
+        with open(os.path.join(tmpdir, "decrypttimemod.py"), "wb") as f:
+            f.write(_spython.encrypt_bytes(b"x = 1\n"))
+        code = ("import sys; sys.dont_write_bytecode = True; "
+                "sys.path.insert(0, %r); import decrypttimemod" % tmpdir)
+        rc, out, err = assert_python_ok("-c", code, PYTHONDECRYPTTIME="1")
+        lines = err.splitlines()
+        self.assertTrue(lines[0].startswith("decrypt time: sniff [us]"))
+        fields = [line.split("|") for line in lines
+                  if line.endswith(" decrypttimemod")]
+        self.assertEqual(len(fields), 1)
+        self.assertEqual(len(fields[0]), 6)
+
     def test_ioencoding(self):
         import subprocess
         env = dict(os.environ)
@@ -1,129 +1,1790 @@
 #include "decrypt_source_file.h"
+#include <errno.h>
+#include <pthread.h>
+#include <sys/mman.h>
+#ifdef __linux__
+#include <sys/syscall.h>
+#endif
+
+#if defined(__linux__) && defined(SYS_memfd_create)
+#  define HAVE_DECRYPT_MEMFD
+#  ifndef MFD_CLOEXEC
+#    define MFD_CLOEXEC       0x0001U
+#    define MFD_ALLOW_SEALING 0x0002U
+#  endif
+#endif
+
+// 在解释器之外单独编译_spython扩展(src/setup.py)时，新版本的Python不再提供这个宏
+#ifndef Py_GETENV
+#define Py_GETENV(s) getenv(s)
+#endif
+
+#define BLOCK_SIZE    64          // encrypt_file每次加密的块大小
+#define DECRYPT_CHUNK (64 * 1024) // 每次交给EVP_DecryptUpdate的数据量
+#define PARALLEL_MIN_CHUNK  (1024 * 1024) // 多线程解密时每个线程至少分到的密文长度
+#define PARALLEL_MAX_THREADS 16
 
 static unsigned char* str2hex (char *str);
-static void encrypt_buf (char *raw_buf, char **encrpy_buf, int len);
-static void decrypt_buf (char *raw_buf, char **encrpy_buf, int len);
-static int decrypt_open (char *filename);
+static void init_decrypt_key (void);
+static int decrypt_open (const char *filename, int cloexec);
+static int header_version (const unsigned char *head, size_t len);
+static size_t padded_len (int version, size_t len);
+static int decrypt_data (int version, const unsigned char *data, size_t len,
+                         unsigned char *plain, size_t *plain_len);
+static int decrypt_blocks (const unsigned char *cipher, size_t len,
+                           unsigned char *plain, size_t *plain_len);
+static int decrypt_v2 (const unsigned char *data, size_t len,
+                       unsigned char *plain, size_t *plain_len, int mapped);
+static EVP_MD_CTX *mac_v2_begin (const unsigned char *head);
+static int mac_v2_end (EVP_MD_CTX *md, const unsigned char *expected);
+static void copy_cipher (const unsigned char *data, size_t off, size_t len,
+                         unsigned char *plain, int mapped);
+static int decrypt_v2_parallel (const unsigned char *data, size_t length,
+                                const unsigned char *head, const unsigned char *tag,
+                                unsigned char *plain, int nthreads, int mapped);
+static int decrypt_ctr_range (const unsigned char *nonce, const unsigned char *cipher,
+                              size_t off, size_t len, unsigned char *plain);
+static void init_decrypt_threads (void);
+static void drop_pages (const unsigned char *map, size_t *dropped, size_t done);
+static int memory_fd (const char *buf, size_t len, int cloexec);
+static ssize_t pread_all (int fd, unsigned char *buf, size_t len, off_t offset);
+static int write_all (int fd, const char *buf, size_t len);
+static void init_decrypt_paths (void);
+typedef struct cache_entry cache_entry;
+static void init_cache_budget (void);
+static void cache_remove (cache_entry *e, int evicted);
+static cache_entry *cache_acquire (const struct stat *st);
+static void cache_release (cache_entry *e);
+static void cache_store (const struct stat *st, const unsigned char *plain, size_t len);
+static unsigned long long now_ns (void);
+
+// 解密密钥只解析、扩展一次，进程内所有解密调用共享(初始化后只读)
+static pthread_once_t decrypt_key_once = PTHREAD_ONCE_INIT;
+static EVP_CIPHER_CTX *decrypt_ctx = NULL;      // v1: AES-128-ECB，再手工还原CBC
+static EVP_CIPHER_CTX *decrypt_ctr_ctx = NULL;  // v2: AES-128-CTR
+static unsigned char decrypt_iv[AES_BLOCK_SIZE];
+static unsigned char decrypt_mac_key[SHA256_DIGEST_LENGTH];
+
+/**
+ * 多线程解密
+ * v2的CTR模式中每个16字节块的密钥流只取决于nonce和块序号，大文件可以切成几段由多个线程同时解密，
+ * 当前线程按顺序对各段的拷贝计算HMAC，算过的一段随即由对应的线程原地解密，校验失败时清除全部明文。线程数默认为在线CPU数(最多PARALLEL_MAX_THREADS)，
+ * 可以用PYTHONDECRYPTTHREADS修改，1表示只用当前线程；每个线程至少分到PARALLEL_MIN_CHUNK字节，
+ * 小于2*PARALLEL_MIN_CHUNK的文件总是单线程解密。
+ */
+static pthread_once_t decrypt_threads_once = PTHREAD_ONCE_INIT;
+static int decrypt_threads = 1;
+
+/**
+ * 解密结果缓存
+ * traceback、linecache、inspect显示源码时会反复打开同一个加密文件，每次都要重新读取、校验和解密。
+ * 这里以(设备号, inode, 文件大小, mtime)为键缓存明文，文件被修改后旧的缓存项自然失效。
+ * 同一个文件第二次被解密时才保存明文：import时只解密一次的模块不占用缓存，也不会把已缓存的源码挤出去。
+ * 保存了明文的缓存项按最近使用的顺序排列，明文总大小超过预算时淘汰最久未使用的缓存项。
+ */
+#define CACHE_BUCKETS      256
+#define CACHE_MAX_SEEN     1024              // 最多记住多少个只解密过一次的文件
+#define CACHE_DEFAULT_SIZE (4 * 1024 * 1024) // 默认预算，可以用PYTHONDECRYPTCACHESIZE修改
+
+struct cache_entry {
+    struct cache_entry *hash_next;
+    struct cache_entry *prev, *next;  // 所在的LRU链表
+    dev_t dev;
+    ino_t ino;
+    off_t size;
+    time_t mtime;
+    long mtime_nsec;
+    unsigned char *plain;   // NULL表示只解密过一次，还没有保存明文
+    size_t plain_len;
+    int refcnt;             // 正在读取plain的调用者数量
+    int removed;            // 已经从缓存中删除，最后一个调用者释放时再free
+};
+
+// dopen在释放GIL之后调用，缓存由自己的互斥锁保护
+static pthread_mutex_t cache_lock = PTHREAD_MUTEX_INITIALIZER;
+static pthread_once_t cache_once = PTHREAD_ONCE_INIT;
+static cache_entry *cache_table[CACHE_BUCKETS];
+static cache_entry cache_lru = {NULL, &cache_lru, &cache_lru};   // 保存了明文的缓存项
+static cache_entry cache_seen = {NULL, &cache_seen, &cache_seen}; // 只解密过一次的文件
+static size_t cache_budget = CACHE_DEFAULT_SIZE;
+static size_t cache_bytes = 0;
+static size_t cache_entries = 0;
+static size_t cache_seen_count = 0;
+static unsigned long cache_hits = 0;
+static unsigned long cache_misses = 0;
+static unsigned long cache_evictions = 0;
+
+/**
+ * 解密耗时统计
+ * 每个线程各自累计一份(用于把耗时归到正在导入的模块上)，同时原子地累加到进程的总数上。
+ * 计时只调用clock_gettime(CLOCK_MONOTONIC)，与open和解密本身相比可以忽略，因此总是开启。
+ */
+static __thread d_decrypt_stats thread_stats;
+static d_decrypt_stats total_stats;
+
+#define STATS_ADD(field, value) do {                                        \
+        unsigned long long v_ = (value);                                   \
+        thread_stats.field += v_;                                          \
+        __atomic_fetch_add (&total_stats.field, v_, __ATOMIC_RELAXED);     \
+    } while (0)
+
+// 解密范围
+// 默认以O_RDONLY|O_CLOEXEC打开的每个文件都要先读文件头判断是否加密。
+// 设置PYTHONDECRYPTPATHS(python3也可以用-X decryptpaths=...)后只有路径匹配其中一项的文件才会解密，
+// 其余文件直接open，读取数据文件时和原生python没有区别。
+// 各项之间用':'分隔，每一项最多包含一个'*'，与open时传入的路径比较：
+//   /opt/app/       以/opt/app/开头的路径
+//   *.py            以.py结尾的路径
+//   /opt/app/*.py   同时满足前缀和后缀
+// 加密的字节码缓存(.spyc)不受限制，总是解密。
+#define DECRYPT_PATHS_SEP     ':'
+#define DECRYPT_ALWAYS_SUFFIX ".spyc"
+
+typedef struct {
+    const char *prefix;
+    size_t prefix_len;
+    const char *suffix;     // NULL表示这一项没有'*'，只比较前缀
+    size_t suffix_len;
+} decrypt_pattern;
+
+typedef struct {
+    size_t count;
+    decrypt_pattern *patterns;
+    char *spec;             // patterns中的字符串都指向这份拷贝
+} decrypt_policy;
+
+static pthread_once_t decrypt_paths_once = PTHREAD_ONCE_INIT;
+// NULL表示解密所有文件；替换后旧的规则不释放，其他线程可能还在使用
+static decrypt_policy *decrypt_paths = NULL;
+
+// 规则在释放GIL之后读取，用原子操作发布，读取时不加锁
+#if defined(__GNUC__) && defined(__ATOMIC_ACQUIRE)
+#  define LOAD_POLICY()       __atomic_load_n (&decrypt_paths, __ATOMIC_ACQUIRE)
+#  define STORE_POLICY(value) __atomic_store_n (&decrypt_paths, (value), __ATOMIC_RELEASE)
+#else
+#  define LOAD_POLICY()       (decrypt_paths)
+#  define STORE_POLICY(value) (decrypt_paths = (value))
+#endif
+
+static decrypt_policy *parse_decrypt_paths (const char *spec);
 
 
 /**
- * @description 用于替换源码中的fopen(file, "r"); 
+ * @description 用于替换源码中的fopen(file, "r");
  */
 FILE* d_open(char *filename, const char *modes)
 {
-    if (strcmp(modes, "r") != 0) {
+    // python2的find_module以"rb"(PY_STDIOTEXTMODE)打开源码文件
+    if (strcmp(modes, "r") != 0 && strcmp(modes, "rb") != 0) {
         return fopen(filename, modes);
     }
     FILE *ret = NULL;
     int fd;
-    fd = decrypt_open(filename);
+    fd = decrypt_open(filename, 0);
     if ( fd < 0 ){
        // perror("error");
         return ret;
     }
     ret = fdopen(fd, modes);
+    if (ret == NULL)
+        close(fd);
 
     return ret;
 }
 
 /**
- * @description 用于替换源码中的open(pathname, flags, mode) 
+ * @description 用于替换源码中的open(pathname, flags, mode)
  */
 int dopen(const char *pathname, int flags, mode_t mode)
 {
 #ifdef O_CLOEXEC
-    if (flags != (O_RDONLY | O_CLOEXEC))
+    if (flags != (O_RDONLY | O_CLOEXEC) || !d_decrypt_allowed(pathname))
+        return open(pathname, flags, mode);
+    else
+        return decrypt_open(pathname, 1);
 #else
-    if (flags != O_RDONLY)
-#endif
+    if (flags != O_RDONLY || !d_decrypt_allowed(pathname))
         return open(pathname, flags, mode);
     else
-        return decrypt_open(pathname);
+        return decrypt_open(pathname, 0);
+#endif
 }
 
 /**
  * @description: 打开加密文件，返回文件描述符
+ *               解密结果只保存在内存中(memfd/tmpfs/pipe)，不会在当前目录或磁盘上生成临时文件
  * @param filename 表示需要解密的文件
+ * @param cloexec 返回的文件描述符是否设置close-on-exec
  * @return 返回解密后的文件的文件描述符，失败返回-1
  */
-static int decrypt_open (char *filename)
+static int decrypt_open (const char *filename, int cloexec)
 {
-    int ret = -1;
-    int original_file_fd = open (filename, O_RDONLY);
-    int size = 0;
-    char buf[64] = {0};
-    char filehead[512] = {0};
-    char *de_buf = (char *)malloc (64);
-
-    char template[] = "decrypt-file-XXXXXX"; 
-    ret = mkstemp (template);
-    if (ret == -1){
-        close(original_file_fd);
-        return -1;
-    }
-        
-    // 是否输出解密后的文件
-#ifdef _NO_DECRYPT_FILE_OUTPUT
-    unlink (template); 
+    int ret;
+    int original_file_fd;
+
+#ifdef O_CLOEXEC
+    original_file_fd = open (filename, O_RDONLY | (cloexec ? O_CLOEXEC : 0));
+#else
+    original_file_fd = open (filename, O_RDONLY);
 #endif
-    
-    // 读取文件头
-    size = read (original_file_fd, filehead, sizeof(HEADINFO)-1);
-    if ( size < 0 ){
+    if (original_file_fd < 0)
+        return -1;
+    ret = d_decrypt_fd (original_file_fd, cloexec);
+    if (ret != original_file_fd) {
+        int saved_errno = errno;
         close (original_file_fd);
-        close (ret);
+        errno = saved_errno;
+    }
+    return ret;
+}
+
+/**
+ * @description: 解密一个已经打开的文件，不改变fd的文件偏移，也不关闭fd
+ * @param fd 需要解密的文件
+ * @param cloexec 新的文件描述符是否设置close-on-exec
+ * @return 未加密的文件直接返回fd本身；加密文件返回保存明文的新文件描述符；失败返回-1并设置errno
+ */
+int d_decrypt_fd (int fd, int cloexec)
+{
+    unsigned char *plain = NULL;
+    size_t plain_len = 0;
+    int ret, saved_errno;
+
+    ret = d_read_decrypted (fd, &plain, &plain_len);
+    if (ret <= 0)
+        return ret == 0 ? fd : -1;
+    ret = memory_fd ((char *)plain, plain_len, cloexec);
+    saved_errno = errno;
+    d_free_decrypted (plain, plain_len);
+    errno = saved_errno;
+    return ret;
+}
+
+/**
+ * @description: 只读取文件头，判断一个已经打开的文件是否是加密文件，不改变fd的文件偏移
+ *               与d_read_decrypted的判断相同：读不到文件头(管道、设备等)按普通文件处理
+ * @param fd 已经打开的文件
+ * @return 加密文件(包括不支持的版本)返回1，普通文件返回0
+ */
+int d_is_encrypted (int fd)
+{
+    unsigned char filehead[sizeof(HEADINFO)-1];
+    ssize_t size;
+    unsigned long long t0 = now_ns ();
+
+    size = pread (fd, filehead, sizeof(filehead), 0);
+    STATS_ADD (sniffs, 1);
+    STATS_ADD (sniff_ns, now_ns () - t0);
+    return header_version (filehead, size > 0 ? (size_t)size : 0) != 0;
+}
+
+/**
+ * @description: 把一个已经打开的加密文件解密到堆上，不经过内存文件，不改变fd的文件偏移
+ *               与d_decrypt_fd一样使用解密结果缓存：反复读取的文件(资源、模板等)直接复制缓存的明文
+ * @param fd 已经打开的文件
+ * @param plain 输出: malloc分配的明文，用d_free_decrypted释放
+ * @param plain_len 输出明文长度
+ * @return 加密文件返回1；普通文件返回0，不读取文件内容；失败返回-1并设置errno
+ */
+int d_read_decrypted (int fd, unsigned char **plain, size_t *plain_len)
+{
+    int ret = -1;
+    int version;
+    ssize_t size = 0;
+    unsigned char filehead[sizeof(HEADINFO)-1];
+    unsigned char *data = NULL;
+    unsigned char *out = NULL;
+    size_t cap = 0;
+    size_t out_len = 0;
+    struct stat st;
+    cache_entry *entry;
+    unsigned long long t0, t1, t2;
+
+    // 用一次pread读取文件头，不改变文件偏移；
+    // 普通文件(以及管道、设备等不能pread的文件)直接返回，不做任何额外的分配
+    t0 = now_ns ();
+    size = pread (fd, filehead, sizeof(filehead), 0);
+    version = header_version (filehead, size > 0 ? (size_t)size : 0);
+    t1 = now_ns ();
+    STATS_ADD (sniffs, 1);
+    STATS_ADD (sniff_ns, t1 - t0);
+    if (version == 0)
+        return 0;
+    if (version < 0) {
+        errno = ENOTSUP;
         return -1;
     }
-    filehead[size] = 0;
-    // 普通文件直接打开
-    if(strcmp(filehead, HEADINFO) != 0) {
-        close (ret);
-        ret = original_file_fd;
-        lseek (ret, 0, SEEK_SET);
+
+    if (fstat (fd, &st) < 0)
+        return -1;
+    // 最近反复打开过的文件直接使用缓存的明文
+    if ((entry = cache_acquire (&st)) != NULL) {
+        out = (unsigned char *)malloc (entry->plain_len ? entry->plain_len : 1);
+        if (out != NULL) {
+            memcpy (out, entry->plain, entry->plain_len);
+            *plain = out;
+            *plain_len = entry->plain_len;
+            STATS_ADD (files, 1);
+            STATS_ADD (plain_bytes, entry->plain_len);
+            STATS_ADD (decrypt_ns, now_ns () - t1);
+            ret = 1;
+        } else {
+            errno = ENOMEM;
+        }
+        cache_release (entry);
         return ret;
     }
 
-    // 加密文件解密后打开
-    while ((size = read (original_file_fd, buf, 64)) > 0) {
-        int end_pos = 0;
-        decrypt_buf (buf, &de_buf, 64);
-        for (int i = 63; i >= 0; i--) {
-            if (de_buf[i] != 0) {
-                end_pos = i + 1;
-                break;
-            }
+    // 一次性读入整个文件；v1最后一个块不足64字节时补0(与逐块read的行为一致)
+    cap = padded_len (version, (size_t)st.st_size);
+    data = (unsigned char *)calloc (cap ? cap : 1, 1);
+    out = (unsigned char *)malloc (cap ? cap : 1);
+    if (data == NULL || out == NULL) {
+        errno = ENOMEM;
+        goto done;
+    }
+    size = pread_all (fd, data, cap, 0);
+    if (size < 0)
+        goto done;
+    t2 = now_ns ();
+    STATS_ADD (read_ns, t2 - t1);
+
+    if (decrypt_data (version, data, (size_t)size, out, &out_len) < 0)
+        goto done;
+    cache_store (&st, out, out_len);
+    // 明文之后的部分(v1去掉的补0块)也不在堆上残留
+    OPENSSL_cleanse (out + out_len, cap - out_len);
+    *plain = out;
+    *plain_len = out_len;
+    out = NULL;
+    STATS_ADD (files, 1);
+    STATS_ADD (bytes, size);
+    STATS_ADD (plain_bytes, out_len);
+    STATS_ADD (decrypt_ns, now_ns () - t2);
+    ret = 1;
+
+done:
+    if (out != NULL) {
+        OPENSSL_cleanse (out, cap);
+        free (out);
+    }
+    free (data);
+    return ret;
+}
+
+/**
+ * @description: 清除并释放d_read_decrypted返回的明文
+ */
+void d_free_decrypted (unsigned char *plain, size_t plain_len)
+{
+    if (plain == NULL)
+        return;
+    OPENSSL_cleanse (plain, plain_len);
+    free (plain);
+}
+
+/**
+ * @description: 把加密文件直接解密到一块只读的匿名内存映射中
+ *               密文通过mmap读取，明文不经过内存文件，也不再从fd读一遍，比decrypt_open少两份完整的拷贝；
+ *               明文之后保证有一个'\0'，可以直接交给compile等需要C字符串的接口
+ * @param fd 已经打开的文件，不改变文件偏移
+ * @param addr 输出: 明文的起始地址
+ * @param len 输出: 明文长度
+ * @param map_len 输出: 映射的长度，释放时传给d_unmap_decrypted
+ * @return 加密文件返回1；普通文件返回0，不做任何映射；失败返回-1并设置errno
+ */
+int d_map_decrypted (int fd, unsigned char **addr, size_t *len, size_t *map_len)
+{
+    unsigned char filehead[sizeof(HEADINFO)-1];
+    unsigned char *cipher, *plain;
+    size_t size, cap, mlen, plain_len = 0;
+    ssize_t n;
+    int version, ret = -1;
+    struct stat st;
+    unsigned long long t0, t1, t2;
+
+    t0 = now_ns ();
+    n = pread (fd, filehead, sizeof(filehead), 0);
+    version = header_version (filehead, n > 0 ? (size_t)n : 0);
+    t1 = now_ns ();
+    STATS_ADD (sniffs, 1);
+    STATS_ADD (sniff_ns, t1 - t0);
+    if (version == 0)
+        return 0;
+    if (version < 0) {
+        errno = ENOTSUP;
+        return -1;
+    }
+    if (fstat (fd, &st) < 0)
+        return -1;
+    size = (size_t)st.st_size;
+    cap = padded_len (version, size);
+    if (cap == size) {
+        cipher = (unsigned char *)mmap (NULL, size, PROT_READ, MAP_PRIVATE, fd, 0);
+        if (cipher == MAP_FAILED)
+            return -1;
+    } else {
+        // 最后一个块不完整的v1文件需要补0，这种文件很少见，读到堆上处理
+        cipher = (unsigned char *)calloc (cap, 1);
+        if (cipher == NULL) {
+            errno = ENOMEM;
+            return -1;
         }
-        if (write (ret, de_buf, end_pos) == -1) {
-            close(original_file_fd);
-            close(ret);
+        if (pread_all (fd, cipher, size, 0) < 0)
+            goto done;
+    }
+    // 映射的密文在解密时才从page cache读入，这部分耗时计入解密
+    t2 = now_ns ();
+    STATS_ADD (read_ns, t2 - t1);
+    // 明文不会比补齐后的密文长，多留一个字节放'\0'
+    mlen = cap + 1;
+    plain = (unsigned char *)mmap (NULL, mlen, PROT_READ | PROT_WRITE,
+                                   MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+    if (plain == MAP_FAILED)
+        goto done;
+    // v2把密文逐块复制到明文缓冲区后校验、解密，复制过的密文页面随即丢弃，峰值内存只有明文本身
+    if ((version == ENC_VERSION ? decrypt_v2 (cipher, size, plain, &plain_len, 1)
+                                : decrypt_data (version, cipher, size, plain, &plain_len)) < 0) {
+        int saved_errno = errno;
+        d_unmap_decrypted (plain, mlen);
+        errno = saved_errno;
+        goto done;
+    }
+    plain[plain_len] = '\0';
+    mprotect (plain, mlen, PROT_READ);
+    STATS_ADD (files, 1);
+    STATS_ADD (bytes, size);
+    STATS_ADD (plain_bytes, plain_len);
+    STATS_ADD (decrypt_ns, now_ns () - t2);
+    *addr = plain;
+    *len = plain_len;
+    *map_len = mlen;
+    ret = 1;
+
+done:
+    if (cap == size) {
+        munmap (cipher, size);
+    } else {
+        free (cipher);
+    }
+    return ret;
+}
+
+/**
+ * @description: 清除并释放d_map_decrypted返回的明文
+ */
+void d_unmap_decrypted (unsigned char *addr, size_t map_len)
+{
+    if (mprotect (addr, map_len, PROT_READ | PROT_WRITE) == 0)
+        OPENSSL_cleanse (addr, map_len);
+    munmap (addr, map_len);
+}
+
+/**
+ * @description: 解密内存中的一个加密文件(v1或v2格式)
+ * @param data 加密文件的完整内容
+ * @param plain 输出: malloc分配的明文，由调用者free
+ * @param plain_len 输出明文长度
+ * @return 成功返回0；不是加密数据或校验失败返回-1并设置errno
+ */
+int d_decrypt_buffer (const unsigned char *data, size_t len,
+                      unsigned char **plain, size_t *plain_len)
+{
+    int version = header_version (data, len);
+    size_t cap;
+    unsigned char *padded = NULL;
+    unsigned long long t0 = now_ns ();
+
+    if (version <= 0) {
+        errno = version == 0 ? EINVAL : ENOTSUP;
+        return -1;
+    }
+    cap = padded_len (version, len);
+    *plain = (unsigned char *)malloc (cap ? cap : 1);
+    if (*plain == NULL) {
+        errno = ENOMEM;
+        return -1;
+    }
+    // v1的最后一个块需要补0到64字节
+    if (cap != len) {
+        padded = (unsigned char *)calloc (cap, 1);
+        if (padded == NULL) {
+            free (*plain);
+            errno = ENOMEM;
             return -1;
         }
-        memset (buf,0,64);
+        memcpy (padded, data, len);
+        data = padded;
     }
-    lseek (ret,0,SEEK_SET);
-    free (de_buf);
-    close(original_file_fd);
+    if (decrypt_data (version, data, len, *plain, plain_len) < 0) {
+        OPENSSL_cleanse (*plain, cap);
+        free (*plain);
+        *plain = NULL;
+        free (padded);
+        return -1;
+    }
+    free (padded);
+    STATS_ADD (files, 1);
+    STATS_ADD (bytes, len);
+    STATS_ADD (plain_bytes, *plain_len);
+    STATS_ADD (decrypt_ns, now_ns () - t0);
+    return 0;
+}
+
+/**
+ * 流式加密
+ * v2文件头中记录了明文长度，所以创建时就要给出总长度；密文和HMAC都可以逐块计算，
+ * 不需要把整个文件放在内存里。同一个d_encryptor不能被多个线程同时使用。
+ */
+struct d_encryptor {
+    EVP_CIPHER_CTX *ctx;
+    EVP_PKEY *key;
+    EVP_MD_CTX *md;
+    size_t len;   // 明文总长度
+    size_t done;  // 已经加密的明文长度
+};
+
+/**
+ * @description: 开始加密一段长度为len的明文
+ * @param header 输出ENC_HEADER_SIZE字节的文件头(包含随机nonce)，应写在密文之前
+ * @return 成功返回新的d_encryptor，失败返回NULL并设置errno
+ */
+d_encryptor *d_encryptor_new (size_t len, unsigned char *header)
+{
+    d_encryptor *enc;
+    int i;
+
+    pthread_once (&decrypt_key_once, init_decrypt_key);
+    enc = (d_encryptor *)calloc (1, sizeof(d_encryptor));
+    if (enc == NULL) {
+        errno = ENOMEM;
+        return NULL;
+    }
+    enc->len = len;
+    memset (header, 0, ENC_HEADER_SIZE);
+    memcpy (header, ENC_MAGIC, sizeof(ENC_MAGIC)-1);
+    header[sizeof(ENC_MAGIC)-1] = ENC_VERSION;
+    for (i = 0; i < 8; i++)
+        header[ENC_LENGTH_OFFSET + i] = (unsigned char)((uint64_t)len >> (8 * i));
+
+    // CTR模式下加密和解密是同一个运算
+    if (decrypt_ctr_ctx == NULL || (enc->ctx = EVP_CIPHER_CTX_new ()) == NULL ||
+        RAND_bytes (header + ENC_NONCE_OFFSET, ENC_HEADER_SIZE - ENC_NONCE_OFFSET) != 1 ||
+        !EVP_CIPHER_CTX_copy (enc->ctx, decrypt_ctr_ctx) ||
+        !EVP_DecryptInit_ex (enc->ctx, NULL, NULL, NULL, header + ENC_NONCE_OFFSET))
+        goto error;
+    enc->key = EVP_PKEY_new_mac_key (EVP_PKEY_HMAC, NULL, decrypt_mac_key, sizeof(decrypt_mac_key));
+    if (enc->key == NULL || (enc->md = EVP_MD_CTX_create ()) == NULL ||
+        EVP_DigestSignInit (enc->md, NULL, EVP_sha256 (), NULL, enc->key) != 1 ||
+        EVP_DigestSignUpdate (enc->md, header, ENC_HEADER_SIZE) != 1)
+        goto error;
+    return enc;
+
+error:
+    d_encryptor_free (enc);
+    errno = EIO;
+    return NULL;
+}
+
+/**
+ * @description: 加密下一段明文，out与in等长，可以与in是同一块内存
+ * @return 成功返回0，失败返回-1并设置errno(超出创建时给出的长度为EINVAL)
+ */
+int d_encryptor_update (d_encryptor *enc, const unsigned char *in, size_t len,
+                        unsigned char *out)
+{
+    size_t off, chunk;
+    int n;
+
+    if (len > enc->len - enc->done) {
+        errno = EINVAL;
+        return -1;
+    }
+    for (off = 0; off < len; off += chunk) {
+        chunk = len - off < DECRYPT_CHUNK ? len - off : DECRYPT_CHUNK;
+        if (!EVP_DecryptUpdate (enc->ctx, out + off, &n, in + off, (int)chunk) ||
+            (size_t)n != chunk ||
+            EVP_DigestSignUpdate (enc->md, out + off, chunk) != 1) {
+            errno = EIO;
+            return -1;
+        }
+    }
+    enc->done += len;
+    return 0;
+}
+
+/**
+ * @description: 结束加密
+ * @param tag 输出ENC_TAG_SIZE字节的HMAC，应写在密文之后
+ * @return 成功返回0，失败返回-1并设置errno(明文长度与创建时给出的不同为EINVAL)
+ */
+int d_encryptor_final (d_encryptor *enc, unsigned char *tag)
+{
+    size_t tag_len = ENC_TAG_SIZE;
+
+    if (enc->done != enc->len) {
+        errno = EINVAL;
+        return -1;
+    }
+    if (EVP_DigestSignFinal (enc->md, tag, &tag_len) != 1 || tag_len != ENC_TAG_SIZE) {
+        errno = EIO;
+        return -1;
+    }
+    return 0;
+}
+
+void d_encryptor_free (d_encryptor *enc)
+{
+    if (enc == NULL)
+        return;
+    EVP_CIPHER_CTX_free (enc->ctx);
+    if (enc->md != NULL)
+        EVP_MD_CTX_destroy (enc->md);
+    EVP_PKEY_free (enc->key);
+    free (enc);
+}
+
+/**
+ * @description: 把内存中的数据加密成v2格式(与encrypt_file生成的文件格式相同)
+ * @param data 输出: malloc分配的加密结果，由调用者free
+ * @param data_len 输出加密结果的长度
+ * @return 成功返回0，失败返回-1并设置errno
+ */
+int d_encrypt_buffer (const unsigned char *plain, size_t len,
+                      unsigned char **data, size_t *data_len)
+{
+    d_encryptor *enc;
+    unsigned char *out;
+    int ret = -1;
+
+    out = (unsigned char *)malloc (ENC_HEADER_SIZE + len + ENC_TAG_SIZE);
+    if (out == NULL) {
+        errno = ENOMEM;
+        return -1;
+    }
+    if ((enc = d_encryptor_new (len, out)) != NULL &&
+        d_encryptor_update (enc, plain, len, out + ENC_HEADER_SIZE) == 0 &&
+        d_encryptor_final (enc, out + ENC_HEADER_SIZE + len) == 0) {
+        *data = out;
+        *data_len = ENC_HEADER_SIZE + len + ENC_TAG_SIZE;
+        ret = 0;
+    }
+    d_encryptor_free (enc);
+    if (ret < 0)
+        free (out);
     return ret;
 }
 
+/**
+ * @description: 把文件src加密为dst(v2格式)，按DECRYPT_CHUNK分块读取、加密和写入
+ *               先确认src可读，再在dst所在目录创建临时文件，全部写完后改名为dst，
+ *               失败时不会留下不完整的dst。dst的权限与src相同
+ * @return 成功返回0，失败返回-1并设置errno
+ */
+int d_encrypt_file (const char *src, const char *dst)
+{
+    d_encryptor *enc = NULL;
+    struct stat st;
+    unsigned char head[ENC_HEADER_SIZE];
+    unsigned char *buf = NULL;
+    char *tmp = NULL;
+    size_t done = 0, want;
+    ssize_t n;
+    int src_fd, dst_fd = -1, ret = -1, saved;
+
+    src_fd = open (src, O_RDONLY);
+    if (src_fd < 0)
+        return -1;
+    if (fstat (src_fd, &st) < 0)
+        goto done;
+    if (!S_ISREG (st.st_mode)) {
+        errno = EINVAL;
+        goto done;
+    }
+    buf = (unsigned char *)malloc (DECRYPT_CHUNK);
+    tmp = (char *)malloc (strlen (dst) + sizeof(".XXXXXX"));
+    if (buf == NULL || tmp == NULL) {
+        errno = ENOMEM;
+        goto done;
+    }
+    sprintf (tmp, "%s.XXXXXX", dst);
+    if ((dst_fd = mkstemp (tmp)) < 0) {
+        free (tmp);
+        tmp = NULL;
+        goto done;
+    }
+    if (fchmod (dst_fd, st.st_mode & 07777) < 0 ||
+        (enc = d_encryptor_new ((size_t)st.st_size, head)) == NULL ||
+        write_all (dst_fd, (const char *)head, ENC_HEADER_SIZE) < 0)
+        goto done;
+    while (done < (size_t)st.st_size) {
+        want = (size_t)st.st_size - done < DECRYPT_CHUNK ? (size_t)st.st_size - done : DECRYPT_CHUNK;
+        n = read (src_fd, buf, want);
+        if (n < 0 && errno == EINTR)
+            continue;
+        if (n <= 0) {
+            // 读取过程中文件变短了
+            if (n == 0)
+                errno = EIO;
+            goto done;
+        }
+        if (d_encryptor_update (enc, buf, (size_t)n, buf) < 0 ||
+            write_all (dst_fd, (const char *)buf, (size_t)n) < 0)
+            goto done;
+        done += (size_t)n;
+    }
+    if (d_encryptor_final (enc, head) < 0 ||
+        write_all (dst_fd, (const char *)head, ENC_TAG_SIZE) < 0)
+        goto done;
+    if (close (dst_fd) < 0) {
+        dst_fd = -1;
+        goto done;
+    }
+    dst_fd = -1;
+    if (rename (tmp, dst) == 0)
+        ret = 0;
+
+done:
+    saved = errno;
+    if (dst_fd >= 0)
+        close (dst_fd);
+    if (ret < 0 && tmp != NULL)
+        unlink (tmp);
+    close (src_fd);
+    d_encryptor_free (enc);
+    if (buf != NULL) {
+        OPENSSL_cleanse (buf, DECRYPT_CHUNK);
+        free (buf);
+    }
+    free (tmp);
+    errno = saved;
+    return ret;
+}
+
+/**
+ * @description: 设置需要解密的路径，格式见上文"解密范围"
+ * @param spec ':'分隔的路径规则，NULL或空字符串表示解密所有文件
+ * @return 成功返回0，失败返回-1并设置errno
+ */
+int d_set_decrypt_paths (const char *spec)
+{
+    decrypt_policy *policy = NULL;
+
+    pthread_once (&decrypt_paths_once, init_decrypt_paths);
+    if (spec != NULL && *spec != '\0' && (policy = parse_decrypt_paths (spec)) == NULL)
+        return -1;
+    STORE_POLICY (policy);
+    return 0;
+}
+
+/**
+ * @description: 判断路径是否在解密范围内，只做字符串比较，不访问文件系统
+ * @return 需要尝试解密返回1，否则返回0
+ */
+int d_decrypt_allowed (const char *pathname)
+{
+    const decrypt_policy *policy;
+    const decrypt_pattern *pattern;
+    size_t i, len;
+
+    pthread_once (&decrypt_paths_once, init_decrypt_paths);
+    policy = LOAD_POLICY ();
+    if (policy == NULL)
+        return 1;
+    len = strlen (pathname);
+    if (len >= sizeof(DECRYPT_ALWAYS_SUFFIX)-1 &&
+        memcmp (pathname + len - (sizeof(DECRYPT_ALWAYS_SUFFIX)-1),
+                DECRYPT_ALWAYS_SUFFIX, sizeof(DECRYPT_ALWAYS_SUFFIX)-1) == 0)
+        return 1;
+    for (i = 0; i < policy->count; i++) {
+        pattern = &policy->patterns[i];
+        if (len < pattern->prefix_len + pattern->suffix_len ||
+            memcmp (pathname, pattern->prefix, pattern->prefix_len) != 0)
+            continue;
+        if (pattern->suffix == NULL ||
+            memcmp (pathname + len - pattern->suffix_len, pattern->suffix,
+                    pattern->suffix_len) == 0)
+            return 1;
+    }
+    return 0;
+}
+
+/**
+ * @description: 读取解密结果缓存的统计信息
+ */
+void d_cache_get_info (d_cache_info *info)
+{
+    pthread_once (&cache_once, init_cache_budget);
+    pthread_mutex_lock (&cache_lock);
+    info->hits = cache_hits;
+    info->misses = cache_misses;
+    info->evictions = cache_evictions;
+    info->entries = cache_entries;
+    info->bytes = cache_bytes;
+    info->budget = cache_budget;
+    pthread_mutex_unlock (&cache_lock);
+}
+
+/**
+ * @description: 修改解密结果缓存的内存预算，超出新预算的缓存项立即淘汰
+ * @param budget 缓存的明文总字节数上限，0表示关闭缓存并清空
+ */
+void d_cache_set_budget (size_t budget)
+{
+    pthread_once (&cache_once, init_cache_budget);
+    pthread_mutex_lock (&cache_lock);
+    cache_budget = budget;
+    while (cache_bytes > cache_budget)
+        cache_remove (cache_lru.prev, 1);
+    if (budget == 0) {
+        while (cache_seen.next != &cache_seen)
+            cache_remove (cache_seen.next, 0);
+    }
+    pthread_mutex_unlock (&cache_lock);
+}
+
+/**
+ * @description: 设置解密大文件时最多使用的线程数
+ * @param n 线程数，1表示只用当前线程，0表示使用在线CPU数
+ */
+void d_set_decrypt_threads (int n)
+{
+    pthread_once (&decrypt_threads_once, init_decrypt_threads);
+    if (n <= 0)
+        n = (int)sysconf (_SC_NPROCESSORS_ONLN);
+    if (n < 1)
+        n = 1;
+    if (n > PARALLEL_MAX_THREADS)
+        n = PARALLEL_MAX_THREADS;
+    __atomic_store_n (&decrypt_threads, n, __ATOMIC_RELAXED);
+}
+
+/**
+ * @description: 解密大文件时最多使用的线程数
+ */
+int d_get_decrypt_threads (void)
+{
+    pthread_once (&decrypt_threads_once, init_decrypt_threads);
+    return __atomic_load_n (&decrypt_threads, __ATOMIC_RELAXED);
+}
+
+/**
+ * @description: 获取进程启动以来的解密统计
+ */
+void d_get_decrypt_stats (d_decrypt_stats *stats)
+{
+    stats->files = __atomic_load_n (&total_stats.files, __ATOMIC_RELAXED);
+    stats->bytes = __atomic_load_n (&total_stats.bytes, __ATOMIC_RELAXED);
+    stats->plain_bytes = __atomic_load_n (&total_stats.plain_bytes, __ATOMIC_RELAXED);
+    stats->sniffs = __atomic_load_n (&total_stats.sniffs, __ATOMIC_RELAXED);
+    stats->sniff_ns = __atomic_load_n (&total_stats.sniff_ns, __ATOMIC_RELAXED);
+    stats->read_ns = __atomic_load_n (&total_stats.read_ns, __ATOMIC_RELAXED);
+    stats->decrypt_ns = __atomic_load_n (&total_stats.decrypt_ns, __ATOMIC_RELAXED);
+}
+
+/**
+ * @description: 获取当前线程的解密统计，两次调用之差就是这段时间内当前线程的解密耗时
+ */
+void d_get_thread_decrypt_stats (d_decrypt_stats *stats)
+{
+    *stats = thread_stats;
+}
+
+/**
+ * @description: 根据文件头判断文件格式
+ * @return 普通文件返回0，加密文件返回格式版本号(1或2)，不支持的版本返回-1
+ */
+static int header_version (const unsigned char *head, size_t len)
+{
+    if (len >= ENC_HEADER_SIZE &&
+        memcmp (head, ENC_MAGIC, sizeof(ENC_MAGIC)-1) == 0)
+        return head[sizeof(ENC_MAGIC)-1] == ENC_VERSION ? ENC_VERSION : -1;
+    if (len >= sizeof(HEADINFO)-1 &&
+        memcmp (head, HEADINFO, sizeof(HEADINFO)-1) == 0)
+        return 1;
+    return 0;
+}
+
+/**
+ * @description: 解密时密文缓冲区需要的长度
+ *               v1文件头之后是64字节的块，最后一个块不完整时补0；v2不需要补齐
+ */
+static size_t padded_len (int version, size_t len)
+{
+    size_t head = sizeof(HEADINFO)-1;
+
+    if (version != 1 || len <= head)
+        return len;
+    return head + (len - head + BLOCK_SIZE - 1) / BLOCK_SIZE * BLOCK_SIZE;
+}
+
+/**
+ * @description: 按版本解密整个加密文件的内容
+ * @param data 加密文件的完整内容；v1时缓冲区必须补0到64字节的整数倍
+ * @param plain 输出缓冲区，至少len字节(v1为补齐后的长度)
+ * @return 成功返回0，失败返回-1并设置errno
+ */
+static int decrypt_data (int version, const unsigned char *data, size_t len,
+                         unsigned char *plain, size_t *plain_len)
+{
+    size_t cipher_len;
+
+    if (version == ENC_VERSION)
+        return decrypt_v2 (data, len, plain, plain_len, 0);
+    cipher_len = len - (sizeof(HEADINFO)-1);
+    cipher_len = (cipher_len + BLOCK_SIZE - 1) / BLOCK_SIZE * BLOCK_SIZE;
+    if (decrypt_blocks (data + sizeof(HEADINFO)-1, cipher_len, plain, plain_len) < 0) {
+        errno = EIO;
+        return -1;
+    }
+    return 0;
+}
+
+/**
+ * @description: 批量解密encrypt_file生成的密文
+ *               每个64字节块都是从同一个IV开始的独立CBC，所以先用EVP对整段密文做ECB解密
+ *               (可以充分利用AES-NI流水线)，再按CBC的规则和IV或前一个密文块异或，
+ *               最后去掉每个块末尾补的0，结果与逐块解密完全一致
+ * @param cipher 密文，长度为64的整数倍
+ * @param plain 输出缓冲区，至少len字节
+ * @param plain_len 输出明文长度
+ * @return 成功返回0，失败返回-1
+ */
+static int decrypt_blocks (const unsigned char *cipher, size_t len,
+                           unsigned char *plain, size_t *plain_len)
+{
+    EVP_CIPHER_CTX *ctx = NULL;
+    const unsigned char *prev;
+    size_t off, chunk, end, out = 0;
+    int i, n, ret = -1;
+
+    pthread_once (&decrypt_key_once, init_decrypt_key);
+    if (decrypt_ctx == NULL || (ctx = EVP_CIPHER_CTX_new ()) == NULL)
+        return -1;
+    if (!EVP_CIPHER_CTX_copy (ctx, decrypt_ctx))
+        goto done;
+
+    for (off = 0; off < len; off += chunk) {
+        chunk = len - off < DECRYPT_CHUNK ? len - off : DECRYPT_CHUNK;
+        if (!EVP_DecryptUpdate (ctx, plain + off, &n, cipher + off, (int)chunk)
+            || (size_t)n != chunk)
+            goto done;
+    }
+
+    for (off = 0; off < len; off += AES_BLOCK_SIZE) {
+        prev = (off % BLOCK_SIZE == 0) ? decrypt_iv : cipher + off - AES_BLOCK_SIZE;
+        for (i = 0; i < AES_BLOCK_SIZE; i++)
+            plain[off + i] ^= prev[i];
+    }
+
+    for (off = 0; off < len; off += BLOCK_SIZE) {
+        end = BLOCK_SIZE;
+        while (end > 0 && plain[off + end - 1] == 0)
+            end--;
+        if (out != off)
+            memmove (plain + out, plain + off, end);
+        out += end;
+    }
+    *plain_len = out;
+    ret = 0;
+
+done:
+    EVP_CIPHER_CTX_free (ctx);
+    return ret;
+}
+
+/**
+ * @description: 解密v2格式的文件
+ *               文件格式: 文件头(ENC_HEADER_SIZE) + AES-128-CTR密文 + HMAC-SHA256(文件头+密文)
+ *               密文每次只从data读取一遍：逐块复制到明文缓冲区(私有内存)，对这份拷贝计算HMAC，
+ *               再原地解密。data是文件映射时，文件在校验和解密之间被改写也不会解密未经校验的数据；
+ *               校验失败时清除已经解密的明文，不返回任何内容。明文中的0字节原样保留
+ * @param data 整个文件的内容
+ * @param plain 输出缓冲区，至少len字节
+ * @param plain_len 输出明文长度
+ * @param mapped data是文件的只读映射时为1，复制过的页面会被丢弃
+ * @return 成功返回0，失败返回-1并设置errno
+ */
+static int decrypt_v2 (const unsigned char *data, size_t len,
+                       unsigned char *plain, size_t *plain_len, int mapped)
+{
+    EVP_CIPHER_CTX *ctx = NULL;
+    EVP_MD_CTX *md = NULL;
+    unsigned char head[ENC_HEADER_SIZE];
+    unsigned char tag[ENC_TAG_SIZE];
+    uint64_t length = 0;
+    size_t off, chunk;
+    int i, n, nthreads, ret = -1;
+
+    if (len < ENC_HEADER_SIZE + ENC_TAG_SIZE) {
+        errno = EBADMSG;
+        return -1;
+    }
+    // 文件头和tag也只读取一次
+    memcpy (head, data, ENC_HEADER_SIZE);
+    memcpy (tag, data + len - ENC_TAG_SIZE, ENC_TAG_SIZE);
+    for (i = 0; i < 8; i++)
+        length |= (uint64_t)head[ENC_LENGTH_OFFSET + i] << (8 * i);
+    if (length != len - ENC_HEADER_SIZE - ENC_TAG_SIZE) {
+        errno = EBADMSG;
+        return -1;
+    }
+
+    pthread_once (&decrypt_key_once, init_decrypt_key);
+    nthreads = d_get_decrypt_threads ();
+    if (length / PARALLEL_MIN_CHUNK < (size_t)nthreads)
+        nthreads = (int)(length / PARALLEL_MIN_CHUNK);
+    if (nthreads >= 2) {
+        if (decrypt_v2_parallel (data, length, head, tag, plain, nthreads, mapped) < 0)
+            return -1;
+        *plain_len = length;
+        return 0;
+    }
+
+    if (decrypt_ctr_ctx == NULL || (md = mac_v2_begin (head)) == NULL ||
+        (ctx = EVP_CIPHER_CTX_new ()) == NULL) {
+        errno = EIO;
+        goto done;
+    }
+    if (!EVP_CIPHER_CTX_copy (ctx, decrypt_ctr_ctx) ||
+        !EVP_DecryptInit_ex (ctx, NULL, NULL, NULL, head + ENC_NONCE_OFFSET)) {
+        errno = EIO;
+        goto done;
+    }
+    for (off = 0; off < length; off += chunk) {
+        chunk = length - off < DECRYPT_CHUNK ? length - off : DECRYPT_CHUNK;
+        copy_cipher (data, off, chunk, plain, mapped);
+        if (EVP_DigestSignUpdate (md, plain + off, chunk) != 1 ||
+            !EVP_DecryptUpdate (ctx, plain + off, &n, plain + off, (int)chunk) ||
+            (size_t)n != chunk) {
+            OPENSSL_cleanse (plain, off + chunk);
+            errno = EIO;
+            goto done;
+        }
+    }
+    ret = mac_v2_end (md, tag);
+    md = NULL;
+    if (ret < 0) {
+        OPENSSL_cleanse (plain, length);
+        errno = EBADMSG;
+        goto done;
+    }
+    *plain_len = length;
+
+done:
+    if (md != NULL)
+        EVP_MD_CTX_destroy (md);
+    EVP_CIPHER_CTX_free (ctx);
+    return ret;
+}
+
+/* decrypt_v2_parallel中各线程之间的同步 */
+typedef struct {
+    pthread_mutex_t lock;
+    pthread_cond_t cond;
+    int hashed;   // 已经计算过HMAC的段数，这些段可以原地解密了
+    int failed;   // 校验失败，不再解密
+} decrypt_pipeline;
+
+/* decrypt_v2_parallel中一个线程负责的一段密文 */
+typedef struct {
+    decrypt_pipeline *pipe;
+    const unsigned char *data;    // 整个文件的内容
+    const unsigned char *nonce;
+    unsigned char *plain;         // 整段明文的开头
+    size_t off;                   // 这一段在密文中的偏移，AES_BLOCK_SIZE的整数倍
+    size_t len;
+    int index;
+    int mapped;
+    int copied;                   // 这一段已经复制到plain中
+    int ret;
+} decrypt_job;
+
+static void *decrypt_job_run (void *arg)
+{
+    decrypt_job *job = (decrypt_job *)arg;
+    decrypt_pipeline *pipe = job->pipe;
+    int go;
+
+    copy_cipher (job->data, job->off, job->len, job->plain, job->mapped);
+    pthread_mutex_lock (&pipe->lock);
+    job->copied = 1;
+    pthread_cond_broadcast (&pipe->cond);
+    // 当前线程对这一段的拷贝计算完HMAC之后才能原地解密
+    while (pipe->hashed <= job->index && !pipe->failed)
+        pthread_cond_wait (&pipe->cond, &pipe->lock);
+    go = !pipe->failed;
+    pthread_mutex_unlock (&pipe->lock);
+    if (go)
+        job->ret = decrypt_ctr_range (job->nonce, job->plain, job->off, job->len, job->plain);
+    return NULL;
+}
+
+/**
+ * @description: 多线程解密v2格式的文件，见上文"多线程解密"
+ *               各线程先把自己的一段密文复制到明文缓冲区(复制过的映射页面随即丢弃)，
+ *               当前线程按顺序对这些拷贝计算HMAC，每算完一段就让对应的线程原地解密，
+ *               所以校验和解密的是同一份数据，峰值内存也只有明文本身。
+ *               校验失败时清除已经解密的明文，与单线程一样，被篡改的文件不会返回任何明文
+ * @param data 整个文件的内容，长度已经检查过
+ * @param length 明文长度
+ * @param head 文件头的拷贝
+ * @param tag 文件末尾tag的拷贝
+ * @param plain 输出缓冲区，至少length字节
+ * @param nthreads 解密的线程数
+ * @param mapped data是文件的只读映射时为1
+ * @return 成功返回0，失败返回-1并设置errno
+ */
+static int decrypt_v2_parallel (const unsigned char *data, size_t length,
+                                const unsigned char *head, const unsigned char *tag,
+                                unsigned char *plain, int nthreads, int mapped)
+{
+    decrypt_job jobs[PARALLEL_MAX_THREADS];
+    pthread_t threads[PARALLEL_MAX_THREADS];
+    int started[PARALLEL_MAX_THREADS];
+    decrypt_pipeline pipe;
+    EVP_MD_CTX *md;
+    size_t off = 0, step;
+    int i, ok = 1;
+
+    if (decrypt_ctr_ctx == NULL || (md = mac_v2_begin (head)) == NULL) {
+        errno = EIO;
+        return -1;
+    }
+    pthread_mutex_init (&pipe.lock, NULL);
+    pthread_cond_init (&pipe.cond, NULL);
+    pipe.hashed = 0;
+    pipe.failed = 0;
+
+    // 每段的长度取DECRYPT_CHUNK的整数倍，分界处的计数器正好是整数个块
+    step = (length / nthreads + DECRYPT_CHUNK - 1) / DECRYPT_CHUNK * DECRYPT_CHUNK;
+    for (i = 0; i < nthreads; i++) {
+        jobs[i].pipe = &pipe;
+        jobs[i].data = data;
+        jobs[i].nonce = head + ENC_NONCE_OFFSET;
+        jobs[i].plain = plain;
+        jobs[i].off = off;
+        jobs[i].len = length - off < step ? length - off : step;
+        jobs[i].index = i;
+        jobs[i].mapped = mapped;
+        jobs[i].copied = 0;
+        jobs[i].ret = 0;
+        off += jobs[i].len;
+        // 线程创建失败时这一段由当前线程复制，校验通过后再解密
+        started[i] = jobs[i].len > 0 &&
+                     pthread_create (&threads[i], NULL, decrypt_job_run, &jobs[i]) == 0;
+    }
+
+    for (i = 0; i < nthreads && ok; i++) {
+        if (started[i]) {
+            pthread_mutex_lock (&pipe.lock);
+            while (!jobs[i].copied)
+                pthread_cond_wait (&pipe.cond, &pipe.lock);
+            pthread_mutex_unlock (&pipe.lock);
+        } else {
+            copy_cipher (data, jobs[i].off, jobs[i].len, plain, mapped);
+        }
+        if (EVP_DigestSignUpdate (md, plain + jobs[i].off, jobs[i].len) != 1)
+            ok = 0;
+        pthread_mutex_lock (&pipe.lock);
+        pipe.hashed = i + 1;
+        pipe.failed = !ok;
+        pthread_cond_broadcast (&pipe.cond);
+        pthread_mutex_unlock (&pipe.lock);
+    }
+    if (mac_v2_end (md, tag) < 0)
+        ok = 0;
+    if (!ok) {
+        pthread_mutex_lock (&pipe.lock);
+        pipe.failed = 1;
+        pthread_cond_broadcast (&pipe.cond);
+        pthread_mutex_unlock (&pipe.lock);
+    }
+
+    for (i = 0; i < nthreads; i++) {
+        if (started[i])
+            pthread_join (threads[i], NULL);
+        else if (ok && jobs[i].len > 0)
+            jobs[i].ret = decrypt_ctr_range (jobs[i].nonce, plain, jobs[i].off,
+                                             jobs[i].len, plain);
+    }
+    pthread_cond_destroy (&pipe.cond);
+    pthread_mutex_destroy (&pipe.lock);
+    if (!ok) {
+        OPENSSL_cleanse (plain, length);
+        errno = EBADMSG;
+        return -1;
+    }
+    for (i = 0; i < nthreads; i++) {
+        if (jobs[i].ret < 0) {
+            OPENSSL_cleanse (plain, length);
+            errno = EIO;
+            return -1;
+        }
+    }
+    return 0;
+}
+
+/**
+ * @description: 解密CTR密文中从off开始的len字节
+ *               AES-128-CTR的计数器是把nonce当作128位大端整数逐块加1，
+ *               所以从第off/16个块开始解密时，初始计数器为nonce + off/16
+ * @param off 在密文中的偏移，必须是AES_BLOCK_SIZE的整数倍
+ * @return 成功返回0，失败返回-1
+ */
+static int decrypt_ctr_range (const unsigned char *nonce, const unsigned char *cipher,
+                              size_t off, size_t len, unsigned char *plain)
+{
+    EVP_CIPHER_CTX *ctx;
+    unsigned char counter[AES_BLOCK_SIZE];
+    uint64_t blocks = off / AES_BLOCK_SIZE;
+    unsigned int sum;
+    size_t pos, chunk;
+    int i, n, ret = -1;
+
+    memcpy (counter, nonce, AES_BLOCK_SIZE);
+    for (i = AES_BLOCK_SIZE - 1; i >= 0 && blocks != 0; i--) {
+        sum = counter[i] + (unsigned int)(blocks & 0xff);
+        counter[i] = (unsigned char)sum;
+        blocks = (blocks >> 8) + (sum >> 8);
+    }
+    if (decrypt_ctr_ctx == NULL || (ctx = EVP_CIPHER_CTX_new ()) == NULL)
+        return -1;
+    if (!EVP_CIPHER_CTX_copy (ctx, decrypt_ctr_ctx) ||
+        !EVP_DecryptInit_ex (ctx, NULL, NULL, NULL, counter))
+        goto done;
+    for (pos = off; pos < off + len; pos += chunk) {
+        chunk = off + len - pos < DECRYPT_CHUNK ? off + len - pos : DECRYPT_CHUNK;
+        if (!EVP_DecryptUpdate (ctx, plain + pos, &n, cipher + pos, (int)chunk)
+            || (size_t)n != chunk)
+            goto done;
+    }
+    ret = 0;
+
+done:
+    EVP_CIPHER_CTX_free (ctx);
+    return ret;
+}
+
+/**
+ * @description: 开始计算v2文件的HMAC-SHA256，先加入文件头
+ *               之后用EVP_DigestSignUpdate依次加入密文，分块计算，不需要整个文件同时留在内存里
+ * @param head 文件头的拷贝
+ * @return 成功返回计算上下文，失败返回NULL
+ */
+static EVP_MD_CTX *mac_v2_begin (const unsigned char *head)
+{
+    EVP_PKEY *key;
+    EVP_MD_CTX *md = NULL;
+
+    key = EVP_PKEY_new_mac_key (EVP_PKEY_HMAC, NULL, decrypt_mac_key, sizeof(decrypt_mac_key));
+    if (key == NULL || (md = EVP_MD_CTX_create ()) == NULL ||
+        EVP_DigestSignInit (md, NULL, EVP_sha256 (), NULL, key) != 1 ||
+        EVP_DigestSignUpdate (md, head, ENC_HEADER_SIZE) != 1) {
+        if (md != NULL)
+            EVP_MD_CTX_destroy (md);
+        md = NULL;
+    }
+    // 上下文持有key的引用
+    EVP_PKEY_free (key);
+    return md;
+}
+
+/**
+ * @description: 结束HMAC计算并与文件中的tag比较，释放md
+ * @param expected 文件末尾tag的拷贝
+ * @return 一致返回0，否则返回-1
+ */
+static int mac_v2_end (EVP_MD_CTX *md, const unsigned char *expected)
+{
+    unsigned char tag[SHA256_DIGEST_LENGTH];
+    size_t tag_len = SHA256_DIGEST_LENGTH;
+    int ret = -1;
+
+    if (EVP_DigestSignFinal (md, tag, &tag_len) == 1 && tag_len == SHA256_DIGEST_LENGTH &&
+        CRYPTO_memcmp (tag, expected, ENC_TAG_SIZE) == 0)
+        ret = 0;
+    EVP_MD_CTX_destroy (md);
+    return ret;
+}
+
+/**
+ * @description: 把密文中从off开始的len字节复制到plain的相同偏移处
+ *               之后的校验和解密都只使用这份私有的拷贝，不会再读取一遍文件映射
+ * @param data 整个文件的内容
+ * @param mapped data是文件的只读映射时为1，每复制DECRYPT_CHUNK字节就丢弃复制过的完整页面
+ */
+static void copy_cipher (const unsigned char *data, size_t off, size_t len,
+                         unsigned char *plain, int mapped)
+{
+    size_t page, dropped, pos, chunk;
+
+    if (!mapped) {
+        memcpy (plain + off, data + ENC_HEADER_SIZE + off, len);
+        return;
+    }
+    // 与相邻的一段共用的页面不丢弃，由调用者munmap时释放
+    page = (size_t)sysconf (_SC_PAGESIZE);
+    dropped = (ENC_HEADER_SIZE + off + page - 1) / page * page;
+    for (pos = off; pos < off + len; pos += chunk) {
+        chunk = off + len - pos < DECRYPT_CHUNK ? off + len - pos : DECRYPT_CHUNK;
+        memcpy (plain + pos, data + ENC_HEADER_SIZE + pos, chunk);
+        drop_pages (data, &dropped, ENC_HEADER_SIZE + pos + chunk);
+    }
+}
+
+/**
+ * @description: 丢弃只读文件映射中[*dropped, done)范围内的完整页面
+ *               页面只是不再计入RSS，之后再访问会从page cache重新读入
+ */
+static void drop_pages (const unsigned char *map, size_t *dropped, size_t done)
+{
+    size_t page = (size_t)sysconf (_SC_PAGESIZE);
+    size_t end = done / page * page;
+
+    if (end > *dropped) {
+        madvise ((void *)(map + *dropped), end - *dropped, MADV_DONTNEED);
+        *dropped = end;
+    }
+}
+
+/**
+ * @description: 创建一个内容为buf的匿名内存文件
+ *               优先使用memfd_create，其次使用tmpfs(/dev/shm)上的O_TMPFILE匿名文件，
+ *               最后退回到pipe(不可seek，只能用于能放进管道缓冲区的小文件)
+ * @return 读写位置在文件开头的文件描述符，失败返回-1
+ */
+static int memory_fd (const char *buf, size_t len, int cloexec)
+{
+    int fd = -1;
+    int pipefd[2];
+
+#ifdef HAVE_DECRYPT_MEMFD
+    fd = syscall (SYS_memfd_create, "spython-decrypted",
+                  MFD_ALLOW_SEALING | (cloexec ? MFD_CLOEXEC : 0));
+    if (fd >= 0) {
+        if (write_all (fd, buf, len) < 0 || lseek (fd, 0, SEEK_SET) < 0) {
+            close (fd);
+            return -1;
+        }
+#ifdef F_ADD_SEALS
+        // 解密后的内容只读
+        fcntl (fd, F_ADD_SEALS, F_SEAL_SHRINK | F_SEAL_GROW | F_SEAL_WRITE | F_SEAL_SEAL);
+#endif
+        return fd;
+    }
+#endif
+
+#ifdef O_TMPFILE
+    fd = open ("/dev/shm", O_TMPFILE | O_RDWR | O_EXCL | (cloexec ? O_CLOEXEC : 0), 0600);
+    if (fd >= 0) {
+        if (write_all (fd, buf, len) < 0 || lseek (fd, 0, SEEK_SET) < 0) {
+            close (fd);
+            return -1;
+        }
+        return fd;
+    }
+#endif
+
+    if (pipe (pipefd) < 0)
+        return -1;
+#ifdef F_SETPIPE_SZ
+    if (len > PIPE_BUF)
+        fcntl (pipefd[1], F_SETPIPE_SZ, (int)len);
+#endif
+#ifdef F_GETPIPE_SZ
+    if (fcntl (pipefd[1], F_GETPIPE_SZ) < (long)len) {
+        close (pipefd[0]);
+        close (pipefd[1]);
+        errno = EFBIG;
+        return -1;
+    }
+#else
+    if (len > PIPE_BUF) {
+        close (pipefd[0]);
+        close (pipefd[1]);
+        errno = EFBIG;
+        return -1;
+    }
+#endif
+    if (write_all (pipefd[1], buf, len) < 0) {
+        close (pipefd[0]);
+        close (pipefd[1]);
+        return -1;
+    }
+    close (pipefd[1]);
+    if (cloexec)
+        fcntl (pipefd[0], F_SETFD, FD_CLOEXEC);
+    return pipefd[0];
+}
+
+/**
+ * @description: 解析':'分隔的路径规则
+ * @return 成功返回新分配的规则，失败返回NULL并设置errno
+ */
+static decrypt_policy *parse_decrypt_paths (const char *spec)
+{
+    decrypt_policy *policy;
+    decrypt_pattern *pattern;
+    char *item, *end, *star;
+    size_t count = 1;
+    const char *p;
+
+    for (p = spec; *p; p++)
+        if (*p == DECRYPT_PATHS_SEP)
+            count++;
+    policy = (decrypt_policy *)calloc (1, sizeof(decrypt_policy));
+    if (policy == NULL ||
+        (policy->patterns = (decrypt_pattern *)calloc (count, sizeof(decrypt_pattern))) == NULL ||
+        (policy->spec = strdup (spec)) == NULL) {
+        if (policy != NULL)
+            free (policy->patterns);
+        free (policy);
+        errno = ENOMEM;
+        return NULL;
+    }
+    for (item = policy->spec; item != NULL; item = end) {
+        end = strchr (item, DECRYPT_PATHS_SEP);
+        if (end != NULL)
+            *end++ = '\0';
+        if (*item == '\0')
+            continue;
+        pattern = &policy->patterns[policy->count++];
+        pattern->prefix = item;
+        star = strchr (item, '*');
+        if (star != NULL) {
+            *star = '\0';
+            pattern->suffix = star + 1;
+            pattern->suffix_len = strlen (pattern->suffix);
+        }
+        pattern->prefix_len = strlen (item);
+    }
+    return policy;
+}
+
+/**
+ * @description: 从环境变量PYTHONDECRYPTPATHS读取解密范围，没有设置时解密所有文件
+ */
+static void init_decrypt_paths (void)
+{
+    char *value = Py_GETENV ("PYTHONDECRYPTPATHS");
+
+    if (value != NULL && *value != '\0')
+        decrypt_paths = parse_decrypt_paths (value);
+}
+
+/**
+ * @description: 从环境变量PYTHONDECRYPTCACHESIZE读取缓存预算，支持k/m后缀，0表示关闭缓存
+ */
+static void init_cache_budget (void)
+{
+    char *value = Py_GETENV ("PYTHONDECRYPTCACHESIZE");
+    char *end;
+    unsigned long budget;
+
+    if (value == NULL || *value == '\0')
+        return;
+    errno = 0;
+    budget = strtoul (value, &end, 10);
+    if (errno != 0 || end == value)
+        return;
+    if (*end == 'k' || *end == 'K') {
+        budget *= 1024;
+        end++;
+    } else if (*end == 'm' || *end == 'M') {
+        budget *= 1024 * 1024;
+        end++;
+    }
+    if (*end == '\0')
+        cache_budget = budget;
+}
+
+/**
+ * @description: 从环境变量PYTHONDECRYPTTHREADS读取解密线程数，没有设置时使用在线CPU数
+ */
+static void init_decrypt_threads (void)
+{
+    char *value = Py_GETENV ("PYTHONDECRYPTTHREADS");
+    char *end;
+    long n = 0;
+
+    if (value != NULL && *value != '\0') {
+        errno = 0;
+        n = strtol (value, &end, 10);
+        if (errno != 0 || end == value || *end != '\0')
+            n = 0;
+    }
+    if (n <= 0)
+        n = sysconf (_SC_NPROCESSORS_ONLN);
+    if (n < 1)
+        n = 1;
+    if (n > PARALLEL_MAX_THREADS)
+        n = PARALLEL_MAX_THREADS;
+    decrypt_threads = (int)n;
+}
+
+static size_t cache_hash (dev_t dev, ino_t ino)
+{
+    return ((size_t)dev * 31 + (size_t)ino) % CACHE_BUCKETS;
+}
+
+static void cache_unlink (cache_entry *e)
+{
+    e->prev->next = e->next;
+    e->next->prev = e->prev;
+}
+
+static void cache_push_front (cache_entry *list, cache_entry *e)
+{
+    e->next = list->next;
+    e->prev = list;
+    list->next->prev = e;
+    list->next = e;
+}
+
+static void cache_free (cache_entry *e)
+{
+    if (e->plain != NULL) {
+        OPENSSL_cleanse (e->plain, e->plain_len);
+        free (e->plain);
+    }
+    free (e);
+}
+
+/**
+ * @description: 从缓存中删除一项(调用者持有cache_lock)
+ * @param evicted 是否因为超出预算被淘汰，只用于统计
+ */
+static void cache_remove (cache_entry *e, int evicted)
+{
+    cache_entry **p = &cache_table[cache_hash (e->dev, e->ino)];
+
+    while (*p != e)
+        p = &(*p)->hash_next;
+    *p = e->hash_next;
+    cache_unlink (e);
+    if (e->plain != NULL) {
+        cache_bytes -= e->plain_len;
+        cache_entries--;
+        if (evicted)
+            cache_evictions++;
+    } else {
+        cache_seen_count--;
+    }
+    if (e->refcnt > 0)
+        e->removed = 1;
+    else
+        cache_free (e);
+}
+
+/**
+ * @description: 按(设备号, inode)查找缓存项，文件大小或mtime不一致的旧缓存项直接删除
+ *               调用者持有cache_lock
+ */
+static cache_entry *cache_lookup (const struct stat *st)
+{
+    cache_entry *e = cache_table[cache_hash (st->st_dev, st->st_ino)];
+#ifdef HAVE_STAT_TV_NSEC
+    long nsec = st->st_mtim.tv_nsec;
+#else
+    long nsec = 0;
+#endif
+
+    while (e != NULL && (e->dev != st->st_dev || e->ino != st->st_ino))
+        e = e->hash_next;
+    if (e != NULL && (e->size != st->st_size || e->mtime != st->st_mtime ||
+                      e->mtime_nsec != nsec)) {
+        cache_remove (e, 0);
+        e = NULL;
+    }
+    return e;
+}
+
+/**
+ * @description: 查找文件的明文缓存，命中时增加引用计数，用完后必须调用cache_release
+ * @return 命中返回缓存项，否则返回NULL
+ */
+static cache_entry *cache_acquire (const struct stat *st)
+{
+    cache_entry *e;
+
+    pthread_once (&cache_once, init_cache_budget);
+    pthread_mutex_lock (&cache_lock);
+    if (cache_budget == 0) {
+        pthread_mutex_unlock (&cache_lock);
+        return NULL;
+    }
+    e = cache_lookup (st);
+    if (e != NULL && e->plain != NULL) {
+        cache_unlink (e);
+        cache_push_front (&cache_lru, e);
+        e->refcnt++;
+        cache_hits++;
+    } else {
+        e = NULL;
+        cache_misses++;
+    }
+    pthread_mutex_unlock (&cache_lock);
+    return e;
+}
+
+static void cache_release (cache_entry *e)
+{
+    pthread_mutex_lock (&cache_lock);
+    if (--e->refcnt == 0 && e->removed)
+        cache_free (e);
+    pthread_mutex_unlock (&cache_lock);
+}
+
+/**
+ * @description: 记录一次解密的结果：第一次只记住这个文件，第二次才保存明文
+ */
+static void cache_store (const struct stat *st, const unsigned char *plain, size_t len)
+{
+    cache_entry *e;
+    unsigned char *copy = NULL;
+
+    pthread_mutex_lock (&cache_lock);
+    if (len > cache_budget)
+        goto done;
+    e = cache_lookup (st);
+    if (e == NULL) {
+        e = (cache_entry *)calloc (1, sizeof(cache_entry));
+        if (e == NULL)
+            goto done;
+        e->dev = st->st_dev;
+        e->ino = st->st_ino;
+        e->size = st->st_size;
+        e->mtime = st->st_mtime;
+#ifdef HAVE_STAT_TV_NSEC
+        e->mtime_nsec = st->st_mtim.tv_nsec;
+#endif
+        e->hash_next = cache_table[cache_hash (e->dev, e->ino)];
+        cache_table[cache_hash (e->dev, e->ino)] = e;
+        cache_push_front (&cache_seen, e);
+        if (++cache_seen_count > CACHE_MAX_SEEN)
+            cache_remove (cache_seen.prev, 0);
+        goto done;
+    }
+    if (e->plain != NULL)
+        goto done;
+
+    // 复制明文时不持有锁，其他线程的查找不用等待这次复制
+    pthread_mutex_unlock (&cache_lock);
+    copy = (unsigned char *)malloc (len ? len : 1);
+    if (copy == NULL)
+        return;
+    memcpy (copy, plain, len);
+    pthread_mutex_lock (&cache_lock);
+    // 锁释放期间缓存项可能已经被删除、被别的线程保存了明文，或者预算已经变小
+    e = cache_lookup (st);
+    if (e == NULL || e->plain != NULL || len > cache_budget)
+        goto done;
+    e->plain = copy;
+    e->plain_len = len;
+    copy = NULL;
+    cache_unlink (e);
+    cache_seen_count--;
+    cache_push_front (&cache_lru, e);
+    cache_entries++;
+    cache_bytes += len;
+    // 新缓存项在链表头部，且len不超过预算，所以不会淘汰到它自己
+    while (cache_bytes > cache_budget)
+        cache_remove (cache_lru.prev, 1);
+
+done:
+    pthread_mutex_unlock (&cache_lock);
+    if (copy != NULL) {
+        OPENSSL_cleanse (copy, len);
+        free (copy);
+    }
+}
+
+static unsigned long long now_ns (void)
+{
+    struct timespec ts;
+    clock_gettime (CLOCK_MONOTONIC, &ts);
+    return (unsigned long long)ts.tv_sec * 1000000000ULL + ts.tv_nsec;
+}
+
+static ssize_t pread_all (int fd, unsigned char *buf, size_t len, off_t offset)
+{
+    ssize_t n;
+    size_t done = 0;
+    while (done < len) {
+        n = pread (fd, buf + done, len - done, offset + done);
+        if (n < 0) {
+            if (errno == EINTR)
+                continue;
+            return -1;
+        }
+        if (n == 0)
+            break;
+        done += n;
+    }
+    return done;
+}
+
+static int write_all (int fd, const char *buf, size_t len)
+{
+    ssize_t n;
+    while (len > 0) {
+        n = write (fd, buf, len);
+        if (n < 0) {
+            if (errno == EINTR)
+                continue;
+            return -1;
+        }
+        buf += n;
+        len -= n;
+    }
+    return 0;
+}
+
 static unsigned char* str2hex (char *str) {
     unsigned char *ret = NULL;
     int str_len = strlen (str);
     int i = 0;
     assert ((str_len%2) == 0);
-    ret = (char *) malloc (str_len/2);
+    ret = (unsigned char *) malloc (str_len/2);
     for (i =0;i < str_len; i = i + 2 ) {
         sscanf (str + i, "%2hhx", &ret[i / 2]);
     }
     return ret;
 }
 
-static void decrypt_buf (char *raw_buf, char **encrpy_buf, int len ) {
-    AES_KEY aes;
+/**
+ * @description: 解析KEY、IV并生成解密用的EVP上下文模板，由pthread_once保证只执行一次
+ *               每次解密时复制这个模板，不再重新计算轮密钥
+ */
+static void init_decrypt_key (void)
+{
     unsigned char *key = str2hex (KEY);
     unsigned char *iv  = str2hex (IV);
-    AES_set_decrypt_key (key,128,&aes);
-    AES_cbc_encrypt (raw_buf, *encrpy_buf, len, &aes, iv, AES_DECRYPT);
+    EVP_CIPHER_CTX *ctx = EVP_CIPHER_CTX_new ();
+    unsigned char info[sizeof(ENC_MAC_INFO)-1 + 16];
+
+    if (ctx != NULL && EVP_DecryptInit_ex (ctx, EVP_aes_128_ecb (), NULL, key, NULL)) {
+        EVP_CIPHER_CTX_set_padding (ctx, 0);
+        decrypt_ctx = ctx;
+    } else {
+        EVP_CIPHER_CTX_free (ctx);
+    }
+    ctx = EVP_CIPHER_CTX_new ();
+    if (ctx != NULL && EVP_DecryptInit_ex (ctx, EVP_aes_128_ctr (), NULL, key, NULL)) {
+        decrypt_ctr_ctx = ctx;
+    } else {
+        EVP_CIPHER_CTX_free (ctx);
+    }
+    memcpy (decrypt_iv, iv, AES_BLOCK_SIZE);
+
+    // v2的HMAC密钥由AES密钥派生，不直接复用同一个密钥
+    memcpy (info, ENC_MAC_INFO, sizeof(ENC_MAC_INFO)-1);
+    memcpy (info + sizeof(ENC_MAC_INFO)-1, key, 16);
+    EVP_Digest (info, sizeof(info), decrypt_mac_key, NULL, EVP_sha256 (), NULL);
+    OPENSSL_cleanse (info, sizeof(info));
+
+    OPENSSL_cleanse (key, strlen (KEY) / 2);
     free (key);
     free (iv);
 }
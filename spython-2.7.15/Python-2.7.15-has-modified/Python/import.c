@@ -16,6 +16,11 @@
 #include "importdl.h"
 #include "decrypt_source_file.h"
 
+#if defined(HAVE_DIRENT_H) && !defined(PYOS_OS2)
+#include <dirent.h>
+#define USE_DIR_LISTING_CACHE
+#endif
+
 #ifdef HAVE_FCNTL_H
 #include <fcntl.h>
 #endif
@@ -267,11 +272,19 @@ _PyImportHooks_Init(void)
     Py_DECREF(path_hooks);
 }
 
+#ifdef USE_DIR_LISTING_CACHE
+/* absolute dirname -> ((st_dev, st_ino, mtime), {name: None}) */
+static PyObject *dir_listing_cache = NULL;
+#endif
+
 void
 _PyImport_Fini(void)
 {
     Py_XDECREF(extensions);
     extensions = NULL;
+#ifdef USE_DIR_LISTING_CACHE
+    Py_CLEAR(dir_listing_cache);
+#endif
     PyMem_DEL(_PyImport_Filetab);
     _PyImport_Filetab = NULL;
 }
@@ -863,6 +876,101 @@ load_compiled_module(char *name, char *cpathname, FILE *fp)
     return m;
 }
 
+/* spython: PYTHONDECRYPTTIME splits the self time of every import into the
+   time spent sniffing file headers, reading and decrypting sources (as
+   counted by decrypt_source_file.c for the current thread) and compiling
+   them, and prints one line per module to stderr.  The rest is finding the
+   module and executing its body. */
+
+enum {
+    PHASE_TOTAL,
+    PHASE_SNIFF,
+    PHASE_READ,
+    PHASE_DECRYPT,
+    PHASE_COMPILE,
+    PHASE_COUNT
+};
+
+static unsigned long long compile_ns = 0;
+
+static int
+decrypt_time_enabled(void)
+{
+    static int enabled = -1;
+    if (enabled < 0) {
+        char *p = Py_GETENV("PYTHONDECRYPTTIME");
+        enabled = p != NULL && *p != '\0';
+    }
+    return enabled;
+}
+
+static unsigned long long
+monotonic_ns(void)
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (unsigned long long)ts.tv_sec * 1000000000ULL + ts.tv_nsec;
+}
+
+static void
+decrypt_phases_now(unsigned long long *phases)
+{
+    d_decrypt_stats stats;
+
+    d_get_thread_decrypt_stats(&stats);
+    phases[PHASE_TOTAL] = monotonic_ns();
+    phases[PHASE_SNIFF] = stats.sniff_ns;
+    phases[PHASE_READ] = stats.read_ns;
+    phases[PHASE_DECRYPT] = stats.decrypt_ns;
+    phases[PHASE_COMPILE] = compile_ns;
+}
+
+/* Time spent by the imports nested in the current one, per phase */
+static unsigned long long decrypt_accumulated[PHASE_COUNT];
+static int decrypt_level = 0;
+
+static void
+decrypt_time_enter(unsigned long long *start, unsigned long long *saved)
+{
+    static int header = 1;
+    int i;
+
+    if (header) {
+        fputs("decrypt time: sniff [us] |   read | decrypt | compile |"
+              "    exec | imported package\n", stderr);
+        header = 0;
+    }
+    decrypt_level++;
+    for (i = 0; i < PHASE_COUNT; i++) {
+        saved[i] = decrypt_accumulated[i];
+        decrypt_accumulated[i] = 0;
+    }
+    decrypt_phases_now(start);
+}
+
+static void
+decrypt_time_exit(const char *name, unsigned long long *start,
+                  unsigned long long *saved)
+{
+    unsigned long long cum[PHASE_COUNT], self[PHASE_COUNT], other;
+    int i;
+
+    decrypt_phases_now(cum);
+    for (i = 0; i < PHASE_COUNT; i++) {
+        cum[i] -= start[i];
+        self[i] = cum[i] - decrypt_accumulated[i];
+        decrypt_accumulated[i] = saved[i] + cum[i];
+    }
+    other = self[PHASE_SNIFF] + self[PHASE_READ] + self[PHASE_DECRYPT]
+            + self[PHASE_COMPILE];
+    decrypt_level--;
+    fprintf(stderr, "decrypt time: %10llu | %6llu | %7llu | %7llu | %7llu | %*s%s\n",
+            self[PHASE_SNIFF] / 1000, self[PHASE_READ] / 1000,
+            self[PHASE_DECRYPT] / 1000, self[PHASE_COMPILE] / 1000,
+            (self[PHASE_TOTAL] > other ? self[PHASE_TOTAL] - other : 0) / 1000,
+            decrypt_level*2, "", name);
+}
+
 /* Parse a source file and return the corresponding code object */
 
 static PyCodeObject *
@@ -871,17 +979,22 @@ parse_source_module(const char *pathname, FILE *fp)
     PyCodeObject *co = NULL;
     mod_ty mod;
     PyCompilerFlags flags;
+    unsigned long long t0 = 0;
     PyArena *arena = PyArena_New();
     if (arena == NULL)
         return NULL;
 
     flags.cf_flags = 0;
 
+    if (decrypt_time_enabled())
+        t0 = monotonic_ns();
     mod = PyParser_ASTFromFile(fp, pathname, Py_file_input, 0, 0, &flags,
                                NULL, arena);
     if (mod) {
         co = PyAST_Compile(mod, pathname, NULL, arena);
     }
+    if (decrypt_time_enabled())
+        compile_ns += monotonic_ns() - t0;
     PyArena_Free(arena);
     return co;
 }
@@ -1015,6 +1128,228 @@ update_compiled_module(PyCodeObject *co, char *pathname)
     return 1;
 }
 
+/* spython: opt-in encrypted bytecode cache.
+
+   With PYTHONENCRYPTEDCACHE set (and -E not given), compiled code is cached
+   next to the source as <module>.spyc instead of a plain .pyc.  The file is
+   d_encrypt_buffer(magic + sha256(source) + marshalled code), so no
+   plaintext bytecode reaches the disk, and it is validated against the hash
+   of the decrypted source rather than the mtime of the file. */
+
+#define ENCRYPTED_CACHE_SUFFIX ".spyc"
+#define ENCRYPTED_CACHE_HEADER (4 + SHA256_DIGEST_LENGTH)
+
+static int
+encrypted_cache_enabled(void)
+{
+    char *p = Py_GETENV("PYTHONENCRYPTEDCACHE");
+    return p != NULL && *p != '\0';
+}
+
+/* Given the pathname of a source file, fill buf with the pathname of its
+   encrypted cache, or return NULL if there's no space in the buffer. */
+
+static char *
+make_encrypted_pathname(char *pathname, char *buf, size_t buflen)
+{
+    size_t len = strlen(pathname);
+    if (len >= 3 && strcmp(&pathname[len-3], ".py") == 0)
+        len -= 3;
+    if (len + sizeof(ENCRYPTED_CACHE_SUFFIX) > buflen)
+        return NULL;
+    memcpy(buf, pathname, len);
+    memcpy(buf + len, ENCRYPTED_CACHE_SUFFIX, sizeof(ENCRYPTED_CACHE_SUFFIX));
+    return buf;
+}
+
+/* Read the rest of an (already decrypted) source file into a string and
+   seek back.  Returns NULL without an exception if fp can't be rewound. */
+
+static PyObject *
+read_source_bytes(FILE *fp)
+{
+    PyObject *source;
+    struct stat st;
+    size_t n;
+    long start = ftell(fp);
+
+    if (start < 0 || fstat(fileno(fp), &st) != 0 || st.st_size < start) {
+        clearerr(fp);
+        return NULL;
+    }
+    source = PyString_FromStringAndSize(NULL, (Py_ssize_t)(st.st_size - start));
+    if (source == NULL)
+        return NULL;
+    n = fread(PyString_AS_STRING(source), 1, PyString_GET_SIZE(source), fp);
+    if (ferror(fp) || fseek(fp, start, SEEK_SET) != 0) {
+        clearerr(fp);
+        Py_DECREF(source);
+        return NULL;
+    }
+    if (n != (size_t)PyString_GET_SIZE(source) &&
+        _PyString_Resize(&source, (Py_ssize_t)n) < 0)
+        return NULL;
+    return source;
+}
+
+/* Return the cached code object if spathname holds code compiled from a
+   source with the given hash, else NULL.  Doesn't set an exception. */
+
+static PyCodeObject *
+read_encrypted_cache(char *spathname, unsigned char *hash)
+{
+    FILE *fp;
+    struct stat st;
+    unsigned char *data = NULL, *plain = NULL;
+    size_t plain_len = 0;
+    long magic;
+    PyObject *co = NULL;
+
+    fp = fopen(spathname, "rb");
+    if (fp == NULL)
+        return NULL;
+    if (fstat(fileno(fp), &st) == 0 && st.st_size > 0 &&
+        (data = (unsigned char *)malloc(st.st_size)) != NULL &&
+        fread(data, 1, st.st_size, fp) == (size_t)st.st_size)
+        (void)d_decrypt_buffer(data, st.st_size, &plain, &plain_len);
+    fclose(fp);
+    free(data);
+    if (plain == NULL) {
+        if (Py_VerboseFlag)
+            PySys_WriteStderr("# %s can't be decrypted\n", spathname);
+        return NULL;
+    }
+
+    magic = (long)plain_len < ENCRYPTED_CACHE_HEADER ? -1 :
+        (long)(plain[0] | (plain[1] << 8) | (plain[2] << 16) |
+               ((unsigned long)plain[3] << 24));
+    if (magic != pyc_magic) {
+        if (Py_VerboseFlag)
+            PySys_WriteStderr("# %s has bad magic\n", spathname);
+    }
+    else if (memcmp(plain + 4, hash, SHA256_DIGEST_LENGTH) != 0) {
+        if (Py_VerboseFlag)
+            PySys_WriteStderr("# %s has bad source hash\n", spathname);
+    }
+    else {
+        co = PyMarshal_ReadObjectFromString(
+            (char *)plain + ENCRYPTED_CACHE_HEADER,
+            (Py_ssize_t)(plain_len - ENCRYPTED_CACHE_HEADER));
+        if (co == NULL)
+            PyErr_Clear();
+        else if (!PyCode_Check(co))
+            Py_CLEAR(co);
+        else if (Py_VerboseFlag)
+            PySys_WriteStderr("# %s matches source\n", spathname);
+    }
+    OPENSSL_cleanse(plain, plain_len);
+    free(plain);
+    return (PyCodeObject *)co;
+}
+
+/* Write a compiled module to its encrypted cache.  Errors are ignored, a
+   partially written file is removed. */
+
+static void
+write_encrypted_cache(PyCodeObject *co, char *spathname, struct stat *srcstat,
+                      unsigned char *hash)
+{
+    FILE *fp;
+    PyObject *marshalled;
+    unsigned char *plain, *data = NULL;
+    size_t plain_len, data_len = 0;
+    mode_t mode = srcstat->st_mode & ~S_IXUSR & ~S_IXGRP & ~S_IXOTH;
+
+    marshalled = PyMarshal_WriteObjectToString((PyObject *)co,
+                                               Py_MARSHAL_VERSION);
+    if (marshalled == NULL) {
+        PyErr_Clear();
+        return;
+    }
+    plain_len = ENCRYPTED_CACHE_HEADER + PyString_GET_SIZE(marshalled);
+    plain = (unsigned char *)malloc(plain_len);
+    if (plain != NULL) {
+        plain[0] = (unsigned char)(pyc_magic & 0xff);
+        plain[1] = (unsigned char)((pyc_magic >> 8) & 0xff);
+        plain[2] = (unsigned char)((pyc_magic >> 16) & 0xff);
+        plain[3] = (unsigned char)((pyc_magic >> 24) & 0xff);
+        memcpy(plain + 4, hash, SHA256_DIGEST_LENGTH);
+        memcpy(plain + ENCRYPTED_CACHE_HEADER, PyString_AS_STRING(marshalled),
+               PyString_GET_SIZE(marshalled));
+        (void)d_encrypt_buffer(plain, plain_len, &data, &data_len);
+        OPENSSL_cleanse(plain, plain_len);
+        free(plain);
+    }
+    Py_DECREF(marshalled);
+    if (data == NULL)
+        return;
+
+    fp = open_exclusive(spathname, mode);
+    if (fp == NULL) {
+        if (Py_VerboseFlag)
+            PySys_WriteStderr("# can't create %s\n", spathname);
+        free(data);
+        return;
+    }
+    if (fwrite(data, 1, data_len, fp) != data_len ||
+        fflush(fp) != 0 || ferror(fp)) {
+        if (Py_VerboseFlag)
+            PySys_WriteStderr("# can't write %s\n", spathname);
+        fclose(fp);
+        (void) unlink(spathname);
+        free(data);
+        return;
+    }
+    fclose(fp);
+    free(data);
+    if (Py_VerboseFlag)
+        PySys_WriteStderr("# wrote %s\n", spathname);
+}
+
+/* Get the code object for a source module through the encrypted cache,
+   compiling (and caching) the source if the cache is missing or stale. */
+
+static PyCodeObject *
+load_encrypted_cached_code(char *name, char *pathname, char *spathname,
+                           FILE *fp, struct stat *srcstat)
+{
+    PyObject *source;
+    PyCodeObject *co;
+    unsigned char hash[SHA256_DIGEST_LENGTH];
+
+    source = read_source_bytes(fp);
+    if (source == NULL) {
+        if (PyErr_Occurred())
+            return NULL;
+        return parse_source_module(pathname, fp);
+    }
+    if (!EVP_Digest(PyString_AS_STRING(source), PyString_GET_SIZE(source),
+                    hash, NULL, EVP_sha256(), NULL)) {
+        Py_DECREF(source);
+        return parse_source_module(pathname, fp);
+    }
+    Py_DECREF(source);
+
+    co = read_encrypted_cache(spathname, hash);
+    if (co != NULL) {
+        if (update_compiled_module(co, pathname) < 0) {
+            Py_DECREF(co);
+            return NULL;
+        }
+        if (Py_VerboseFlag)
+            PySys_WriteStderr("import %s # precompiled from %s\n",
+                name, spathname);
+        return co;
+    }
+    co = parse_source_module(pathname, fp);
+    if (co == NULL)
+        return NULL;
+    if (Py_VerboseFlag)
+        PySys_WriteStderr("import %s # from %s\n", name, pathname);
+    write_encrypted_cache(co, spathname, srcstat, hash);
+    return co;
+}
+
 #ifdef MS_WINDOWS
 
 /* Seconds between 1.1.1601 and 1.1.1970 */
@@ -1047,6 +1382,36 @@ win32_mtime(FILE *fp, char *pathname)
 #endif  /* #ifdef MS_WINDOWS */
 
 
+/* spython: find_module() only probes for sources, they are decrypted here
+   when they are actually read.  Return fp itself for a plain source, a new
+   FILE holding the decrypted contents of an encrypted one, or NULL with an
+   exception set. */
+
+static FILE *
+open_decrypted_source(char *pathname, FILE *fp)
+{
+    FILE *dfp;
+    int fd;
+
+    /* Decryption only touches its own buffers, other threads may run */
+    Py_BEGIN_ALLOW_THREADS
+    fd = d_decrypt_fd(fileno(fp), 0);
+    Py_END_ALLOW_THREADS
+    if (fd == fileno(fp))
+        return fp;
+    if (fd < 0) {
+        PyErr_Format(PyExc_ImportError, "can't decrypt %.200s: %.200s",
+                     pathname, strerror(errno));
+        return NULL;
+    }
+    dfp = fdopen(fd, "r" PY_STDIOTEXTMODE);
+    if (dfp == NULL) {
+        close(fd);
+        PyErr_SetFromErrnoWithFilename(PyExc_IOError, pathname);
+    }
+    return dfp;
+}
+
 /* Load a source module from a given file and return its module
    object WITH INCREMENTED REFERENCE COUNT.  If there's a matching
    byte-compiled file, use that instead. */
@@ -1056,7 +1421,8 @@ load_source_module(char *name, char *pathname, FILE *fp)
 {
     struct stat st;
     FILE *fpc;
-    char *buf;
+    FILE *sfp = fp;    /* the decrypted source */
+    char *buf = NULL;
     char *cpathname;
     PyCodeObject *co = NULL;
     PyObject *m;
@@ -1086,7 +1452,23 @@ load_source_module(char *name, char *pathname, FILE *fp)
     }
     buf = PyMem_MALLOC(MAXPATHLEN+1);
     if (buf == NULL) {
-        return PyErr_NoMemory();
+        PyErr_NoMemory();
+        goto error_exit;
+    }
+    if (encrypted_cache_enabled() &&
+        make_encrypted_pathname(pathname, buf, (size_t)MAXPATHLEN + 1)) {
+        sfp = open_decrypted_source(pathname, fp);
+        if (sfp == NULL)
+            goto error_exit;
+        co = load_encrypted_cached_code(name, pathname, buf, sfp, &st);
+        if (co == NULL)
+            goto error_exit;
+        m = PyImport_ExecCodeModuleEx(name, (PyObject *)co, pathname);
+        Py_DECREF(co);
+        PyMem_FREE(buf);
+        if (sfp != fp)
+            fclose(sfp);
+        return m;
     }
     cpathname = make_compiled_pathname(pathname, buf,
                                        (size_t)MAXPATHLEN + 1);
@@ -1104,7 +1486,10 @@ load_source_module(char *name, char *pathname, FILE *fp)
         pathname = cpathname;
     }
     else {
-        co = parse_source_module(pathname, fp);
+        sfp = open_decrypted_source(pathname, fp);
+        if (sfp == NULL)
+            goto error_exit;
+        co = parse_source_module(pathname, sfp);
         if (co == NULL)
             goto error_exit;
         if (Py_VerboseFlag)
@@ -1123,11 +1508,15 @@ load_source_module(char *name, char *pathname, FILE *fp)
     Py_DECREF(co);
 
     PyMem_FREE(buf);
+    if (sfp != fp)
+        fclose(sfp);
     return m;
 
 error_exit:
     Py_XDECREF(co);
     PyMem_FREE(buf);
+    if (sfp != NULL && sfp != fp)
+        fclose(sfp);
     return NULL;
 }
 
@@ -1311,6 +1700,118 @@ static int case_ok(char *, Py_ssize_t, Py_ssize_t, char *);
 static int find_init_module(char *); /* Forward */
 static struct filedescr importhookdescr = {"", "", IMP_HOOK};
 
+#ifdef USE_DIR_LISTING_CACHE
+/* spython: like FileFinder._path_cache in 3.x, find_module() checks a cached
+   listing of every sys.path directory instead of trying to open each
+   candidate file.  Listings are keyed by the absolute directory name, so
+   that relative sys.path entries follow os.chdir(), and reused for as long
+   as the device, inode and mtime of the directory don't change.  Listings
+   of directories modified within the last second are never reused, since
+   a new file wouldn't necessarily bump the mtime again.
+
+   Return a new reference to a dict whose keys are the names in dirname,
+   NULL with no exception set if the directory can't (or shouldn't) be
+   listed, or NULL with an exception set on error. */
+
+static PyObject *
+get_dir_listing(char *dirname)
+{
+    struct stat st;
+    PyObject *entry, *names, *stamp, *name;
+    DIR *dirp;
+    struct dirent *dp;
+    char *path = dirname[0] ? dirname : ".";
+    char key[MAXPATHLEN+1];
+    size_t len;
+
+    /* The listing only matches names exactly */
+    if (Py_GETENV("PYTHONCASEOK") != NULL)
+        return NULL;
+    if (stat(path, &st) != 0 || !S_ISDIR(st.st_mode))
+        return NULL;
+    /* Like '' in 3.x's PathFinder, relative names are relative to the
+       current directory at the time of the import. */
+    len = strlen(dirname);
+    if (dirname[0] == SEP) {
+        if (len > MAXPATHLEN)
+            return NULL;
+        strcpy(key, dirname);
+    }
+    else {
+        if (getcwd(key, MAXPATHLEN) == NULL)
+            return NULL;
+        if (len) {
+            size_t cwdlen = strlen(key);
+            if (cwdlen + 1 + len > MAXPATHLEN)
+                return NULL;
+            key[cwdlen] = SEP;
+            strcpy(key + cwdlen + 1, dirname);
+        }
+    }
+    if (dir_listing_cache == NULL) {
+        dir_listing_cache = PyDict_New();
+        if (dir_listing_cache == NULL)
+            return NULL;
+    }
+    stamp = Py_BuildValue("(KKL)",
+                          (unsigned PY_LONG_LONG)st.st_dev,
+                          (unsigned PY_LONG_LONG)st.st_ino,
+                          (PY_LONG_LONG)st.st_mtime);
+    if (stamp == NULL)
+        return NULL;
+    entry = PyDict_GetItemString(dir_listing_cache, key);
+    if (entry != NULL) {
+        int r = PyObject_RichCompareBool(PyTuple_GET_ITEM(entry, 0),
+                                         stamp, Py_EQ);
+        if (r != 0) {
+            Py_DECREF(stamp);
+            if (r < 0)
+                return NULL;
+            names = PyTuple_GET_ITEM(entry, 1);
+            Py_INCREF(names);
+            return names;
+        }
+        if (PyDict_DelItemString(dir_listing_cache, key) < 0) {
+            Py_DECREF(stamp);
+            return NULL;
+        }
+    }
+    if (st.st_mtime + 1 >= time(NULL)) {
+        /* Too recent to be cached, probe for every file. */
+        Py_DECREF(stamp);
+        return NULL;
+    }
+
+    dirp = opendir(path);
+    if (dirp == NULL) {
+        Py_DECREF(stamp);
+        return NULL;
+    }
+    names = PyDict_New();
+    while (names != NULL && (dp = readdir(dirp)) != NULL) {
+        name = PyString_FromString(dp->d_name);
+        if (name == NULL || PyDict_SetItem(names, name, Py_None) < 0)
+            Py_CLEAR(names);
+        Py_XDECREF(name);
+    }
+    closedir(dirp);
+    if (names == NULL) {
+        Py_DECREF(stamp);
+        return NULL;
+    }
+    entry = PyTuple_Pack(2, stamp, names);
+    Py_DECREF(stamp);
+    if (entry == NULL ||
+        PyDict_SetItemString(dir_listing_cache, key, entry) < 0) {
+        Py_XDECREF(entry);
+        Py_DECREF(names);
+        return NULL;
+    }
+    Py_DECREF(entry);
+    return names;
+}
+#endif
+
 static struct filedescr *
 find_module(char *fullname, char *subname, PyObject *path, char *buf,
             size_t buflen, FILE **p_fp, PyObject **p_loader)
@@ -1449,6 +1950,7 @@ find_module(char *fullname, char *subname, PyObject *path, char *buf,
     namelen = strlen(name);
     for (i = 0; i < npath; i++) {
         PyObject *copy = NULL;
+        PyObject *listing = NULL;
         PyObject *v = PyList_GetItem(path, i);
         if (!v)
             goto error_exit;
@@ -1506,6 +2008,13 @@ find_module(char *fullname, char *subname, PyObject *path, char *buf,
         }
         /* no hook was found, use builtin import */
 
+#ifdef USE_DIR_LISTING_CACHE
+        listing = get_dir_listing(buf);
+        if (listing == NULL && PyErr_Occurred()) {
+            Py_XDECREF(copy);
+            goto error_exit;
+        }
+#endif
         if (len > 0 && buf[len-1] != SEP
 #ifdef ALTSEP
             && buf[len-1] != ALTSEP
@@ -1517,10 +2026,13 @@ find_module(char *fullname, char *subname, PyObject *path, char *buf,
 
         /* Check for package import (buf holds a directory name,
            and there's an __init__ module in that directory */
-        if (isdir(buf) &&         /* it's an existing directory */
+        if ((listing == NULL ||
+             PyDict_GetItemString(listing, name) != NULL) &&
+            isdir(buf) &&         /* it's an existing directory */
             case_ok(buf, len, namelen, name)) { /* case matches */
             if (find_init_module(buf)) { /* and has __init__.py */
                 Py_XDECREF(copy);
+                Py_XDECREF(listing);
                 PyMem_FREE(name);
                 return &fd_package;
             }
@@ -1532,6 +2044,7 @@ find_module(char *fullname, char *subname, PyObject *path, char *buf,
                 if (PyErr_Warn(PyExc_ImportWarning,
                                warnstr)) {
                     Py_XDECREF(copy);
+                    Py_XDECREF(listing);
                     goto error_exit;
                 }
             }
@@ -1571,12 +2084,16 @@ find_module(char *fullname, char *subname, PyObject *path, char *buf,
             }
 #endif /* PYOS_OS2 */
             strcpy(buf+len, fdp->suffix);
+            if (listing != NULL &&
+                PyDict_GetItemString(listing, buf + len - namelen) == NULL)
+                continue;
             if (Py_VerboseFlag > 1)
                 PySys_WriteStderr("# trying %s\n", buf);
             filemode = fdp->mode;
             if (filemode[0] == 'U')
                 filemode = "r" PY_STDIOTEXTMODE;
-            fp = d_open(buf, filemode);
+            /* Sources are decrypted by load_source_module() */
+            fp = fopen(buf, filemode);
             if (fp != NULL) {
                 if (case_ok(buf, len, namelen, name))
                     break;
@@ -1601,6 +2118,7 @@ find_module(char *fullname, char *subname, PyObject *path, char *buf,
         }
 #endif
         Py_XDECREF(copy);
+        Py_XDECREF(listing);
         if (fp != NULL)
             break;
     }
@@ -2723,7 +3241,14 @@ import_submodule(PyObject *mod, char *subname, char *fullname)
             Py_INCREF(Py_None);
             return Py_None;
         }
-        m = load_module(fullname, fp, buf, fdp->type, loader);
+        if (decrypt_time_enabled()) {
+            unsigned long long start[PHASE_COUNT], saved[PHASE_COUNT];
+            decrypt_time_enter(start, saved);
+            m = load_module(fullname, fp, buf, fdp->type, loader);
+            decrypt_time_exit(fullname, start, saved);
+        }
+        else
+            m = load_module(fullname, fp, buf, fdp->type, loader);
         Py_XDECREF(loader);
         if (fp)
             fclose(fp);
@@ -2985,6 +3510,17 @@ call_find_module(char *name, PyObject *path)
         PyMem_FREE(pathname);
         return NULL;
     }
+    if (fp != NULL && fdp->type == PY_SOURCE) {
+        /* imp.find_module() has always returned the decrypted source */
+        FILE *sfp = open_decrypted_source(pathname, fp);
+        if (sfp != fp)
+            fclose(fp);
+        if (sfp == NULL) {
+            PyMem_FREE(pathname);
+            return NULL;
+        }
+        fp = sfp;
+    }
     if (fp != NULL) {
         fob = PyFile_FromFile(fp, pathname, fdp->mode, fclose);
         if (fob == NULL) {
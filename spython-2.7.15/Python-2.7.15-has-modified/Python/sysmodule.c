@@ -21,6 +21,7 @@ Data members:
 #include "eval.h"
 
 #include "osdefs.h"
+#include "decrypt_source_file.h"
 
 #ifdef MS_WINDOWS
 #define WIN32_LEAN_AND_MEAN
@@ -915,6 +916,107 @@ PyDoc_STRVAR(sys_clear_type_cache__doc__,
 "_clear_type_cache() -> None\n\
 Clear the internal type lookup cache.");
 
+static PyObject *
+sys_decrypt_cache_info(PyObject *self, PyObject *args)
+{
+    d_cache_info info;
+
+    d_cache_get_info(&info);
+    return Py_BuildValue("{s:k,s:k,s:k,s:n,s:n,s:n}",
+                         "hits", info.hits,
+                         "misses", info.misses,
+                         "evictions", info.evictions,
+                         "entries", (Py_ssize_t)info.entries,
+                         "size", (Py_ssize_t)info.bytes,
+                         "maxsize", (Py_ssize_t)info.budget);
+}
+
+PyDoc_STRVAR(decrypt_cache_info_doc,
+"_decrypt_cache_info() -> dict\n\
+\n\
+Return statistics of the cache of decrypted source files: hits, misses,\n\
+evictions, entries, size (bytes of plaintext held) and maxsize.");
+
+static PyObject *
+sys_set_decrypt_cache_size(PyObject *self, PyObject *args)
+{
+    Py_ssize_t maxsize;
+
+    if (!PyArg_ParseTuple(args, "n:_set_decrypt_cache_size", &maxsize))
+        return NULL;
+    if (maxsize < 0) {
+        PyErr_SetString(PyExc_ValueError, "maxsize must be >= 0");
+        return NULL;
+    }
+    d_cache_set_budget((size_t)maxsize);
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(set_decrypt_cache_size_doc,
+"_set_decrypt_cache_size(maxsize)\n\
+\n\
+Set the memory budget, in bytes of plaintext, of the cache of decrypted\n\
+source files.  Entries over the new budget are dropped; 0 disables the\n\
+cache.  The initial budget comes from PYTHONDECRYPTCACHESIZE.");
+
+static PyObject *
+sys_decrypt_threads(PyObject *self, PyObject *args)
+{
+    return PyInt_FromLong(d_get_decrypt_threads());
+}
+
+PyDoc_STRVAR(decrypt_threads_doc,
+"_decrypt_threads() -> int\n\
+\n\
+Return the maximum number of threads used to decrypt a large file.");
+
+static PyObject *
+sys_set_decrypt_threads(PyObject *self, PyObject *args)
+{
+    int n;
+
+    if (!PyArg_ParseTuple(args, "i:_set_decrypt_threads", &n))
+        return NULL;
+    if (n < 0) {
+        PyErr_SetString(PyExc_ValueError, "n must be >= 0");
+        return NULL;
+    }
+    d_set_decrypt_threads(n);
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(set_decrypt_threads_doc,
+"_set_decrypt_threads(n)\n\
+\n\
+Set the maximum number of threads used to decrypt a large file: 1 decrypts\n\
+in the calling thread only, 0 uses one thread per online CPU.  Each thread\n\
+gets at least 1 MiB of ciphertext.  The initial value comes from\n\
+PYTHONDECRYPTTHREADS.");
+
+static PyObject *
+sys_decrypt_stats(PyObject *self, PyObject *args)
+{
+    d_decrypt_stats stats;
+
+    d_get_decrypt_stats(&stats);
+    return Py_BuildValue("{s:K,s:K,s:K,s:K,s:K,s:K,s:K}",
+                         "files", stats.files,
+                         "bytes", stats.bytes,
+                         "plain_bytes", stats.plain_bytes,
+                         "sniffs", stats.sniffs,
+                         "sniff_ns", stats.sniff_ns,
+                         "read_ns", stats.read_ns,
+                         "decrypt_ns", stats.decrypt_ns);
+}
+
+PyDoc_STRVAR(decrypt_stats_doc,
+"_decrypt_stats() -> dict\n\
+\n\
+Return counters of all decryption done by this process: files decrypted,\n\
+bytes of ciphertext read, plain_bytes produced, sniffs (file headers\n\
+checked) and the nanoseconds spent sniffing headers, reading ciphertext\n\
+and decrypting (sniff_ns, read_ns, decrypt_ns).");
+
 
 static PyMethodDef sys_methods[] = {
     /* Might as well keep this in alphabetic order */
@@ -922,6 +1024,8 @@ static PyMethodDef sys_methods[] = {
      callstats_doc},
     {"_clear_type_cache",       sys_clear_type_cache,     METH_NOARGS,
      sys_clear_type_cache__doc__},
+    {"_decrypt_cache_info", sys_decrypt_cache_info, METH_NOARGS,
+     decrypt_cache_info_doc},
     {"_current_frames", sys_current_frames, METH_NOARGS,
      current_frames_doc},
     {"displayhook",     sys_displayhook, METH_O, displayhook_doc},
@@ -980,6 +1084,13 @@ static PyMethodDef sys_methods[] = {
 #endif
     {"setprofile",      sys_setprofile, METH_O, setprofile_doc},
     {"getprofile",      sys_getprofile, METH_NOARGS, getprofile_doc},
+    {"_set_decrypt_cache_size", sys_set_decrypt_cache_size, METH_VARARGS,
+     set_decrypt_cache_size_doc},
+    {"_decrypt_stats", sys_decrypt_stats, METH_NOARGS, decrypt_stats_doc},
+    {"_decrypt_threads", sys_decrypt_threads, METH_NOARGS,
+     decrypt_threads_doc},
+    {"_set_decrypt_threads", sys_set_decrypt_threads, METH_VARARGS,
+     set_decrypt_threads_doc},
     {"setrecursionlimit", sys_setrecursionlimit, METH_VARARGS,
      setrecursionlimit_doc},
 #ifdef WITH_TSC
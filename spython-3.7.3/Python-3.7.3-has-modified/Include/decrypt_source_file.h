@@ -4,6 +4,11 @@
 #include <math.h>
 
 #include <openssl/aes.h>
+#include <openssl/evp.h>
+#include <openssl/crypto.h>
+#include <openssl/hmac.h>
+#include <openssl/rand.h>
+#include <openssl/sha.h>
 #include <stdio.h>
 #include <string.h>
 #include <assert.h>
@@ -20,10 +25,77 @@
 
 #define KEY  "8cc72b05705d5c46f412af8cbed55aad"
 #define IV   "667b02a85c61c786def4521b060265e8"
-#define HEADINFO "encrypted-python-source-file-header"
-#define _NO_DECRYPT_FILE_OUTPUT // 是否需要输出解密后的文件
+#define HEADINFO "encrypted-python-source-file-header" // v1文件头
 
+/**
+ * v2文件格式:
+ *   文件头: magic(6) + 版本号(1) + 标志位(1) + 明文长度(8, 小端) + nonce(16)
+ *   AES-128-CTR密文(长度等于明文长度)
+ *   HMAC-SHA256(文件头 + 密文)
+ */
+#define ENC_MAGIC         "SPYENC"
+#define ENC_VERSION       2
+#define ENC_LENGTH_OFFSET 8
+#define ENC_NONCE_OFFSET  16
+#define ENC_HEADER_SIZE   32
+#define ENC_TAG_SIZE      32
+#define ENC_MAC_INFO      "spython-v2-hmac-key"
+
+/* 解密结果缓存的统计信息 */
+typedef struct {
+    unsigned long hits;       // 直接使用缓存明文的次数
+    unsigned long misses;     // 加密文件没有命中缓存的次数
+    unsigned long evictions;  // 因超出预算被淘汰的缓存项数
+    size_t entries;           // 当前缓存的文件数
+    size_t bytes;             // 当前缓存的明文总字节数
+    size_t budget;            // 明文总字节数上限，0表示关闭缓存
+} d_cache_info;
+
+/* 解密统计，耗时的单位都是纳秒 */
+typedef struct {
+    unsigned long long files;        // 解密的加密文件数(包括直接使用缓存明文的)
+    unsigned long long bytes;        // 读取的密文字节数
+    unsigned long long plain_bytes;  // 得到的明文字节数
+    unsigned long long sniffs;       // 读取文件头判断是否加密的次数
+    unsigned long long sniff_ns;     // 读取、检查文件头的耗时
+    unsigned long long read_ns;      // 读取密文的耗时
+    unsigned long long decrypt_ns;   // 校验、解密和写入内存文件的耗时
+} d_decrypt_stats;
+
+/* 流式加密的状态，见d_encryptor_new */
+typedef struct d_encryptor d_encryptor;
+
+/**
+ * 线程安全: 以下函数都可以在释放GIL之后被多个线程同时调用。
+ * 每次解密只使用栈上和本次调用分配的内存，解密结果写入匿名内存文件，不在磁盘上创建临时文件；
+ * 密钥和EVP上下文模板只初始化一次(pthread_once)，之后只读，每次解密复制一份，读取时不加锁；
+ * 唯一共享的可变状态是解密结果缓存，由一个互斥锁保护，锁内不做解密和大块内存复制。
+ */
 FILE* d_open(char *filename, const char *modes);
 int   dopen(const char *pathname, int flags, mode_t mode);
+int   d_decrypt_fd(int fd, int cloexec);
+int   d_is_encrypted(int fd);
+int   d_read_decrypted(int fd, unsigned char **plain, size_t *plain_len);
+void  d_free_decrypted(unsigned char *plain, size_t plain_len);
+int   d_map_decrypted(int fd, unsigned char **addr, size_t *len, size_t *map_len);
+void  d_unmap_decrypted(unsigned char *addr, size_t map_len);
+int   d_decrypt_buffer(const unsigned char *data, size_t len,
+                       unsigned char **plain, size_t *plain_len);
+int   d_encrypt_buffer(const unsigned char *plain, size_t len,
+                       unsigned char **data, size_t *data_len);
+int   d_encrypt_file(const char *src, const char *dst);
+d_encryptor *d_encryptor_new(size_t len, unsigned char *header);
+int   d_encryptor_update(d_encryptor *enc, const unsigned char *in, size_t len,
+                         unsigned char *out);
+int   d_encryptor_final(d_encryptor *enc, unsigned char *tag);
+void  d_encryptor_free(d_encryptor *enc);
+int   d_set_decrypt_paths(const char *spec);
+int   d_decrypt_allowed(const char *pathname);
+void  d_cache_get_info(d_cache_info *info);
+void  d_cache_set_budget(size_t budget);
+void  d_set_decrypt_threads(int n);
+int   d_get_decrypt_threads(void);
+void  d_get_decrypt_stats(d_decrypt_stats *stats);
+void  d_get_thread_decrypt_stats(d_decrypt_stats *stats);
 
 #endif
\ No newline at end of file
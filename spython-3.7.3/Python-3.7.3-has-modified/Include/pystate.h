@@ -37,6 +37,7 @@ typedef struct {
     int faulthandler;       /* PYTHONFAULTHANDLER, -X faulthandler */
     int tracemalloc;        /* PYTHONTRACEMALLOC, -X tracemalloc=N */
     int import_time;        /* PYTHONPROFILEIMPORTTIME, -X importtime */
+    int decrypt_time;       /* PYTHONDECRYPTTIME, -X decrypttime */
     int show_ref_count;     /* -X showrefcount */
     int show_alloc_count;   /* -X showalloccount */
     int dump_refs;          /* PYTHONDUMPREFS */
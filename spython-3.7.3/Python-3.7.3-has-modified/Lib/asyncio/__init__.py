@@ -13,6 +13,7 @@ from .locks import *
 from .protocols import *
 from .runners import *
 from .queues import *
+from .resolvers import *
 from .streams import *
 from .subprocess import *
 from .tasks import *
@@ -30,6 +31,7 @@ __all__ = (base_events.__all__ +
            protocols.__all__ +
            runners.__all__ +
            queues.__all__ +
+           resolvers.__all__ +
            streams.__all__ +
            subprocess.__all__ +
            tasks.__all__ +
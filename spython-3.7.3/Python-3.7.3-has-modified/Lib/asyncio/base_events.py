@@ -364,6 +364,7 @@ class BaseEventLoop(events.AbstractEventLoop):
         self._ready = collections.deque()
         self._scheduled = []
         self._default_executor = None
+        self._resolver = None
         self._internal_fds = 0
         # Identifier of the thread running the event loop, or None if the
         # event loop is not running
@@ -778,8 +779,26 @@ class BaseEventLoop(events.AbstractEventLoop):
             logger.debug(msg)
         return addrinfo
 
+    def set_resolver(self, resolver):
+        """Set the resolver used by getaddrinfo().
+
+        resolver is an asyncio.AbstractResolver, or None to call
+        socket.getaddrinfo() in the default executor.  The loop does not
+        close the resolver.
+        """
+        self._resolver = resolver
+
+    def get_resolver(self):
+        """Return the resolver used by getaddrinfo(), or None."""
+        return self._resolver
+
     async def getaddrinfo(self, host, port, *,
                           family=0, type=0, proto=0, flags=0):
+        if self._resolver is not None:
+            return await self._resolver.getaddrinfo(
+                host, port, family=family, type=type, proto=proto,
+                flags=flags)
+
         if self._debug:
             getaddr_func = self._getaddrinfo_debug
         else:
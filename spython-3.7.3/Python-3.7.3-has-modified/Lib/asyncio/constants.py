@@ -15,6 +15,11 @@ DEBUG_STACK_DEPTH = 10
 # The default timeout matches that of Nginx.
 SSL_HANDSHAKE_TIMEOUT = 60.0
 
+# Selector event loops run TLS connections through a transport doing
+# SSL_read()/SSL_write() on the socket instead of sslproto.SSLProtocol
+# and its MemoryBIO pair.  start_tls() always uses SSLProtocol.
+SSL_SOCKET_TRANSPORT = True
+
 # Used in sendfile fallback code.  We use fallback for platforms
 # that don't support sendfile, or for TLS connections.
 SENDFILE_FALLBACK_READBUFFER_SIZE = 1024 * 256
@@ -291,6 +291,12 @@ class AbstractEventLoop:
     def set_default_executor(self, executor):
         raise NotImplementedError
 
+    def set_resolver(self, resolver):
+        raise NotImplementedError
+
+    def get_resolver(self):
+        raise NotImplementedError
+
     # Network I/O methods returning Futures.
 
     async def getaddrinfo(self, host, port, *,
@@ -157,6 +157,8 @@ class _ProactorReadPipeTransport(_ProactorBasePipeTransport,
                                  transports.ReadTransport):
     """Transport for read pipes."""
 
+    max_size = 32 * 1024  # Buffer size passed to recv().
+
     def __init__(self, loop, sock, protocol, waiter=None,
                  extra=None, server=None):
         self._pending_data = None
@@ -271,7 +273,8 @@ class _ProactorReadPipeTransport(_ProactorBasePipeTransport,
 
             if not self._paused:
                 # reschedule a new read
-                self._read_fut = self._loop._proactor.recv(self._sock, 32768)
+                self._read_fut = self._loop._proactor.recv(self._sock,
+                                                           self.max_size)
         except ConnectionAbortedError as exc:
             if not self._closing:
                 self._fatal_error(exc, 'Fatal read error on pipe transport')
@@ -0,0 +1,597 @@
+"""Pluggable host name resolution for event loops.
+
+By default loop.getaddrinfo() calls socket.getaddrinfo() in the default
+executor.  A resolver set with loop.set_resolver() is used instead:
+
+    loop.set_resolver(asyncio.CachingResolver(asyncio.DnsResolver()))
+
+ThreadedResolver does what the loop does by default.  CachingResolver
+keeps the results of another resolver for their TTL, remembers names that
+do not resolve, and lets concurrent lookups of the same name share one
+query.  DnsResolver answers from /etc/hosts and queries the nameservers
+of /etc/resolv.conf over UDP on the event loop itself, without threads.
+"""
+
+__all__ = ('AbstractResolver', 'ThreadedResolver', 'CachingResolver',
+           'DnsResolver')
+
+import collections
+import os
+import random
+import socket
+import struct
+
+from . import events
+from . import futures
+from . import protocols
+from . import tasks
+
+
+# getaddrinfo() errors that mean the name does not exist, as opposed to a
+# temporary failure; only those are cached by CachingResolver.
+_NEGATIVE_ERRORS = frozenset(
+    getattr(socket, name) for name in ('EAI_NONAME', 'EAI_NODATA')
+    if hasattr(socket, name))
+
+
+class AbstractResolver:
+    """Abstract base class for the resolvers used by loop.getaddrinfo()."""
+
+    async def getaddrinfo(self, host, port, *,
+                          family=0, type=0, proto=0, flags=0):
+        """Return a list of 5-tuples like socket.getaddrinfo()."""
+        infos, ttl = await self.resolve(host, port, family, type, proto,
+                                        flags)
+        return infos
+
+    async def resolve(self, host, port, family, type, proto, flags):
+        """Look up host and port.
+
+        Return a tuple (infos, ttl): infos is the list getaddrinfo()
+        returns, ttl the number of seconds it may be cached for, or None
+        if the resolver does not know.  Raise socket.gaierror if the name
+        does not resolve.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the resources held by the resolver."""
+
+
+class ThreadedResolver(AbstractResolver):
+    """Call socket.getaddrinfo() in the default executor of the loop."""
+
+    async def resolve(self, host, port, family, type, proto, flags):
+        loop = events.get_running_loop()
+        infos = await loop.run_in_executor(
+            None, socket.getaddrinfo, host, port, family, type, proto, flags)
+        return infos, None
+
+
+class CachingResolver(AbstractResolver):
+    """Cache the results of another resolver, ThreadedResolver by default.
+
+    A result is kept for the TTL the resolver reports, at most max_ttl
+    seconds, or for ttl seconds if it reports none.  Names that do not
+    exist are remembered for negative_ttl seconds; temporary failures are
+    not cached.  Lookups with the same arguments made while a query is
+    running wait for that query instead of starting another one.  At most
+    maxsize results are kept, the least recently used are dropped first.
+
+    A CachingResolver must only be used by one event loop.
+    """
+
+    def __init__(self, resolver=None, *, ttl=60, max_ttl=3600,
+                 negative_ttl=5, maxsize=1024):
+        if resolver is None:
+            resolver = ThreadedResolver()
+        self._resolver = resolver
+        self._ttl = ttl
+        self._max_ttl = max_ttl
+        self._negative_ttl = negative_ttl
+        self._maxsize = maxsize
+        # key -> (expiry time, infos, exception)
+        self._cache = collections.OrderedDict()
+        # key -> future of the running query
+        self._pending = {}
+        self._hits = 0
+        self._misses = 0
+        self._shared = 0
+
+    def __repr__(self):
+        return (f'<{self.__class__.__name__} resolver={self._resolver!r} '
+                f'entries={len(self._cache)}>')
+
+    def cache_info(self):
+        """Return a dict of statistics: hits, misses, shared lookups
+        (waiting for a running query), entries and maxsize."""
+        return {'hits': self._hits, 'misses': self._misses,
+                'shared': self._shared, 'entries': len(self._cache),
+                'maxsize': self._maxsize}
+
+    def clear(self):
+        """Forget all cached results."""
+        self._cache.clear()
+
+    def close(self):
+        self.clear()
+        self._resolver.close()
+
+    async def resolve(self, host, port, family, type, proto, flags):
+        loop = events.get_running_loop()
+        key = (host, port, family, type, proto, flags)
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires, infos, exc = entry
+            now = loop.time()
+            if expires > now:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                if exc is not None:
+                    raise socket.gaierror(*exc.args)
+                return list(infos), expires - now
+            del self._cache[key]
+
+        waiter = self._pending.get(key)
+        if waiter is None:
+            self._misses += 1
+            waiter = self._pending[key] = loop.create_future()
+            loop.create_task(self._lookup(key, waiter))
+        else:
+            self._shared += 1
+        # A cancelled caller must not cancel the query the others wait for.
+        infos, ttl = await tasks.shield(waiter)
+        return list(infos), ttl
+
+    async def _lookup(self, key, waiter):
+        loop = events.get_running_loop()
+        try:
+            infos, ttl = await self._resolver.resolve(*key)
+        except futures.CancelledError:
+            waiter.cancel()
+            raise
+        except socket.gaierror as exc:
+            if exc.errno in _NEGATIVE_ERRORS and self._negative_ttl > 0:
+                self._store(key, loop.time() + self._negative_ttl, None, exc)
+            waiter.set_exception(exc)
+        except Exception as exc:
+            waiter.set_exception(exc)
+        except BaseException as exc:
+            waiter.set_exception(exc)
+            raise
+        else:
+            if ttl is None:
+                ttl = self._ttl
+            ttl = min(ttl, self._max_ttl)
+            if ttl > 0:
+                self._store(key, loop.time() + ttl, tuple(infos), None)
+            waiter.set_result((infos, ttl))
+        finally:
+            del self._pending[key]
+
+    def _store(self, key, expires, infos, exc):
+        if self._maxsize <= 0:
+            return
+        self._cache[key] = (expires, infos, exc)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+
+
+# DNS constants, RFC 1035 and RFC 3596.
+_TYPE_A = 1
+_TYPE_CNAME = 5
+_TYPE_AAAA = 28
+_CLASS_IN = 1
+_RCODE_NXDOMAIN = 3
+_FLAG_QR = 0x8000
+_FLAG_TC = 0x0200
+_FLAG_RD = 0x0100
+_HEADER = struct.Struct('!HHHHHH')
+_RR = struct.Struct('!HHIH')
+_MAX_CNAMES = 8
+
+# Seconds between checks whether the hosts file changed.
+_HOSTS_CHECK_INTERVAL = 5
+
+
+class _Truncated(Exception):
+    """The answer did not fit into a UDP datagram."""
+
+
+def _encode_name(name):
+    # name is ASCII (IDNA encoded), without the trailing dot.
+    parts = []
+    for label in name.split(b'.'):
+        if not 0 < len(label) < 64:
+            raise socket.gaierror(socket.EAI_NONAME,
+                                  'Name or service not known')
+        parts.append(bytes([len(label)]) + label)
+    parts.append(b'\0')
+    data = b''.join(parts)
+    if len(data) > 255:
+        raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+    return data
+
+
+def _read_name(data, offset):
+    """Return (lowercase name, offset after it) of a possibly compressed
+    name at offset."""
+    labels = []
+    end = None
+    for _ in range(128):
+        length = data[offset]
+        if length & 0xc0 == 0xc0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3f) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            return b'.'.join(labels).lower(), offset if end is None else end
+        labels.append(data[offset:offset + length])
+        offset += length
+    raise ValueError('compression loop in name')
+
+
+def _build_query(query_id, name, qtype):
+    return (_HEADER.pack(query_id, _FLAG_RD, 1, 0, 0, 0) +
+            _encode_name(name) + struct.pack('!HH', qtype, _CLASS_IN))
+
+
+def _parse_answer(data, query_id, name, qtype):
+    """Return (rcode, records) of a reply to _build_query(); records is a
+    list of (owner, type, ttl, rdata) from the answer section.  Raise
+    ValueError if data is not a reply to this query."""
+    (reply_id, flags, qdcount, ancount,
+     nscount, arcount) = _HEADER.unpack_from(data)
+    if reply_id != query_id or not flags & _FLAG_QR or qdcount != 1:
+        raise ValueError('not a reply to the query')
+    if flags & _FLAG_TC:
+        raise _Truncated
+    owner, offset = _read_name(data, _HEADER.size)
+    rtype, rclass = struct.unpack_from('!HH', data, offset)
+    if owner != name.lower() or rtype != qtype or rclass != _CLASS_IN:
+        raise ValueError('reply to another question')
+    offset += 4
+    records = []
+    for _ in range(ancount):
+        owner, offset = _read_name(data, offset)
+        rtype, rclass, ttl, rdlength = _RR.unpack_from(data, offset)
+        offset += _RR.size
+        rdata = data[offset:offset + rdlength]
+        if len(rdata) != rdlength:
+            raise ValueError('truncated record')
+        if rtype == _TYPE_CNAME:
+            rdata = _read_name(data, offset)[0]
+        offset += rdlength
+        if rclass == _CLASS_IN:
+            records.append((owner, rtype, ttl, rdata))
+    return flags & 0xf, records
+
+
+def _addresses(records, name, qtype):
+    """Follow the CNAME chain of name through records.
+
+    Return (addresses, canonical name, smallest TTL of the records used).
+    """
+    family, size = ((socket.AF_INET, 4) if qtype == _TYPE_A
+                    else (socket.AF_INET6, 16))
+    name = name.lower()
+    ttl = None
+    for _ in range(_MAX_CNAMES):
+        for owner, rtype, rttl, rdata in records:
+            if owner == name and rtype == _TYPE_CNAME:
+                name = rdata
+                ttl = rttl if ttl is None else min(ttl, rttl)
+                break
+        else:
+            break
+    addresses = []
+    for owner, rtype, rttl, rdata in records:
+        if owner == name and rtype == qtype and len(rdata) == size:
+            addresses.append((family, socket.inet_ntop(family, rdata)))
+            ttl = rttl if ttl is None else min(ttl, rttl)
+    return addresses, name, ttl
+
+
+class _DnsQueryProtocol(protocols.DatagramProtocol):
+
+    def __init__(self, query_id, waiter):
+        self._query_id = query_id
+        self._waiter = waiter
+
+    def datagram_received(self, data, addr):
+        if (not self._waiter.done() and len(data) >= _HEADER.size and
+                struct.unpack_from('!H', data)[0] == self._query_id):
+            self._waiter.set_result(data)
+
+    def error_received(self, exc):
+        if not self._waiter.done():
+            self._waiter.set_exception(exc)
+
+    def connection_lost(self, exc):
+        if not self._waiter.done():
+            self._waiter.set_exception(
+                exc or ConnectionError('DNS query socket closed'))
+
+
+def _parse_hosts(data):
+    """Return {lowercase name: [(family, address), ...]} of a hosts file."""
+    hosts = {}
+    for line in data.splitlines():
+        fields = line.split(b'#', 1)[0].split()
+        if len(fields) < 2:
+            continue
+        try:
+            address = fields[0].decode('ascii')
+        except UnicodeDecodeError:
+            continue
+        family = socket.AF_INET6 if ':' in address else socket.AF_INET
+        try:
+            socket.inet_pton(family, address.partition('%')[0])
+        except (OSError, ValueError):
+            continue
+        for name in fields[1:]:
+            entries = hosts.setdefault(name.lower(), [])
+            if (family, address) not in entries:
+                entries.append((family, address))
+    return hosts
+
+
+def _parse_resolv_conf(data):
+    """Return (nameservers, search domains, options) of resolv.conf."""
+    nameservers = []
+    search = []
+    options = {}
+    for line in data.splitlines():
+        fields = line.split(b'#', 1)[0].split(b';', 1)[0].split()
+        if not fields:
+            continue
+        if fields[0] == b'nameserver' and len(fields) > 1:
+            nameservers.append(fields[1].decode('ascii', 'replace'))
+        elif fields[0] in (b'search', b'domain'):
+            # The last of them wins.
+            search = [domain.rstrip(b'.').lower() for domain in fields[1:]]
+        elif fields[0] == b'options':
+            for option in fields[1:]:
+                key, sep, value = option.partition(b':')
+                if sep and value.isdigit():
+                    options[key.decode('ascii', 'replace')] = int(value)
+    return nameservers, search, options
+
+
+def _is_numeric(host):
+    if isinstance(host, bytes):
+        host = host.decode('ascii', 'replace')
+    host = host.partition('%')[0]
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except (OSError, ValueError):
+            pass
+    return False
+
+
+class DnsResolver(AbstractResolver):
+    """Resolve names on the event loop: /etc/hosts, then DNS over UDP.
+
+    Names found in hosts_file are answered from it; the file is read
+    again when it changes.  Other names are looked up by sending A and/or
+    AAAA queries over UDP to the nameservers, each query from its own
+    socket with a random ID.  nameservers, search domains, timeout (per
+    query, in seconds) and attempts default to what resolv_conf says.
+    A nameserver is an address string or an (address, port) tuple.
+
+    Numeric hosts are converted without any lookup.  Names the resolver
+    can not handle (a truncated answer, an unusual address family, no
+    nameservers) are passed to socket.getaddrinfo() in the default
+    executor.  Results carry the smallest TTL of the DNS records they
+    came from; hosts file results have no TTL.
+    """
+
+    def __init__(self, nameservers=None, *, search=None, timeout=None,
+                 attempts=None, hosts_file='/etc/hosts',
+                 resolv_conf='/etc/resolv.conf'):
+        self._nameservers = nameservers
+        self._search = search
+        self._timeout = timeout
+        self._attempts = attempts
+        self._ndots = 1
+        self._hosts_file = hosts_file
+        self._resolv_conf = resolv_conf
+        self._configured = False
+        self._hosts = {}
+        self._hosts_mtime = None
+        self._hosts_checked = None
+        self._fallback = ThreadedResolver()
+
+    def __repr__(self):
+        return (f'<{self.__class__.__name__} '
+                f'nameservers={self._nameservers!r}>')
+
+    def _configure(self):
+        nameservers, search, options = [], [], {}
+        if self._resolv_conf is not None:
+            try:
+                with open(self._resolv_conf, 'rb') as f:
+                    nameservers, search, options = _parse_resolv_conf(
+                        f.read())
+            except OSError:
+                pass
+        if self._nameservers is None:
+            self._nameservers = nameservers
+        self._nameservers = [
+            (server, 53) if isinstance(server, str) else tuple(server)
+            for server in self._nameservers]
+        if self._search is None:
+            self._search = search
+        self._search = [domain.encode('idna') if isinstance(domain, str)
+                        else domain for domain in self._search]
+        if self._timeout is None:
+            self._timeout = options.get('timeout', 5)
+        if self._attempts is None:
+            self._attempts = options.get('attempts', 2)
+        self._ndots = options.get('ndots', 1)
+        self._configured = True
+
+    def _lookup_hosts(self, name, now):
+        if self._hosts_file is None:
+            return []
+        if (self._hosts_checked is None or
+                now - self._hosts_checked >= _HOSTS_CHECK_INTERVAL):
+            self._hosts_checked = now
+            try:
+                mtime = os.stat(self._hosts_file).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._hosts_mtime:
+                self._hosts_mtime = mtime
+                self._hosts = {}
+                if mtime is not None:
+                    try:
+                        with open(self._hosts_file, 'rb') as f:
+                            self._hosts = _parse_hosts(f.read())
+                    except OSError:
+                        pass
+        return self._hosts.get(name.lower(), [])
+
+    def _candidates(self, name):
+        # Like the resolver of the C library: with fewer than ndots dots
+        # the search domains come first, a trailing dot disables them.
+        if name.endswith(b'.'):
+            return [name.rstrip(b'.')]
+        searched = [name + b'.' + domain for domain in self._search]
+        if name.count(b'.') >= self._ndots:
+            return [name] + searched
+        return searched + [name]
+
+    async def resolve(self, host, port, family, type, proto, flags):
+        loop = events.get_running_loop()
+        if (host is None or flags & socket.AI_NUMERICHOST or
+                _is_numeric(host)):
+            # No lookup: getaddrinfo() of an address does not block.
+            infos = socket.getaddrinfo(host, port, family, type, proto,
+                                       flags | socket.AI_NUMERICHOST)
+            return infos, None
+        if not self._configured:
+            self._configure()
+        if family not in (socket.AF_UNSPEC, socket.AF_INET, socket.AF_INET6):
+            return await self._fallback.resolve(host, port, family, type,
+                                                proto, flags)
+        if isinstance(host, str):
+            name = host.encode('idna')
+        else:
+            name = bytes(host)
+
+        addresses = [(fam, address) for fam, address
+                     in self._lookup_hosts(name.rstrip(b'.'), loop.time())
+                     if family in (socket.AF_UNSPEC, fam)]
+        canonname = name.rstrip(b'.')
+        ttl = None
+        if not addresses:
+            if not self._nameservers:
+                return await self._fallback.resolve(host, port, family, type,
+                                                    proto, flags)
+            try:
+                addresses, canonname, ttl = await self._query_name(name,
+                                                                   family)
+            except _Truncated:
+                return await self._fallback.resolve(host, port, family, type,
+                                                    proto, flags)
+
+        infos = []
+        for fam, address in addresses:
+            infos.extend(socket.getaddrinfo(
+                address, port, fam, type, proto,
+                (flags & ~socket.AI_CANONNAME) | socket.AI_NUMERICHOST))
+        if infos and flags & socket.AI_CANONNAME:
+            fam, stype, sproto, _, sockaddr = infos[0]
+            infos[0] = (fam, stype, sproto,
+                        canonname.decode('ascii', 'replace'), sockaddr)
+        return infos, ttl
+
+    async def _query_name(self, name, family):
+        """Return (addresses, canonical name, TTL) of name from DNS."""
+        qtypes = []
+        if family in (socket.AF_UNSPEC, socket.AF_INET):
+            qtypes.append(_TYPE_A)
+        if family in (socket.AF_UNSPEC, socket.AF_INET6):
+            qtypes.append(_TYPE_AAAA)
+        temporary = False
+        for candidate in self._candidates(name):
+            results = await tasks.gather(
+                *[self._query(candidate, qtype) for qtype in qtypes],
+                return_exceptions=True)
+            addresses = []
+            canonname = candidate
+            ttl = None
+            for result in results:
+                if isinstance(result, _Truncated):
+                    raise result
+                if isinstance(result, socket.gaierror):
+                    if result.errno not in _NEGATIVE_ERRORS:
+                        temporary = True
+                    continue
+                if isinstance(result, BaseException):
+                    raise result
+                found, cname, rttl = result
+                if found:
+                    if not addresses:
+                        canonname = cname
+                    addresses.extend(found)
+                    ttl = rttl if ttl is None else min(ttl, rttl)
+            if addresses:
+                return addresses, canonname, ttl
+        if temporary:
+            raise socket.gaierror(socket.EAI_AGAIN,
+                                  'Temporary failure in name resolution')
+        raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+
+    async def _query(self, name, qtype):
+        """Query the nameservers for the records of one type.
+
+        Return (addresses, canonical name, TTL); raise socket.gaierror if
+        the name or the records do not exist or no nameserver answered.
+        """
+        query_id = random.getrandbits(16)
+        packet = _build_query(query_id, name, qtype)
+        for attempt in range(self._attempts):
+            for server in self._nameservers:
+                try:
+                    data = await self._send(server, packet, query_id)
+                    rcode, records = _parse_answer(data, query_id, name,
+                                                   qtype)
+                except (OSError, ValueError, IndexError, struct.error,
+                        futures.TimeoutError):
+                    continue
+                if rcode == _RCODE_NXDOMAIN:
+                    raise socket.gaierror(socket.EAI_NONAME,
+                                          'Name or service not known')
+                if rcode != 0:
+                    # SERVFAIL, REFUSED...: ask the next nameserver.
+                    continue
+                addresses, cname, ttl = _addresses(records, name, qtype)
+                if not addresses:
+                    raise socket.gaierror(socket.EAI_NONAME,
+                                          'No address associated with name')
+                return addresses, cname, ttl
+        raise socket.gaierror(socket.EAI_AGAIN,
+                              'Temporary failure in name resolution')
+
+    async def _send(self, server, packet, query_id):
+        loop = events.get_running_loop()
+        family = socket.AF_INET6 if ':' in server[0] else socket.AF_INET
+        waiter = loop.create_future()
+        # The socket is connected, so it only receives datagrams from the
+        # server.  The address is numeric and does not go through
+        # loop.getaddrinfo() and so this resolver again.
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: _DnsQueryProtocol(query_id, waiter),
+            remote_addr=server, family=family)
+        try:
+            transport.sendto(packet)
+            return await tasks.wait_for(waiter, self._timeout)
+        finally:
+            transport.close()
@@ -9,6 +9,8 @@ __all__ = 'BaseSelectorEventLoop',
 import collections
 import errno
 import functools
+import itertools
+import os
 import selectors
 import socket
 import warnings
@@ -27,6 +29,19 @@ from . import sslproto
 from . import transports
 from .log import logger
 
+# Socket transports flush their write buffer with a single sendmsg()
+# (scatter/gather) call of at most _IOV_MAX buffers.  Immutable data of at
+# least _ZERO_COPY_SIZE bytes is buffered by reference; smaller writes are
+# copied and coalesced, which is cheaper than one iovec each.
+_ZERO_COPY_SIZE = 16 * 1024
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = -1
+if _IOV_MAX <= 0:
+    _IOV_MAX = 16  # _XOPEN_IOV_MAX, the POSIX minimum
+
 
 def _test_selector_event(selector, fd, event):
     # Test if the selector is monitoring 'event' events
@@ -65,6 +80,11 @@ class BaseSelectorEventLoop(base_events.BaseEventLoop):
             *, server_side=False, server_hostname=None,
             extra=None, server=None,
             ssl_handshake_timeout=constants.SSL_HANDSHAKE_TIMEOUT):
+        if constants.SSL_SOCKET_TRANSPORT:
+            return _SelectorSslTransport(
+                self, rawsock, protocol, sslcontext, waiter,
+                server_side, server_hostname, extra, server,
+                ssl_handshake_timeout=ssl_handshake_timeout)
         ssl_protocol = sslproto.SSLProtocol(
                 self, protocol, sslcontext, waiter,
                 server_side, server_hostname,
@@ -710,10 +730,15 @@ class _SelectorSocketTransport(_SelectorTransport):
     _start_tls_compatible = True
     _sendfile_compatible = constants._SendfileMode.TRY_NATIVE
 
+    # The write buffer is a deque of bytes, read-only memoryviews and
+    # bytearrays, see _append_buffer().
+    _buffer_factory = collections.deque
+
     def __init__(self, loop, sock, protocol, waiter=None,
                  extra=None, server=None):
 
         self._read_ready_cb = None
+        self._buffer_size = 0
         super().__init__(loop, sock, protocol, extra, server)
         self._eof = False
         self._paused = False
@@ -861,34 +886,138 @@ class _SelectorSocketTransport(_SelectorTransport):
                 self._fatal_error(exc, 'Fatal write error on socket transport')
                 return
             else:
-                data = data[n:]
+                if n == len(data):
+                    return
+                data = memoryview(data).cast('B')[n:]
                 if not data:
                     return
             # Not all was written; register write handler.
             self._loop._add_writer(self._sock_fd, self._write_ready)
 
         # Add it to the buffer.
-        self._buffer.extend(data)
+        self._append_buffer(data)
+        self._maybe_pause_protocol()
+
+    def writelines(self, list_of_data):
+        # Large items are buffered as they are, runs of small ones are
+        # joined first.
+        list_of_data = list(list_of_data)
+        if sum(map(len, list_of_data)) < _ZERO_COPY_SIZE:
+            # Fast path: no large items.
+            self.write(b''.join(list_of_data))
+            return
+        items = []
+        small = []
+        for data in list_of_data:
+            if len(data) < _ZERO_COPY_SIZE:
+                # b''.join() checks the type.
+                small.append(data)
+            elif not isinstance(data, (bytes, bytearray, memoryview)):
+                raise TypeError(f'data argument must be a bytes-like object, '
+                                f'not {type(data).__name__!r}')
+            else:
+                if small:
+                    items.append(b''.join(small))
+                    small = []
+                items.append(data)
+        if small:
+            items.append(b''.join(small))
+        if len(items) == 1:
+            self.write(items[0])
+            return
+        if self._eof:
+            raise RuntimeError('Cannot call writelines() after write_eof()')
+        if self._empty_waiter is not None:
+            raise RuntimeError('unable to writelines; sendfile is in progress')
+
+        if self._conn_lost:
+            if self._conn_lost >= constants.LOG_THRESHOLD_FOR_CONNLOST_WRITES:
+                logger.warning('socket.send() raised exception.')
+            self._conn_lost += 1
+            return
+
+        was_empty = not self._buffer
+        for data in items:
+            if data:
+                self._append_buffer(data)
+        if was_empty and self._buffer:
+            # Optimization: try to send now, with one sendmsg() call.
+            try:
+                n = self._send_buffer()
+            except (BlockingIOError, InterruptedError):
+                pass
+            except Exception as exc:
+                self._fatal_error(exc, 'Fatal write error on socket transport')
+                return
+            else:
+                self._consume_buffer(n)
+                if not self._buffer:
+                    return
+            # Not all was written; register write handler.
+            self._loop._add_writer(self._sock_fd, self._write_ready)
         self._maybe_pause_protocol()
 
+    def _append_buffer(self, data):
+        # Keep a reference to large immutable data.  Anything else is
+        # copied to a bytearray at the end of the buffer, so that the
+        # caller may reuse it and small writes are sent as one buffer.
+        buffer = self._buffer
+        if type(data) is memoryview:
+            data = data.cast('B')
+        if len(data) >= _ZERO_COPY_SIZE and (
+                type(data) is bytes or
+                type(data) is memoryview and data.readonly):
+            buffer.append(data)
+        elif buffer and type(buffer[-1]) is bytearray:
+            buffer[-1].extend(data)
+        else:
+            buffer.append(bytearray(data))
+        self._buffer_size += len(data)
+
+    def _send_buffer(self):
+        # Send the head of the buffer; return the number of bytes sent.
+        if _HAS_SENDMSG and len(self._buffer) > 1:
+            return self._sock.sendmsg(itertools.islice(self._buffer, _IOV_MAX))
+        return self._sock.send(self._buffer[0])
+
+    def _consume_buffer(self, nbytes):
+        if not nbytes:
+            return
+        self._buffer_size -= nbytes
+        buffer = self._buffer
+        if not self._buffer_size:
+            buffer.clear()
+            return
+        while nbytes:
+            data = buffer[0]
+            if len(data) > nbytes:
+                # Partial write: keep the rest of this buffer.
+                if type(data) is bytearray:
+                    del data[:nbytes]
+                else:
+                    buffer[0] = memoryview(data)[nbytes:]
+                break
+            buffer.popleft()
+            nbytes -= len(data)
+
     def _write_ready(self):
         assert self._buffer, 'Data should not be empty'
 
         if self._conn_lost:
             return
         try:
-            n = self._sock.send(self._buffer)
+            n = self._send_buffer()
         except (BlockingIOError, InterruptedError):
             pass
         except Exception as exc:
             self._loop._remove_writer(self._sock_fd)
             self._buffer.clear()
+            self._buffer_size = 0
             self._fatal_error(exc, 'Fatal write error on socket transport')
             if self._empty_waiter is not None:
                 self._empty_waiter.set_exception(exc)
         else:
-            if n:
-                del self._buffer[:n]
+            self._consume_buffer(n)
             self._maybe_resume_protocol()  # May append to buffer.
             if not self._buffer:
                 self._loop._remove_writer(self._sock_fd)
@@ -909,6 +1038,15 @@ class _SelectorSocketTransport(_SelectorTransport):
     def can_write_eof(self):
         return True
 
+    def get_write_buffer_size(self):
+        return self._buffer_size
+
+    def _force_close(self, exc):
+        if not self._conn_lost:
+            # The buffer is cleared.
+            self._buffer_size = 0
+        super()._force_close(exc)
+
     def _call_connection_lost(self, exc):
         super()._call_connection_lost(exc)
         if self._empty_waiter is not None:
@@ -927,6 +1065,465 @@ class _SelectorSocketTransport(_SelectorTransport):
         self._empty_waiter = None
 
 
+def _is_ssl_eof(exc):
+    # A TCP EOF without close_notify.  OpenSSL 3 reports it as a plain
+    # SSLError, with a reason code missing from the error tables of _ssl.
+    return (isinstance(exc, ssl.SSLEOFError) or
+            isinstance(exc, ssl.SSLError) and
+            'unexpected eof while reading' in str(exc))
+
+
+class _SelectorSslTransport(_SelectorTransport):
+    """SSL transport doing TLS directly on the socket.
+
+    The ssl module's C socket object reads and writes records on the file
+    descriptor itself, so there is no MemoryBIO pair and no Python-level
+    record pumping as in sslproto.SSLProtocol.  The behaviour seen by the
+    protocol is the same: connection_made() is called once the handshake
+    has completed, a close_notify from the peer closes the transport and
+    close() sends a close_notify after flushing the write buffer.
+    """
+
+    _sendfile_compatible = constants._SendfileMode.FALLBACK
+
+    # Plaintext asked from each SSL_read() call: a whole TLS record.
+    read_size = 16 * 1024
+
+    def __init__(self, loop, rawsock, protocol, sslcontext, waiter=None,
+                 server_side=False, server_hostname=None,
+                 extra=None, server=None,
+                 ssl_handshake_timeout=constants.SSL_HANDSHAKE_TIMEOUT):
+        if ssl is None:
+            raise RuntimeError('stdlib ssl module not available')
+
+        if ssl_handshake_timeout is None:
+            ssl_handshake_timeout = constants.SSL_HANDSHAKE_TIMEOUT
+        elif ssl_handshake_timeout <= 0:
+            raise ValueError(
+                f"ssl_handshake_timeout should be a positive number, "
+                f"got {ssl_handshake_timeout}")
+
+        if not sslcontext:
+            sslcontext = sslproto._create_transport_context(
+                server_side, server_hostname)
+
+        self._session_established = False
+        self._read_ready_cb = None
+        super().__init__(loop, rawsock, protocol, extra, server)
+        self._server_side = server_side
+        if server_hostname and not server_side:
+            self._server_hostname = server_hostname
+        else:
+            self._server_hostname = None
+        self._sslcontext = sslcontext
+        self._extra['sslcontext'] = sslcontext
+        self._waiter = waiter
+        self._ssl_handshake_timeout = ssl_handshake_timeout
+        self._handshake_timeout_handle = None
+        self._ssl_object = None
+        self._sslobj = None
+        self._paused = False
+        self._read_wants_write = False
+        self._write_wants_read = False
+        self._close_notify = False
+
+        base_events._set_nodelay(self._sock)
+
+        self._loop.call_soon(self._start_handshake)
+
+    def set_protocol(self, protocol):
+        if isinstance(protocol, protocols.BufferedProtocol):
+            self._read_ready_cb = self._read_ready__get_buffer
+        else:
+            self._read_ready_cb = self._read_ready__data_received
+
+        super().set_protocol(protocol)
+        # connection_made() is only called once the handshake succeeded.
+        self._protocol_connected = self._session_established
+
+    def _wakeup_waiter(self, exc=None):
+        if self._waiter is None:
+            return
+        if not self._waiter.cancelled():
+            if exc is not None:
+                self._waiter.set_exception(exc)
+            else:
+                self._waiter.set_result(None)
+        self._waiter = None
+
+    def _start_handshake(self):
+        if self._conn_lost:
+            return
+        if self._loop.get_debug():
+            logger.debug("%r starts SSL handshake", self)
+        self._handshake_start_time = self._loop.time()
+
+        self._ssl_object = ssl.SSLObject.__new__(ssl.SSLObject)
+        try:
+            self._sslobj = self._sslcontext._wrap_socket(
+                self._sock, self._server_side,
+                self._sslcontext._encode_hostname(self._server_hostname),
+                owner=self._ssl_object, session=None)
+        except Exception as exc:
+            self._fatal_error(exc, 'SSL handshake failed')
+            return
+        self._ssl_object._sslobj = self._sslobj
+
+        self._handshake_timeout_handle = self._loop.call_later(
+            self._ssl_handshake_timeout, self._check_handshake_timeout)
+        self._on_handshake()
+
+    def _check_handshake_timeout(self):
+        if not self._session_established:
+            msg = (
+                f"SSL handshake is taking longer than "
+                f"{self._ssl_handshake_timeout} seconds: "
+                f"aborting the connection"
+            )
+            self._fatal_error(ConnectionAbortedError(msg))
+
+    def _on_handshake(self):
+        if self._conn_lost:
+            return
+        try:
+            self._sslobj.do_handshake()
+        except ssl.SSLWantReadError:
+            self._loop._remove_writer(self._sock_fd)
+            self._loop._add_reader(self._sock_fd, self._on_handshake)
+            return
+        except ssl.SSLWantWriteError:
+            self._loop._remove_reader(self._sock_fd)
+            self._loop._add_writer(self._sock_fd, self._on_handshake)
+            return
+        except Exception as exc:
+            self._on_handshake_complete(exc)
+            return
+        self._on_handshake_complete(None)
+
+    def _on_handshake_complete(self, handshake_exc):
+        self._handshake_timeout_handle.cancel()
+        self._loop._remove_reader(self._sock_fd)
+        self._loop._remove_writer(self._sock_fd)
+
+        try:
+            if handshake_exc is not None:
+                raise handshake_exc
+
+            peercert = self._ssl_object.getpeercert()
+        except Exception as exc:
+            if _is_ssl_eof(exc):
+                # The peer went away during the handshake.
+                if self._loop.get_debug():
+                    logger.debug("%r received EOF", self)
+                self._wakeup_waiter(ConnectionResetError())
+                self._force_close(None)
+                return
+            if isinstance(exc, ssl.CertificateError):
+                msg = 'SSL handshake failed on verifying the certificate'
+            else:
+                msg = 'SSL handshake failed'
+            self._fatal_error(exc, msg)
+            return
+
+        if self._loop.get_debug():
+            dt = self._loop.time() - self._handshake_start_time
+            logger.debug("%r: SSL handshake took %.1f ms", self, dt * 1e3)
+
+        # Add extra info that becomes available after handshake.
+        self._extra.update(peercert=peercert,
+                           cipher=self._ssl_object.cipher(),
+                           compression=self._ssl_object.compression(),
+                           ssl_object=self._ssl_object,
+                           )
+        self._session_established = True
+        self._protocol_connected = True
+        self._protocol.connection_made(self)
+        self._wakeup_waiter()
+        if not self._paused:
+            self._add_reader(self._sock_fd, self._read_ready)
+
+    def is_reading(self):
+        if self._sslobj is None:
+            raise RuntimeError('SSL transport has not been initialized yet')
+        return not self._paused and not self._closing
+
+    def pause_reading(self):
+        if self._closing or self._paused:
+            return
+        self._paused = True
+        if self._write_wants_read:
+            self._loop._add_reader(self._sock_fd, self._write_retry)
+        else:
+            self._loop._remove_reader(self._sock_fd)
+        if self._loop.get_debug():
+            logger.debug("%r pauses reading", self)
+
+    def resume_reading(self):
+        if self._closing or not self._paused:
+            return
+        self._paused = False
+        if self._session_established:
+            self._add_reader(self._sock_fd, self._read_ready)
+            self._schedule_pending_read()
+        if self._loop.get_debug():
+            logger.debug("%r resumes reading", self)
+
+    def _schedule_pending_read(self):
+        # Plaintext already decrypted by OpenSSL does not make the
+        # socket readable again.
+        if self._sslobj.pending():
+            self._loop.call_soon(self._read_pending)
+
+    def _read_pending(self):
+        if not (self._paused or self._closing):
+            self._read_ready()
+
+    def _read_ready(self):
+        if self._conn_lost:
+            return
+        # This method is also called from _write_ready() if a write
+        # call earlier failed with SSLWantReadError.
+        if self._write_wants_read:
+            self._write_wants_read = False
+            self._write_ready()
+
+            if self._buffer:
+                self._loop._add_writer(self._sock_fd, self._write_ready)
+            if self._closing:
+                return
+
+        self._read_ready_cb()
+
+    def _set_write_wants_read(self):
+        self._write_wants_read = True
+        if self._paused and not self._closing:
+            # SSL_write() only makes progress once the socket is readable:
+            # watch it while reading is paused, to retry the write only.
+            self._loop._add_reader(self._sock_fd, self._write_retry)
+
+    def _write_retry(self):
+        if self._conn_lost:
+            return
+        self._write_wants_read = False
+        self._write_ready()
+        if self._write_wants_read or self._conn_lost:
+            return
+        if self._paused and not self._closing:
+            self._loop._remove_reader(self._sock_fd)
+        if self._buffer:
+            self._loop._add_writer(self._sock_fd, self._write_ready)
+
+    def _read_ready__get_buffer(self):
+        nbytes = 0
+        while nbytes < self.max_size and not self._paused:
+            try:
+                buf = self._protocol.get_buffer(-1)
+                if not len(buf):
+                    raise RuntimeError('get_buffer() returned an empty buffer')
+            except Exception as exc:
+                self._fatal_error(
+                    exc, 'Fatal error: protocol.get_buffer() call failed.')
+                return
+
+            try:
+                n = self._sslobj.read(len(buf), buf)
+            except Exception as exc:
+                self._read_ready__on_error(exc)
+                return
+
+            if not n:
+                # close_notify from the peer.
+                self.close()
+                return
+
+            try:
+                self._protocol.buffer_updated(n)
+            except Exception as exc:
+                self._fatal_error(
+                    exc, 'Fatal error: protocol.buffer_updated() call failed.')
+                return
+            nbytes += n
+
+        if not self._paused:
+            self._schedule_pending_read()
+
+    def _read_ready__data_received(self):
+        chunks = []
+        nbytes = 0
+        error = None
+        try:
+            # Read all records currently available, up to max_size, and
+            # pass them to the protocol at once.
+            while nbytes < self.max_size:
+                chunk = self._sslobj.read(self.read_size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                nbytes += len(chunk)
+            else:
+                self._schedule_pending_read()
+        except Exception as exc:
+            error = exc
+
+        if chunks:
+            data = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+            try:
+                self._protocol.data_received(data)
+            except Exception as exc:
+                self._fatal_error(
+                    exc, 'Fatal error: protocol.data_received() call failed.')
+                return
+
+        if error is not None:
+            self._read_ready__on_error(error)
+        elif not chunk:
+            # close_notify from the peer.
+            self.close()
+
+    def _read_ready__on_error(self, exc):
+        if isinstance(exc, (BlockingIOError, InterruptedError,
+                            ssl.SSLWantReadError)):
+            return
+        if isinstance(exc, ssl.SSLWantWriteError):
+            self._read_wants_write = True
+            self._loop._remove_reader(self._sock_fd)
+            self._loop._add_writer(self._sock_fd, self._write_ready)
+        elif _is_ssl_eof(exc):
+            self._read_ready__on_eof()
+        else:
+            self._fatal_error(exc, 'Fatal read error on SSL transport')
+
+    def _read_ready__on_eof(self):
+        if self._loop.get_debug():
+            logger.debug("%r received EOF", self)
+
+        try:
+            keep_open = self._protocol.eof_received()
+            if keep_open:
+                logger.warning('returning true from eof_received() '
+                               'has no effect when using ssl')
+        except Exception as exc:
+            self._fatal_error(
+                exc, 'Fatal error: protocol.eof_received() call failed.')
+            return
+        # The peer did not send close_notify: do not answer with one.
+        _SelectorTransport.close(self)
+
+    def _write_ready(self):
+        if self._conn_lost:
+            return
+        # This method is also called from _read_ready() if a read
+        # call earlier failed with SSLWantWriteError.
+        if self._read_wants_write:
+            self._read_wants_write = False
+            self._read_ready()
+
+            if not (self._paused or self._closing):
+                self._add_reader(self._sock_fd, self._read_ready)
+
+        if self._buffer:
+            try:
+                # The SSL socket accepts a moving write buffer, so the
+                # bytearray can grow between retries of an SSL_write().
+                n = self._sslobj.write(self._buffer)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantWriteError):
+                n = 0
+            except ssl.SSLWantReadError:
+                n = 0
+                self._loop._remove_writer(self._sock_fd)
+                self._set_write_wants_read()
+            except Exception as exc:
+                self._loop._remove_writer(self._sock_fd)
+                self._buffer.clear()
+                self._fatal_error(exc, 'Fatal write error on SSL transport')
+                return
+
+            if n:
+                del self._buffer[:n]
+
+        self._maybe_resume_protocol()  # May append to buffer.
+
+        if not self._buffer:
+            self._loop._remove_writer(self._sock_fd)
+            if self._closing:
+                self._call_connection_lost(None)
+
+    def write(self, data):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise TypeError(f"data: expecting a bytes-like instance, "
+                            f"got {type(data).__name__}")
+        if not data:
+            return
+
+        if self._conn_lost:
+            if self._conn_lost >= constants.LOG_THRESHOLD_FOR_CONNLOST_WRITES:
+                logger.warning('socket.send() raised exception.')
+            self._conn_lost += 1
+            return
+
+        if not self._buffer and not self._write_wants_read:
+            # Optimization: try to send now.
+            try:
+                self._sslobj.write(data)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantWriteError):
+                pass
+            except ssl.SSLWantReadError:
+                self._set_write_wants_read()
+            except Exception as exc:
+                self._fatal_error(exc, 'Fatal write error on SSL transport')
+                return
+            else:
+                # Without partial writes, SSL_write() sends all or nothing.
+                return
+            # SSL_write() must be retried with the same data.
+            if not self._write_wants_read:
+                self._loop._add_writer(self._sock_fd, self._write_ready)
+
+        # Add it to the buffer.
+        self._buffer.extend(data)
+        self._maybe_pause_protocol()
+
+    def write_eof(self):
+        raise NotImplementedError("SSL doesn't support half-closes")
+
+    def can_write_eof(self):
+        return False
+
+    def close(self):
+        if self._closing:
+            return
+        if not self._session_established:
+            self._force_close(None)
+            return
+        self._close_notify = True
+        super().close()
+        if self._write_wants_read:
+            # The write buffer is only flushed once the socket is readable.
+            self._loop._add_reader(self._sock_fd, self._read_ready)
+
+    def abort(self):
+        self._close_notify = False
+        super().abort()
+
+    def _call_connection_lost(self, exc):
+        if self._handshake_timeout_handle is not None:
+            self._handshake_timeout_handle.cancel()
+            self._handshake_timeout_handle = None
+        self._loop._remove_reader(self._sock_fd)
+        self._loop._remove_writer(self._sock_fd)
+        if self._close_notify and exc is None:
+            self._close_notify = False
+            try:
+                self._ssl_object.unwrap()
+            except (ssl.SSLError, OSError):
+                # Best effort: the socket is closed anyway.
+                pass
+        try:
+            super()._call_connection_lost(exc)
+        finally:
+            self._wakeup_waiter(exc)
+
+
 class _SelectorDatagramTransport(_SelectorTransport):
 
     _buffer_factory = collections.deque
@@ -1,9 +1,11 @@
 __all__ = (
     'StreamReader', 'StreamWriter', 'StreamReaderProtocol',
+    'BufferedStreamReaderProtocol',
     'open_connection', 'start_server',
     'IncompleteReadError', 'LimitOverrunError',
 )
 
+import collections
 import socket
 
 if hasattr(socket, 'AF_UNIX'):
@@ -18,6 +20,12 @@ from .tasks import sleep
 
 _DEFAULT_LIMIT = 2 ** 16  # 64 KiB
 
+# Size of the chunks a chunked StreamReader receives data into (as much
+# as a selector transport reads at once), and the free space below which
+# a new chunk is started.
+_CHUNK_SIZE = 2 ** 18  # 256 KiB
+_MIN_CHUNK_FREE = 2 ** 12  # 4 KiB
+
 
 class IncompleteReadError(EOFError):
     """
@@ -51,7 +59,8 @@ class LimitOverrunError(Exception):
 
 
 async def open_connection(host=None, port=None, *,
-                          loop=None, limit=_DEFAULT_LIMIT, **kwds):
+                          loop=None, limit=_DEFAULT_LIMIT, chunked=False,
+                          **kwds):
     """A wrapper for create_connection() returning a (reader, writer) pair.
 
     The reader returned is a StreamReader instance; the writer is a
@@ -62,8 +71,9 @@ async def open_connection(host=None, port=None, *,
     with various optional keyword arguments following.
 
     Additional optional keyword arguments are loop (to set the event loop
-    instance to use) and limit (to set the buffer limit passed to the
-    StreamReader).
+    instance to use), limit (to set the buffer limit passed to the
+    StreamReader) and chunked (to make a chunked StreamReader, which the
+    transport receives into directly).
 
     (If you want to customize the StreamReader and/or
     StreamReaderProtocol classes, just copy the code -- there's
@@ -71,8 +81,8 @@ async def open_connection(host=None, port=None, *,
     """
     if loop is None:
         loop = events.get_event_loop()
-    reader = StreamReader(limit=limit, loop=loop)
-    protocol = StreamReaderProtocol(reader, loop=loop)
+    reader = StreamReader(limit=limit, loop=loop, chunked=chunked)
+    protocol = _protocol_class(chunked)(reader, loop=loop)
     transport, _ = await loop.create_connection(
         lambda: protocol, host, port, **kwds)
     writer = StreamWriter(transport, protocol, reader, loop)
@@ -80,7 +90,8 @@ async def open_connection(host=None, port=None, *,
 
 
 async def start_server(client_connected_cb, host=None, port=None, *,
-                       loop=None, limit=_DEFAULT_LIMIT, **kwds):
+                       loop=None, limit=_DEFAULT_LIMIT, chunked=False,
+                       **kwds):
     """Start a socket server, call back for each client connected.
 
     The first parameter, `client_connected_cb`, takes two parameters:
@@ -96,8 +107,8 @@ async def start_server(client_connected_cb, host=None, port=None, *,
     following.  The return value is the same as loop.create_server().
 
     Additional optional keyword arguments are loop (to set the event loop
-    instance to use) and limit (to set the buffer limit passed to the
-    StreamReader).
+    instance to use), limit (to set the buffer limit passed to the
+    StreamReader) and chunked (to make chunked StreamReaders).
 
     The return value is the same as loop.create_server(), i.e. a
     Server object which can be used to stop the service.
@@ -106,9 +117,9 @@ async def start_server(client_connected_cb, host=None, port=None, *,
         loop = events.get_event_loop()
 
     def factory():
-        reader = StreamReader(limit=limit, loop=loop)
-        protocol = StreamReaderProtocol(reader, client_connected_cb,
-                                        loop=loop)
+        reader = StreamReader(limit=limit, loop=loop, chunked=chunked)
+        protocol = _protocol_class(chunked)(reader, client_connected_cb,
+                                            loop=loop)
         return protocol
 
     return await loop.create_server(factory, host, port, **kwds)
@@ -118,27 +129,29 @@ if hasattr(socket, 'AF_UNIX'):
     # UNIX Domain Sockets are supported on this platform
 
     async def open_unix_connection(path=None, *,
-                                   loop=None, limit=_DEFAULT_LIMIT, **kwds):
+                                   loop=None, limit=_DEFAULT_LIMIT,
+                                   chunked=False, **kwds):
         """Similar to `open_connection` but works with UNIX Domain Sockets."""
         if loop is None:
             loop = events.get_event_loop()
-        reader = StreamReader(limit=limit, loop=loop)
-        protocol = StreamReaderProtocol(reader, loop=loop)
+        reader = StreamReader(limit=limit, loop=loop, chunked=chunked)
+        protocol = _protocol_class(chunked)(reader, loop=loop)
         transport, _ = await loop.create_unix_connection(
             lambda: protocol, path, **kwds)
         writer = StreamWriter(transport, protocol, reader, loop)
         return reader, writer
 
     async def start_unix_server(client_connected_cb, path=None, *,
-                                loop=None, limit=_DEFAULT_LIMIT, **kwds):
+                                loop=None, limit=_DEFAULT_LIMIT,
+                                chunked=False, **kwds):
         """Similar to `start_server` but works with UNIX Domain Sockets."""
         if loop is None:
             loop = events.get_event_loop()
 
         def factory():
-            reader = StreamReader(limit=limit, loop=loop)
-            protocol = StreamReaderProtocol(reader, client_connected_cb,
-                                            loop=loop)
+            reader = StreamReader(limit=limit, loop=loop, chunked=chunked)
+            protocol = _protocol_class(chunked)(reader, client_connected_cb,
+                                                loop=loop)
             return protocol
 
         return await loop.create_unix_server(factory, path, **kwds)
@@ -273,6 +286,34 @@ class StreamReaderProtocol(FlowControlMixin, protocols.Protocol):
             closed.exception()
 
 
+class BufferedStreamReaderProtocol(StreamReaderProtocol,
+                                   protocols.BufferedProtocol):
+    """StreamReaderProtocol for a chunked StreamReader.
+
+    The transport receives data directly into the chunks of the reader
+    (get_buffer() and buffer_updated()) instead of passing it to
+    data_received(), which saves a copy of every read.
+    """
+
+    def __init__(self, stream_reader, client_connected_cb=None, loop=None):
+        super().__init__(stream_reader, client_connected_cb, loop=loop)
+        if not stream_reader._chunked:
+            raise ValueError('BufferedStreamReaderProtocol requires a '
+                             'chunked StreamReader')
+
+    def get_buffer(self, sizehint):
+        return self._stream_reader._get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        self._stream_reader._buffer_updated(nbytes)
+
+
+def _protocol_class(chunked):
+    if chunked:
+        return BufferedStreamReaderProtocol
+    return StreamReaderProtocol
+
+
 class StreamWriter:
     """Wraps a Transport.
 
@@ -348,9 +389,185 @@ class StreamWriter:
         await self._protocol._drain_helper()
 
 
+class _ChunkedBuffer:
+    """The buffer of a chunked StreamReader.
+
+    Received data is kept as a deque of [chunk, begin, end] entries.
+    Consuming data from the front only moves the begin of the first
+    entries, instead of moving all remaining data like ``del buf[:n]``
+    does on a bytearray.  It supports the subset of the bytearray API
+    that StreamReader uses, plus readinto() and readview().
+
+    Data from feed_data() is kept as is; get_buffer() hands out the free
+    end of a bytearray chunk for the transport to receive into.  A chunk
+    is only reused when it was completely consumed and no view of it was
+    returned by readview(), so those views stay valid.
+    """
+
+    def __init__(self):
+        self._chunks = collections.deque()
+        self._size = 0
+        self._tail = None  # bytearray chunk the transport receives into
+        self._tail_end = 0
+
+    def __len__(self):
+        return self._size
+
+    def __bytes__(self):
+        return self._slice(0, self._size)
+
+    def __getitem__(self, index):
+        start, stop, step = index.indices(self._size)
+        assert step == 1, 'step is not supported'
+        return self._slice(start, stop)
+
+    def __delitem__(self, index):
+        assert index.start is None and index.step is None, \
+            'only a prefix can be deleted'
+        self._consume(index.indices(self._size)[1])
+
+    def clear(self):
+        self._chunks.clear()
+        self._size = 0
+
+    def extend(self, data):
+        data = bytes(data)
+        if data:
+            self._chunks.append([data, 0, len(data)])
+            self._size += len(data)
+
+    def get_buffer(self, sizehint):
+        tail = self._tail
+        if tail is not None and not self._chunks:
+            # Everything received into the tail was consumed.
+            self._tail_end = 0
+        if (tail is None or
+                len(tail) - self._tail_end < max(sizehint, _MIN_CHUNK_FREE)):
+            tail = self._tail = bytearray(max(sizehint, _CHUNK_SIZE))
+            self._tail_end = 0
+        return memoryview(tail)[self._tail_end:]
+
+    def buffer_updated(self, nbytes):
+        end = self._tail_end + nbytes
+        if self._chunks and self._chunks[-1][0] is self._tail:
+            self._chunks[-1][2] = end
+        else:
+            self._chunks.append([self._tail, self._tail_end, end])
+        self._tail_end = end
+        self._size += nbytes
+
+    def find(self, sub, start=0):
+        # Matches inside a chunk are found by chunk.find(); matches across
+        # chunk boundaries in carry, the last len(sub) - 1 bytes before
+        # the chunk, followed by the start of the chunk.
+        keep = len(sub) - 1
+        carry = b''
+        pos = 0  # position of the current chunk
+        for chunk, begin, end in self._chunks:
+            if carry:
+                joined = carry + chunk[begin:begin + keep]
+                i = joined.find(sub, max(start - pos + len(carry), 0))
+                if i != -1:
+                    return pos - len(carry) + i
+            size = end - begin
+            if start < pos + size:
+                i = chunk.find(sub, begin + max(start - pos, 0), end)
+                if i != -1:
+                    return pos + i - begin
+            if keep:
+                carry = (carry + chunk[max(begin, end - keep):end])[-keep:]
+            pos += size
+        return -1
+
+    def startswith(self, prefix, start=0):
+        return self._slice(start, start + len(prefix)) == prefix
+
+    def read(self, n):
+        """Remove up to n bytes and return them as bytes."""
+        n = min(n, self._size)
+        data = self._slice(0, n)
+        self._consume(n)
+        return data
+
+    def readinto(self, view):
+        """Move up to len(view) bytes to view, return their number."""
+        n = min(len(view), self._size)
+        entry = self._chunks[0] if n else None
+        if entry is not None and entry[2] - entry[1] > n:
+            # Fast path: the bytes are in the first chunk.
+            begin = entry[1]
+            view[:n] = memoryview(entry[0])[begin:begin + n]
+            entry[1] = begin + n
+            self._size -= n
+            return n
+        pos = 0
+        for chunk, begin, end in self._chunks:
+            if pos == n:
+                break
+            size = min(end - begin, n - pos)
+            view[pos:pos + size] = memoryview(chunk)[begin:begin + size]
+            pos += size
+        self._consume(n)
+        return n
+
+    def readview(self, n):
+        """Remove n bytes and return them as a memoryview.
+
+        This does not copy when the bytes are in one chunk.
+        """
+        chunk, begin, end = self._chunks[0]
+        if end - begin < n:
+            data = bytearray(n)
+            self.readinto(memoryview(data))
+            return memoryview(data)
+        if chunk is self._tail:
+            # Do not receive into the chunk again.
+            self._tail = None
+        view = memoryview(chunk)[begin:begin + n]
+        self._consume(n)
+        return view
+
+    def _slice(self, start, stop):
+        if self._chunks:
+            chunk, begin, end = self._chunks[0]
+            if stop <= end - begin:
+                if type(chunk) is bytes:
+                    return chunk[begin + start:begin + stop]
+                return bytes(memoryview(chunk)[begin + start:begin + stop])
+        parts = []
+        pos = 0
+        for chunk, begin, end in self._chunks:
+            if pos >= stop:
+                break
+            size = end - begin
+            if start < pos + size:
+                lo = begin + max(start - pos, 0)
+                hi = begin + min(stop - pos, size)
+                if (lo == 0 and hi == len(chunk) and
+                        type(chunk) is bytes and not parts and
+                        pos + size >= stop):
+                    # A whole chunk from feed_data(): no copy.
+                    return chunk
+                parts.append(memoryview(chunk)[lo:hi])
+            pos += size
+        return b''.join(parts)
+
+    def _consume(self, n):
+        self._size -= n
+        chunks = self._chunks
+        while n:
+            entry = chunks[0]
+            size = entry[2] - entry[1]
+            if n < size:
+                entry[1] += n
+                break
+            chunks.popleft()
+            n -= size
+
+
 class StreamReader:
 
-    def __init__(self, limit=_DEFAULT_LIMIT, loop=None):
+    def __init__(self, limit=_DEFAULT_LIMIT, loop=None, *, chunked=False):
         # The line length limit is  a security feature;
         # it also doubles as half the buffer limit.
 
@@ -362,7 +579,13 @@ class StreamReader:
             self._loop = events.get_event_loop()
         else:
             self._loop = loop
-        self._buffer = bytearray()
+        # A chunked reader keeps the received chunks instead of appending
+        # them to a bytearray, see _ChunkedBuffer.
+        self._chunked = chunked
+        if chunked:
+            self._buffer = _ChunkedBuffer()
+        else:
+            self._buffer = bytearray()
         self._eof = False    # Whether we're done.
         self._waiter = None  # A future used by _wait_for_data()
         self._exception = None
@@ -377,6 +600,8 @@ class StreamReader:
             info.append('eof')
         if self._limit != _DEFAULT_LIMIT:
             info.append(f'limit={self._limit}')
+        if self._chunked:
+            info.append('chunked')
         if self._waiter:
             info.append(f'waiter={self._waiter!r}')
         if self._exception:
@@ -432,7 +657,21 @@ class StreamReader:
 
         self._buffer.extend(data)
         self._wakeup_waiter()
+        self._maybe_pause_transport()
+
+    def _get_buffer(self, sizehint):
+        assert not self._eof, 'get_buffer after feed_eof'
+        return self._buffer.get_buffer(sizehint)
+
+    def _buffer_updated(self, nbytes):
+        if not nbytes:
+            return
+
+        self._buffer.buffer_updated(nbytes)
+        self._wakeup_waiter()
+        self._maybe_pause_transport()
 
+    def _maybe_pause_transport(self):
         if (self._transport is not None and
                 not self._paused and
                 len(self._buffer) > 2 * self._limit):
@@ -640,8 +879,11 @@ class StreamReader:
             await self._wait_for_data('read')
 
         # This will work right even if buffer is less than n bytes
-        data = bytes(self._buffer[:n])
-        del self._buffer[:n]
+        if self._chunked:
+            data = self._buffer.read(n)
+        else:
+            data = bytes(self._buffer[:n])
+            del self._buffer[:n]
 
         self._maybe_resume_transport()
         return data
@@ -670,15 +912,12 @@ class StreamReader:
         if n == 0:
             return b''
 
-        while len(self._buffer) < n:
-            if self._eof:
-                incomplete = bytes(self._buffer)
-                self._buffer.clear()
-                raise IncompleteReadError(incomplete, n)
-
-            await self._wait_for_data('readexactly')
+        if len(self._buffer) < n:
+            await self._wait_for_size(n, 'readexactly')
 
-        if len(self._buffer) == n:
+        if self._chunked:
+            data = self._buffer.read(n)
+        elif len(self._buffer) == n:
             data = bytes(self._buffer)
             self._buffer.clear()
         else:
@@ -687,6 +926,93 @@ class StreamReader:
         self._maybe_resume_transport()
         return data
 
+    async def readinto(self, buffer):
+        """Read up to len(buffer) bytes from the stream into buffer.
+
+        buffer is a writable bytes-like object such as a bytearray or
+        memoryview.  Return the number of bytes read, which is at least 1
+        unless buffer is empty or EOF was received before any byte was
+        read.  Like read(n), but without making a bytes object.
+        """
+        if self._exception is not None:
+            raise self._exception
+
+        view = memoryview(buffer).cast('B')
+        if not view:
+            return 0
+
+        if not self._buffer and not self._eof:
+            await self._wait_for_data('readinto')
+
+        n = self._readinto(view)
+        self._maybe_resume_transport()
+        return n
+
+    async def readexactly_into(self, buffer):
+        """Read exactly len(buffer) bytes into buffer.
+
+        Like readexactly(len(buffer)), but the bytes are copied straight
+        into the writable bytes-like object buffer.  Raise an
+        IncompleteReadError if EOF is reached first; buffer is then left
+        unchanged.
+        """
+        if self._exception is not None:
+            raise self._exception
+
+        view = memoryview(buffer).cast('B')
+        n = len(view)
+        if len(self._buffer) < n:
+            await self._wait_for_size(n, 'readexactly_into')
+        self._readinto(view)
+        self._maybe_resume_transport()
+
+    async def readexactly_view(self, n):
+        """Read exactly `n` bytes and return them as a memoryview.
+
+        With a chunked StreamReader the view refers to the received chunk
+        when the `n` bytes arrived in one, so no copy is made; it must not
+        be modified.  Otherwise this is readexactly(n) in a memoryview.
+        Raise an IncompleteReadError like readexactly().
+        """
+        if n < 0:
+            raise ValueError('readexactly size can not be less than zero')
+
+        if self._exception is not None:
+            raise self._exception
+
+        if n == 0:
+            return memoryview(b'')
+
+        if len(self._buffer) < n:
+            await self._wait_for_size(n, 'readexactly_view')
+        if self._chunked:
+            view = self._buffer.readview(n)
+        else:
+            view = memoryview(bytearray(n))
+            self._readinto(view)
+        self._maybe_resume_transport()
+        return view
+
+    async def _wait_for_size(self, n, func_name):
+        """Wait until the buffer holds `n` bytes, see readexactly()."""
+        while len(self._buffer) < n:
+            if self._eof:
+                incomplete = bytes(self._buffer)
+                self._buffer.clear()
+                raise IncompleteReadError(incomplete, n)
+
+            await self._wait_for_data(func_name)
+
+    def _readinto(self, view):
+        """Move up to len(view) bytes from the buffer to view."""
+        if self._chunked:
+            return self._buffer.readinto(view)
+        n = min(len(view), len(self._buffer))
+        with memoryview(self._buffer) as data:
+            view[:n] = data[:n]
+        del self._buffer[:n]
+        return n
+
     def __aiter__(self):
         return self
 
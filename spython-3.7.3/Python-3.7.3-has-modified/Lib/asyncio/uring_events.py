@@ -0,0 +1,794 @@
+"""Event loop using io_uring, for Linux 5.6 and newer.
+
+UringEventLoop is a proactor event loop (see proactor_events): sockets
+are read and written by operations submitted to an io_uring, whose
+completions set the result of futures, like IocpProactor does with the
+I/O completion ports of Windows.  The operations started during one
+iteration of the event loop are submitted by the same system call that
+waits for completions.  Regular files can be read and written the same
+way, without the default executor.
+
+UringEventLoopPolicy falls back to the selector event loop when the
+kernel lacks io_uring.
+"""
+
+__all__ = (
+    'UringProactor', 'UringEventLoop', 'UringEventLoopPolicy',
+)
+
+import collections
+import errno
+import io
+import itertools
+import os
+import select
+import socket
+import sys
+import time
+import warnings
+import weakref
+
+from . import constants
+from . import events
+from . import futures
+from . import proactor_events
+from . import transports
+from . import unix_events
+from .log import logger
+
+try:
+    import _uring
+except ImportError:  # pragma: no cover
+    _uring = None
+
+
+# Returned by the finish callback of an operation that started another
+# operation for the same future.
+_PENDING = object()
+
+
+def _error(res):
+    return OSError(-res, os.strerror(-res))
+
+
+def _fileno(fileobj):
+    if isinstance(fileobj, int):
+        return fileobj
+    return fileobj.fileno()
+
+
+class _UringFuture(futures.Future):
+    """Future of an io_uring operation.
+
+    Cancelling it cancels the operation in the kernel.
+    """
+
+    def __init__(self, proactor, *, loop=None):
+        super().__init__(loop=loop)
+        if self._source_traceback:
+            del self._source_traceback[-1]
+        self._proactor = proactor
+        self._key = None
+
+    def _repr_info(self):
+        info = super()._repr_info()
+        if self._key is not None and not self.done():
+            info.insert(1, f'key={self._key}')
+        return info
+
+    def cancel(self):
+        if not self.done() and self._key is not None:
+            self._proactor._cancel(self._key)
+        return super().cancel()
+
+
+class _UringTransportMixin:
+
+    def _call_connection_lost(self, exc):
+        # Unlike the base class, ignore errors of shutdown(): it fails with
+        # ENOTCONN once the peer has reset the connection, and the socket
+        # must still be closed and detached from the server.  shutdown()
+        # is kept because it completes a pending recv() on the socket.
+        try:
+            self._protocol.connection_lost(exc)
+        finally:
+            if hasattr(self._sock, 'shutdown'):
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self._sock.close()
+            self._sock = None
+            server = self._server
+            if server is not None:
+                server._detach()
+                self._server = None
+
+
+class _UringSocketTransport(_UringTransportMixin,
+                            proactor_events._ProactorSocketTransport):
+
+    # Larger than the 32 KiB of the base class, but every pending recv()
+    # holds a buffer of this size.
+    max_size = 64 * 1024
+
+    def write(self, data):
+        # Fast path: when nothing is being written, send() at once like the
+        # selector event loop does, and only queue an operation for what
+        # the socket buffer could not take.  This saves a future and an
+        # event loop iteration per write.
+        if (data and self._write_fut is None and not self._conn_lost and
+                not self._eof_written and self._empty_waiter is None and
+                isinstance(data, (bytes, bytearray, memoryview))):
+            try:
+                n = self._sock.send(data)
+            except OSError:
+                # Would block, or failed: the operation will report errors.
+                pass
+            else:
+                if n == len(data):
+                    return
+                data = memoryview(data)[n:]
+        super().write(data)
+
+
+class _UringReadPipeTransport(_UringTransportMixin,
+                              proactor_events._ProactorReadPipeTransport):
+    pass
+
+
+class _UringWritePipeTransport(_UringTransportMixin,
+                               proactor_events._ProactorWritePipeTransport):
+    # The base class reads the pipe to notice when its other end is closed,
+    # which fails for the write end of a pipe and steals the input of a
+    # terminal.  Wait for POLLHUP or POLLERR instead.
+
+    def __init__(self, loop, *args, **kw):
+        proactor_events._ProactorBaseWritePipeTransport.__init__(
+            self, loop, *args, **kw)
+        self._read_fut = loop._proactor.wait_closed(self._sock)
+        self._read_fut.add_done_callback(self._pipe_closed)
+
+
+class _UringDatagramTransport(proactor_events._ProactorBasePipeTransport,
+                              transports.DatagramTransport):
+
+    max_size = 256 * 1024
+
+    def __init__(self, loop, sock, protocol, address=None,
+                 waiter=None, extra=None):
+        self._address = address
+        self._empty_waiter = None
+        super().__init__(loop, sock, protocol, waiter=waiter, extra=extra)
+        # The base class sets _buffer to None.
+        self._buffer = collections.deque()
+        self._loop.call_soon(self._loop_reading)
+
+    def _set_extra(self, sock):
+        self._extra['socket'] = sock
+        try:
+            self._extra['sockname'] = sock.getsockname()
+        except OSError:
+            pass
+        if self._address is not None:
+            self._extra['peername'] = self._address
+
+    def get_write_buffer_size(self):
+        return sum(len(data) for data, _ in self._buffer)
+
+    def abort(self):
+        self._force_close(None)
+
+    def sendto(self, data, addr=None):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise TypeError(f'data argument must be a bytes-like object, '
+                            f'not {type(data).__name__!r}')
+        if not data:
+            return
+
+        if self._address is not None and addr not in (None, self._address):
+            raise ValueError(
+                f'Invalid address: must be None or {self._address}')
+
+        if self._conn_lost and self._address:
+            if self._conn_lost >= constants.LOG_THRESHOLD_FOR_CONNLOST_WRITES:
+                logger.warning('socket.sendto() raised exception.')
+            self._conn_lost += 1
+            return
+
+        self._buffer.append((bytes(data), addr))
+        if self._write_fut is None:
+            self._loop_writing()
+        self._maybe_pause_protocol()
+
+    def _loop_writing(self, fut=None):
+        try:
+            if self._conn_lost:
+                return
+
+            assert fut is self._write_fut
+            self._write_fut = None
+            if fut:
+                fut.result()
+        except OSError as exc:
+            self._protocol.error_received(exc)
+        except Exception as exc:
+            self._fatal_error(exc, 'Fatal write error on datagram transport')
+            return
+
+        try:
+            if not self._buffer:
+                self._maybe_resume_protocol()
+                if self._closing:
+                    self._loop.call_soon(self._call_connection_lost, None)
+                return
+
+            data, addr = self._buffer.popleft()
+            if self._address is not None:
+                self._write_fut = self._loop._proactor.send(self._sock, data)
+            else:
+                self._write_fut = self._loop._proactor.sendto(
+                    self._sock, data, addr=addr)
+        except OSError as exc:
+            self._protocol.error_received(exc)
+            self._loop.call_soon(self._loop_writing)
+        except Exception as exc:
+            self._fatal_error(exc, 'Fatal write error on datagram transport')
+        else:
+            self._write_fut.add_done_callback(self._loop_writing)
+            self._maybe_resume_protocol()
+
+    def _loop_reading(self, fut=None):
+        if self._conn_lost:
+            return
+        assert self._read_fut is fut or (self._read_fut is None and
+                                         self._closing)
+        self._read_fut = None
+        if fut is not None:
+            if self._closing or fut.cancelled():
+                return
+            try:
+                res = fut.result()
+            except OSError as exc:
+                # For example ECONNREFUSED: keep reading.
+                self._protocol.error_received(exc)
+            except Exception as exc:
+                self._fatal_error(exc, 'Fatal read error on datagram transport')
+                return
+            else:
+                if self._address is not None:
+                    self._protocol.datagram_received(res, self._address)
+                else:
+                    self._protocol.datagram_received(*res)
+            if self._conn_lost or self._closing:
+                return
+
+        try:
+            if self._address is not None:
+                self._read_fut = self._loop._proactor.recv(self._sock,
+                                                           self.max_size)
+            else:
+                self._read_fut = self._loop._proactor.recvfrom(self._sock,
+                                                               self.max_size)
+        except Exception as exc:
+            self._fatal_error(exc, 'Fatal read error on datagram transport')
+        else:
+            self._read_fut.add_done_callback(self._loop_reading)
+
+    def _call_connection_lost(self, exc):
+        # Unlike the base class, do not shutdown() the socket: it fails
+        # with ENOTCONN for an unconnected datagram socket.
+        try:
+            self._protocol.connection_lost(exc)
+        finally:
+            self._sock.close()
+            self._sock = None
+
+
+class UringProactor:
+    """Proactor implementation using io_uring."""
+
+    def __init__(self, entries=256):
+        self._ring = None
+        if _uring is None:
+            raise OSError(errno.ENOSYS, 'the _uring module is not available')
+        self._loop = None
+        self._results = []
+        self._ring = _uring.Ring(entries)
+        self._keys = itertools.count(1)
+        # key => (future, obj, finish, discard)
+        self._cache = {}
+        self._stopped_serving = weakref.WeakSet()
+
+    def _check_closed(self):
+        if self._ring is None:
+            raise RuntimeError('UringProactor is closed')
+
+    def __repr__(self):
+        info = ['operation#=%s' % len(self._cache),
+                'result#=%s' % len(self._results)]
+        if self._ring is None:
+            info.append('closed')
+        return '<%s %s>' % (self.__class__.__name__, " ".join(info))
+
+    def set_loop(self, loop):
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if not self._results:
+            self._poll(timeout)
+        tmp = self._results
+        self._results = []
+        return tmp
+
+    def _result(self, value):
+        fut = self._loop.create_future()
+        fut.set_result(value)
+        return fut
+
+    def recv(self, conn, nbytes, flags=0):
+        return self._input(conn, nbytes, flags)
+
+    def recv_into(self, conn, buf, flags=0):
+        return self._input(conn, buf, flags)
+
+    def _input(self, conn, target, flags):
+        ring = self._ring
+        fd = conn.fileno()
+        if isinstance(conn, socket.socket):
+            def start(key):
+                ring.recv(key, fd, target, flags)
+        else:
+            # A pipe.
+            def start(key):
+                ring.read(key, fd, target)
+
+        def finish(res, data):
+            if res == -errno.EAGAIN:
+                return self._when_ready(fut, conn, select.POLLIN,
+                                        start, finish)
+            if res < 0:
+                raise _error(res)
+            return res if data is None else data
+
+        fut = _UringFuture(self, loop=self._loop)
+        return self._register(fut, conn, start, finish)
+
+    def send(self, conn, buf, flags=0):
+        ring = self._ring
+        fd = conn.fileno()
+        view = memoryview(buf).cast('B')
+        sent = 0
+        if isinstance(conn, socket.socket):
+            def start(key):
+                ring.send(key, fd, view[sent:], flags)
+        else:
+            def start(key):
+                ring.write(key, fd, view[sent:])
+
+        def finish(res, data):
+            nonlocal sent
+            if res == -errno.EAGAIN:
+                return self._when_ready(fut, conn, select.POLLOUT,
+                                        start, finish)
+            if res < 0:
+                raise _error(res)
+            sent += res
+            if sent < len(view):
+                # Partial send: send the rest.
+                self._register(fut, conn, start, finish)
+                return _PENDING
+            return sent
+
+        fut = _UringFuture(self, loop=self._loop)
+        return self._register(fut, conn, start, finish)
+
+    def accept(self, listener):
+        ring = self._ring
+        fd = listener.fileno()
+
+        def start(key):
+            ring.accept(key, fd, socket.SOCK_CLOEXEC)
+
+        def finish(res, data):
+            if res == -errno.EAGAIN:
+                return self._when_ready(fut, listener, select.POLLIN,
+                                        start, finish)
+            if res < 0:
+                raise _error(res)
+            conn = socket.socket(listener.family, listener.type,
+                                 listener.proto, fileno=res)
+            try:
+                conn.settimeout(listener.gettimeout())
+                return conn, conn.getpeername()
+            except OSError:
+                conn.close()
+                raise
+
+        def discard(res, data):
+            # The future was cancelled but a connection was accepted.
+            if res >= 0:
+                os.close(res)
+
+        fut = _UringFuture(self, loop=self._loop)
+        return self._register(fut, listener, start, finish, discard)
+
+    def connect(self, conn, address):
+        # connect() on a non-blocking socket, then wait until it is
+        # writable, like the selector event loop.
+        try:
+            conn.connect(address)
+        except (BlockingIOError, InterruptedError):
+            pass
+        else:
+            return self._result(None)
+
+        def finish(res, data):
+            if res < 0:
+                raise _error(res)
+            err = conn.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err != 0:
+                raise OSError(err, f'Connect call failed {address}')
+
+        return self.wait_ready(conn, select.POLLOUT, finish)
+
+    def recvfrom(self, conn, nbytes, flags=0):
+        # The _uring module has no recvmsg operation: wait until the socket
+        # is readable, then call recvfrom().
+        fd = conn.fileno()
+
+        def start(key):
+            self._ring.poll(key, fd, select.POLLIN)
+
+        def finish(res, data):
+            if res < 0:
+                raise _error(res)
+            try:
+                return conn.recvfrom(nbytes, flags)
+            except (BlockingIOError, InterruptedError):
+                self._register(fut, conn, start, finish)
+                return _PENDING
+
+        fut = _UringFuture(self, loop=self._loop)
+        return self._register(fut, conn, start, finish)
+
+    def sendto(self, conn, buf, flags=0, addr=None):
+        try:
+            return self._result(conn.sendto(buf, flags, addr))
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        fd = conn.fileno()
+
+        def start(key):
+            self._ring.poll(key, fd, select.POLLOUT)
+
+        def finish(res, data):
+            if res < 0:
+                raise _error(res)
+            try:
+                return conn.sendto(buf, flags, addr)
+            except (BlockingIOError, InterruptedError):
+                self._register(fut, conn, start, finish)
+                return _PENDING
+
+        fut = _UringFuture(self, loop=self._loop)
+        return self._register(fut, conn, start, finish)
+
+    def read(self, file, nbytes, offset=-1):
+        """Read up to nbytes from file (a file object or descriptor) at
+        offset, or at the file position if offset is -1."""
+        return self._file_input(file, nbytes, offset)
+
+    def read_into(self, file, buf, offset=-1):
+        """Read into buf from file at offset, return the number of bytes."""
+        return self._file_input(file, buf, offset)
+
+    def _file_input(self, file, target, offset):
+        ring = self._ring
+        fd = _fileno(file)
+
+        def start(key):
+            ring.read(key, fd, target, offset)
+
+        def finish(res, data):
+            if res < 0:
+                raise _error(res)
+            return res if data is None else data
+
+        fut = _UringFuture(self, loop=self._loop)
+        return self._register(fut, file, start, finish)
+
+    def write(self, file, data, offset=-1):
+        """Write all of data to file at offset, or at the file position if
+        offset is -1; return the number of bytes written."""
+        ring = self._ring
+        fd = _fileno(file)
+        view = memoryview(data).cast('B')
+        written = 0
+
+        def start(key):
+            pos = offset if offset < 0 else offset + written
+            ring.write(key, fd, view[written:], pos)
+
+        def finish(res, data):
+            nonlocal written
+            if res < 0:
+                raise _error(res)
+            written += res
+            if res and written < len(view):
+                self._register(fut, file, start, finish)
+                return _PENDING
+            return written
+
+        fut = _UringFuture(self, loop=self._loop)
+        return self._register(fut, file, start, finish)
+
+    def wait_closed(self, pipe):
+        """Return a future set to b'' when the other end of pipe is closed."""
+        return self.wait_ready(pipe, 0, lambda res, data: b'')
+
+    def wait_ready(self, obj, events, finish=None):
+        """Return a future set when obj is ready for events (a mask of
+        select.POLL* constants)."""
+        ring = self._ring
+        fd = obj.fileno()
+
+        def start(key):
+            ring.poll(key, fd, events)
+
+        def poll_finish(res, data):
+            if res < 0:
+                raise _error(res)
+            if finish is not None:
+                return finish(res, data)
+            return res
+
+        fut = _UringFuture(self, loop=self._loop)
+        return self._register(fut, obj, start, poll_finish)
+
+    def _when_ready(self, fut, obj, events, start, finish):
+        # The operation on the non-blocking obj failed with EAGAIN (older
+        # kernels do not wait for non-blocking sockets): start it again
+        # when obj is ready.
+        fd = obj.fileno()
+
+        def poll_start(key):
+            self._ring.poll(key, fd, events)
+
+        def poll_finish(res, data):
+            if res < 0:
+                raise _error(res)
+            self._register(fut, obj, start, finish)
+            return _PENDING
+
+        self._register(fut, obj, poll_start, poll_finish)
+        return _PENDING
+
+    def _register(self, fut, obj, start, finish, discard=None):
+        # start(key) queues the operation on the ring.  Its completion is
+        # passed to finish(), which returns the result of the future, or
+        # _PENDING if it started another operation for the future.  We only
+        # store obj to prevent it from being garbage collected too early.
+        self._check_closed()
+        key = next(self._keys)
+        start(key)
+        fut._key = key
+        self._cache[key] = (fut, obj, finish, discard)
+        return fut
+
+    def _cancel(self, key):
+        if self._ring is not None and key in self._cache:
+            self._ring.cancel(key)
+
+    def _poll(self, timeout=None):
+        if timeout is not None and timeout < 0:
+            raise ValueError("negative timeout")
+
+        for key, res, data in self._ring.wait(timeout):
+            try:
+                f, obj, finish, discard = self._cache.pop(key)
+            except KeyError:
+                continue
+
+            if obj in self._stopped_serving:
+                f.cancel()
+            elif f.done():
+                # Cancelled: the kernel completed the operation anyway.
+                if discard is not None:
+                    discard(res, data)
+            else:
+                try:
+                    value = finish(res, data)
+                except OSError as e:
+                    f.set_exception(e)
+                    self._results.append(f)
+                else:
+                    if value is not _PENDING:
+                        f.set_result(value)
+                        self._results.append(f)
+
+    def _stop_serving(self, obj):
+        # obj is a socket.  It will be closed in
+        # BaseProactorEventLoop._stop_serving() which will make any
+        # pending operations fail quickly.
+        self._stopped_serving.add(obj)
+
+    def close(self):
+        if self._ring is None:
+            # already closed
+            return
+
+        # Cancel remaining registered operations.
+        for fut, obj, finish, discard in list(self._cache.values()):
+            fut.cancel()
+
+        # Wait until the kernel is done with all operations: their buffers
+        # must not be released before.  Display progress every second.
+        msg_update = 1.0
+        start_time = time.monotonic()
+        next_msg = start_time + msg_update
+        while self._cache:
+            if next_msg <= time.monotonic():
+                logger.debug('%r is running after closing for %.1f seconds',
+                             self, time.monotonic() - start_time)
+                next_msg = time.monotonic() + msg_update
+
+            # handle a few events, or timeout
+            self._poll(msg_update)
+
+        self._results = []
+
+        self._ring.close()
+        self._ring = None
+
+    def __del__(self):
+        self.close()
+
+
+class UringEventLoop(proactor_events.BaseProactorEventLoop):
+    """Proactor event loop using io_uring.
+
+    Adds signal handling, UNIX Domain Sockets and asynchronous file I/O
+    (file_read(), file_readinto() and file_write()) to the proactor event
+    loop.  Subprocesses and add_reader()/add_writer() are not supported.
+
+    Raise OSError if the kernel does not support io_uring.
+    """
+
+    def __init__(self, proactor=None):
+        if proactor is None:
+            try:
+                proactor = UringProactor()
+            except OSError:
+                # For BaseEventLoop.__del__() of the half-built event loop.
+                self._closed = True
+                raise
+        super().__init__(proactor)
+        self._signal_handlers = {}
+
+    def close(self):
+        super().close()
+        if not sys.is_finalizing():
+            for sig in list(self._signal_handlers):
+                self.remove_signal_handler(sig)
+        elif self._signal_handlers:
+            warnings.warn(f"Closing the loop {self!r} "
+                          f"on interpreter shutdown "
+                          f"stage, skipping signal handlers removal",
+                          ResourceWarning,
+                          source=self)
+            self._signal_handlers.clear()
+
+    # Signals and UNIX Domain Sockets work like in the selector event loop.
+    add_signal_handler = unix_events._UnixSelectorEventLoop.add_signal_handler
+    remove_signal_handler = \
+        unix_events._UnixSelectorEventLoop.remove_signal_handler
+    _handle_signal = unix_events._UnixSelectorEventLoop._handle_signal
+    _check_signal = unix_events._UnixSelectorEventLoop._check_signal
+    _process_self_data = unix_events._UnixSelectorEventLoop._process_self_data
+    create_unix_connection = \
+        unix_events._UnixSelectorEventLoop.create_unix_connection
+    create_unix_server = unix_events._UnixSelectorEventLoop.create_unix_server
+
+    def _make_socket_transport(self, sock, protocol, waiter=None,
+                               extra=None, server=None):
+        return _UringSocketTransport(self, sock, protocol, waiter,
+                                     extra, server)
+
+    def _make_read_pipe_transport(self, sock, protocol, waiter=None,
+                                  extra=None):
+        return _UringReadPipeTransport(self, sock, protocol, waiter, extra)
+
+    def _make_write_pipe_transport(self, sock, protocol, waiter=None,
+                                   extra=None):
+        return _UringWritePipeTransport(self, sock, protocol, waiter, extra)
+
+    def _make_datagram_transport(self, sock, protocol,
+                                 address=None, waiter=None, extra=None):
+        return _UringDatagramTransport(self, sock, protocol, address,
+                                       waiter, extra)
+
+    async def _sock_sendfile_native(self, sock, file, offset, count):
+        # Unlike the base class, move the file position after a partial
+        # transfer, like the selector event loop.
+        try:
+            fileno = file.fileno()
+        except (AttributeError, io.UnsupportedOperation) as err:
+            raise events.SendfileNotAvailableError("not a regular file")
+        try:
+            fsize = os.fstat(fileno).st_size
+        except OSError as err:
+            raise events.SendfileNotAvailableError("not a regular file")
+        blocksize = count if count else fsize
+        if not blocksize:
+            return 0  # empty file
+
+        fd = sock.fileno()
+        total_sent = 0
+        try:
+            while not count or total_sent < count:
+                if count:
+                    blocksize = count - total_sent
+                try:
+                    sent = os.sendfile(fd, fileno, offset + total_sent,
+                                       blocksize)
+                except (BlockingIOError, InterruptedError):
+                    await self._proactor.wait_ready(sock, select.POLLOUT)
+                    continue
+                except OSError as exc:
+                    if total_sent == 0:
+                        # 'file' is not a regular mmap(2)-like file: fall
+                        # back on plain send().
+                        raise events.SendfileNotAvailableError(
+                            "os.sendfile call failed") from exc
+                    if (exc.errno == errno.ENOTCONN and
+                            type(exc) is not ConnectionError):
+                        raise ConnectionError(
+                            "socket is not connected", errno.ENOTCONN) from exc
+                    raise
+                if sent == 0:
+                    break  # EOF
+                total_sent += sent
+            return total_sent
+        finally:
+            if total_sent > 0:
+                os.lseek(fileno, offset + total_sent, os.SEEK_SET)
+
+    def _loop_self_reading(self, f=None):
+        # Signal numbers are written to the self-pipe.
+        if f is not None and not f.cancelled() and f.exception() is None:
+            self._process_self_data(f.result())
+        super()._loop_self_reading(f)
+
+    async def file_read(self, file, n, offset=-1):
+        """Read up to n bytes from file at offset.
+
+        file is a file object or descriptor.  If offset is -1, read at the
+        file position and advance it.
+        """
+        return await self._proactor.read(file, n, offset)
+
+    async def file_readinto(self, file, buf, offset=-1):
+        """Read from file at offset into buf, return the number of bytes."""
+        return await self._proactor.read_into(file, buf, offset)
+
+    async def file_write(self, file, data, offset=-1):
+        """Write all of data to file at offset, see file_read()."""
+        return await self._proactor.write(file, data, offset)
+
+
+class UringEventLoopPolicy(unix_events.DefaultEventLoopPolicy):
+    """Event loop policy creating UringEventLoops.
+
+    SelectorEventLoops are created instead if the kernel does not support
+    io_uring.
+    """
+
+    def _loop_factory(self):
+        try:
+            return UringEventLoop()
+        except OSError as exc:
+            logger.debug('io_uring is not available (%s), using the '
+                         'selector event loop', exc)
+            return unix_events.SelectorEventLoop()
@@ -791,10 +791,24 @@ class FrozenImporter:
 
     @classmethod
     def find_spec(cls, fullname, path=None, target=None):
-        if _imp.is_frozen(fullname):
-            return spec_from_loader(fullname, cls, origin='frozen')
-        else:
+        if not _imp.is_frozen(fullname):
             return None
+        spec = spec_from_loader(fullname, cls, origin='frozen')
+        if (_bootstrap_external is not None and
+                _imp._is_frozen_encrypted(fullname)):
+            # A stdlib module frozen by Tools/scripts/freeze_stdlib.py keeps
+            # the location of its source file in Lib/.
+            is_package = spec.submodule_search_locations is not None
+            origin = _bootstrap_external._frozen_stdlib_origin(fullname,
+                                                               is_package)
+            if origin is not None:
+                spec.origin = origin
+                spec.has_location = True
+            if is_package:
+                # Its submodules that were not frozen are still on disk.
+                spec.submodule_search_locations = (
+                    _bootstrap_external._FrozenPackagePath(fullname))
+        return spec
 
     @classmethod
     def find_module(cls, fullname, path=None):
@@ -816,6 +830,8 @@ class FrozenImporter:
             raise ImportError('{!r} is not a frozen module'.format(name),
                               name=name)
         code = _call_with_frames_removed(_imp.get_frozen_object, name)
+        if module.__spec__.has_location:
+            _imp._fix_co_filename(code, module.__spec__.origin)
         exec(code, module.__dict__)
 
     @classmethod
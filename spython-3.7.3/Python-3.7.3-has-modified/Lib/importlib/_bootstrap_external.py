@@ -43,6 +43,21 @@ def _make_relax_case():
     return _relax_case
 
 
+def _encrypted_cache_enabled():
+    """True if code objects may be cached encrypted next to the .pyc path.
+
+    Enabled with -X encryptedcache or PYTHONENCRYPTEDCACHE (ignored under -E).
+    """
+    if 'encryptedcache' in sys._xoptions:
+        return True
+    if sys.flags.ignore_environment:
+        return False
+    key = 'PYTHONENCRYPTEDCACHE'
+    if not sys.platform.startswith(_CASE_INSENSITIVE_PLATFORMS_STR_KEY):
+        key = key.encode()
+    return bool(_os.environ.get(key))
+
+
 def _w_long(x):
     """Convert a 32-bit integer to little-endian."""
     return (int(x) & 0xFFFFFFFF).to_bytes(4, 'little')
@@ -124,6 +139,17 @@ def _write_atomic(path, data, mode=0o666):
         raise
 
 
+def _read_raw(path):
+    """Return the bytes of the file at path as they are on disk.
+
+    FileIO opened by name decrypts encrypted files; a descriptor from
+    os.open() is read without decryption.
+    """
+    fd = _os.open(path, _os.O_RDONLY)
+    with _io.FileIO(fd, 'r') as file:
+        return file.read()
+
+
 _code_type = type(_write_atomic.__code__)
 
 
@@ -268,6 +294,9 @@ BYTECODE_SUFFIXES = ['.pyc']
 # Deprecated.
 DEBUG_BYTECODE_SUFFIXES = OPTIMIZED_BYTECODE_SUFFIXES = BYTECODE_SUFFIXES
 
+# Suffix of the opt-in encrypted bytecode cache, see SourceLoader.get_code().
+ENCRYPTED_BYTECODE_SUFFIX = '.spyc'
+
 def cache_from_source(path, debug_override=None, *, optimization=None):
     """Given the path to a .py file, return the path to its .pyc file.
 
@@ -771,6 +800,13 @@ class SourceLoader(_LoaderBasics):
         Implementing this method allows for the writing of bytecode files.
         """
 
+    def _get_source_data(self, path):
+        """Return the source at path as a bytes-like object for compiling.
+
+        Defaults to get_data().
+        """
+        return self.get_data(path)
+
 
     def get_source(self, fullname):
         """Concrete implementation of InspectLoader.get_source."""
@@ -786,9 +822,11 @@ class SourceLoader(_LoaderBasics):
         """Return the code object compiled from source.
 
         The 'data' argument can be any object type that compile() supports.
+        _imp._compile_source() calls compile() and times it for
+        -X decrypttime.
         """
-        return _bootstrap._call_with_frames_removed(compile, data, path, 'exec',
-                                        dont_inherit=True, optimize=_optimize)
+        return _bootstrap._call_with_frames_removed(_imp._compile_source,
+                                                    data, path, _optimize)
 
     def get_code(self, fullname):
         """Concrete implementation of InspectLoader.get_code.
@@ -808,6 +846,9 @@ class SourceLoader(_LoaderBasics):
         except NotImplementedError:
             bytecode_path = None
         else:
+            if _encrypted_cache:
+                return self._get_code_encrypted(fullname, source_path,
+                                                bytecode_path)
             try:
                 st = self.path_stats(source_path)
             except OSError:
@@ -832,7 +873,8 @@ class SourceLoader(_LoaderBasics):
                             if (_imp.check_hash_based_pycs != 'never' and
                                 (check_source or
                                  _imp.check_hash_based_pycs == 'always')):
-                                source_bytes = self.get_data(source_path)
+                                source_bytes = self._get_source_data(
+                                    source_path)
                                 source_hash = _imp.source_hash(
                                     _RAW_MAGIC_NUMBER,
                                     source_bytes,
@@ -856,7 +898,7 @@ class SourceLoader(_LoaderBasics):
                                                  bytecode_path=bytecode_path,
                                                  source_path=source_path)
         if source_bytes is None:
-            source_bytes = self.get_data(source_path)
+            source_bytes = self._get_source_data(source_path)
         code_object = self.source_to_code(source_bytes, source_path)
         _bootstrap._verbose_message('code object from {}', source_path)
         if (not sys.dont_write_bytecode and bytecode_path is not None and
@@ -875,6 +917,55 @@ class SourceLoader(_LoaderBasics):
                 pass
         return code_object
 
+    def _get_code_encrypted(self, fullname, source_path, bytecode_path):
+        """Load code through the encrypted bytecode cache.
+
+        The cache holds a checked hash-based pyc encrypted with
+        _spython.encrypt_bytes(), so no plaintext bytecode ever reaches the
+        disk.  It is read raw and has to decrypt: a plaintext file under the
+        cache name, which get_data() would pass through, is a cache miss.
+        It is validated against the hash of the source, which is read
+        anyway, instead of the source mtime.
+
+        """
+        cache_path = (bytecode_path[:-len(BYTECODE_SUFFIXES[0])] +
+                      ENCRYPTED_BYTECODE_SUFFIX)
+        source_bytes = self._get_source_data(source_path)
+        source_hash = _imp.source_hash(_RAW_MAGIC_NUMBER, source_bytes)
+        try:
+            data = _spython.decrypt_bytes(_read_raw(cache_path))
+        except OSError:
+            pass
+        else:
+            exc_details = {
+                'name': fullname,
+                'path': cache_path,
+            }
+            try:
+                flags = _classify_pyc(data, fullname, exc_details)
+                if flags != 0b11:
+                    raise ImportError('unchecked pyc in {!r}'.format(fullname),
+                                      **exc_details)
+                _validate_hash_pyc(data, source_hash, fullname, exc_details)
+            except (ImportError, EOFError):
+                pass
+            else:
+                _bootstrap._verbose_message('{} matches {}', cache_path,
+                                            source_path)
+                return _compile_bytecode(memoryview(data)[16:], name=fullname,
+                                         bytecode_path=cache_path,
+                                         source_path=source_path)
+        code_object = self.source_to_code(source_bytes, source_path)
+        _bootstrap._verbose_message('code object from {}', source_path)
+        data = _code_to_hash_pyc(code_object, source_hash, True)
+        try:
+            self._cache_bytecode(source_path, cache_path,
+                                 _spython.encrypt_bytes(data))
+            _bootstrap._verbose_message('wrote {!r}', cache_path)
+        except NotImplementedError:
+            pass
+        return code_object
+
 
 class FileLoader:
 
@@ -912,9 +1003,12 @@ class FileLoader:
         return self.path
 
     def get_data(self, path):
-        """Return the data from path as raw bytes."""
-        with _io.FileIO(path, 'r') as file:
-            return file.read()
+        """Return the data from path as raw bytes.
+
+        An encrypted file is decrypted by _spython.read_data() straight into
+        memory, and repeatedly read files come from the decryption cache.
+        """
+        return _spython.read_data(path)
 
     # ResourceReader ABC API.
 
@@ -926,6 +1020,10 @@ class FileLoader:
 
     def open_resource(self, resource):
         path = _path_join(_path_split(self.path)[0], resource)
+        # Only an encrypted resource is read into memory, a plain one is
+        # still streamed from the file.
+        if _spython.is_encrypted(path):
+            return _io.BytesIO(self.get_data(path))
         return _io.FileIO(path, 'r')
 
     def resource_path(self, resource):
@@ -953,6 +1051,19 @@ class SourceFileLoader(FileLoader, SourceLoader):
         st = _path_stat(path)
         return {'mtime': st.st_mtime, 'size': st.st_size}
 
+    def _get_source_data(self, path):
+        """Return the source at path for compiling.
+
+        _spython.read_source() decrypts an encrypted source straight into an
+        anonymous mapping and returns a memoryview of it, saving the copies
+        through an in-memory file and FileIO.  Subclasses that override
+        get_data() or source_to_code() still get bytes from get_data().
+        """
+        if (type(self).get_data is not FileLoader.get_data or
+                type(self).source_to_code is not SourceLoader.source_to_code):
+            return self.get_data(path)
+        return _spython.read_source(path)
+
     def _cache_bytecode(self, source_path, bytecode_path, data):
         # Adapt between the two APIs
         mode = _calc_mode(source_path)
@@ -1130,6 +1241,92 @@ class _NamespacePath:
         self._path.append(item)
 
 
+_frozen_stdlib_dir = None
+
+
+def _frozen_stdlib_origin(fullname, is_package):
+    """Return the path of the source file of a stdlib module frozen by
+    Tools/scripts/freeze_stdlib.py, or None if the stdlib directory is not
+    on sys.path.
+
+    The directory is the first entry of sys.path containing os.py, the
+    landmark used by getpath.c; it is looked up once and then cached.
+    """
+    global _frozen_stdlib_dir
+    if _frozen_stdlib_dir is None:
+        for entry in sys.path:
+            if not isinstance(entry, str):
+                continue
+            if _path_isfile(_path_join(entry or _os.getcwd(), 'os.py')):
+                _frozen_stdlib_dir = entry
+                break
+        else:
+            return None
+    parts = fullname.split('.')
+    if is_package:
+        parts.append('__init__.py')
+    else:
+        parts[-1] += '.py'
+    return _path_join(_frozen_stdlib_dir, *parts)
+
+
+class _FrozenPackagePath:
+    """Represents the __path__ of a stdlib package frozen by
+    Tools/scripts/freeze_stdlib.py.  The directory of the package is looked
+    up on the parent path the first time __path__ is used, i.e. when a
+    submodule that was not frozen is imported, so that importing the frozen
+    modules does not touch the file system."""
+
+    def __init__(self, name):
+        self._name = name
+        self._path = None
+
+    def _get_parent_path(self):
+        parent, dot, me = self._name.rpartition('.')
+        if dot == '':
+            return sys.path
+        return sys.modules[parent].__path__
+
+    def _recalculate(self):
+        if self._path is None:
+            # Only look for a plain directory: the path hooks may import
+            # submodules of this package themselves (zipimport needs
+            # encodings.cp437), which would recurse back here.
+            tail = self._name.rpartition('.')[2]
+            for entry in self._get_parent_path():
+                if not isinstance(entry, str):
+                    continue
+                directory = _path_join(entry or _os.getcwd(), tail)
+                if _path_isfile(_path_join(directory, '__init__.py')):
+                    self._path = [directory]
+                    break
+            else:
+                # Not found (yet), look again next time.
+                return []
+        return self._path
+
+    def __iter__(self):
+        return iter(self._recalculate())
+
+    def __setitem__(self, index, path):
+        self._recalculate()[index] = path
+
+    def __len__(self):
+        return len(self._recalculate())
+
+    def __repr__(self):
+        return '_FrozenPackagePath({!r})'.format(self._name)
+
+    def __contains__(self, item):
+        return item in self._recalculate()
+
+    def append(self, item):
+        self._recalculate()
+        if self._path is None:
+            self._path = []
+        self._path.append(item)
+
+
 # We use this exclusively in module_from_spec() for backward-compatibility.
 class _NamespaceLoader:
     def __init__(self, name, path, path_finder):
@@ -1504,7 +1701,8 @@ def _setup(_bootstrap_module):
 
     # Directly load built-in modules needed during bootstrap.
     self_module = sys.modules[__name__]
-    for builtin_name in ('_io', '_warnings', 'builtins', 'marshal'):
+    for builtin_name in ('_io', '_warnings', 'builtins', 'marshal',
+                         '_spython'):
         if builtin_name not in sys.modules:
             builtin_module = _bootstrap._builtin_from_name(builtin_name)
         else:
@@ -1547,6 +1745,7 @@ def _setup(_bootstrap_module):
 
     # Constants
     setattr(self_module, '_relax_case', _make_relax_case())
+    setattr(self_module, '_encrypted_cache', _encrypted_cache_enabled())
     EXTENSION_SUFFIXES.extend(_imp.extension_suffixes())
     if builtin_os == 'nt':
         SOURCE_SUFFIXES.append('.pyw')
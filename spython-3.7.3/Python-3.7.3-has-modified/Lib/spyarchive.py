@@ -0,0 +1,316 @@
+"""Import modules from an spython encrypted archive.
+
+An archive (conventionally ``*.spya``) packs many encrypted files into one
+indexed file, so importing N modules costs one open() and one mmap() instead
+of an open, header read and decrypt per module plus a stat per sys.path
+entry.  Layout, all integers little endian:
+
+    header   magic b"SPYARC", version (u8), flags (u8),
+             offset (u64) and size (u64) of the table of contents
+    members  each file encrypted on its own, in the spython container format
+    toc      encrypted as well: count (u32), then for every member
+             name size (u16), offset (u64), size (u64), UTF-8 name
+
+Member names are paths relative to the archive root, using "/".  Only the
+table of contents is decrypted when the archive is opened; members are
+decrypted on demand.
+
+    import spyarchive
+    spyarchive.install("app.spya")
+    import app.main
+
+Archives are built with ``spython-enc --archive`` or write_archive().
+"""
+
+import errno
+import io
+import mmap
+import os
+import struct
+import sys
+
+import _spython
+
+__all__ = ["ArchiveError", "EncryptedArchive", "ArchiveFinder",
+           "install", "write_archive"]
+
+ARCHIVE_MAGIC = b"SPYARC"
+ARCHIVE_VERSION = 1
+
+_HEADER = struct.Struct("<6sBBQQ")
+_COUNT = struct.Struct("<I")
+_ENTRY = struct.Struct("<HQQ")
+_SOURCE_SUFFIX = ".py"
+
+if sys.version_info[0] >= 3:
+    from importlib.util import decode_source, spec_from_loader
+
+    def _slice(buf, offset, size):
+        return memoryview(buf)[offset:offset + size]
+
+    def _member_name(raw):
+        return raw.decode("utf-8")
+else:
+    import imp
+
+    def _slice(buf, offset, size):
+        return buffer(buf, offset, size)
+
+    def _member_name(raw):
+        return raw
+
+
+class ArchiveError(ImportError):
+    pass
+
+
+class EncryptedArchive(object):
+    """A read-only, memory mapped encrypted archive."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, EnvironmentError) as e:
+                raise ArchiveError("can't map %r: %s" % (path, e))
+        try:
+            self._members = self._read_toc()
+        except:
+            self._map.close()
+            raise
+
+    def _read_toc(self):
+        if len(self._map) < _HEADER.size:
+            raise ArchiveError("%r is not an spython archive" % self.path)
+        magic, version, flags, offset, size = _HEADER.unpack_from(self._map)
+        if magic != ARCHIVE_MAGIC:
+            raise ArchiveError("%r is not an spython archive" % self.path)
+        if version != ARCHIVE_VERSION:
+            raise ArchiveError("%r: unsupported archive version %d"
+                               % (self.path, version))
+        toc = self._decrypt(offset, size)
+        members = {}
+        count, = _COUNT.unpack_from(toc)
+        pos = _COUNT.size
+        for _ in range(count):
+            name_size, offset, size = _ENTRY.unpack_from(toc, pos)
+            pos += _ENTRY.size
+            name = _member_name(toc[pos:pos + name_size])
+            pos += name_size
+            if offset + size > len(self._map):
+                raise ArchiveError("%r: member %r is truncated"
+                                   % (self.path, name))
+            members[name] = (offset, size)
+        return members
+
+    def _decrypt(self, offset, size):
+        try:
+            return _spython.decrypt_bytes(_slice(self._map, offset, size))
+        except (OSError, struct.error) as e:
+            raise ArchiveError("%r: can't decrypt: %s" % (self.path, e))
+
+    def names(self):
+        return list(self._members)
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def read(self, name):
+        """Decrypt and return the contents of a member."""
+        try:
+            offset, size = self._members[name]
+        except KeyError:
+            raise KeyError("no member %r in %r" % (name, self.path))
+        return self._decrypt(offset, size)
+
+    def close(self):
+        self._map.close()
+
+
+class ArchiveFinder(object):
+    """Meta path finder and loader for the modules of an encrypted archive.
+
+    Modeled on zipimport: module ``a.b`` is ``a/b.py`` or the package
+    ``a/b/__init__.py`` inside the archive, and __file__ is the archive path
+    joined with the member name.  Sources are decrypted when the module is
+    executed, not when the archive is opened.
+    """
+
+    def __init__(self, path):
+        self.archive = EncryptedArchive(path)
+        self.path = self.archive.path
+        self._modules = {}
+        for name in self.archive.names():
+            if not name.endswith(_SOURCE_SUFFIX):
+                continue
+            parts = name[:-len(_SOURCE_SUFFIX)].split("/")
+            is_package = parts[-1] == "__init__"
+            if is_package:
+                del parts[-1]
+            if parts:
+                fullname = ".".join(parts)
+                # A package wins over a module of the same name.
+                if is_package or fullname not in self._modules:
+                    self._modules[fullname] = (name, is_package)
+
+    def __repr__(self):
+        return "<%s for %r>" % (self.__class__.__name__, self.path)
+
+    def _entry(self, fullname):
+        try:
+            return self._modules[fullname]
+        except KeyError:
+            raise ArchiveError("can't find module %r" % fullname)
+
+    # Finder API.
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname not in self._modules:
+            return None
+        member, is_package = self._modules[fullname]
+        spec = spec_from_loader(fullname, self,
+                                origin=self.get_filename(fullname),
+                                is_package=is_package)
+        spec.has_location = True
+        if is_package:
+            spec.submodule_search_locations = [
+                os.path.dirname(spec.origin)]
+        return spec
+
+    def find_module(self, fullname, path=None):
+        if fullname in self._modules:
+            return self
+        return None
+
+    def invalidate_caches(self):
+        pass
+
+    # Loader API.
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        code = self.get_code(module.__name__)
+        exec(code, module.__dict__)
+
+    def load_module(self, fullname):
+        # PEP 302 loading, used by Python 2.
+        code = self.get_code(fullname)
+        module = sys.modules.get(fullname)
+        if module is None:
+            module = sys.modules[fullname] = imp.new_module(fullname)
+        module.__file__ = self.get_filename(fullname)
+        module.__loader__ = self
+        if self.is_package(fullname):
+            module.__path__ = [os.path.dirname(module.__file__)]
+            module.__package__ = fullname
+        else:
+            module.__package__ = fullname.rpartition(".")[0]
+        try:
+            exec(code, module.__dict__)
+        except:
+            sys.modules.pop(fullname, None)
+            raise
+        return sys.modules[fullname]
+
+    def is_package(self, fullname):
+        return self._entry(fullname)[1]
+
+    def get_filename(self, fullname):
+        member = self._entry(fullname)[0]
+        return os.path.join(self.path, *member.split("/"))
+
+    def get_source(self, fullname):
+        data = self.archive.read(self._entry(fullname)[0])
+        if sys.version_info[0] >= 3:
+            return decode_source(data)
+        return data
+
+    def get_code(self, fullname):
+        data = self.archive.read(self._entry(fullname)[0])
+        return compile(data, self.get_filename(fullname), "exec",
+                       dont_inherit=True)
+
+    def get_data(self, pathname):
+        """Return the decrypted contents of an archive member.
+
+        pathname is a path below the archive, as returned by get_filename().
+        """
+        prefix = self.path + os.sep
+        if pathname.startswith(prefix):
+            pathname = pathname[len(prefix):]
+        name = pathname.replace(os.sep, "/")
+        if name not in self.archive:
+            raise IOError(0, "no such member in archive", pathname)
+        return self.archive.read(name)
+
+    def get_resource_reader(self, fullname):
+        """Return a reader for importlib.resources if fullname is a package."""
+        try:
+            if not self.is_package(fullname):
+                return None
+        except ArchiveError:
+            return None
+        return _ArchiveResourceReader(self, fullname)
+
+
+class _ArchiveResourceReader(object):
+    """importlib.resources reader for the files of a package in an archive.
+
+    Resources are decrypted into memory; they have no path on disk.
+    """
+
+    def __init__(self, finder, fullname):
+        self.archive = finder.archive
+        self.prefix = fullname.replace(".", "/") + "/"
+
+    def open_resource(self, resource):
+        name = self.prefix + resource
+        if name not in self.archive:
+            raise IOError(errno.ENOENT, "no such member in archive", resource)
+        return io.BytesIO(self.archive.read(name))
+
+    def resource_path(self, resource):
+        raise IOError(errno.ENOENT, "archive members have no path", resource)
+
+    def is_resource(self, name):
+        return self.prefix + name in self.archive
+
+    def contents(self):
+        names = set()
+        for name in self.archive.names():
+            if name.startswith(self.prefix):
+                names.add(name[len(self.prefix):].split("/")[0])
+        return iter(names)
+
+
+def install(path, index=0):
+    """Insert an ArchiveFinder for the archive at path into sys.meta_path."""
+    finder = ArchiveFinder(path)
+    sys.meta_path.insert(index, finder)
+    return finder
+
+
+def write_archive(target, members):
+    """Write an archive from an iterable of (name, bytes) pairs."""
+    entries = []
+    with open(target, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        for name, data in members:
+            blob = _spython.encrypt_bytes(data)
+            if not isinstance(name, bytes):
+                name = name.encode("utf-8")
+            entries.append((name, f.tell(), len(blob)))
+            f.write(blob)
+        toc = [_COUNT.pack(len(entries))]
+        for name, offset, size in entries:
+            toc.append(_ENTRY.pack(len(name), offset, size))
+            toc.append(name)
+        blob = _spython.encrypt_bytes(b"".join(toc))
+        toc_offset = f.tell()
+        f.write(blob)
+        f.seek(0)
+        f.write(_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, 0,
+                             toc_offset, len(blob)))
@@ -2596,6 +2596,7 @@ if sys.platform == 'win32':
             raise unittest.SkipTest("IocpEventLoop does not have add_reader()")
 else:
     import selectors
+    from asyncio import uring_events
 
     class UnixEventLoopTestsMixin(EventLoopTestsMixin,
                                   SendfileMixin,
@@ -2660,6 +2661,44 @@ else:
         def create_event_loop(self):
             return asyncio.SelectorEventLoop(selectors.SelectSelector())
 
+    @unittest.skipUnless(test_utils.has_uring(), 'requires io_uring')
+    class UringEventLoopTests(EventLoopTestsMixin,
+                              SendfileMixin,
+                              SockSendfileMixin,
+                              test_utils.TestCase):
+
+        def create_event_loop(self):
+            return uring_events.UringEventLoop()
+
+        def test_reader_callback(self):
+            raise unittest.SkipTest("UringEventLoop does not have add_reader()")
+
+        def test_reader_callback_cancel(self):
+            raise unittest.SkipTest("UringEventLoop does not have add_reader()")
+
+        def test_writer_callback(self):
+            raise unittest.SkipTest("UringEventLoop does not have add_writer()")
+
+        def test_writer_callback_cancel(self):
+            raise unittest.SkipTest("UringEventLoop does not have add_writer()")
+
+        def test_remove_fds_after_closing(self):
+            raise unittest.SkipTest("UringEventLoop does not have add_reader()")
+
+        # The tests read the pipe right after write(), but UringEventLoop
+        # only submits writes when the event loop runs.
+        def test_write_pipe(self):
+            raise unittest.SkipTest("UringEventLoop writes asynchronously")
+
+        def test_write_pty(self):
+            raise unittest.SkipTest("UringEventLoop writes asynchronously")
+
+        def test_bidirectional_pty(self):
+            raise unittest.SkipTest("UringEventLoop writes asynchronously")
+
+        def test_unclosed_pipe_transport(self):
+            raise unittest.SkipTest("proactor pipe transports have another repr")
+
 
 def noop(*args, **kwargs):
     pass
@@ -0,0 +1,415 @@
+"""Tests for resolvers.py"""
+
+import os
+import socket
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import asyncio
+from asyncio import resolvers
+from test import support
+from test.test_asyncio import utils as test_utils
+
+
+A = resolvers._TYPE_A
+AAAA = resolvers._TYPE_AAAA
+CNAME = resolvers._TYPE_CNAME
+
+
+class FakeResolver(asyncio.AbstractResolver):
+    """Return canned results, remembering the hosts asked for."""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    async def resolve(self, host, port, family, type, proto, flags):
+        self.calls.append(host)
+        await asyncio.sleep(0)
+        result = self.results[host]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class StubDnsServer(asyncio.DatagramProtocol):
+    """Answer DNS queries from zone, {(name, type): records}.
+
+    records is a list of (owner, type, ttl, value); an owner of None is
+    compressed to a pointer at the question.  Names missing from zone
+    get NXDOMAIN; a value of 'drop' is never answered and 'truncate' sets
+    the TC flag.
+    """
+
+    def __init__(self, zone):
+        self.zone = zone
+        self.queries = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query_id, flags = struct.unpack_from('!HH', data)
+        name, offset = resolvers._read_name(data, 12)
+        qtype, = struct.unpack_from('!H', data, offset)
+        question = data[12:offset + 4]
+        self.queries.append((name, qtype))
+        records = self.zone.get((name, qtype))
+        flags = 0x8180
+        if records == 'drop':
+            return
+        if records == 'truncate':
+            flags |= resolvers._FLAG_TC
+            records = []
+        elif records is None:
+            flags |= resolvers._RCODE_NXDOMAIN
+            records = []
+        answer = []
+        for owner, rtype, ttl, value in records:
+            if rtype == A:
+                rdata = socket.inet_pton(socket.AF_INET, value)
+            elif rtype == AAAA:
+                rdata = socket.inet_pton(socket.AF_INET6, value)
+            else:
+                rdata = resolvers._encode_name(value)
+            owner = (b'\xc0\x0c' if owner is None
+                     else resolvers._encode_name(owner))
+            answer.append(owner + resolvers._RR.pack(rtype, 1, ttl,
+                                                     len(rdata)) + rdata)
+        reply = (resolvers._HEADER.pack(query_id, flags, 1, len(answer), 0, 0)
+                 + question + b''.join(answer))
+        self.transport.sendto(reply, addr)
+
+
+class ParserTests(unittest.TestCase):
+
+    def test_parse_hosts(self):
+        hosts = resolvers._parse_hosts(
+            b'# comment\n'
+            b'127.0.0.1 localhost Local # trailing\n'
+            b'::1 localhost ip6-localhost\n'
+            b'10.0.0.1\n'
+            b'bogus name\n')
+        self.assertEqual(hosts[b'localhost'],
+                         [(socket.AF_INET, '127.0.0.1'),
+                          (socket.AF_INET6, '::1')])
+        self.assertEqual(hosts[b'local'], [(socket.AF_INET, '127.0.0.1')])
+        self.assertNotIn(b'name', hosts)
+
+    def test_parse_resolv_conf(self):
+        nameservers, search, options = resolvers._parse_resolv_conf(
+            b'nameserver 10.0.0.53\n'
+            b'; comment\n'
+            b'domain ignored.example\n'
+            b'search Example.com. corp.example.com\n'
+            b'nameserver ::1\n'
+            b'options timeout:2 attempts:3 rotate\n')
+        self.assertEqual(nameservers, ['10.0.0.53', '::1'])
+        self.assertEqual(search, [b'example.com', b'corp.example.com'])
+        self.assertEqual(options, {'timeout': 2, 'attempts': 3})
+
+    def test_read_compressed_name(self):
+        data = b'\x03www\x07example\x03com\x00\x04mail\xc0\x04'
+        self.assertEqual(resolvers._read_name(data, 0),
+                         (b'www.example.com', 17))
+        self.assertEqual(resolvers._read_name(data, 17),
+                         (b'mail.example.com', 24))
+        self.assertRaises(ValueError, resolvers._read_name, b'\xc0\x00', 0)
+
+    def test_encode_name(self):
+        self.assertEqual(resolvers._encode_name(b'a.bc'), b'\x01a\x02bc\x00')
+        self.assertRaises(socket.gaierror, resolvers._encode_name, b'a..b')
+        self.assertRaises(socket.gaierror, resolvers._encode_name,
+                          b'x' * 64)
+
+
+class _ResolverTestCase(test_utils.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.unpatch_get_running_loop()
+        self.loop = asyncio.new_event_loop()
+        self.set_event_loop(self.loop)
+
+    def resolve(self, resolver, host, port=80, family=0,
+                type=socket.SOCK_STREAM, proto=0, flags=0):
+        return self.loop.run_until_complete(
+            resolver.resolve(host, port, family, type, proto, flags))
+
+
+class CachingResolverTests(_ResolverTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.infos = [(socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                       ('10.0.0.1', 80))]
+        self.fake = FakeResolver({
+            'good': (self.infos, None),
+            'short': (self.infos, 2),
+            'missing': socket.gaierror(socket.EAI_NONAME, 'not known'),
+            'flaky': socket.gaierror(socket.EAI_AGAIN, 'try again'),
+        })
+
+    def test_positive(self):
+        resolver = asyncio.CachingResolver(self.fake, ttl=30)
+        for i in range(3):
+            infos, ttl = self.resolve(resolver, 'good')
+            self.assertEqual(infos, self.infos)
+            self.assertLessEqual(ttl, 30)
+        self.assertEqual(self.fake.calls, ['good'])
+        info = resolver.cache_info()
+        self.assertEqual((info['hits'], info['misses'], info['entries']),
+                         (2, 1, 1))
+
+    def test_ttl(self):
+        resolver = asyncio.CachingResolver(self.fake, ttl=30, max_ttl=60)
+        now = self.loop.time()
+        with mock.patch.object(self.loop, 'time', return_value=now):
+            self.assertEqual(self.resolve(resolver, 'short')[1], 2)
+            self.resolve(resolver, 'good')
+        with mock.patch.object(self.loop, 'time', return_value=now + 10):
+            self.resolve(resolver, 'short')
+            self.resolve(resolver, 'good')
+        self.assertEqual(self.fake.calls, ['short', 'good', 'short'])
+
+        self.fake.results['long'] = (self.infos, 86400)
+        self.assertEqual(self.resolve(resolver, 'long')[1], 60)
+
+    def test_negative(self):
+        resolver = asyncio.CachingResolver(self.fake, negative_ttl=5)
+        for i in range(2):
+            with self.assertRaises(socket.gaierror) as cm:
+                self.resolve(resolver, 'missing')
+            self.assertEqual(cm.exception.errno, socket.EAI_NONAME)
+            with self.assertRaises(socket.gaierror):
+                self.resolve(resolver, 'flaky')
+        # Temporary failures are not cached.
+        self.assertEqual(self.fake.calls, ['missing', 'flaky', 'flaky'])
+
+        resolver = asyncio.CachingResolver(self.fake, negative_ttl=0)
+        for i in range(2):
+            with self.assertRaises(socket.gaierror):
+                self.resolve(resolver, 'missing')
+        self.assertEqual(self.fake.calls.count('missing'), 3)
+
+    def test_coalescing(self):
+        resolver = asyncio.CachingResolver(self.fake)
+
+        async def lookups():
+            return await asyncio.gather(
+                *[resolver.getaddrinfo('good', 80) for i in range(10)])
+
+        results = self.loop.run_until_complete(lookups())
+        self.assertEqual(results, [self.infos] * 10)
+        self.assertEqual(self.fake.calls, ['good'])
+        self.assertEqual(resolver.cache_info()['shared'], 9)
+
+    def test_cancelled_waiter(self):
+        resolver = asyncio.CachingResolver(self.fake)
+
+        async def lookups():
+            first = self.loop.create_task(resolver.getaddrinfo('good', 80))
+            second = self.loop.create_task(resolver.getaddrinfo('good', 80))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(self.loop.run_until_complete(lookups()), self.infos)
+        self.assertEqual(self.fake.calls, ['good'])
+
+    def test_maxsize(self):
+        for host in 'abc':
+            self.fake.results[host] = (self.infos, None)
+        resolver = asyncio.CachingResolver(self.fake, maxsize=2)
+        for host in 'abac':
+            self.resolve(resolver, host)
+        # b was the least recently used when c was added.
+        self.resolve(resolver, 'a')
+        self.resolve(resolver, 'b')
+        self.assertEqual(self.fake.calls, ['a', 'b', 'c', 'b'])
+        self.assertEqual(resolver.cache_info()['entries'], 2)
+
+    def test_loop_resolver(self):
+        resolver = asyncio.CachingResolver(self.fake)
+        self.assertIsNone(self.loop.get_resolver())
+        self.loop.set_resolver(resolver)
+        self.assertIs(self.loop.get_resolver(), resolver)
+        infos = self.loop.run_until_complete(
+            self.loop.getaddrinfo('good', 80, type=socket.SOCK_STREAM))
+        self.assertEqual(infos, self.infos)
+        self.loop.set_resolver(None)
+        self.assertIsNone(self.loop.get_resolver())
+
+
+class DnsResolverTests(_ResolverTestCase):
+
+    zone = {
+        (b'www.example.com', A): [(None, A, 300, '192.0.2.1'),
+                                  (None, A, 60, '192.0.2.2')],
+        (b'www.example.com', AAAA): [(None, AAAA, 120, '2001:db8::1')],
+        (b'alias.example.com', A): [
+            (None, CNAME, 30, b'www.example.com'),
+            (b'www.example.com', A, 300, '192.0.2.1')],
+        (b'alias.example.com', AAAA): [
+            (None, CNAME, 30, b'www.example.com')],
+        (b'v4only.example.com', A): [(None, A, 300, '192.0.2.9')],
+        (b'v4only.example.com', AAAA): [],
+        (b'slow.example.com', A): 'drop',
+        (b'slow.example.com', AAAA): 'drop',
+        (b'big.example.com', A): 'truncate',
+        (b'big.example.com', AAAA): 'truncate',
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.server = StubDnsServer(self.zone)
+        transport, _ = self.loop.run_until_complete(
+            self.loop.create_datagram_endpoint(
+                lambda: self.server, local_addr=('127.0.0.1', 0)))
+        self.addCleanup(transport.close)
+        self.address = transport.get_extra_info('sockname')
+        fd, self.hosts = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(support.unlink, self.hosts)
+        with open(self.hosts, 'wb') as f:
+            f.write(b'10.0.0.7 intranet intranet.example.com\n')
+
+    def new_resolver(self, **kwargs):
+        kwargs.setdefault('timeout', 0.2)
+        kwargs.setdefault('attempts', 1)
+        kwargs.setdefault('search', [])
+        return asyncio.DnsResolver([self.address], hosts_file=self.hosts,
+                                   resolv_conf=None, **kwargs)
+
+    def addresses(self, infos):
+        return [info[4][0] for info in infos]
+
+    def test_a_and_aaaa(self):
+        infos, ttl = self.resolve(self.new_resolver(), 'www.example.com')
+        self.assertEqual(self.addresses(infos),
+                         ['192.0.2.1', '192.0.2.2', '2001:db8::1'])
+        self.assertEqual(infos[0][:3],
+                         (socket.AF_INET, socket.SOCK_STREAM,
+                          socket.IPPROTO_TCP))
+        self.assertEqual(infos[0][4], ('192.0.2.1', 80))
+        self.assertEqual(ttl, 60)
+
+        infos, ttl = self.resolve(self.new_resolver(), 'WWW.example.com.',
+                                  family=socket.AF_INET6)
+        self.assertEqual(self.addresses(infos), ['2001:db8::1'])
+        self.assertEqual(ttl, 120)
+        self.assertEqual(self.server.queries[-1], (b'www.example.com', AAAA))
+
+    def test_cname(self):
+        infos, ttl = self.resolve(self.new_resolver(), 'alias.example.com',
+                                  family=socket.AF_INET,
+                                  flags=socket.AI_CANONNAME)
+        self.assertEqual(self.addresses(infos), ['192.0.2.1'])
+        self.assertEqual(infos[0][3], 'www.example.com')
+        self.assertEqual(ttl, 30)
+
+    def test_no_aaaa(self):
+        infos, ttl = self.resolve(self.new_resolver(), 'v4only.example.com')
+        self.assertEqual(self.addresses(infos), ['192.0.2.9'])
+        with self.assertRaises(socket.gaierror) as cm:
+            self.resolve(self.new_resolver(), 'v4only.example.com',
+                         family=socket.AF_INET6)
+        self.assertEqual(cm.exception.errno, socket.EAI_NONAME)
+
+    def test_nxdomain(self):
+        with self.assertRaises(socket.gaierror) as cm:
+            self.resolve(self.new_resolver(), 'missing.example.com')
+        self.assertEqual(cm.exception.errno, socket.EAI_NONAME)
+
+    def test_timeout(self):
+        with self.assertRaises(socket.gaierror) as cm:
+            self.resolve(self.new_resolver(timeout=0.05, attempts=2),
+                         'slow.example.com')
+        self.assertEqual(cm.exception.errno, socket.EAI_AGAIN)
+        self.assertEqual(self.server.queries.count(
+            (b'slow.example.com', A)), 2)
+
+    def test_search(self):
+        resolver = self.new_resolver(search=['nowhere.test', 'example.com'])
+        infos, ttl = self.resolve(resolver, 'www', family=socket.AF_INET)
+        self.assertEqual(self.addresses(infos), ['192.0.2.1', '192.0.2.2'])
+        self.assertEqual(self.server.queries,
+                         [(b'www.nowhere.test', A), (b'www.example.com', A)])
+
+    def test_hosts_file(self):
+        resolver = self.new_resolver()
+        infos, ttl = self.resolve(resolver, 'Intranet')
+        self.assertEqual(self.addresses(infos), ['10.0.0.7'])
+        self.assertIsNone(ttl)
+        self.assertEqual(self.server.queries, [])
+        # Like glibc, a family missing from the hosts file is asked for.
+        with self.assertRaises(socket.gaierror):
+            self.resolve(resolver, 'intranet', family=socket.AF_INET6)
+        self.assertEqual(self.server.queries, [(b'intranet', AAAA)])
+
+    def test_numeric(self):
+        resolver = self.new_resolver()
+        infos, ttl = self.resolve(resolver, '192.0.2.55', port='80')
+        self.assertEqual(infos[0][4], ('192.0.2.55', 80))
+        self.assertEqual(self.addresses(self.resolve(resolver, '::1')[0]),
+                         ['::1'])
+        with self.assertRaises(socket.gaierror):
+            self.resolve(resolver, 'www.example.com',
+                         flags=socket.AI_NUMERICHOST)
+        self.assertEqual(self.server.queries, [])
+
+    def test_truncated_falls_back(self):
+        resolver = self.new_resolver()
+        infos = [(socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                  ('192.0.2.100', 80))]
+        resolver._fallback = FakeResolver({'big.example.com': (infos, None)})
+        self.assertEqual(self.resolve(resolver, 'big.example.com'),
+                         (infos, None))
+
+    def test_unanswered_server_is_skipped(self):
+        # Nothing listens on the first server: the ICMP error or the
+        # timeout moves on to the next one.
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        dead = sock.getsockname()
+        sock.close()
+        resolver = asyncio.DnsResolver([dead, self.address], timeout=0.2,
+                                       attempts=1, search=[],
+                                       hosts_file=None, resolv_conf=None)
+        infos, ttl = self.resolve(resolver, 'www.example.com',
+                                  family=socket.AF_INET)
+        self.assertEqual(self.addresses(infos), ['192.0.2.1', '192.0.2.2'])
+
+    def test_resolv_conf(self):
+        with open(self.hosts, 'wb') as f:
+            f.write(b'nameserver %s\nsearch example.com\noptions timeout:1\n'
+                    % self.address[0].encode())
+        resolver = asyncio.DnsResolver(resolv_conf=self.hosts,
+                                       hosts_file=None)
+        resolver._configure()
+        self.assertEqual(resolver._nameservers, [(self.address[0], 53)])
+        self.assertEqual(resolver._search, [b'example.com'])
+        self.assertEqual(resolver._timeout, 1)
+        self.assertEqual(resolver._attempts, 2)
+
+    def test_with_cache_on_loop(self):
+        self.loop.set_resolver(asyncio.CachingResolver(self.new_resolver()))
+
+        async def lookups():
+            return await asyncio.gather(*[
+                self.loop.getaddrinfo('www.example.com', 443,
+                                      family=socket.AF_INET,
+                                      type=socket.SOCK_STREAM)
+                for i in range(5)])
+
+        for i in range(2):
+            results = self.loop.run_until_complete(lookups())
+            self.assertEqual([self.addresses(infos) for infos in results],
+                             [['192.0.2.1', '192.0.2.2']] * 5)
+        self.assertEqual(self.server.queries, [(b'www.example.com', A)])
+
+
+if __name__ == '__main__':
+    unittest.main()
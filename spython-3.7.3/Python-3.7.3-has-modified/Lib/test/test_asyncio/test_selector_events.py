@@ -11,9 +11,11 @@ except ImportError:
     ssl = None
 
 import asyncio
+from asyncio import selector_events
 from asyncio.selector_events import BaseSelectorEventLoop
 from asyncio.selector_events import _SelectorTransport
 from asyncio.selector_events import _SelectorSocketTransport
+from asyncio.selector_events import _SelectorSslTransport
 from asyncio.selector_events import _SelectorDatagramTransport
 from test.test_asyncio import utils as test_utils
 
@@ -36,6 +38,13 @@ def list_to_buffer(l=()):
     return bytearray().join(l)
 
 
+def fill_buffer(transport, *chunks):
+    # Put data in the write buffer of a socket transport.
+    for data in chunks:
+        transport._buffer.append(data)
+        transport._buffer_size += len(data)
+
+
 def close_transport(transport):
     # Don't call transport.close() because the event loop and the selector
     # are mocked
@@ -1067,18 +1076,44 @@ class SelectorSocketTransportTests(test_utils.TestCase):
 
     def test_write_no_data(self):
         transport = self.socket_transport()
-        transport._buffer.extend(b'data')
+        fill_buffer(transport, b'data')
         transport.write(b'')
         self.assertFalse(self.sock.send.called)
-        self.assertEqual(list_to_buffer([b'data']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'data'])
 
     def test_write_buffer(self):
         transport = self.socket_transport()
-        transport._buffer.extend(b'data1')
+        fill_buffer(transport, b'data1')
         transport.write(b'data2')
         self.assertFalse(self.sock.send.called)
-        self.assertEqual(list_to_buffer([b'data1', b'data2']),
-                         transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'data1', b'data2'])
+        self.assertEqual(transport.get_write_buffer_size(), 10)
+
+    def test_write_buffer_coalesce(self):
+        transport = self.socket_transport()
+        fill_buffer(transport, b'data1')
+        transport.write(b'data2')
+        transport.write(memoryview(b'data3'))
+        self.assertEqual(list(transport._buffer), [b'data1', b'data2data3'])
+        self.assertEqual(transport.get_write_buffer_size(), 15)
+
+    def test_write_buffer_no_copy(self):
+        transport = self.socket_transport()
+        fill_buffer(transport, b'data1')
+        data = b'x' * selector_events._ZERO_COPY_SIZE
+        transport.write(data)
+        self.assertIs(transport._buffer[-1], data)
+        transport.write(b'data2')
+        self.assertEqual(list(transport._buffer), [b'data1', data, b'data2'])
+
+    def test_write_buffer_bytearray_copied(self):
+        transport = self.socket_transport()
+        fill_buffer(transport, b'data1')
+        data = bytearray(selector_events._ZERO_COPY_SIZE)
+        transport.write(data)
+        data[:] = b'xxxxx'
+        self.assertEqual(list(transport._buffer),
+                         [b'data1', bytes(selector_events._ZERO_COPY_SIZE)])
 
     def test_write_partial(self):
         data = b'data'
@@ -1088,7 +1123,8 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'ta']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'ta'])
+        self.assertEqual(transport.get_write_buffer_size(), 2)
 
     def test_write_partial_bytearray(self):
         data = bytearray(b'data')
@@ -1098,7 +1134,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'ta']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'ta'])
         self.assertEqual(data, bytearray(b'data'))  # Hasn't been mutated.
 
     def test_write_partial_memoryview(self):
@@ -1109,7 +1145,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'ta']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'ta'])
 
     def test_write_partial_none(self):
         data = b'data'
@@ -1120,7 +1156,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'data']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'data'])
 
     def test_write_tryagain(self):
         self.sock.send.side_effect = BlockingIOError
@@ -1130,7 +1166,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'data']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'data'])
 
     @mock.patch('asyncio.selector_events.logger')
     def test_write_exception(self, m_log):
@@ -1166,16 +1202,85 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(b'data')
         self.assertEqual(transport._conn_lost, 2)
 
+    def test_writelines(self):
+        self.sock.send.return_value = 9
+        transport = self.socket_transport()
+        transport.writelines([b'head', bytearray(b'body'), memoryview(b'!')])
+        self.sock.send.assert_called_once_with(b'headbody!')
+        self.assertFalse(self.sock.sendmsg.called)
+        self.assertFalse(transport._buffer)
+        self.assertFalse(self.loop.writers)
+
+    def test_writelines_sendmsg(self):
+        body = b'x' * selector_events._ZERO_COPY_SIZE
+        self.sock.sendmsg.return_value = len(body) + 4
+        transport = self.socket_transport()
+        transport.writelines([b'head', body])
+        self.sock.sendmsg.assert_called_once_with(mock.ANY)
+        self.assertFalse(transport._buffer)
+        self.assertFalse(self.loop.writers)
+
+    def test_writelines_partial(self):
+        body = b'x' * selector_events._ZERO_COPY_SIZE
+        sent = []
+
+        def sendmsg(buffers):
+            sent.append([bytes(b) for b in buffers])
+            return 6
+
+        self.sock.sendmsg.side_effect = sendmsg
+        transport = self.socket_transport()
+        transport.writelines([b'head', body])
+        self.assertEqual(sent, [[b'head', body]])
+        self.loop.assert_writer(7, transport._write_ready)
+        self.assertEqual(list(transport._buffer), [body[2:]])
+        self.assertIs(transport._buffer[0].obj, body)
+        self.assertEqual(transport.get_write_buffer_size(), len(body) - 2)
+
+    def test_writelines_no_copy(self):
+        self.sock.sendmsg.side_effect = BlockingIOError
+        size = selector_events._ZERO_COPY_SIZE
+        body1, body2 = b'1' * size, memoryview(b'2' * size)
+        transport = self.socket_transport()
+        transport.writelines([b'h1', body1, b'h', b'2', body2, b'', b'end'])
+        self.assertEqual(list(transport._buffer),
+                         [b'h1', body1, b'h2', body2, b'end'])
+        self.assertIs(transport._buffer[1], body1)
+        self.assertIs(transport._buffer[3].obj, body2.obj)
+        self.assertEqual(transport.get_write_buffer_size(), 2 * size + 7)
+        self.loop.assert_writer(7, transport._write_ready)
+
+    def test_writelines_buffer(self):
+        transport = self.socket_transport()
+        fill_buffer(transport, b'data')
+        transport.writelines([b'head', b'body'])
+        self.assertFalse(self.sock.sendmsg.called)
+        self.assertEqual(list(transport._buffer), [b'data', b'headbody'])
+        self.assertEqual(transport.get_write_buffer_size(), 12)
+
+    def test_writelines_str(self):
+        transport = self.socket_transport()
+        self.assertRaises(TypeError, transport.writelines, [b'data', 'str'])
+        self.assertFalse(transport._buffer)
+
+    def test_writelines_pauses_protocol(self):
+        self.sock.send.side_effect = BlockingIOError
+        transport = self.socket_transport()
+        transport.set_write_buffer_limits(high=5)
+        transport.writelines([b'head', b'body'])
+        self.protocol.pause_writing.assert_called_with()
+
     def test_write_ready(self):
         data = b'data'
         self.sock.send.return_value = len(data)
 
         transport = self.socket_transport()
-        transport._buffer.extend(data)
+        fill_buffer(transport, data)
         self.loop._add_writer(7, transport._write_ready)
         transport._write_ready()
         self.assertTrue(self.sock.send.called)
         self.assertFalse(self.loop.writers)
+        self.assertEqual(transport.get_write_buffer_size(), 0)
 
     def test_write_ready_closing(self):
         data = b'data'
@@ -1183,7 +1288,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
 
         transport = self.socket_transport()
         transport._closing = True
-        transport._buffer.extend(data)
+        fill_buffer(transport, data)
         self.loop._add_writer(7, transport._write_ready)
         transport._write_ready()
         self.assertTrue(self.sock.send.called)
@@ -1201,44 +1306,83 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         self.sock.send.return_value = 2
 
         transport = self.socket_transport()
-        transport._buffer.extend(data)
+        fill_buffer(transport, data)
+        self.loop._add_writer(7, transport._write_ready)
+        transport._write_ready()
+        self.loop.assert_writer(7, transport._write_ready)
+        self.assertEqual(list(transport._buffer), [b'ta'])
+
+    def test_write_ready_partial_several(self):
+        self.sock.sendmsg.return_value = 7
+
+        transport = self.socket_transport()
+        fill_buffer(transport, b'data1', b'data2', b'data3')
         self.loop._add_writer(7, transport._write_ready)
         transport._write_ready()
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'ta']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'ta2', b'data3'])
+        self.assertEqual(transport.get_write_buffer_size(), 8)
 
     def test_write_ready_partial_none(self):
         data = b'data'
         self.sock.send.return_value = 0
 
         transport = self.socket_transport()
-        transport._buffer.extend(data)
+        fill_buffer(transport, data)
         self.loop._add_writer(7, transport._write_ready)
         transport._write_ready()
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'data']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'data'])
 
     def test_write_ready_tryagain(self):
-        self.sock.send.side_effect = BlockingIOError
+        self.sock.sendmsg.side_effect = BlockingIOError
 
         transport = self.socket_transport()
-        transport._buffer = list_to_buffer([b'data1', b'data2'])
+        fill_buffer(transport, b'data1', b'data2')
         self.loop._add_writer(7, transport._write_ready)
         transport._write_ready()
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'data1data2']), transport._buffer)
+        self.assertEqual(list(transport._buffer), [b'data1', b'data2'])
+
+    @mock.patch('asyncio.selector_events._IOV_MAX', 2)
+    def test_write_ready_iov_max(self):
+        sent = []
+
+        def sendmsg(buffers):
+            buffers = list(buffers)
+            sent.append(buffers)
+            return sum(map(len, buffers))
+
+        self.sock.sendmsg.side_effect = sendmsg
+        transport = self.socket_transport()
+        fill_buffer(transport, b'a', b'b', b'c')
+        transport._write_ready()
+        self.assertEqual(sent, [[b'a', b'b']])
+        self.assertEqual(list(transport._buffer), [b'c'])
+
+    @mock.patch('asyncio.selector_events._HAS_SENDMSG', False)
+    def test_write_ready_no_sendmsg(self):
+        self.sock.send.return_value = 3
+
+        transport = self.socket_transport()
+        fill_buffer(transport, b'data1', b'data2')
+        transport._write_ready()
+        self.sock.send.assert_called_with(b'data1')
+        self.assertFalse(self.sock.sendmsg.called)
+        self.assertEqual(list(transport._buffer), [b'a1', b'data2'])
 
     def test_write_ready_exception(self):
         err = self.sock.send.side_effect = OSError()
 
         transport = self.socket_transport()
         transport._fatal_error = mock.Mock()
-        transport._buffer.extend(b'data')
+        fill_buffer(transport, b'data')
         transport._write_ready()
         transport._fatal_error.assert_called_with(
                                    err,
                                    'Fatal write error on socket transport')
+        self.assertEqual(transport.get_write_buffer_size(), 0)
 
     def test_write_eof(self):
         tr = self.socket_transport()
@@ -1254,7 +1398,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         self.sock.send.side_effect = BlockingIOError
         tr.write(b'data')
         tr.write_eof()
-        self.assertEqual(tr._buffer, list_to_buffer([b'data']))
+        self.assertEqual(list(tr._buffer), [b'data'])
         self.assertTrue(tr._eof)
         self.assertFalse(self.sock.shutdown.called)
         self.sock.send.side_effect = lambda _: 4
@@ -1457,6 +1601,282 @@ class SelectorSocketTransportBufferedProtocolTests(test_utils.TestCase):
                                    'Fatal read error on socket transport')
 
 
+@unittest.skipIf(ssl is None, 'No ssl module')
+class SelectorSslTransportTests(test_utils.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.loop = self.new_test_loop()
+        self.protocol = test_utils.make_test_protocol(asyncio.Protocol)
+        self.sock = mock.Mock(socket.socket)
+        self.sock.fileno.return_value = 7
+        self.sslsock = mock.Mock()
+        self.sslsock.pending.return_value = 0
+        self.sslcontext = mock.Mock()
+        self.sslcontext._wrap_socket.return_value = self.sslsock
+        # The handshake timeout is tested on its own.
+        self.loop.call_later = mock.Mock()
+
+    def ssl_transport(self, waiter=None, server_hostname=None):
+        transport = _SelectorSslTransport(
+            self.loop, self.sock, self.protocol, self.sslcontext,
+            waiter=waiter, server_hostname=server_hostname)
+        self.addCleanup(close_transport, transport)
+        return transport
+
+    def _make_one(self):
+        # A transport which completed its handshake.
+        transport = self.ssl_transport()
+        test_utils.run_briefly(self.loop)
+        return transport
+
+    def test_on_handshake(self):
+        waiter = asyncio.Future(loop=self.loop)
+        tr = self.ssl_transport(waiter=waiter)
+        self.loop.run_until_complete(waiter)
+        self.assertIsNone(waiter.result())
+        self.sslsock.do_handshake.assert_called_with()
+        self.protocol.connection_made.assert_called_with(tr)
+        self.loop.assert_reader(7, tr._read_ready)
+        self.assertIs(tr.get_extra_info('socket'), self.sock)
+        self.assertIsInstance(tr.get_extra_info('ssl_object'), ssl.SSLObject)
+
+    def test_on_handshake_reader_retry(self):
+        self.sslsock.do_handshake.side_effect = ssl.SSLWantReadError
+        tr = self.ssl_transport()
+        test_utils.run_briefly(self.loop)
+        self.loop.assert_reader(7, tr._on_handshake)
+        self.assertFalse(self.protocol.connection_made.called)
+
+    def test_on_handshake_writer_retry(self):
+        self.sslsock.do_handshake.side_effect = ssl.SSLWantWriteError
+        tr = self.ssl_transport()
+        test_utils.run_briefly(self.loop)
+        self.loop.assert_writer(7, tr._on_handshake)
+
+    def test_on_handshake_exc(self):
+        exc = ssl.SSLError()
+        self.sslsock.do_handshake.side_effect = exc
+        waiter = asyncio.Future(loop=self.loop)
+        with test_utils.disable_logger():
+            self.ssl_transport(waiter=waiter)
+            with self.assertRaises(ssl.SSLError):
+                self.loop.run_until_complete(waiter)
+        self.assertTrue(self.sock.close.called)
+        self.assertFalse(self.protocol.connection_lost.called)
+
+    def test_on_handshake_eof(self):
+        self.sslsock.do_handshake.side_effect = ssl.SSLEOFError
+        self.loop.call_exception_handler = mock.Mock()
+        waiter = asyncio.Future(loop=self.loop)
+        self.ssl_transport(waiter=waiter)
+        with self.assertRaises(ConnectionResetError):
+            self.loop.run_until_complete(waiter)
+        self.assertFalse(self.loop.call_exception_handler.called)
+
+    def test_server_hostname(self):
+        self.ssl_transport(server_hostname='python.org')
+        test_utils.run_briefly(self.loop)
+        self.sslcontext._encode_hostname.assert_called_with('python.org')
+
+    def test_pause_resume_reading(self):
+        tr = self._make_one()
+        self.assertTrue(tr.is_reading())
+        tr.pause_reading()
+        self.assertFalse(tr.is_reading())
+        self.loop.assert_no_reader(7)
+        tr.resume_reading()
+        self.assertTrue(tr.is_reading())
+        self.loop.assert_reader(7, tr._read_ready)
+
+    def test_read_ready_records(self):
+        tr = self._make_one()
+        self.sslsock.read.side_effect = [b'ab', b'cd', ssl.SSLWantReadError]
+        tr._read_ready()
+        self.protocol.data_received.assert_called_once_with(b'abcd')
+
+    def test_read_ready_want_write(self):
+        tr = self._make_one()
+        self.sslsock.read.side_effect = ssl.SSLWantWriteError
+        tr._read_ready()
+        self.assertFalse(self.protocol.data_received.called)
+        self.assertTrue(tr._read_wants_write)
+        self.loop.assert_no_reader(7)
+        self.loop.assert_writer(7, tr._write_ready)
+
+        self.sslsock.read.side_effect = [b'data', ssl.SSLWantReadError]
+        tr._write_ready()
+        self.protocol.data_received.assert_called_with(b'data')
+        self.assertFalse(tr._read_wants_write)
+        self.loop.assert_reader(7, tr._read_ready)
+
+    def test_read_ready_close_notify(self):
+        tr = self._make_one()
+        self.sslsock.read.return_value = b''
+        tr._read_ready()
+        self.assertFalse(self.protocol.eof_received.called)
+        self.assertTrue(tr.is_closing())
+        test_utils.run_briefly(self.loop)
+        self.sslsock.shutdown.assert_called_with()
+        self.protocol.connection_lost.assert_called_with(None)
+
+    def test_read_ready_ragged_eof(self):
+        tr = self._make_one()
+        self.sslsock.read.side_effect = [b'data', ssl.SSLEOFError]
+        tr._read_ready()
+        self.protocol.data_received.assert_called_with(b'data')
+        self.protocol.eof_received.assert_called_with()
+        test_utils.run_briefly(self.loop)
+        self.assertFalse(self.sslsock.shutdown.called)
+        self.protocol.connection_lost.assert_called_with(None)
+
+    @mock.patch('logging.exception')
+    def test_read_ready_err(self, m_exc):
+        tr = self._make_one()
+        err = self.sslsock.read.side_effect = OSError()
+        tr._fatal_error = mock.Mock()
+        tr._read_ready()
+        tr._fatal_error.assert_called_with(
+            err, 'Fatal read error on SSL transport')
+
+    def test_write(self):
+        tr = self._make_one()
+        tr.write(b'data')
+        self.sslsock.write.assert_called_with(b'data')
+        self.assertFalse(tr._buffer)
+
+    def test_write_str(self):
+        tr = self._make_one()
+        self.assertRaises(TypeError, tr.write, 'str')
+
+    def test_write_want_write(self):
+        tr = self._make_one()
+        self.sslsock.write.side_effect = ssl.SSLWantWriteError
+        tr.write(b'data')
+        tr.write(b'more')
+        self.assertEqual(list_to_buffer([b'datamore']), tr._buffer)
+        self.loop.assert_writer(7, tr._write_ready)
+
+        written = []
+        def write(data):
+            written.append(bytes(data))
+            return len(data)
+        self.sslsock.write.side_effect = write
+        tr._write_ready()
+        self.assertEqual(written, [b'datamore'])
+        self.assertFalse(tr._buffer)
+        self.assertFalse(7 in self.loop.writers)
+
+    def test_write_want_read(self):
+        tr = self._make_one()
+        self.sslsock.write.side_effect = ssl.SSLWantReadError
+        tr.write(b'data')
+        self.assertTrue(tr._write_wants_read)
+        self.assertFalse(7 in self.loop.writers)
+
+        self.sslsock.write.side_effect = None
+        self.sslsock.write.return_value = 4
+        self.sslsock.read.side_effect = ssl.SSLWantReadError
+        tr._read_ready()
+        self.assertFalse(tr._write_wants_read)
+        self.assertFalse(tr._buffer)
+
+    def test_write_want_read_paused(self):
+        tr = self._make_one()
+        test_utils.run_briefly(self.loop)
+        tr.pause_reading()
+        self.sslsock.write.side_effect = ssl.SSLWantReadError
+        tr.write(b'data')
+        self.assertTrue(tr._write_wants_read)
+        self.loop.assert_reader(7, tr._write_retry)
+
+        self.sslsock.write.side_effect = None
+        self.sslsock.write.return_value = 4
+        tr._write_retry()
+        self.assertFalse(tr._write_wants_read)
+        self.assertFalse(tr._buffer)
+        self.assertFalse(self.sslsock.read.called)
+        self.assertFalse(self.protocol.data_received.called)
+        self.loop.assert_no_reader(7)
+        self.assertFalse(7 in self.loop.writers)
+
+    def test_pause_reading_write_wants_read(self):
+        tr = self._make_one()
+        test_utils.run_briefly(self.loop)
+        self.sslsock.write.side_effect = ssl.SSLWantReadError
+        tr.write(b'data')
+        self.loop.assert_reader(7, tr._read_ready)
+        tr.pause_reading()
+        self.loop.assert_reader(7, tr._write_retry)
+        tr.resume_reading()
+        self.loop.assert_reader(7, tr._read_ready)
+
+    def test_write_eof(self):
+        tr = self._make_one()
+        self.assertFalse(tr.can_write_eof())
+        self.assertRaises(NotImplementedError, tr.write_eof)
+
+    def test_close(self):
+        tr = self._make_one()
+        tr.close()
+        self.assertTrue(tr.is_closing())
+        test_utils.run_briefly(self.loop)
+        self.sslsock.shutdown.assert_called_with()
+        self.protocol.connection_lost.assert_called_with(None)
+        self.assertTrue(self.sock.close.called)
+
+    def test_close_write_buffer(self):
+        tr = self._make_one()
+        tr._buffer.extend(b'data')
+        tr.close()
+        test_utils.run_briefly(self.loop)
+        self.assertFalse(self.protocol.connection_lost.called)
+        self.sslsock.write.return_value = 4
+        tr._write_ready()
+        self.sslsock.shutdown.assert_called_with()
+        self.protocol.connection_lost.assert_called_with(None)
+
+    def test_abort(self):
+        tr = self._make_one()
+        tr.abort()
+        test_utils.run_briefly(self.loop)
+        self.assertFalse(self.sslsock.shutdown.called)
+        self.protocol.connection_lost.assert_called_with(None)
+
+    def test_close_during_handshake(self):
+        self.sslsock.do_handshake.side_effect = ssl.SSLWantReadError
+        waiter = asyncio.Future(loop=self.loop)
+        tr = self.ssl_transport(waiter=waiter)
+        test_utils.run_briefly(self.loop)
+        tr.close()
+        test_utils.run_briefly(self.loop)
+        self.assertFalse(self.sslsock.shutdown.called)
+        self.assertFalse(self.protocol.connection_lost.called)
+        self.loop.assert_no_reader(7)
+        self.assertTrue(self.sock.close.called)
+
+    def test_handshake_timeout(self):
+        self.sslsock.do_handshake.side_effect = ssl.SSLWantReadError
+        waiter = asyncio.Future(loop=self.loop)
+        tr = _SelectorSslTransport(
+            self.loop, self.sock, self.protocol, self.sslcontext,
+            waiter=waiter, ssl_handshake_timeout=0.1)
+        self.addCleanup(close_transport, tr)
+        test_utils.run_briefly(self.loop)
+        self.loop.call_later.assert_called_with(
+            0.1, tr._check_handshake_timeout)
+        tr._check_handshake_timeout()
+        with self.assertRaisesRegex(ConnectionAbortedError,
+                                    'SSL handshake is taking longer'):
+            self.loop.run_until_complete(waiter)
+
+    def test_handshake_timeout_negative(self):
+        with self.assertRaisesRegex(ValueError, 'a positive number'):
+            _SelectorSslTransport(
+                self.loop, self.sock, self.protocol, self.sslcontext,
+                ssl_handshake_timeout=-10)
+
+
 class SelectorDatagramTransportTests(test_utils.TestCase):
 
     def setUp(self):
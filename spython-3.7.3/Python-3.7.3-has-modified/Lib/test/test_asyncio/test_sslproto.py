@@ -680,6 +680,20 @@ class SelectorStartTLSTests(BaseStartTLS, unittest.TestCase):
         return asyncio.SelectorEventLoop()
 
 
+@unittest.skipIf(ssl is None, 'No ssl module')
+class SelectorMemoryBIOStartTLSTests(BaseStartTLS, unittest.TestCase):
+    # create_connection(ssl=...) through SSLProtocol, like start_tls().
+
+    def setUp(self):
+        patcher = mock.patch('asyncio.constants.SSL_SOCKET_TRANSPORT', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def new_loop(self):
+        return asyncio.SelectorEventLoop()
+
+
 @unittest.skipIf(ssl is None, 'No ssl module')
 @unittest.skipUnless(hasattr(asyncio, 'ProactorEventLoop'), 'Windows only')
 class ProactorStartTLSTests(BaseStartTLS, unittest.TestCase):
@@ -890,5 +890,195 @@ os.close(fd)
             self.loop.run_until_complete(wr.wait_closed())
 
 
+class ChunkedStreamTests(test_utils.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        self.set_event_loop(self.loop)
+
+    def tearDown(self):
+        test_utils.run_briefly(self.loop)
+        self.loop.close()
+        gc.collect()
+        super().tearDown()
+
+    def stream(self, *chunks, eof=False, limit=2 ** 16):
+        stream = asyncio.StreamReader(limit=limit, loop=self.loop,
+                                      chunked=True)
+        for chunk in chunks:
+            stream.feed_data(chunk)
+        if eof:
+            stream.feed_eof()
+        return stream
+
+    def receive(self, stream, data):
+        # What a transport does with a BufferedProtocol.
+        buf = stream._get_buffer(len(data))
+        buf[:len(data)] = data
+        stream._buffer_updated(len(data))
+
+    def test_buffer_operations(self):
+        data = b'0123456789abcdef'
+        for split in ([16], [1] * 16, [3, 1, 5, 7], [8, 8]):
+            buffer = asyncio.streams._ChunkedBuffer()
+            pos = 0
+            for size in split:
+                buffer.extend(data[pos:pos + size])
+                pos += size
+            self.assertEqual(bytes(buffer), data)
+            self.assertEqual(len(buffer), 16)
+            for sub in (b'0', b'3456', b'789ab', b'f', b'ef', b'x', b'fx'):
+                for start in range(17):
+                    self.assertEqual(buffer.find(sub, start),
+                                     data.find(sub, start), (split, sub))
+            self.assertTrue(buffer.startswith(b'567', 5))
+            self.assertEqual(buffer[2:13], data[2:13])
+            del buffer[:5]
+            self.assertEqual(bytes(buffer), data[5:])
+            self.assertEqual(buffer.find(b'9a'), 4)
+
+    def test_feed_data_is_not_copied(self):
+        data = b'x' * 100
+        stream = self.stream(data)
+        view = self.loop.run_until_complete(stream.readexactly_view(100))
+        self.assertIs(view.obj, data)
+        stream = self.stream(data)
+        self.assertIs(self.loop.run_until_complete(stream.readexactly(100)),
+                      data)
+
+    def test_readuntil(self):
+        stream = self.stream(b'li', b'ne1\r', b'\n', b'line2\r\nli')
+        self.assertEqual(
+            self.loop.run_until_complete(stream.readuntil(b'\r\n')),
+            b'line1\r\n')
+        self.assertEqual(
+            self.loop.run_until_complete(stream.readuntil(b'\r\n')),
+            b'line2\r\n')
+        self.assertEqual(bytes(stream._buffer), b'li')
+
+    def test_readline_limit(self):
+        stream = self.stream(b'12', b'345', b'6\n78\n', limit=3)
+        self.assertRaises(ValueError, self.loop.run_until_complete,
+                          stream.readline())
+        self.assertEqual(bytes(stream._buffer), b'78\n')
+        self.assertEqual(self.loop.run_until_complete(stream.readline()),
+                         b'78\n')
+
+    def test_read(self):
+        stream = self.stream(b'abc', b'defg', eof=True)
+        self.assertEqual(self.loop.run_until_complete(stream.read(5)),
+                         b'abcde')
+        self.assertEqual(self.loop.run_until_complete(stream.read()), b'fg')
+        self.assertTrue(stream.at_eof())
+
+    def test_readinto(self):
+        stream = self.stream(b'abc', b'defg', eof=True)
+        buf = bytearray(5)
+        n = self.loop.run_until_complete(stream.readinto(buf))
+        self.assertEqual((n, buf), (5, bytearray(b'abcde')))
+        n = self.loop.run_until_complete(stream.readinto(memoryview(buf)[1:]))
+        self.assertEqual((n, buf), (2, bytearray(b'afgde')))
+        self.assertEqual(self.loop.run_until_complete(stream.readinto(buf)),
+                         0)
+
+    def test_readexactly_into(self):
+        stream = self.stream(b'ab', b'cd', b'efgh')
+        buf = bytearray(5)
+        self.loop.run_until_complete(stream.readexactly_into(buf))
+        self.assertEqual(buf, b'abcde')
+        stream.feed_eof()
+        with self.assertRaises(asyncio.IncompleteReadError) as cm:
+            self.loop.run_until_complete(stream.readexactly_into(buf))
+        self.assertEqual(cm.exception.partial, b'fgh')
+        self.assertEqual(cm.exception.expected, 5)
+        self.assertEqual(buf, b'abcde')
+
+    def test_readexactly_view(self):
+        stream = self.stream()
+        for message in (b'spam', b'ham', b'eggs'):
+            self.receive(stream, message)
+        first = self.loop.run_until_complete(stream.readexactly_view(2))
+        # The messages were received into one chunk: no copy.
+        second = self.loop.run_until_complete(stream.readexactly_view(6))
+        self.assertIs(first.obj, second.obj)
+        self.assertEqual((bytes(first), bytes(second)), (b'sp', b'amhame'))
+        # The views stay valid while more data is received.
+        self.receive(stream, b'x' * 100000)
+        self.assertEqual(bytes(second), b'amhame')
+        view = self.loop.run_until_complete(stream.readexactly_view(100003))
+        self.assertEqual(bytes(view), b'ggs' + b'x' * 100000)
+
+    def test_receive_reuses_consumed_chunk(self):
+        stream = self.stream()
+        self.receive(stream, b'abc')
+        chunk = stream._buffer._tail
+        self.assertEqual(self.loop.run_until_complete(stream.readexactly(3)),
+                         b'abc')
+        self.receive(stream, b'def')
+        self.assertIs(stream._buffer._tail, chunk)
+        self.assertEqual(stream._buffer._chunks[0][1], 0)
+
+    def test_wakeup_and_pause(self):
+        stream = self.stream(limit=4)
+        transport = mock.Mock()
+        stream.set_transport(transport)
+        task = self.loop.create_task(stream.readexactly(10))
+        test_utils.run_briefly(self.loop)
+        self.receive(stream, b'01234')
+        self.assertFalse(transport.pause_reading.called)
+        self.receive(stream, b'56789')
+        self.assertTrue(transport.pause_reading.called)
+        self.assertEqual(self.loop.run_until_complete(task), b'0123456789')
+        self.assertTrue(transport.resume_reading.called)
+
+    def test_protocol(self):
+        self.assertRaises(ValueError, asyncio.BufferedStreamReaderProtocol,
+                          asyncio.StreamReader(loop=self.loop),
+                          loop=self.loop)
+        protocol = asyncio.BufferedStreamReaderProtocol(self.stream(),
+                                                        loop=self.loop)
+        self.assertIsInstance(protocol, asyncio.BufferedProtocol)
+
+    def test_open_connection(self):
+        async def handle_client(reader, writer):
+            header = bytearray(4)
+            while True:
+                try:
+                    await reader.readexactly_into(header)
+                except asyncio.IncompleteReadError:
+                    break
+                body = await reader.readexactly_view(
+                    int.from_bytes(header, 'big'))
+                writer.write(bytes(body).upper())
+            writer.close()
+
+        async def client(addr):
+            reader, writer = await asyncio.open_connection(
+                *addr, loop=self.loop, chunked=True)
+            self.assertIsInstance(writer._protocol,
+                                  asyncio.BufferedStreamReaderProtocol)
+            for message in (b'hello', b'x' * 300000, b'world'):
+                writer.write(len(message).to_bytes(4, 'big') + message)
+            writer.write_eof()
+            data = await reader.read()
+            writer.close()
+            return data
+
+        server = self.loop.run_until_complete(
+            asyncio.start_server(handle_client, '127.0.0.1', 0,
+                                 loop=self.loop, chunked=True))
+        addr = server.sockets[0].getsockname()
+        data = self.loop.run_until_complete(client(addr))
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
+        self.assertEqual(data, b'HELLO' + b'X' * 300000 + b'WORLD')
+
+    def test___repr__(self):
+        self.assertEqual('<StreamReader chunked>', repr(self.stream()))
+        self.assertEqual('<StreamReader 5 bytes chunked>',
+                         repr(self.stream(b'ab', b'cde')))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,298 @@
+"""Tests for uring_events.py"""
+
+import errno
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import unittest
+from unittest import mock
+
+if not sys.platform.startswith('linux'):
+    raise unittest.SkipTest('Linux only')
+
+import asyncio
+from asyncio import uring_events
+from test.test_asyncio import utils as test_utils
+from test import support
+
+if not test_utils.has_uring():
+    raise unittest.SkipTest('requires io_uring')
+
+import _uring
+
+
+class RingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = _uring.Ring(8)
+        self.addCleanup(self.ring.close)
+
+    def test_recv_send(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        self.ring.recv(1, a.fileno(), 100)
+        self.ring.send(2, b.fileno(), b'spam')
+        results = {}
+        while len(results) < 2:
+            for key, res, data in self.ring.wait(5):
+                results[key] = (res, data)
+        self.assertEqual(results, {1: (4, b'spam'), 2: (4, None)})
+        self.assertEqual(self.ring.pending, 0)
+
+    def test_recv_into(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        buf = bytearray(10)
+        b.send(b'ham')
+        self.ring.recv(1, a.fileno(), buf)
+        self.assertEqual(self.ring.wait(5), [(1, 3, None)])
+        self.assertEqual(buf[:3], b'ham')
+
+    def test_file(self):
+        self.addCleanup(support.unlink, support.TESTFN)
+        fd = os.open(support.TESTFN, os.O_RDWR | os.O_CREAT)
+        self.addCleanup(os.close, fd)
+        self.ring.write(1, fd, b'hello world', 0)
+        self.assertEqual(self.ring.wait(5), [(1, 11, None)])
+        self.ring.read(2, fd, 5, 6)
+        self.assertEqual(self.ring.wait(5), [(2, 5, b'world')])
+
+    def test_error(self):
+        self.ring.recv(1, -1, 10)
+        key, res, data = self.ring.wait(5)[0]
+        self.assertEqual(res, -errno.EBADF)
+
+    def test_cancel(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        self.ring.recv(1, a.fileno(), 10)
+        self.assertEqual(self.ring.wait(0), [])
+        self.ring.cancel(1)
+        key, res, data = self.ring.wait(5)[0]
+        self.assertEqual(key, 1)
+        self.assertLess(res, 0)
+        self.assertEqual(self.ring.pending, 0)
+
+    def test_wait_timeout(self):
+        self.assertEqual(self.ring.wait(0.01), [])
+        # Like poll(), a negative timeout does not wait.
+        self.assertEqual(self.ring.wait(-1), [])
+
+    def test_close(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        self.ring.recv(1, a.fileno(), 10)
+        self.ring.close()
+        self.assertTrue(self.ring.closed)
+        with self.assertRaises(ValueError):
+            self.ring.recv(2, a.fileno(), 10)
+
+
+class UringProactorTests(test_utils.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.loop = uring_events.UringEventLoop()
+        self.set_event_loop(self.loop)
+
+    def test_close(self):
+        a, b = socket.socketpair()
+        trans = self.loop._make_socket_transport(a, asyncio.Protocol())
+        f = asyncio.ensure_future(self.loop.sock_recv(b, 100), loop=self.loop)
+        trans.close()
+        self.loop.run_until_complete(f)
+        self.assertEqual(f.result(), b'')
+        b.close()
+
+    def test_cancel_recv(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        a.setblocking(False)
+        f = self.loop._proactor.recv(a, 100)
+        key = f._key
+        test_utils.run_briefly(self.loop)
+        f.cancel()
+        test_utils.run_briefly(self.loop)
+        self.assertNotIn(key, self.loop._proactor._cache)
+        # The data is not lost.
+        b.send(b'data')
+        self.assertEqual(
+            self.loop.run_until_complete(self.loop.sock_recv(a, 100)),
+            b'data')
+
+    def test_eagain(self):
+        # Older kernels complete operations on non-blocking sockets with
+        # EAGAIN: they are started again when the socket is ready.
+        proactor = self.loop._proactor
+        with mock.patch.object(proactor, '_ring') as ring:
+            sock = mock.Mock(socket.socket)
+            sock.fileno.return_value = 5
+            f = proactor.recv(sock, 100)
+            ring.recv.assert_called_once_with(1, 5, 100, 0)
+            ring.wait.return_value = [(1, -errno.EAGAIN, None)]
+            proactor.select(0)
+            ring.poll.assert_called_once_with(2, 5, select.POLLIN)
+            ring.wait.return_value = [(2, select.POLLIN, None)]
+            proactor.select(0)
+            ring.recv.assert_called_with(3, 5, 100, 0)
+            self.assertFalse(f.done())
+            ring.wait.return_value = [(3, 4, b'data')]
+            proactor.select(0)
+        self.assertEqual(f.result(), b'data')
+        self.assertEqual(proactor._cache, {})
+
+    def test_partial_send(self):
+        proactor = self.loop._proactor
+        with mock.patch.object(proactor, '_ring') as ring:
+            sock = mock.Mock(socket.socket)
+            sock.fileno.return_value = 5
+            f = proactor.send(sock, b'abcdef')
+            ring.wait.return_value = [(1, 4, None)]
+            proactor.select(0)
+            self.assertFalse(f.done())
+            self.assertEqual(bytes(ring.send.call_args[0][2]), b'ef')
+            ring.wait.return_value = [(2, 2, None)]
+            proactor.select(0)
+        self.assertEqual(f.result(), 6)
+
+    def test_error(self):
+        a, b = socket.socketpair()
+        a.close()
+        b.close()
+        f = self.loop._proactor.recv(a, 10)
+        with self.assertRaises(OSError):
+            self.loop.run_until_complete(f)
+
+    def test_echo(self):
+        async def handle(reader, writer):
+            while True:
+                data = await reader.read(1000)
+                if not data:
+                    break
+                writer.write(data)
+            writer.close()
+
+        async def client(port):
+            reader, writer = await asyncio.open_connection(
+                '127.0.0.1', port, loop=self.loop)
+            for i in range(20):
+                writer.write(b'x' * 1000)
+                self.assertEqual(await reader.readexactly(1000), b'x' * 1000)
+            writer.close()
+
+        server = self.loop.run_until_complete(
+            asyncio.start_server(handle, '127.0.0.1', 0, loop=self.loop))
+        port = server.sockets[0].getsockname()[1]
+        self.loop.run_until_complete(client(port))
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
+
+    def test_peer_reset(self):
+        # shutdown() fails with ENOTCONN when the peer has reset the
+        # connection: the socket is still closed.
+        transports = []
+        lost = self.loop.create_future()
+
+        class Proto(asyncio.Protocol):
+            def connection_made(self, transport):
+                transports.append(transport)
+
+            def connection_lost(self, exc):
+                lost.set_result(exc)
+
+        self.loop.call_exception_handler = mock.Mock()
+        server = self.loop.run_until_complete(
+            self.loop.create_server(Proto, '127.0.0.1', 0))
+        port = server.sockets[0].getsockname()[1]
+        with socket.create_connection(('127.0.0.1', port)) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                            struct.pack('ii', 1, 0))
+            test_utils.run_until(self.loop, lambda: transports)
+            sock_obj = transports[0].get_extra_info('socket')
+        self.loop.run_until_complete(lost)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(sock_obj.fileno(), -1)
+        self.assertFalse(self.loop.call_exception_handler.called)
+        self.assertEqual(server._active_count, 0)
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
+
+    def test_file_io(self):
+        self.addCleanup(support.unlink, support.TESTFN)
+        with open(support.TESTFN, 'w+b', buffering=0) as f:
+            n = self.loop.run_until_complete(
+                self.loop.file_write(f, b'0123456789' * 1000, 0))
+            self.assertEqual(n, 10000)
+            self.assertEqual(
+                self.loop.run_until_complete(self.loop.file_read(f, 5, 9995)),
+                b'56789')
+            buf = bytearray(20)
+            n = self.loop.run_until_complete(
+                self.loop.file_readinto(f.fileno(), buf, 9990))
+            self.assertEqual(n, 10)
+            self.assertEqual(buf[:n], b'0123456789')
+            # Read at the file position.
+            self.assertEqual(
+                self.loop.run_until_complete(self.loop.file_read(f, 3)),
+                b'012')
+            self.assertEqual(f.tell(), 3)
+
+    def test_signal(self):
+        called = []
+        self.loop.add_signal_handler(signal.SIGUSR1, called.append, 1)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        test_utils.run_until(self.loop, lambda: called)
+        self.assertEqual(called, [1])
+        self.assertTrue(self.loop.remove_signal_handler(signal.SIGUSR1))
+
+    def test_write_pipe_closed(self):
+        rpipe, wpipe = os.pipe()
+        pipeobj = open(wpipe, 'wb', 0)
+        proto = asyncio.Protocol()
+        lost = self.loop.create_future()
+        proto.connection_lost = lost.set_result
+        transport, _ = self.loop.run_until_complete(
+            self.loop.connect_write_pipe(lambda: proto, pipeobj))
+        transport.write(b'data')
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(os.read(rpipe, 10), b'data')
+        os.close(rpipe)
+        self.loop.run_until_complete(lost)
+        self.assertTrue(transport.is_closing())
+
+
+class UringPolicyTests(test_utils.TestCase):
+
+    def test_uring_policy(self):
+        policy = uring_events.UringEventLoopPolicy()
+        loop = policy.new_event_loop()
+        try:
+            self.assertIsInstance(loop, uring_events.UringEventLoop)
+        finally:
+            loop.close()
+
+    def test_fallback(self):
+        policy = uring_events.UringEventLoopPolicy()
+        with mock.patch.object(uring_events, '_uring', None):
+            loop = policy.new_event_loop()
+        try:
+            self.assertIsInstance(loop, asyncio.SelectorEventLoop)
+        finally:
+            loop.close()
+
+    def test_proactor_unavailable(self):
+        with mock.patch.object(uring_events, '_uring', None):
+            with self.assertRaises(OSError):
+                uring_events.UringEventLoop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -92,6 +92,18 @@ def dummy_ssl_context():
         return ssl.SSLContext(ssl.PROTOCOL_TLS)
 
 
+def has_uring():
+    """Return True if the kernel supports the io_uring event loop."""
+    if not sys.platform.startswith('linux'):
+        return False
+    from asyncio import uring_events
+    try:
+        uring_events.UringProactor().close()
+    except OSError:
+        return False
+    return True
+
+
 def run_briefly(loop):
     async def once():
         pass
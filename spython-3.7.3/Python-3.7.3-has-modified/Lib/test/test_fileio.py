@@ -569,6 +569,71 @@ class COtherFileTests(OtherFileTests, unittest.TestCase):
     FileIO = _io.FileIO
     modulename = '_io'
 
+    @cpython_only
+    def testDecryptPaths(self):
+        # Only paths matching PYTHONDECRYPTPATHS / -X decryptpaths are
+        # decrypted, other files are read as they are on disk.
+        import _spython
+        from test.support.script_helper import assert_python_ok
+        encrypted = _spython.encrypt_bytes(b"plain")
+        data = os.path.abspath(TESTFN + ".dat")
+        source = os.path.abspath(TESTFN + ".py")
+        for path in (data, source):
+            with open(path, "wb") as f:
+                f.write(encrypted)
+            self.addCleanup(os.unlink, path)
+        code = ("import sys\n"
+                "for path in sys.argv[1:]:\n"
+                "    with open(path, 'rb') as f:\n"
+                "        print(f.read() == b'plain')\n")
+        rc, out, err = assert_python_ok("-c", code, data, source)
+        self.assertEqual(out.split(), [b"True", b"True"])
+        rc, out, err = assert_python_ok("-c", code, data, source,
+                                        PYTHONDECRYPTPATHS="*.py")
+        self.assertEqual(out.split(), [b"False", b"True"])
+        rc, out, err = assert_python_ok(
+            "-X", "decryptpaths=/nonexistent/:%s*.dat" % os.getcwd(),
+            "-c", code, data, source, PYTHONDECRYPTPATHS="*.py")
+        self.assertEqual(out.split(), [b"True", b"False"])
+
+    @cpython_only
+    def testConcurrentDecrypt(self):
+        # dopen() runs without the GIL; threads decrypting the same files
+        # while the decrypted-source cache is resized must all see the
+        # right plaintext.
+        import _spython
+        import threading
+        contents = [("%d" % i).encode() * (1000 * (i + 1)) for i in range(4)]
+        paths = []
+        for i, data in enumerate(contents):
+            path = "%s.%d.py" % (TESTFN, i)
+            with open(path, "wb") as f:
+                f.write(_spython.encrypt_bytes(data))
+            self.addCleanup(os.unlink, path)
+            paths.append(path)
+        self.addCleanup(sys._set_decrypt_cache_size,
+                        sys._decrypt_cache_info()["maxsize"])
+        errors = []
+
+        def reader():
+            for n in range(50):
+                i = n % len(paths)
+                with self.FileIO(paths[i], "r") as f:
+                    if f.readall() != contents[i]:
+                        errors.append(paths[i])
+
+        def resizer():
+            for n in range(50):
+                sys._set_decrypt_cache_size((n % 3) * 4000)
+
+        threads = [threading.Thread(target=reader) for i in range(8)]
+        threads.append(threading.Thread(target=resizer))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
     @cpython_only
     def testInvalidFd_overflow(self):
         # Issue 15989
@@ -10,6 +10,7 @@
 # Invalid marshalled data in frozen.c could case the interpreter to
 # crash when __hello__ is imported.
 
+import _imp
 import sys
 import unittest
 from test.support import captured_stdout
@@ -25,6 +26,25 @@ class TestFrozen(unittest.TestCase):
             import __hello__
         self.assertEqual(out.getvalue(), 'Hello world!\n')
 
+    def test_encrypted(self):
+        # Modules frozen by Tools/scripts/freeze_stdlib.py are encrypted.
+        self.assertFalse(_imp._is_frozen_encrypted('__hello__'))
+        self.assertFalse(_imp._is_frozen_encrypted('__not_frozen__'))
+        if not _imp.is_frozen('os'):
+            self.skipTest('stdlib not frozen')
+        import os, encodings
+        self.assertTrue(_imp._is_frozen_encrypted('os'))
+        # They keep the location of their source file in Lib/.
+        self.assertTrue(os.__spec__.has_location)
+        self.assertEqual(os.path.basename(os.__file__), 'os.py')
+        self.assertEqual(os.path.basename(encodings.__file__), '__init__.py')
+        self.assertTrue(os.__cached__)
+        self.assertEqual(os.path.basename(os.makedirs.__code__.co_filename),
+                         'os.py')
+        # Submodules that were not frozen are found on disk.
+        self.assertTrue(any(p.endswith('encodings') for p in encodings.__path__))
+        self.assertEqual('\u20ac'.encode('cp1252'), b'\x80')
+
 
 if __name__ == '__main__':
     unittest.main()
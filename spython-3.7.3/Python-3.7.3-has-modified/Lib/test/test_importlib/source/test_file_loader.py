@@ -7,6 +7,7 @@ machinery = util.import_importlib('importlib.machinery')
 importlib_util = util.import_importlib('importlib.util')
 
 import errno
+import io
 import marshal
 import os
 import py_compile
@@ -269,6 +270,120 @@ class SimpleTest(abc.LoaderTests):
                 data[8:16],
             )
 
+    def test_encrypted_bytecode_cache(self):
+        bootstrap = self.machinery.SourceFileLoader.get_code.__globals__
+        with util.create_modules('_temp') as mapping, \
+             unittest.mock.patch.dict(bootstrap, {'_encrypted_cache': True}):
+            source = mapping['_temp']
+            pyc = self.util.cache_from_source(source)
+            spyc = pyc[:-len('.pyc')] + '.spyc'
+            with open(source, 'wb') as fp:
+                fp.write(b'state = "old"')
+            loader = self.machinery.SourceFileLoader('_temp', source)
+            mod = types.ModuleType('_temp')
+            mod.__spec__ = self.util.spec_from_loader('_temp', loader)
+            loader.exec_module(mod)
+            self.assertEqual(mod.state, 'old')
+            self.assertFalse(os.path.exists(pyc))
+            # os.open() bypasses decryption: the cache is encrypted on disk.
+            fd = os.open(spyc, os.O_RDONLY)
+            try:
+                self.assertEqual(os.read(fd, 6), b'SPYENC')
+            finally:
+                os.close(fd)
+            # A changed source invalidates the cache even with the same mtime.
+            with open(source, 'wb') as fp:
+                fp.write(b'state = "new"')
+            loader.exec_module(mod)
+            self.assertEqual(mod.state, 'new')
+            with open(spyc, 'rb') as fp:
+                data = fp.read()
+            self.assertEqual(int.from_bytes(data[4:8], 'little'), 0b11)
+            self.assertEqual(self.util.source_hash(b'state = "new"'),
+                             data[8:16])
+            # A plaintext pyc under the cache name is not trusted, even
+            # though it matches the source.
+            code = compile('state = "planted"', source, 'exec')
+            planted = self.util.source_hash(b'state = "new"')
+            with open(spyc, 'wb') as fp:
+                fp.write(self.util.MAGIC_NUMBER + (0b11).to_bytes(4, 'little')
+                         + planted + marshal.dumps(code))
+            loader.exec_module(mod)
+            self.assertEqual(mod.state, 'new')
+            fd = os.open(spyc, os.O_RDONLY)
+            try:
+                self.assertEqual(os.read(fd, 6), b'SPYENC')
+            finally:
+                os.close(fd)
+
+    def test_encrypted_source_mapped(self):
+        import _spython
+        with util.create_modules('_temp') as mapping:
+            source = mapping['_temp']
+            with open(source, 'wb') as fp:
+                fp.write(_spython.encrypt_bytes(b'state = "mapped"\n'))
+            data = _spython.read_source(source)
+            self.assertIsInstance(data, memoryview)
+            self.assertTrue(data.readonly)
+            self.assertEqual(bytes(data), b'state = "mapped"\n')
+            del data
+            loader = self.machinery.SourceFileLoader('_temp', source)
+            mod = types.ModuleType('_temp')
+            mod.__spec__ = self.util.spec_from_loader('_temp', loader)
+            with util.uncache('_temp'):
+                loader.exec_module(mod)
+            self.assertEqual(mod.state, 'mapped')
+            self.assertEqual(loader.get_source('_temp'), 'state = "mapped"\n')
+
+            # A loader overriding get_data() still gets its sources from it.
+            class Loader(self.machinery.SourceFileLoader):
+                def get_data(self, path):
+                    if path == source:
+                        return b'state = "get_data"\n'
+                    return super().get_data(path)
+            loader = Loader('_temp', source)
+            mod.__spec__ = self.util.spec_from_loader('_temp', loader)
+            sys.dont_write_bytecode, saved = True, sys.dont_write_bytecode
+            try:
+                loader.exec_module(mod)
+            finally:
+                sys.dont_write_bytecode = saved
+            self.assertEqual(mod.state, 'get_data')
+
+            with open(source, 'wb') as fp:
+                fp.write(b'plain')
+            self.assertEqual(_spython.read_source(source), b'plain')
+            self.assertRaises(FileNotFoundError, _spython.read_source,
+                              source + 'x')
+
+    def test_encrypted_data(self):
+        import _spython
+        with util.create_modules('_temp') as mapping:
+            source = mapping['_temp']
+            directory = os.path.dirname(source)
+            data_path = os.path.join(directory, 'data.json')
+            with open(data_path, 'wb') as fp:
+                fp.write(_spython.encrypt_bytes(b'{"spam": 1}'))
+            loader = self.machinery.SourceFileLoader('_temp', source)
+            for i in range(3):
+                # Later reads come from the decryption cache.
+                self.assertEqual(loader.get_data(data_path), b'{"spam": 1}')
+            self.assertEqual(_spython.read_data(data_path), b'{"spam": 1}')
+            with loader.open_resource('data.json') as fp:
+                self.assertIsInstance(fp, io.BytesIO)
+                self.assertEqual(fp.read(), b'{"spam": 1}')
+
+            with open(data_path, 'wb') as fp:
+                fp.write(b'plain')
+            self.assertEqual(loader.get_data(data_path), b'plain')
+            # A plain resource is not read into memory.
+            with loader.open_resource('data.json') as fp:
+                self.assertIsInstance(fp, io.FileIO)
+                self.assertEqual(fp.read(), b'plain')
+            with self.assertRaises(FileNotFoundError) as cm:
+                loader.get_data(data_path + 'x')
+            self.assertEqual(cm.exception.filename, data_path + 'x')
+
     @util.writes_bytecode_files
     def test_overridden_checked_hash_based_pyc(self):
         with util.create_modules('_temp') as mapping, \
@@ -0,0 +1,136 @@
+import importlib.resources
+import os
+import sys
+import traceback
+import unittest
+
+from test import support
+
+import spyarchive
+
+TEMP_ARCHIVE = os.path.abspath(support.TESTFN + ".spya")
+
+TESTPACK = "spyatestpackage"
+
+pack_src = """\
+from . import util
+from .sub import deep
+VALUE = util.f() + deep.G
+"""
+util_src = "def f():\n    return 40\n"
+deep_src = """\
+# coding: utf-8
+G = 2
+S = "\xe9"
+def do_raise():
+    raise TypeError
+"""
+
+
+class ArchiveImportTestCase(unittest.TestCase):
+
+    members = [
+        (TESTPACK + "/__init__.py", pack_src.encode()),
+        (TESTPACK + "/util.py", util_src.encode()),
+        (TESTPACK + "/sub/__init__.py", b""),
+        (TESTPACK + "/sub/deep.py", deep_src.encode("utf-8")),
+        (TESTPACK + "/data.bin", b"\0\1\2\0"),
+    ]
+
+    def setUp(self):
+        self.meta_path = sys.meta_path[:]
+        self.modules_before = support.modules_setup()
+        spyarchive.write_archive(TEMP_ARCHIVE, self.members)
+        self.finder = spyarchive.install(TEMP_ARCHIVE)
+
+    def tearDown(self):
+        sys.meta_path[:] = self.meta_path
+        support.modules_cleanup(*self.modules_before)
+        self.finder.archive.close()
+        support.unlink(TEMP_ARCHIVE)
+
+    def test_archive_is_encrypted(self):
+        with open(TEMP_ARCHIVE, "rb") as f:
+            data = f.read()
+        self.assertTrue(data.startswith(spyarchive.ARCHIVE_MAGIC))
+        self.assertNotIn(b"do_raise", data)
+        self.assertNotIn(TESTPACK.encode(), data)
+
+    def test_import_package(self):
+        mod = __import__(TESTPACK + ".sub.deep")
+        self.assertEqual(mod.VALUE, 42)
+        self.assertEqual(mod.sub.deep.S, "\xe9")
+        self.assertEqual(mod.__file__,
+                         os.path.join(TEMP_ARCHIVE, TESTPACK, "__init__.py"))
+        self.assertEqual(mod.__path__,
+                         [os.path.join(TEMP_ARCHIVE, TESTPACK)])
+        self.assertIs(mod.__loader__, self.finder)
+        self.assertEqual(mod.sub.deep.__package__, TESTPACK + ".sub")
+
+    def test_unknown_module(self):
+        self.assertIsNone(self.finder.find_spec(TESTPACK + ".missing"))
+        self.assertIsNone(self.finder.find_spec(TESTPACK + ".data"))
+        with self.assertRaises(ImportError):
+            __import__(TESTPACK + ".missing")
+
+    def test_loader_api(self):
+        name = TESTPACK + ".sub.deep"
+        self.assertFalse(self.finder.is_package(name))
+        self.assertTrue(self.finder.is_package(TESTPACK + ".sub"))
+        self.assertEqual(self.finder.get_source(name), deep_src)
+        self.assertEqual(self.finder.get_filename(name),
+                         os.path.join(TEMP_ARCHIVE, TESTPACK, "sub",
+                                      "deep.py"))
+        self.assertRaises(ImportError, self.finder.get_source, "missing")
+
+    def test_get_data(self):
+        path = os.path.join(TEMP_ARCHIVE, TESTPACK, "data.bin")
+        self.assertEqual(self.finder.get_data(path), b"\0\1\2\0")
+        self.assertRaises(OSError, self.finder.get_data, path + "x")
+
+    def test_resources(self):
+        self.assertEqual(
+            importlib.resources.read_binary(TESTPACK, "data.bin"),
+            b"\0\1\2\0")
+        self.assertTrue(importlib.resources.is_resource(TESTPACK, "data.bin"))
+        self.assertFalse(importlib.resources.is_resource(TESTPACK, "sub"))
+        self.assertEqual(set(importlib.resources.contents(TESTPACK)),
+                         {"__init__.py", "util.py", "sub", "data.bin"})
+        with self.assertRaises(FileNotFoundError):
+            importlib.resources.read_binary(TESTPACK, "missing")
+        self.assertIsNone(
+            self.finder.get_resource_reader(TESTPACK + ".util"))
+
+    def test_traceback(self):
+        mod = __import__(TESTPACK + ".sub.deep", fromlist=["deep"])
+        try:
+            mod.do_raise()
+        except TypeError:
+            tb = traceback.extract_tb(sys.exc_info()[2])
+        self.assertEqual(tb[-1].filename, mod.__file__)
+        self.assertEqual(tb[-1].line, "raise TypeError")
+
+    def test_not_an_archive(self):
+        with open(TEMP_ARCHIVE, "wb") as f:
+            f.write(b"PK\3\4" + b"\0" * 100)
+        self.assertRaises(spyarchive.ArchiveError,
+                          spyarchive.ArchiveFinder, TEMP_ARCHIVE)
+
+    def test_tampered_member(self):
+        archive = self.finder.archive
+        offset, size = archive._members[TESTPACK + "/util.py"]
+        with open(TEMP_ARCHIVE, "r+b") as f:
+            f.seek(offset + size // 2)
+            byte = f.read(1)
+            f.seek(-1, 1)
+            f.write(bytes([byte[0] ^ 1]))
+        finder = spyarchive.ArchiveFinder(TEMP_ARCHIVE)
+        try:
+            self.assertRaises(spyarchive.ArchiveError,
+                              finder.get_code, TESTPACK + ".util")
+        finally:
+            finder.archive.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
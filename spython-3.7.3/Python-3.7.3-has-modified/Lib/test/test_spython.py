@@ -0,0 +1,298 @@
+"""Tests for the _spython module (spython's encryption primitives)."""
+
+import errno
+import os
+import pkgutil
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+from test import support
+
+_spython = support.import_module('_spython')
+
+HEADER_SIZE = 32
+TAG_SIZE = 32
+
+
+class EncryptBytesTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        for data in (b"", b"x = 1\n", os.urandom(200000)):
+            encrypted = _spython.encrypt_bytes(data)
+            self.assertEqual(len(encrypted), HEADER_SIZE + len(data) + TAG_SIZE)
+            self.assertEqual(encrypted[:6], b"SPYENC")
+            self.assertEqual(bytearray(encrypted)[6], _spython.FORMAT_VERSION)
+            self.assertEqual(_spython.decrypt_bytes(encrypted), data)
+
+    def test_buffer_protocol(self):
+        data = bytearray(b"spam" * 1000)
+        encrypted = _spython.encrypt_bytes(memoryview(data)[4:])
+        self.assertEqual(_spython.decrypt_bytes(bytearray(encrypted)),
+                         bytes(data[4:]))
+
+    def test_random_nonce(self):
+        self.assertNotEqual(_spython.encrypt_bytes(b"spam"),
+                            _spython.encrypt_bytes(b"spam"))
+
+    def test_tampered(self):
+        encrypted = bytearray(_spython.encrypt_bytes(b"x = 1\n"))
+        encrypted[HEADER_SIZE] ^= 1
+        self.assertRaises(OSError, _spython.decrypt_bytes, encrypted)
+        self.assertRaises(OSError, _spython.decrypt_bytes, b"x = 1\n")
+
+    def test_threads(self):
+        # The GIL is released while encrypting; threads must not interfere.
+        contents = [os.urandom(100000 + i) for i in range(4)]
+        errors = []
+
+        def worker(data):
+            for i in range(10):
+                if _spython.decrypt_bytes(_spython.encrypt_bytes(data)) != data:
+                    errors.append(len(data))
+
+        threads = [threading.Thread(target=worker, args=(data,))
+                   for data in contents]
+        with support.start_threads(threads):
+            pass
+        self.assertEqual(errors, [])
+
+
+class ParallelDecryptTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(sys._set_decrypt_threads, sys._decrypt_threads())
+
+    def test_set_threads(self):
+        sys._set_decrypt_threads(3)
+        self.assertEqual(sys._decrypt_threads(), 3)
+        sys._set_decrypt_threads(0)
+        self.assertGreaterEqual(sys._decrypt_threads(), 1)
+        self.assertRaises(ValueError, sys._set_decrypt_threads, -1)
+
+    def test_roundtrip(self):
+        # Files from 2 MiB up are split between threads at counter offsets.
+        sizes = (1 << 20, (2 << 20) - 1, 2 << 20, (5 << 20) + 17)
+        contents = [os.urandom(size) for size in sizes]
+        encrypted = [_spython.encrypt_bytes(data) for data in contents]
+        for n in (1, 2, 3, 16):
+            sys._set_decrypt_threads(n)
+            for data, enc in zip(contents, encrypted):
+                self.assertEqual(_spython.decrypt_bytes(enc), data)
+
+    def test_tampered(self):
+        sys._set_decrypt_threads(4)
+        encrypted = bytearray(_spython.encrypt_bytes(os.urandom(4 << 20)))
+        for pos in (HEADER_SIZE, len(encrypted) - TAG_SIZE - 1,
+                    len(encrypted) - 1):
+            encrypted[pos] ^= 1
+            self.assertRaises(OSError, _spython.decrypt_bytes, encrypted)
+            encrypted[pos] ^= 1
+        _spython.decrypt_bytes(encrypted)
+
+
+class ReadSourceTest(unittest.TestCase):
+    # read_source() decrypts from a mapping of the file: the ciphertext is
+    # copied once, and the copy is both authenticated and decrypted.
+
+    def setUp(self):
+        self.addCleanup(sys._set_decrypt_threads, sys._decrypt_threads())
+        self.addCleanup(support.unlink, support.TESTFN)
+
+    def check(self, data, threads):
+        sys._set_decrypt_threads(threads)
+        encrypted = bytearray(_spython.encrypt_bytes(data))
+        with open(support.TESTFN, "wb") as f:
+            f.write(encrypted)
+        self.assertEqual(bytes(_spython.read_source(support.TESTFN)), data)
+        for pos in (16, HEADER_SIZE, len(encrypted) - TAG_SIZE - 1,
+                    len(encrypted) - 1):
+            encrypted[pos] ^= 1
+            with open(support.TESTFN, "wb") as f:
+                f.write(encrypted)
+            encrypted[pos] ^= 1
+            self.assertRaises(OSError, _spython.read_source, support.TESTFN)
+
+    def test_single_thread(self):
+        self.check(b"x = 1\n" * 1000, 1)
+
+    def test_parallel(self):
+        self.check(os.urandom((4 << 20) + 17), 4)
+
+
+class EncryptorTest(unittest.TestCase):
+
+    def encrypt(self, data, parts):
+        enc = _spython.Encryptor(len(data))
+        step = max(1, len(data) // parts)
+        out = [enc.update(data[i:i + step]) for i in range(0, len(data), step)]
+        out.append(enc.finalize())
+        return b"".join(out)
+
+    def test_roundtrip(self):
+        for data in (b"", b"x", os.urandom(100), os.urandom(300000)):
+            for parts in (1, 3, 100):
+                encrypted = self.encrypt(data, parts)
+                self.assertEqual(len(encrypted),
+                                 HEADER_SIZE + len(data) + TAG_SIZE)
+                self.assertEqual(_spython.decrypt_bytes(encrypted), data)
+
+    def test_empty_update(self):
+        enc = _spython.Encryptor(3)
+        head = enc.update(b"")
+        self.assertEqual(len(head), HEADER_SIZE)
+        out = head + enc.update(memoryview(b"abc")) + enc.finalize()
+        self.assertEqual(_spython.decrypt_bytes(out), b"abc")
+
+    def test_size(self):
+        self.assertRaises(ValueError, _spython.Encryptor, -1)
+        enc = _spython.Encryptor(3)
+        self.assertRaises(ValueError, enc.update, b"abcd")
+        enc.update(b"ab")
+        self.assertRaises(ValueError, enc.finalize)
+        enc.update(b"c")
+        enc.finalize()
+        self.assertRaises(ValueError, enc.finalize)
+        self.assertRaises(ValueError, enc.update, b"")
+
+    def test_shared_between_threads(self):
+        data = os.urandom(64 * 1024)
+        enc = _spython.Encryptor(len(data) * 8)
+        out = []
+        lock = threading.Lock()
+
+        def worker():
+            for i in range(2):
+                # Keep the order of the parts the same as the order of the
+                # ciphertext, the encryption itself runs without the GIL.
+                with lock:
+                    out.append(enc.update(data))
+
+        threads = [threading.Thread(target=worker) for i in range(4)]
+        with support.start_threads(threads):
+            pass
+        out.append(enc.finalize())
+        self.assertEqual(_spython.decrypt_bytes(b"".join(out)), data * 8)
+
+
+class EncryptFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.src = support.TESTFN + ".src"
+        self.dst = support.TESTFN + ".dst"
+        self.addCleanup(support.unlink, self.src)
+        self.addCleanup(support.unlink, self.dst)
+
+    def read_encrypted(self):
+        # open() would decrypt the file, os.open() returns it as on disk.
+        fd = os.open(self.dst, os.O_RDONLY)
+        try:
+            chunks = []
+            while True:
+                chunk = os.read(fd, 1 << 20)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            os.close(fd)
+        return b"".join(chunks)
+
+    def test_encrypt_file(self):
+        for data in (b"", b"x = 1\n", os.urandom(200000)):
+            with open(self.src, "wb") as f:
+                f.write(data)
+            os.chmod(self.src, 0o640)
+            _spython.encrypt_file(self.src, self.dst)
+            self.assertEqual(stat.S_IMODE(os.stat(self.dst).st_mode), 0o640)
+            self.assertEqual(_spython.decrypt_bytes(self.read_encrypted()),
+                             data)
+
+    def test_missing_source(self):
+        with self.assertRaises(FileNotFoundError) as cm:
+            _spython.encrypt_file(self.src, self.dst)
+        self.assertEqual(cm.exception.filename, self.src)
+        self.assertFalse(os.path.exists(self.dst))
+
+    def test_unwritable_destination(self):
+        with open(self.src, "wb") as f:
+            f.write(b"x = 1\n")
+        dst = os.path.join(support.TESTFN + ".missing", "dst")
+        with self.assertRaises(OSError) as cm:
+            _spython.encrypt_file(self.src, dst)
+        self.assertEqual(cm.exception.filename2, dst)
+
+    def test_replaces_atomically(self):
+        with open(self.src, "wb") as f:
+            f.write(b"new")
+        with open(self.dst, "wb") as f:
+            f.write(b"old")
+        _spython.encrypt_file(self.src, self.dst)
+        self.assertEqual(_spython.decrypt_bytes(self.read_encrypted()), b"new")
+        directory = os.path.dirname(os.path.abspath(self.dst))
+        name = os.path.basename(self.dst) + "."
+        self.assertEqual([n for n in os.listdir(directory)
+                          if n.startswith(name)], [])
+
+
+class ReadDataTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "data.json")
+
+    def write(self, data):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_read_data(self):
+        self.write(_spython.encrypt_bytes(b'{"spam": 1}'))
+        for i in range(3):
+            self.assertEqual(_spython.read_data(self.path), b'{"spam": 1}')
+        self.write(b"plain")
+        self.assertEqual(_spython.read_data(self.path), b"plain")
+        with self.assertRaises(EnvironmentError) as cm:
+            _spython.read_data(self.path + "x")
+        self.assertEqual(cm.exception.errno, errno.ENOENT)
+        self.assertEqual(cm.exception.filename, self.path + "x")
+
+    def test_is_encrypted(self):
+        self.write(_spython.encrypt_bytes(b'{"spam": 1}'))
+        self.assertTrue(_spython.is_encrypted(self.path))
+        self.write(b"plain")
+        self.assertFalse(_spython.is_encrypted(self.path))
+        self.write(b"")
+        self.assertFalse(_spython.is_encrypted(self.path))
+        with self.assertRaises(EnvironmentError) as cm:
+            _spython.is_encrypted(self.path + "x")
+        self.assertEqual(cm.exception.errno, errno.ENOENT)
+
+    def test_cached(self):
+        saved = sys._decrypt_cache_info()["maxsize"]
+        self.addCleanup(sys._set_decrypt_cache_size, saved)
+        sys._set_decrypt_cache_size(1 << 20)
+        self.write(_spython.encrypt_bytes(b"x" * 1000))
+        for i in range(2):
+            _spython.read_data(self.path)
+        hits = sys._decrypt_cache_info()["hits"]
+        self.assertEqual(_spython.read_data(self.path), b"x" * 1000)
+        self.assertEqual(sys._decrypt_cache_info()["hits"], hits + 1)
+
+    def test_pkgutil_get_data(self):
+        package = os.path.join(self.dir, "spytestpkg")
+        os.mkdir(package)
+        with open(os.path.join(package, "__init__.py"), "wb"):
+            pass
+        self.path = os.path.join(package, "data.json")
+        self.write(_spython.encrypt_bytes(b'{"spam": 1}'))
+        sys.path.insert(0, self.dir)
+        self.addCleanup(sys.path.remove, self.dir)
+        self.addCleanup(support.unload, "spytestpkg")
+        self.assertEqual(pkgutil.get_data("spytestpkg", "data.json"),
+                         b'{"spam": 1}')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -561,6 +561,96 @@ class SysModuleTest(unittest.TestCase):
     def test_clear_type_cache(self):
         sys._clear_type_cache()
 
+    @test.support.cpython_only
+    def test_decrypt_cache(self):
+        import _spython
+        self.addCleanup(sys._set_decrypt_cache_size,
+                        sys._decrypt_cache_info()["maxsize"])
+        sys._set_decrypt_cache_size(0)
+        sys._set_decrypt_cache_size(1 << 20)
+        self.addCleanup(test.support.unlink, test.support.TESTFN)
+
+        def write(data):
+            with open(test.support.TESTFN, "wb") as f:
+                f.write(_spython.encrypt_bytes(data))
+
+        def read():
+            with open(test.support.TESTFN, "rb") as f:
+                return f.read()
+
+        write(b"x = 1\n")
+        before = sys._decrypt_cache_info()
+        # The first decryption is only remembered, the second one is cached.
+        for i in range(3):
+            self.assertEqual(read(), b"x = 1\n")
+        info = sys._decrypt_cache_info()
+        self.assertEqual(info["hits"] - before["hits"], 1)
+        self.assertEqual(info["misses"] - before["misses"], 2)
+        self.assertEqual(info["entries"], 1)
+        self.assertEqual(info["size"], 6)
+
+        # A modified file is never served from the cache.
+        write(b"x = 22\n")
+        self.assertEqual(read(), b"x = 22\n")
+        self.assertEqual(sys._decrypt_cache_info()["hits"], info["hits"])
+        self.assertEqual(sys._decrypt_cache_info()["entries"], 0)
+
+        sys._set_decrypt_cache_size(0)
+        info = sys._decrypt_cache_info()
+        self.assertEqual((info["entries"], info["size"], info["maxsize"]),
+                         (0, 0, 0))
+        self.assertRaises(ValueError, sys._set_decrypt_cache_size, -1)
+
+    def test_decrypt_stats(self):
+        import _spython
+        self.addCleanup(test.support.unlink, test.support.TESTFN)
+        with open(test.support.TESTFN, "wb") as f:
+            f.write(_spython.encrypt_bytes(b"x = 1\n"))
+        before = sys._decrypt_stats()
+        with open(test.support.TESTFN, "rb") as f:
+            self.assertEqual(f.read(), b"x = 1\n")
+        stats = sys._decrypt_stats()
+        self.assertEqual(stats["files"] - before["files"], 1)
+        self.assertEqual(stats["plain_bytes"] - before["plain_bytes"], 6)
+        self.assertGreater(stats["bytes"] - before["bytes"], 6)
+        self.assertGreaterEqual(stats["sniffs"] - before["sniffs"], 1)
+        self.assertGreater(stats["decrypt_ns"], before["decrypt_ns"])
+
+    def test_decrypt_time(self):
+        import _spython
+        tmpdir = test.support.TESTFN + "_dir"
+        os.mkdir(tmpdir)
+        self.addCleanup(test.support.rmtree, tmpdir)
+        with open(os.path.join(tmpdir, "decrypttimemod.py"), "wb") as f:
+            f.write(_spython.encrypt_bytes(b"x = 1\n"))
+        code = "import sys; sys.path.insert(0, %r); import decrypttimemod" % tmpdir
+        rc, out, err = assert_python_ok("-X", "decrypttime", "-c", code)
+        lines = err.decode().splitlines()
+        self.assertTrue(lines[0].startswith("decrypt time: sniff [us]"))
+        fields = [line.split("|") for line in lines
+                  if line.endswith(" decrypttimemod")]
+        self.assertEqual(len(fields), 1)
+        self.assertEqual(len(fields[0]), 6)
+        rc, out, err = assert_python_ok("-c", code)
+        self.assertNotIn(b"decrypt time:", err)
+
+    def test_decrypt_time_compile(self):
+        # Only the loader's compile of the module counts as compile time,
+        # compile() calls made by the module body are part of exec.
+        tmpdir = test.support.TESTFN + "_dir"
+        os.mkdir(tmpdir)
+        self.addCleanup(test.support.rmtree, tmpdir)
+        with open(os.path.join(tmpdir, "compiletimemod.py"), "w") as f:
+            f.write("for i in range(20):\n"
+                    "    compile('x = 1\\n' * 2000, '<s>', 'exec')\n")
+        code = "import sys; sys.path.insert(0, %r); import compiletimemod" % tmpdir
+        rc, out, err = assert_python_ok("-X", "decrypttime", "-c", code)
+        fields = [line.split("|") for line in err.decode().splitlines()
+                  if line.endswith(" compiletimemod")]
+        self.assertEqual(len(fields), 1)
+        compile_us, exec_us = int(fields[0][3]), int(fields[0][4])
+        self.assertLess(compile_us, exec_us)
+
     def test_ioencoding(self):
         env = dict(os.environ)
 
@@ -440,6 +440,9 @@ typedef struct {
     SSL *ssl;
     PySSLContext *ctx; /* weakref to SSL context */
     char shutdown_seen_zero;
+    /* SSL_is_init_finished() is false again while a TLS 1.3 post-handshake
+       message (NewSessionTicket) is only partly read. */
+    char handshake_done;
     enum py_ssl_server_or_client socket_type;
     PyObject *owner; /* Python level "owner" passed to servername callback */
     PyObject *server_hostname;
@@ -901,6 +904,7 @@ newPySSLSocket(PySSLContext *sslctx, PySocketSockObject *sock,
     self->ctx = sslctx;
     Py_INCREF(sslctx);
     self->shutdown_seen_zero = 0;
+    self->handshake_done = 0;
     self->owner = NULL;
     self->server_hostname = NULL;
     self->err = err;
@@ -1054,6 +1058,7 @@ _ssl__SSLSocket_do_handshake_impl(PySSLSocket *self)
     Py_XDECREF(sock);
     if (ret < 1)
         return PySSL_SetError(self, ret, __FILE__, __LINE__);
+    self->handshake_done = 1;
 
     Py_RETURN_NONE;
 
@@ -1810,7 +1815,7 @@ _ssl__SSLSocket_getpeercert_impl(PySSLSocket *self, int binary_mode)
     X509 *peer_cert;
     PyObject *result;
 
-    if (!SSL_is_init_finished(self->ssl)) {
+    if (!self->handshake_done && !SSL_is_init_finished(self->ssl)) {
         PyErr_SetString(PyExc_ValueError,
                         "handshake not done yet");
         return NULL;
@@ -1994,7 +1999,7 @@ _ssl__SSLSocket_version_impl(PySSLSocket *self)
 
     if (self->ssl == NULL)
         Py_RETURN_NONE;
-    if (!SSL_is_init_finished(self->ssl)) {
+    if (!self->handshake_done && !SSL_is_init_finished(self->ssl)) {
         /* handshake not finished */
         Py_RETURN_NONE;
     }
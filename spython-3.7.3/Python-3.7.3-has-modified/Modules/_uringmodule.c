@@ -0,0 +1,917 @@
+/* io_uring interface for asyncio's UringProactor (Lib/asyncio/uring_events.py).
+
+   A Ring wraps one io_uring instance through the raw system calls, so
+   liburing is not needed.  Operations are queued in the submission ring
+   with a key chosen by the caller; wait() submits everything queued with a
+   single io_uring_enter() call, waits for completions and returns them as
+   (key, result, data) tuples.  The buffer of an operation stays acquired
+   until its completion has been returned, since the kernel writes into it
+   or reads from it asynchronously.
+*/
+
+#include "Python.h"
+
+#include <linux/io_uring.h>
+#include <poll.h>
+#include <sys/mman.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+/* user_data of the cancel requests, their completions are dropped */
+#define CANCEL_KEY UINT64_MAX
+
+#define load_acquire(p) __atomic_load_n((p), __ATOMIC_ACQUIRE)
+#define store_release(p, v) __atomic_store_n((p), (v), __ATOMIC_RELEASE)
+
+/* Operations the Ring needs; the kernel supports all of them since 5.6. */
+static const int required_ops[] = {
+    IORING_OP_POLL_ADD, IORING_OP_ASYNC_CANCEL, IORING_OP_ACCEPT,
+    IORING_OP_READ, IORING_OP_WRITE, IORING_OP_SEND, IORING_OP_RECV,
+};
+
+
+static int
+sys_io_uring_setup(unsigned entries, struct io_uring_params *p)
+{
+    return (int)syscall(__NR_io_uring_setup, entries, p);
+}
+
+static int
+sys_io_uring_enter(int fd, unsigned to_submit, unsigned min_complete,
+                   unsigned flags, void *arg, size_t argsz)
+{
+    return (int)syscall(__NR_io_uring_enter, fd, to_submit, min_complete,
+                        flags, arg, argsz);
+}
+
+static int
+sys_io_uring_register(int fd, unsigned opcode, void *arg, unsigned nr_args)
+{
+    return (int)syscall(__NR_io_uring_register, fd, opcode, arg, nr_args);
+}
+
+
+/* An operation in flight: keeps its buffer (or the bytes object it reads
+   into) alive until the completion. */
+typedef struct {
+    PyObject_HEAD
+    Py_buffer view;         /* view.obj is NULL if no buffer was acquired */
+    PyObject *data;         /* bytes allocated by recv(size)/read(size) */
+} OperationObject;
+
+static void
+Operation_dealloc(OperationObject *self)
+{
+    if (self->view.obj != NULL)
+        PyBuffer_Release(&self->view);
+    Py_XDECREF(self->data);
+    PyObject_Del(self);
+}
+
+static PyTypeObject Operation_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_uring.Operation",                 /* tp_name */
+    sizeof(OperationObject),            /* tp_basicsize */
+    0,                                  /* tp_itemsize */
+    (destructor)Operation_dealloc,      /* tp_dealloc */
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    Py_TPFLAGS_DEFAULT,                 /* tp_flags */
+};
+
+
+typedef struct {
+    PyObject_HEAD
+    int fd;
+    unsigned features;
+    void *sq_ring;
+    size_t sq_ring_size;
+    void *cq_ring;                      /* == sq_ring with SINGLE_MMAP */
+    size_t cq_ring_size;
+    struct io_uring_sqe *sqes;
+    size_t sqes_size;
+    unsigned *sq_head, *sq_tail, *sq_array;
+    unsigned sq_mask, sq_entries;
+    unsigned *cq_head, *cq_tail;
+    unsigned cq_mask;
+    struct io_uring_cqe *cqes;
+    unsigned sq_local_tail;             /* tail including unsubmitted SQEs */
+    PyObject *ops;                      /* key -> Operation in flight */
+} RingObject;
+
+static PyTypeObject Ring_Type;
+
+
+static int
+ring_check_closed(RingObject *self)
+{
+    if (self->fd < 0) {
+        PyErr_SetString(PyExc_ValueError, "I/O operation on closed ring");
+        return -1;
+    }
+    return 0;
+}
+
+static unsigned
+ring_unsubmitted(RingObject *self)
+{
+    return self->sq_local_tail - load_acquire(self->sq_head);
+}
+
+/* Submit the queued SQEs and wait for min_complete completions, with the
+   GIL released if waiting.  ts is the timeout or NULL. */
+static int
+ring_enter(RingObject *self, unsigned min_complete,
+           struct __kernel_timespec *ts)
+{
+    unsigned to_submit, flags = 0;
+    struct io_uring_getevents_arg arg;
+    void *argp = NULL;
+    size_t argsz = 0;
+    int res;
+
+    store_release(self->sq_tail, self->sq_local_tail);
+    to_submit = ring_unsubmitted(self);
+    if (min_complete) {
+        flags |= IORING_ENTER_GETEVENTS;
+        if (ts != NULL) {
+            memset(&arg, 0, sizeof(arg));
+            arg.ts = (__u64)(uintptr_t)ts;
+            argp = &arg;
+            argsz = sizeof(arg);
+            flags |= IORING_ENTER_EXT_ARG;
+        }
+        Py_BEGIN_ALLOW_THREADS
+        res = sys_io_uring_enter(self->fd, to_submit, min_complete, flags,
+                                 argp, argsz);
+        Py_END_ALLOW_THREADS
+    }
+    else {
+        if (!to_submit)
+            return 0;
+        res = sys_io_uring_enter(self->fd, to_submit, 0, 0, NULL, 0);
+    }
+    if (res < 0 && errno != ETIME && errno != EINTR && errno != EBUSY) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    if (res < 0 && errno == EINTR)
+        return PyErr_CheckSignals();
+    return 0;
+}
+
+/* Return a zeroed SQE, submitting the queued ones if the ring is full. */
+static struct io_uring_sqe *
+ring_get_sqe(RingObject *self)
+{
+    struct io_uring_sqe *sqe;
+    unsigned index;
+
+    if (ring_check_closed(self) < 0)
+        return NULL;
+    if (ring_unsubmitted(self) >= self->sq_entries) {
+        if (ring_enter(self, 0, NULL) < 0)
+            return NULL;
+        if (ring_unsubmitted(self) >= self->sq_entries) {
+            PyErr_SetString(PyExc_BlockingIOError,
+                            "io_uring submission queue is full");
+            return NULL;
+        }
+    }
+    index = self->sq_local_tail & self->sq_mask;
+    sqe = &self->sqes[index];
+    memset(sqe, 0, sizeof(*sqe));
+    self->sq_array[index] = index;
+    return sqe;
+}
+
+static void
+ring_queue_sqe(RingObject *self)
+{
+    self->sq_local_tail++;
+}
+
+static OperationObject *
+operation_new(void)
+{
+    OperationObject *op = PyObject_New(OperationObject, &Operation_Type);
+    if (op == NULL)
+        return NULL;
+    op->view.obj = NULL;
+    op->data = NULL;
+    return op;
+}
+
+/* Queue an operation: fill sqe from op (and the other arguments) and
+   remember op under key. */
+static PyObject *
+ring_queue(RingObject *self, unsigned long long key, int opcode, int fd,
+           OperationObject *op, void *addr, unsigned len,
+           unsigned long long off, unsigned op_flags)
+{
+    struct io_uring_sqe *sqe;
+    PyObject *pykey;
+    int res;
+
+    if (key == CANCEL_KEY) {
+        PyErr_SetString(PyExc_ValueError, "invalid key");
+        goto error;
+    }
+    pykey = PyLong_FromUnsignedLongLong(key);
+    if (pykey == NULL)
+        goto error;
+    res = PyDict_Contains(self->ops, pykey);
+    if (res != 0) {
+        if (res > 0)
+            PyErr_Format(PyExc_ValueError, "key %llu is in use", key);
+        Py_DECREF(pykey);
+        goto error;
+    }
+    sqe = ring_get_sqe(self);
+    if (sqe == NULL || PyDict_SetItem(self->ops, pykey, (PyObject *)op) < 0) {
+        Py_DECREF(pykey);
+        goto error;
+    }
+    Py_DECREF(pykey);
+    Py_DECREF(op);
+
+    sqe->opcode = opcode;
+    sqe->fd = fd;
+    sqe->addr = (__u64)(uintptr_t)addr;
+    sqe->len = len;
+    sqe->off = off;
+    sqe->rw_flags = op_flags;
+    sqe->user_data = key;
+    ring_queue_sqe(self);
+    Py_RETURN_NONE;
+
+error:
+    Py_DECREF(op);
+    return NULL;
+}
+
+/* recv() and read(): into a writable buffer, or into a new bytes object
+   of the given size. */
+static PyObject *
+ring_queue_input(RingObject *self, int opcode, unsigned long long key,
+                 int fd, PyObject *target, unsigned long long off,
+                 unsigned op_flags)
+{
+    OperationObject *op;
+    void *addr;
+    Py_ssize_t len;
+
+    op = operation_new();
+    if (op == NULL)
+        return NULL;
+    if (PyLong_Check(target)) {
+        len = PyLong_AsSsize_t(target);
+        if (len < 0) {
+            if (!PyErr_Occurred())
+                PyErr_SetString(PyExc_ValueError, "negative size");
+            Py_DECREF(op);
+            return NULL;
+        }
+        op->data = PyBytes_FromStringAndSize(NULL, len);
+        if (op->data == NULL) {
+            Py_DECREF(op);
+            return NULL;
+        }
+        addr = PyBytes_AS_STRING(op->data);
+    }
+    else {
+        if (PyObject_GetBuffer(target, &op->view, PyBUF_WRITABLE) < 0) {
+            Py_DECREF(op);
+            return NULL;
+        }
+        addr = op->view.buf;
+        len = op->view.len;
+    }
+    if (len > UINT_MAX)
+        len = UINT_MAX;
+    return ring_queue(self, key, opcode, fd, op, addr, (unsigned)len, off,
+                      op_flags);
+}
+
+static PyObject *
+ring_queue_output(RingObject *self, int opcode, unsigned long long key,
+                  int fd, PyObject *data, unsigned long long off,
+                  unsigned op_flags)
+{
+    OperationObject *op;
+    Py_ssize_t len;
+
+    op = operation_new();
+    if (op == NULL)
+        return NULL;
+    if (PyObject_GetBuffer(data, &op->view, PyBUF_SIMPLE) < 0) {
+        Py_DECREF(op);
+        return NULL;
+    }
+    len = op->view.len;
+    if (len > UINT_MAX)
+        len = UINT_MAX;
+    return ring_queue(self, key, opcode, fd, op, op->view.buf,
+                      (unsigned)len, off, op_flags);
+}
+
+
+PyDoc_STRVAR(Ring_recv_doc,
+"recv(key, fd, buffer_or_size, flags=0)\n\n"
+"Queue a recv(2) on the socket fd, into a writable buffer or a new bytes\n"
+"object of the given size.");
+
+static PyObject *
+Ring_recv(RingObject *self, PyObject *args)
+{
+    unsigned long long key;
+    int fd, flags = 0;
+    PyObject *target;
+
+    if (!PyArg_ParseTuple(args, "KiO|i:recv", &key, &fd, &target, &flags))
+        return NULL;
+    return ring_queue_input(self, IORING_OP_RECV, key, fd, target, 0, flags);
+}
+
+PyDoc_STRVAR(Ring_read_doc,
+"read(key, fd, buffer_or_size, offset=-1)\n\n"
+"Queue a read of fd at offset (-1: the file position), into a writable\n"
+"buffer or a new bytes object of the given size.");
+
+static PyObject *
+Ring_read(RingObject *self, PyObject *args)
+{
+    unsigned long long key;
+    int fd;
+    long long offset = -1;
+    PyObject *target;
+
+    if (!PyArg_ParseTuple(args, "KiO|L:read", &key, &fd, &target, &offset))
+        return NULL;
+    return ring_queue_input(self, IORING_OP_READ, key, fd, target,
+                            (unsigned long long)offset, 0);
+}
+
+PyDoc_STRVAR(Ring_send_doc,
+"send(key, fd, data, flags=0)\n\n"
+"Queue a send(2) of a bytes-like object on the socket fd.");
+
+static PyObject *
+Ring_send(RingObject *self, PyObject *args)
+{
+    unsigned long long key;
+    int fd, flags = 0;
+    PyObject *data;
+
+    if (!PyArg_ParseTuple(args, "KiO|i:send", &key, &fd, &data, &flags))
+        return NULL;
+    return ring_queue_output(self, IORING_OP_SEND, key, fd, data, 0, flags);
+}
+
+PyDoc_STRVAR(Ring_write_doc,
+"write(key, fd, data, offset=-1)\n\n"
+"Queue a write of a bytes-like object to fd at offset (-1: the file\n"
+"position).");
+
+static PyObject *
+Ring_write(RingObject *self, PyObject *args)
+{
+    unsigned long long key;
+    int fd;
+    long long offset = -1;
+    PyObject *data;
+
+    if (!PyArg_ParseTuple(args, "KiO|L:write", &key, &fd, &data, &offset))
+        return NULL;
+    return ring_queue_output(self, IORING_OP_WRITE, key, fd, data,
+                             (unsigned long long)offset, 0);
+}
+
+PyDoc_STRVAR(Ring_accept_doc,
+"accept(key, fd, flags=0)\n\n"
+"Queue an accept4(2) on the listening socket fd; the result is the file\n"
+"descriptor of the new connection.");
+
+static PyObject *
+Ring_accept(RingObject *self, PyObject *args)
+{
+    unsigned long long key;
+    int fd, flags = 0;
+    OperationObject *op;
+
+    if (!PyArg_ParseTuple(args, "Ki|i:accept", &key, &fd, &flags))
+        return NULL;
+    op = operation_new();
+    if (op == NULL)
+        return NULL;
+    return ring_queue(self, key, IORING_OP_ACCEPT, fd, op, NULL, 0, 0,
+                      flags);
+}
+
+PyDoc_STRVAR(Ring_poll_doc,
+"poll(key, fd, events)\n\n"
+"Queue a one-shot poll of fd for events (select.POLLIN, ...); the result\n"
+"is the mask of the events that occurred.");
+
+static PyObject *
+Ring_poll(RingObject *self, PyObject *args)
+{
+    unsigned long long key;
+    int fd;
+    unsigned short events;
+    OperationObject *op;
+    struct io_uring_sqe *sqe;
+    PyObject *res;
+
+    if (!PyArg_ParseTuple(args, "KiH:poll", &key, &fd, &events))
+        return NULL;
+    op = operation_new();
+    if (op == NULL)
+        return NULL;
+    res = ring_queue(self, key, IORING_OP_POLL_ADD, fd, op, NULL, 0, 0, 0);
+    if (res != NULL) {
+        sqe = &self->sqes[(self->sq_local_tail - 1) & self->sq_mask];
+        sqe->poll_events = events;
+    }
+    return res;
+}
+
+PyDoc_STRVAR(Ring_cancel_doc,
+"cancel(key)\n\n"
+"Ask the kernel to cancel the operation queued with key.  Its completion\n"
+"still has to be waited for; the result is -ECANCELED if the cancellation\n"
+"succeeded.");
+
+static PyObject *
+Ring_cancel(RingObject *self, PyObject *args)
+{
+    unsigned long long key;
+    struct io_uring_sqe *sqe;
+
+    if (!PyArg_ParseTuple(args, "K:cancel", &key))
+        return NULL;
+    sqe = ring_get_sqe(self);
+    if (sqe == NULL)
+        return NULL;
+    sqe->opcode = IORING_OP_ASYNC_CANCEL;
+    sqe->fd = -1;
+    sqe->addr = key;
+    sqe->user_data = CANCEL_KEY;
+    ring_queue_sqe(self);
+    Py_RETURN_NONE;
+}
+
+/* Move the available completions to a list of (key, res, data). */
+static PyObject *
+ring_reap(RingObject *self)
+{
+    PyObject *list, *pykey, *item;
+    OperationObject *op;
+    struct io_uring_cqe *cqe;
+    unsigned head, tail;
+    PyObject *data;
+
+    list = PyList_New(0);
+    if (list == NULL)
+        return NULL;
+    head = *self->cq_head;
+    tail = load_acquire(self->cq_tail);
+    for (; head != tail; head++) {
+        cqe = &self->cqes[head & self->cq_mask];
+        if (cqe->user_data == CANCEL_KEY)
+            continue;
+        pykey = PyLong_FromUnsignedLongLong(cqe->user_data);
+        if (pykey == NULL)
+            goto error;
+        op = (OperationObject *)PyDict_GetItemWithError(self->ops, pykey);
+        if (op == NULL) {
+            Py_DECREF(pykey);
+            if (PyErr_Occurred())
+                goto error;
+            continue;
+        }
+        Py_INCREF(op);
+        if (PyDict_DelItem(self->ops, pykey) < 0) {
+            Py_DECREF(op);
+            Py_DECREF(pykey);
+            goto error;
+        }
+        data = Py_None;
+        if (op->data != NULL && cqe->res >= 0) {
+            if (_PyBytes_Resize(&op->data, cqe->res) < 0) {
+                Py_DECREF(op);
+                Py_DECREF(pykey);
+                goto error;
+            }
+            data = op->data;
+        }
+        item = Py_BuildValue("NiO", pykey, cqe->res, data);
+        Py_DECREF(op);
+        if (item == NULL || PyList_Append(list, item) < 0) {
+            Py_XDECREF(item);
+            goto error;
+        }
+        Py_DECREF(item);
+    }
+    store_release(self->cq_head, head);
+    return list;
+
+error:
+    /* the completions before head were moved to the list */
+    store_release(self->cq_head, head + 1);
+    Py_DECREF(list);
+    return NULL;
+}
+
+static int
+ring_has_completions(RingObject *self)
+{
+    return *self->cq_head != load_acquire(self->cq_tail);
+}
+
+PyDoc_STRVAR(Ring_wait_doc,
+"wait(timeout=None) -> list of (key, result, data)\n\n"
+"Submit the queued operations and wait up to timeout seconds (forever if\n"
+"None) for at least one completion.  result is the return value of the\n"
+"system call or -errno; data is the bytes object read by recv(size) and\n"
+"read(size), else None.");
+
+static PyObject *
+Ring_wait(RingObject *self, PyObject *args)
+{
+    PyObject *timeout_obj = Py_None;
+    _PyTime_t timeout;
+    struct timespec ts;
+    struct __kernel_timespec kts, *tsp = NULL;
+    struct pollfd pfd;
+    int res;
+
+    if (!PyArg_ParseTuple(args, "|O:wait", &timeout_obj))
+        return NULL;
+    if (ring_check_closed(self) < 0)
+        return NULL;
+    if (timeout_obj != Py_None) {
+        if (_PyTime_FromSecondsObject(&timeout, timeout_obj,
+                                      _PyTime_ROUND_TIMEOUT) < 0)
+            return NULL;
+        if (timeout < 0)
+            timeout = 0;
+        if (_PyTime_AsTimespec(timeout, &ts) < 0)
+            return NULL;
+        kts.tv_sec = ts.tv_sec;
+        kts.tv_nsec = ts.tv_nsec;
+        tsp = &kts;
+    }
+
+    if (ring_has_completions(self) || (tsp && timeout == 0)) {
+        if (ring_enter(self, 0, NULL) < 0)
+            return NULL;
+    }
+    else if (tsp == NULL || (self->features & IORING_FEAT_EXT_ARG)) {
+        if (ring_enter(self, 1, tsp) < 0)
+            return NULL;
+    }
+    else {
+        /* No timeout argument for io_uring_enter() before Linux 5.11:
+           wait for the ring file descriptor instead. */
+        if (ring_enter(self, 0, NULL) < 0)
+            return NULL;
+        pfd.fd = self->fd;
+        pfd.events = POLLIN;
+        Py_BEGIN_ALLOW_THREADS
+        res = poll(&pfd, 1, (int)_PyTime_AsMilliseconds(
+            timeout, _PyTime_ROUND_TIMEOUT));
+        Py_END_ALLOW_THREADS
+        if (res < 0) {
+            if (errno != EINTR)
+                return PyErr_SetFromErrno(PyExc_OSError);
+            if (PyErr_CheckSignals() < 0)
+                return NULL;
+        }
+    }
+    return ring_reap(self);
+}
+
+static int
+ring_close(RingObject *self)
+{
+    PyObject *key, *value;
+    Py_ssize_t pos = 0;
+    int res = 0;
+
+    if (self->fd < 0)
+        return 0;
+    /* The kernel may still use the buffers: cancel the operations and
+       wait for them before releasing anything. */
+    while (PyDict_Next(self->ops, &pos, &key, &value)) {
+        struct io_uring_sqe *sqe = ring_get_sqe(self);
+        if (sqe == NULL) {
+            res = -1;
+            break;
+        }
+        sqe->opcode = IORING_OP_ASYNC_CANCEL;
+        sqe->fd = -1;
+        sqe->addr = PyLong_AsUnsignedLongLong(key);
+        sqe->user_data = CANCEL_KEY;
+        ring_queue_sqe(self);
+    }
+    while (res == 0 && PyDict_GET_SIZE(self->ops)) {
+        PyObject *list;
+        if (ring_enter(self, 1, NULL) < 0) {
+            res = -1;
+            break;
+        }
+        list = ring_reap(self);
+        if (list == NULL)
+            res = -1;
+        Py_XDECREF(list);
+    }
+    if (res < 0 && PyDict_GET_SIZE(self->ops)) {
+        /* Leak the ring rather than free memory the kernel writes to. */
+        return -1;
+    }
+
+    if (self->sqes != NULL)
+        munmap(self->sqes, self->sqes_size);
+    if (self->cq_ring != NULL && self->cq_ring != self->sq_ring)
+        munmap(self->cq_ring, self->cq_ring_size);
+    if (self->sq_ring != NULL)
+        munmap(self->sq_ring, self->sq_ring_size);
+    self->sqes = NULL;
+    self->sq_ring = self->cq_ring = NULL;
+    close(self->fd);
+    self->fd = -1;
+    return res;
+}
+
+PyDoc_STRVAR(Ring_close_doc,
+"close()\n\n"
+"Cancel the operations in flight, wait for them and close the ring.");
+
+static PyObject *
+Ring_close(RingObject *self, PyObject *Py_UNUSED(ignored))
+{
+    if (ring_close(self) < 0)
+        return NULL;
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(Ring_fileno_doc,
+"fileno()\n\n"
+"Return the file descriptor of the ring.");
+
+static PyObject *
+Ring_fileno(RingObject *self, PyObject *Py_UNUSED(ignored))
+{
+    if (ring_check_closed(self) < 0)
+        return NULL;
+    return PyLong_FromLong(self->fd);
+}
+
+static PyObject *
+Ring_get_closed(RingObject *self, void *closure)
+{
+    return PyBool_FromLong(self->fd < 0);
+}
+
+static PyObject *
+Ring_get_pending(RingObject *self, void *closure)
+{
+    return PyLong_FromSsize_t(PyDict_GET_SIZE(self->ops));
+}
+
+/* Fail with ENOSYS if the kernel lacks one of required_ops. */
+static int
+ring_probe(RingObject *self)
+{
+    struct io_uring_probe *probe;
+    size_t size, i;
+    int op;
+
+    size = sizeof(*probe) + 256 * sizeof(struct io_uring_probe_op);
+    probe = PyMem_Calloc(1, size);
+    if (probe == NULL) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    if (sys_io_uring_register(self->fd, IORING_REGISTER_PROBE, probe,
+                              256) < 0) {
+        PyMem_Free(probe);
+        errno = ENOSYS;
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    for (i = 0; i < Py_ARRAY_LENGTH(required_ops); i++) {
+        op = required_ops[i];
+        if (op > probe->last_op ||
+                !(probe->ops[op].flags & IO_URING_OP_SUPPORTED)) {
+            PyMem_Free(probe);
+            PyErr_Format(PyExc_OSError,
+                         "io_uring operation %d is not supported", op);
+            return -1;
+        }
+    }
+    PyMem_Free(probe);
+    return 0;
+}
+
+static int
+ring_setup(RingObject *self, unsigned entries)
+{
+    struct io_uring_params p;
+    void *ptr;
+
+    memset(&p, 0, sizeof(p));
+    self->fd = sys_io_uring_setup(entries, &p);
+    if (self->fd < 0) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    self->features = p.features;
+
+    self->sq_ring_size = p.sq_off.array + p.sq_entries * sizeof(unsigned);
+    self->cq_ring_size = p.cq_off.cqes +
+                         p.cq_entries * sizeof(struct io_uring_cqe);
+    if (p.features & IORING_FEAT_SINGLE_MMAP) {
+        if (self->cq_ring_size > self->sq_ring_size)
+            self->sq_ring_size = self->cq_ring_size;
+        self->cq_ring_size = self->sq_ring_size;
+    }
+    ptr = mmap(NULL, self->sq_ring_size, PROT_READ | PROT_WRITE,
+               MAP_SHARED | MAP_POPULATE, self->fd, IORING_OFF_SQ_RING);
+    if (ptr == MAP_FAILED)
+        goto error;
+    self->sq_ring = ptr;
+    if (p.features & IORING_FEAT_SINGLE_MMAP) {
+        self->cq_ring = ptr;
+    }
+    else {
+        ptr = mmap(NULL, self->cq_ring_size, PROT_READ | PROT_WRITE,
+                   MAP_SHARED | MAP_POPULATE, self->fd, IORING_OFF_CQ_RING);
+        if (ptr == MAP_FAILED)
+            goto error;
+        self->cq_ring = ptr;
+    }
+    self->sqes_size = p.sq_entries * sizeof(struct io_uring_sqe);
+    ptr = mmap(NULL, self->sqes_size, PROT_READ | PROT_WRITE,
+               MAP_SHARED | MAP_POPULATE, self->fd, IORING_OFF_SQES);
+    if (ptr == MAP_FAILED)
+        goto error;
+    self->sqes = ptr;
+
+    self->sq_head = (unsigned *)((char *)self->sq_ring + p.sq_off.head);
+    self->sq_tail = (unsigned *)((char *)self->sq_ring + p.sq_off.tail);
+    self->sq_array = (unsigned *)((char *)self->sq_ring + p.sq_off.array);
+    self->sq_mask = *(unsigned *)((char *)self->sq_ring + p.sq_off.ring_mask);
+    self->sq_entries = p.sq_entries;
+    self->sq_local_tail = *self->sq_tail;
+    self->cq_head = (unsigned *)((char *)self->cq_ring + p.cq_off.head);
+    self->cq_tail = (unsigned *)((char *)self->cq_ring + p.cq_off.tail);
+    self->cq_mask = *(unsigned *)((char *)self->cq_ring + p.cq_off.ring_mask);
+    self->cqes = (struct io_uring_cqe *)((char *)self->cq_ring +
+                                         p.cq_off.cqes);
+    return ring_probe(self);
+
+error:
+    PyErr_SetFromErrno(PyExc_OSError);
+    return -1;
+}
+
+static PyObject *
+Ring_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"entries", NULL};
+    unsigned int entries = 256;
+    RingObject *self;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|I:Ring", kwlist,
+                                     &entries))
+        return NULL;
+    self = (RingObject *)type->tp_alloc(type, 0);
+    if (self == NULL)
+        return NULL;
+    self->fd = -1;
+    self->ops = PyDict_New();
+    if (self->ops == NULL || ring_setup(self, entries) < 0) {
+        Py_DECREF(self);
+        return NULL;
+    }
+    return (PyObject *)self;
+}
+
+static void
+Ring_dealloc(RingObject *self)
+{
+    PyObject *exc_type, *exc_value, *exc_tb;
+
+    PyErr_Fetch(&exc_type, &exc_value, &exc_tb);
+    if (self->ops != NULL && ring_close(self) < 0) {
+        PyErr_WriteUnraisable((PyObject *)self);
+        /* the operations and their buffers are leaked with the ring */
+        Py_INCREF(self->ops);
+    }
+    else if (self->fd >= 0) {
+        close(self->fd);
+    }
+    PyErr_Restore(exc_type, exc_value, exc_tb);
+    Py_XDECREF(self->ops);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static PyMethodDef Ring_methods[] = {
+    {"recv", (PyCFunction)Ring_recv, METH_VARARGS, Ring_recv_doc},
+    {"send", (PyCFunction)Ring_send, METH_VARARGS, Ring_send_doc},
+    {"read", (PyCFunction)Ring_read, METH_VARARGS, Ring_read_doc},
+    {"write", (PyCFunction)Ring_write, METH_VARARGS, Ring_write_doc},
+    {"accept", (PyCFunction)Ring_accept, METH_VARARGS, Ring_accept_doc},
+    {"poll", (PyCFunction)Ring_poll, METH_VARARGS, Ring_poll_doc},
+    {"cancel", (PyCFunction)Ring_cancel, METH_VARARGS, Ring_cancel_doc},
+    {"wait", (PyCFunction)Ring_wait, METH_VARARGS, Ring_wait_doc},
+    {"close", (PyCFunction)Ring_close, METH_NOARGS, Ring_close_doc},
+    {"fileno", (PyCFunction)Ring_fileno, METH_NOARGS, Ring_fileno_doc},
+    {NULL, NULL}
+};
+
+static PyGetSetDef Ring_getset[] = {
+    {"closed", (getter)Ring_get_closed, NULL,
+     "True if the ring is closed."},
+    {"pending", (getter)Ring_get_pending, NULL,
+     "Number of operations whose completion was not returned yet."},
+    {NULL}
+};
+
+PyDoc_STRVAR(Ring_doc,
+"Ring(entries=256)\n\n"
+"An io_uring instance with room for entries queued operations.\n"
+"Raise OSError if the kernel does not support io_uring or one of the\n"
+"operations used here (Linux 5.6 and newer do).");
+
+static PyTypeObject Ring_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_uring.Ring",                      /* tp_name */
+    sizeof(RingObject),                 /* tp_basicsize */
+    0,                                  /* tp_itemsize */
+    (destructor)Ring_dealloc,           /* tp_dealloc */
+    0,                                  /* tp_print */
+    0,                                  /* tp_getattr */
+    0,                                  /* tp_setattr */
+    0,                                  /* tp_reserved */
+    0,                                  /* tp_repr */
+    0,                                  /* tp_as_number */
+    0,                                  /* tp_as_sequence */
+    0,                                  /* tp_as_mapping */
+    0,                                  /* tp_hash */
+    0,                                  /* tp_call */
+    0,                                  /* tp_str */
+    0,                                  /* tp_getattro */
+    0,                                  /* tp_setattro */
+    0,                                  /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                 /* tp_flags */
+    Ring_doc,                           /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    Ring_methods,                       /* tp_methods */
+    0,                                  /* tp_members */
+    Ring_getset,                        /* tp_getset */
+    0,                                  /* tp_base */
+    0,                                  /* tp_dict */
+    0,                                  /* tp_descr_get */
+    0,                                  /* tp_descr_set */
+    0,                                  /* tp_dictoffset */
+    0,                                  /* tp_init */
+    0,                                  /* tp_alloc */
+    Ring_new,                           /* tp_new */
+};
+
+
+PyDoc_STRVAR(module_doc,
+"Low-level io_uring interface used by asyncio.uring_events.");
+
+static struct PyModuleDef uringmodule = {
+    PyModuleDef_HEAD_INIT,
+    "_uring",
+    module_doc,
+    -1,
+    NULL,
+};
+
+PyMODINIT_FUNC
+PyInit__uring(void)
+{
+    PyObject *m;
+
+    if (PyType_Ready(&Operation_Type) < 0 || PyType_Ready(&Ring_Type) < 0)
+        return NULL;
+    m = PyModule_Create(&uringmodule);
+    if (m == NULL)
+        return NULL;
+    Py_INCREF(&Ring_Type);
+    if (PyModule_AddObject(m, "Ring", (PyObject *)&Ring_Type) < 0) {
+        Py_DECREF(m);
+        return NULL;
+    }
+    return m;
+}
@@ -1990,6 +1990,10 @@ config_read_complex_options(_PyCoreConfig *config)
        || config_get_xoption(config, L"importtime")) {
         config->import_time = 1;
     }
+    if (config_get_env_var("PYTHONDECRYPTTIME")
+       || config_get_xoption(config, L"decrypttime")) {
+        config->decrypt_time = 1;
+    }
     if (config_get_xoption(config, L"dev" ) ||
         config_get_env_var("PYTHONDEVMODE"))
     {
@@ -2505,6 +2509,7 @@ _PyCoreConfig_Copy(_PyCoreConfig *config, const _PyCoreConfig *config2)
     COPY_ATTR(faulthandler);
     COPY_ATTR(tracemalloc);
     COPY_ATTR(import_time);
+    COPY_ATTR(decrypt_time);
     COPY_ATTR(show_ref_count);
     COPY_ATTR(show_alloc_count);
     COPY_ATTR(dump_refs);
@@ -206,6 +206,33 @@ exit:
     return return_value;
 }
 
+PyDoc_STRVAR(_imp__is_frozen_encrypted__doc__,
+"_is_frozen_encrypted($module, name, /)\n"
+"--\n"
+"\n"
+"Returns True if the frozen module name is encrypted (a frozen stdlib module).");
+
+#define _IMP__IS_FROZEN_ENCRYPTED_METHODDEF    \
+    {"_is_frozen_encrypted", (PyCFunction)_imp__is_frozen_encrypted, METH_O, _imp__is_frozen_encrypted__doc__},
+
+static PyObject *
+_imp__is_frozen_encrypted_impl(PyObject *module, PyObject *name);
+
+static PyObject *
+_imp__is_frozen_encrypted(PyObject *module, PyObject *arg)
+{
+    PyObject *return_value = NULL;
+    PyObject *name;
+
+    if (!PyArg_Parse(arg, "U:_is_frozen_encrypted", &name)) {
+        goto exit;
+    }
+    return_value = _imp__is_frozen_encrypted_impl(module, name);
+
+exit:
+    return return_value;
+}
+
 PyDoc_STRVAR(_imp_is_builtin__doc__,
 "is_builtin($module, name, /)\n"
 "--\n"
@@ -389,6 +416,40 @@ exit:
     return return_value;
 }
 
+PyDoc_STRVAR(_imp__compile_source__doc__,
+"_compile_source($module, source, path, optimize, /)\n"
+"--\n"
+"\n"
+"Compile the source of a module for SourceLoader.source_to_code().\n"
+"\n"
+"Same as compile(source, path, \'exec\', dont_inherit=True, optimize=optimize),\n"
+"but the time is counted as compile time by -X decrypttime.");
+
+#define _IMP__COMPILE_SOURCE_METHODDEF    \
+    {"_compile_source", (PyCFunction)_imp__compile_source, METH_FASTCALL, _imp__compile_source__doc__},
+
+static PyObject *
+_imp__compile_source_impl(PyObject *module, PyObject *source, PyObject *path,
+                          int optimize);
+
+static PyObject *
+_imp__compile_source(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    PyObject *return_value = NULL;
+    PyObject *source;
+    PyObject *path;
+    int optimize;
+
+    if (!_PyArg_ParseStack(args, nargs, "OOi:_compile_source",
+        &source, &path, &optimize)) {
+        goto exit;
+    }
+    return_value = _imp__compile_source_impl(module, source, path, optimize);
+
+exit:
+    return return_value;
+}
+
 #ifndef _IMP_CREATE_DYNAMIC_METHODDEF
     #define _IMP_CREATE_DYNAMIC_METHODDEF
 #endif /* !defined(_IMP_CREATE_DYNAMIC_METHODDEF) */
@@ -396,4 +457,4 @@ exit:
 #ifndef _IMP_EXEC_DYNAMIC_METHODDEF
     #define _IMP_EXEC_DYNAMIC_METHODDEF
 #endif /* !defined(_IMP_EXEC_DYNAMIC_METHODDEF) */
-/*[clinic end generated code: output=f0660cd1de6b3a73 input=a9049054013a1b77]*/
+/*[clinic end generated code: output=03aa9e8d027a196e input=a9049054013a1b77]*/
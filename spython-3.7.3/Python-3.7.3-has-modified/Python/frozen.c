@@ -4,6 +4,7 @@
 #include "Python.h"
 #include "importlib.h"
 #include "importlib_external.h"
+#include "frozen_stdlib.h"
 
 /* In order to test the support for frozen modules, by default we
    define a single frozen module, __hello__.  Loading it will print
@@ -37,6 +38,8 @@ static const struct _frozen _PyImport_FrozenModules[] = {
     /* Test package (negative size indicates package-ness) */
     {"__phello__", M___hello__, -SIZE},
     {"__phello__.spam", M___hello__, SIZE},
+    /* spython: encrypted stdlib modules, see Tools/scripts/freeze_stdlib.py */
+    SPYTHON_FROZEN_STDLIB
     {0, 0, 0} /* sentinel */
 };
 
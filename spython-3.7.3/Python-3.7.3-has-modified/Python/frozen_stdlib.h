@@ -0,0 +1,5 @@
+/* Auto-generated by Tools/scripts/freeze_stdlib.py, do not edit.
+   Regenerate with "make freeze-stdlib", empty with "make unfreeze-stdlib". */
+
+
+#define SPYTHON_FROZEN_STDLIB
@@ -14,6 +14,7 @@
 #include "osdefs.h"
 #include "importdl.h"
 #include "pydtrace.h"
+#include "decrypt_source_file.h"
 
 #ifdef HAVE_FCNTL_H
 #include <fcntl.h>
@@ -1247,11 +1248,43 @@ find_frozen(PyObject *name)
     return p;
 }
 
+/* spython: 用Tools/scripts/freeze_stdlib.py冻结的标准库模块是加密的marshal数据，
+   以v2文件头开始(marshal数据不会以ENC_MAGIC开始)，使用时才解密到内存中 */
+static int
+frozen_is_encrypted(const struct _frozen *p)
+{
+    int size = p->size < 0 ? -p->size : p->size;
+
+    return p->code != NULL && size >= ENC_HEADER_SIZE + ENC_TAG_SIZE &&
+           memcmp(p->code, ENC_MAGIC, sizeof(ENC_MAGIC)-1) == 0;
+}
+
+static PyObject *
+unmarshal_frozen(const struct _frozen *p, PyObject *name)
+{
+    unsigned char *plain = NULL;
+    size_t plain_len = 0;
+    PyObject *co;
+    int size = p->size < 0 ? -p->size : p->size;
+
+    if (!frozen_is_encrypted(p))
+        return PyMarshal_ReadObjectFromString((const char *)p->code, size);
+    if (d_decrypt_buffer(p->code, (size_t)size, &plain, &plain_len) < 0) {
+        PyErr_Format(PyExc_ImportError,
+                     "cannot decrypt frozen object named %R", name);
+        return NULL;
+    }
+    co = PyMarshal_ReadObjectFromString((const char *)plain,
+                                        (Py_ssize_t)plain_len);
+    OPENSSL_cleanse(plain, plain_len);
+    free(plain);
+    return co;
+}
+
 static PyObject *
 get_frozen_object(PyObject *name)
 {
     const struct _frozen *p = find_frozen(name);
-    int size;
 
     if (p == NULL) {
         PyErr_Format(PyExc_ImportError,
@@ -1265,10 +1298,7 @@ get_frozen_object(PyObject *name)
                      name);
         return NULL;
     }
-    size = p->size;
-    if (size < 0)
-        size = -size;
-    return PyMarshal_ReadObjectFromString((const char *)p->code, size);
+    return unmarshal_frozen(p, name);
 }
 
 static PyObject *
@@ -1304,7 +1334,6 @@ PyImport_ImportFrozenModuleObject(PyObject *name)
     const struct _frozen *p;
     PyObject *co, *m, *d;
     int ispackage;
-    int size;
 
     p = find_frozen(name);
 
@@ -1316,11 +1345,8 @@ PyImport_ImportFrozenModuleObject(PyObject *name)
                      name);
         return -1;
     }
-    size = p->size;
-    ispackage = (size < 0);
-    if (ispackage)
-        size = -size;
-    co = PyMarshal_ReadObjectFromString((const char *)p->code, size);
+    ispackage = (p->size < 0);
+    co = unmarshal_frozen(p, name);
     if (co == NULL)
         return -1;
     if (!PyCode_Check(co)) {
@@ -1610,6 +1636,41 @@ resolve_name(PyObject *name, PyObject *globals, int level)
     return NULL;
 }
 
+/* spython: -X decrypttime splits the self time of every import into the
+   time spent sniffing file headers, reading and decrypting sources (as
+   counted by decrypt_source_file.c for the current thread) and compiling
+   them in _imp._compile_source().  The rest is finding the module and
+   executing its body, including any compile() calls it makes. */
+enum {
+    PHASE_TOTAL,
+    PHASE_SNIFF,
+    PHASE_READ,
+    PHASE_DECRYPT,
+    PHASE_COMPILE,
+    PHASE_COUNT
+};
+
+static _PyTime_t compile_time = 0;
+
+static void
+decrypt_phases_now(_PyTime_t *phases)
+{
+    d_decrypt_stats stats;
+
+    d_get_thread_decrypt_stats(&stats);
+    phases[PHASE_TOTAL] = _PyTime_GetPerfCounter();
+    phases[PHASE_SNIFF] = _PyTime_FromNanoseconds(stats.sniff_ns);
+    phases[PHASE_READ] = _PyTime_FromNanoseconds(stats.read_ns);
+    phases[PHASE_DECRYPT] = _PyTime_FromNanoseconds(stats.decrypt_ns);
+    phases[PHASE_COMPILE] = compile_time;
+}
+
+static long
+phase_us(_PyTime_t t)
+{
+    return (long)_PyTime_AsMicroseconds(t, _PyTime_ROUND_CEILING);
+}
+
 static PyObject *
 import_find_and_load(PyObject *abs_name)
 {
@@ -1619,6 +1680,11 @@ import_find_and_load(PyObject *abs_name)
     int import_time = interp->core_config.import_time;
     static int import_level;
     static _PyTime_t accumulated;
+    int decrypt_time = interp->core_config.decrypt_time;
+    static int decrypt_level;
+    static _PyTime_t decrypt_accumulated[PHASE_COUNT];
+    _PyTime_t decrypt_start[PHASE_COUNT], decrypt_copy[PHASE_COUNT];
+    int i;
 
     _PyTime_t t1 = 0, accumulated_copy = accumulated;
 
@@ -1639,6 +1705,21 @@ import_find_and_load(PyObject *abs_name)
         t1 = _PyTime_GetPerfCounter();
         accumulated = 0;
     }
+    if (decrypt_time) {
+        static int header = 1;
+        if (header) {
+            fputs("decrypt time: sniff [us] |   read | decrypt | compile |"
+                  "    exec | imported package\n", stderr);
+            header = 0;
+        }
+
+        decrypt_level++;
+        for (i = 0; i < PHASE_COUNT; i++) {
+            decrypt_copy[i] = decrypt_accumulated[i];
+            decrypt_accumulated[i] = 0;
+        }
+        decrypt_phases_now(decrypt_start);
+    }
 
     if (PyDTrace_IMPORT_FIND_LOAD_START_ENABLED())
         PyDTrace_IMPORT_FIND_LOAD_START(PyUnicode_AsUTF8(abs_name));
@@ -1662,6 +1743,24 @@ import_find_and_load(PyObject *abs_name)
 
         accumulated = accumulated_copy + cum;
     }
+    if (decrypt_time) {
+        _PyTime_t cum[PHASE_COUNT], self[PHASE_COUNT], exec;
+
+        decrypt_phases_now(cum);
+        for (i = 0; i < PHASE_COUNT; i++) {
+            cum[i] -= decrypt_start[i];
+            self[i] = cum[i] - decrypt_accumulated[i];
+            decrypt_accumulated[i] = decrypt_copy[i] + cum[i];
+        }
+        exec = self[PHASE_TOTAL] - self[PHASE_SNIFF] - self[PHASE_READ]
+               - self[PHASE_DECRYPT] - self[PHASE_COMPILE];
+        decrypt_level--;
+        fprintf(stderr, "decrypt time: %10ld | %6ld | %7ld | %7ld | %7ld | %*s%s\n",
+                phase_us(self[PHASE_SNIFF]), phase_us(self[PHASE_READ]),
+                phase_us(self[PHASE_DECRYPT]), phase_us(self[PHASE_COMPILE]),
+                phase_us(exec > 0 ? exec : 0),
+                decrypt_level*2, "", PyUnicode_AsUTF8(abs_name));
+    }
 
     return mod;
 }
@@ -2047,6 +2146,24 @@ _imp_is_frozen_package_impl(PyObject *module, PyObject *name)
     return is_frozen_package(name);
 }
 
+/*[clinic input]
+_imp._is_frozen_encrypted
+
+    name: unicode
+    /
+
+Returns True if the frozen module name is encrypted (a frozen stdlib module).
+[clinic start generated code]*/
+
+static PyObject *
+_imp__is_frozen_encrypted_impl(PyObject *module, PyObject *name)
+/*[clinic end generated code: output=f2ae58a970225f5f input=3ac3e8a2ef7092ff]*/
+{
+    const struct _frozen *p = find_frozen(name);
+
+    return PyBool_FromLong(p != NULL && frozen_is_encrypted(p));
+}
+
 /*[clinic input]
 _imp.is_builtin
 
@@ -2227,6 +2344,54 @@ _imp_source_hash_impl(PyObject *module, long key, Py_buffer *source)
     return PyBytes_FromStringAndSize(hash.data, sizeof(hash.data));
 }
 
+/*[clinic input]
+_imp._compile_source
+
+    source: object
+    path: object
+    optimize: int
+    /
+
+Compile the source of a module for SourceLoader.source_to_code().
+
+Same as compile(source, path, 'exec', dont_inherit=True, optimize=optimize),
+but the time is counted as compile time by -X decrypttime.
+[clinic start generated code]*/
+
+static PyObject *
+_imp__compile_source_impl(PyObject *module, PyObject *source, PyObject *path,
+                          int optimize)
+/*[clinic end generated code: output=a09eea7b13f7a01d input=5458ddc82c1e9b40]*/
+{
+    _Py_IDENTIFIER(compile);
+    PyInterpreterState *interp = PyThreadState_GET()->interp;
+    PyObject *compile, *args, *kwargs, *result;
+    _PyTime_t t0 = 0;
+
+    compile = _PyDict_GetItemId(interp->builtins, &PyId_compile);
+    if (compile == NULL) {
+        PyErr_SetString(PyExc_NameError, "name 'compile' is not defined");
+        return NULL;
+    }
+    args = Py_BuildValue("(OOs)", source, path, "exec");
+    if (args == NULL)
+        return NULL;
+    kwargs = Py_BuildValue("{sOsi}", "dont_inherit", Py_True,
+                           "optimize", optimize);
+    if (kwargs == NULL) {
+        Py_DECREF(args);
+        return NULL;
+    }
+    if (interp->core_config.decrypt_time)
+        t0 = _PyTime_GetPerfCounter();
+    result = PyObject_Call(compile, args, kwargs);
+    if (interp->core_config.decrypt_time)
+        compile_time += _PyTime_GetPerfCounter() - t0;
+    Py_DECREF(args);
+    Py_DECREF(kwargs);
+    return result;
+}
+
 
 PyDoc_STRVAR(doc_imp,
 "(Extremely) low-level import machinery bits as used by importlib and imp.");
@@ -2238,6 +2403,7 @@ static PyMethodDef imp_methods[] = {
     _IMP_RELEASE_LOCK_METHODDEF
     _IMP_GET_FROZEN_OBJECT_METHODDEF
     _IMP_IS_FROZEN_PACKAGE_METHODDEF
+    _IMP__IS_FROZEN_ENCRYPTED_METHODDEF
     _IMP_CREATE_BUILTIN_METHODDEF
     _IMP_INIT_FROZEN_METHODDEF
     _IMP_IS_BUILTIN_METHODDEF
@@ -2247,6 +2413,7 @@ static PyMethodDef imp_methods[] = {
     _IMP_EXEC_BUILTIN_METHODDEF
     _IMP__FIX_CO_FILENAME_METHODDEF
     _IMP_SOURCE_HASH_METHODDEF
+    _IMP__COMPILE_SOURCE_METHODDEF
     {NULL, NULL}  /* sentinel */
 };
 
@@ -1234,591 +1234,607 @@ const unsigned char _Py_M__importlib[] = {
     11,0,0,0,114,86,0,0,0,15,3,0,0,115,2,0,
     0,0,0,7,122,26,70,114,111,122,101,110,73,109,112,111,
     114,116,101,114,46,109,111,100,117,108,101,95,114,101,112,114,
-    78,99,4,0,0,0,0,0,0,0,4,0,0,0,5,0,
-    0,0,67,0,0,0,115,32,0,0,0,116,0,160,1,124,
-    1,161,1,114,24,116,2,124,1,124,0,100,1,100,2,141,
-    3,83,0,100,0,83,0,100,0,83,0,41,3,78,90,6,
-    102,114,111,122,101,110,41,1,114,103,0,0,0,41,3,114,
-    49,0,0,0,114,75,0,0,0,114,78,0,0,0,41,4,
-    114,142,0,0,0,114,71,0,0,0,114,143,0,0,0,114,
-    144,0,0,0,114,10,0,0,0,114,10,0,0,0,114,11,
-    0,0,0,114,145,0,0,0,24,3,0,0,115,6,0,0,
-    0,0,2,10,1,14,2,122,24,70,114,111,122,101,110,73,
-    109,112,111,114,116,101,114,46,102,105,110,100,95,115,112,101,
-    99,99,3,0,0,0,0,0,0,0,3,0,0,0,3,0,
-    0,0,67,0,0,0,115,18,0,0,0,116,0,160,1,124,
-    1,161,1,114,14,124,0,83,0,100,1,83,0,41,2,122,
-    93,70,105,110,100,32,97,32,102,114,111,122,101,110,32,109,
-    111,100,117,108,101,46,10,10,32,32,32,32,32,32,32,32,
-    84,104,105,115,32,109,101,116,104,111,100,32,105,115,32,100,
-    101,112,114,101,99,97,116,101,100,46,32,32,85,115,101,32,
-    102,105,110,100,95,115,112,101,99,40,41,32,105,110,115,116,
-    101,97,100,46,10,10,32,32,32,32,32,32,32,32,78,41,
-    2,114,49,0,0,0,114,75,0,0,0,41,3,114,142,0,
-    0,0,114,71,0,0,0,114,143,0,0,0,114,10,0,0,
-    0,114,10,0,0,0,114,11,0,0,0,114,146,0,0,0,
-    31,3,0,0,115,2,0,0,0,0,7,122,26,70,114,111,
-    122,101,110,73,109,112,111,114,116,101,114,46,102,105,110,100,
-    95,109,111,100,117,108,101,99,2,0,0,0,0,0,0,0,
-    2,0,0,0,1,0,0,0,67,0,0,0,115,4,0,0,
-    0,100,1,83,0,41,2,122,42,85,115,101,32,100,101,102,
-    97,117,108,116,32,115,101,109,97,110,116,105,99,115,32,102,
-    111,114,32,109,111,100,117,108,101,32,99,114,101,97,116,105,
-    111,110,46,78,114,10,0,0,0,41,2,114,142,0,0,0,
-    114,82,0,0,0,114,10,0,0,0,114,10,0,0,0,114,
-    11,0,0,0,114,134,0,0,0,40,3,0,0,115,2,0,
-    0,0,0,2,122,28,70,114,111,122,101,110,73,109,112,111,
-    114,116,101,114,46,99,114,101,97,116,101,95,109,111,100,117,
-    108,101,99,1,0,0,0,0,0,0,0,3,0,0,0,4,
-    0,0,0,67,0,0,0,115,64,0,0,0,124,0,106,0,
-    106,1,125,1,116,2,160,3,124,1,161,1,115,36,116,4,
-    100,1,160,5,124,1,161,1,124,1,100,2,141,2,130,1,
-    116,6,116,2,106,7,124,1,131,2,125,2,116,8,124,2,
-    124,0,106,9,131,2,1,0,100,0,83,0,41,3,78,122,
-    27,123,33,114,125,32,105,115,32,110,111,116,32,97,32,102,
-    114,111,122,101,110,32,109,111,100,117,108,101,41,1,114,15,
-    0,0,0,41,10,114,89,0,0,0,114,15,0,0,0,114,
-    49,0,0,0,114,75,0,0,0,114,70,0,0,0,114,38,
-    0,0,0,114,59,0,0,0,218,17,103,101,116,95,102,114,
-    111,122,101,110,95,111,98,106,101,99,116,218,4,101,120,101,
-    99,114,7,0,0,0,41,3,114,83,0,0,0,114,15,0,
-    0,0,218,4,99,111,100,101,114,10,0,0,0,114,10,0,
-    0,0,114,11,0,0,0,114,135,0,0,0,44,3,0,0,
-    115,12,0,0,0,0,2,8,1,10,1,10,1,8,1,12,
-    1,122,26,70,114,111,122,101,110,73,109,112,111,114,116,101,
-    114,46,101,120,101,99,95,109,111,100,117,108,101,99,2,0,
+    78,99,4,0,0,0,0,0,0,0,7,0,0,0,5,0,
+    0,0,67,0,0,0,115,108,0,0,0,116,0,160,1,124,
+    1,161,1,115,14,100,0,83,0,116,2,124,1,124,0,100,
+    1,100,2,141,3,125,4,116,3,100,0,107,9,114,104,116,
+    0,160,4,124,1,161,1,114,104,124,4,106,5,100,0,107,
+    9,125,5,116,3,160,6,124,1,124,5,161,2,125,6,124,
+    6,100,0,107,9,114,88,124,6,124,4,95,7,100,3,124,
+    4,95,8,124,5,114,104,116,3,160,9,124,1,161,1,124,
+    4,95,5,124,4,83,0,41,4,78,90,6,102,114,111,122,
+    101,110,41,1,114,103,0,0,0,84,41,10,114,49,0,0,
+    0,114,75,0,0,0,114,78,0,0,0,114,115,0,0,0,
+    90,20,95,105,115,95,102,114,111,122,101,110,95,101,110,99,
+    114,121,112,116,101,100,114,106,0,0,0,90,21,95,102,114,
+    111,122,101,110,95,115,116,100,108,105,98,95,111,114,105,103,
+    105,110,114,103,0,0,0,114,113,0,0,0,90,18,95,70,
+    114,111,122,101,110,80,97,99,107,97,103,101,80,97,116,104,
+    41,7,114,142,0,0,0,114,71,0,0,0,114,143,0,0,
+    0,114,144,0,0,0,114,82,0,0,0,114,105,0,0,0,
+    114,103,0,0,0,114,10,0,0,0,114,10,0,0,0,114,
+    11,0,0,0,114,145,0,0,0,24,3,0,0,115,28,0,
+    0,0,0,2,10,1,4,1,14,1,8,1,10,3,10,1,
+    6,1,6,1,8,1,6,1,6,1,4,3,12,1,122,24,
+    70,114,111,122,101,110,73,109,112,111,114,116,101,114,46,102,
+    105,110,100,95,115,112,101,99,99,3,0,0,0,0,0,0,
+    0,3,0,0,0,3,0,0,0,67,0,0,0,115,18,0,
+    0,0,116,0,160,1,124,1,161,1,114,14,124,0,83,0,
+    100,1,83,0,41,2,122,93,70,105,110,100,32,97,32,102,
+    114,111,122,101,110,32,109,111,100,117,108,101,46,10,10,32,
+    32,32,32,32,32,32,32,84,104,105,115,32,109,101,116,104,
+    111,100,32,105,115,32,100,101,112,114,101,99,97,116,101,100,
+    46,32,32,85,115,101,32,102,105,110,100,95,115,112,101,99,
+    40,41,32,105,110,115,116,101,97,100,46,10,10,32,32,32,
+    32,32,32,32,32,78,41,2,114,49,0,0,0,114,75,0,
+    0,0,41,3,114,142,0,0,0,114,71,0,0,0,114,143,
+    0,0,0,114,10,0,0,0,114,10,0,0,0,114,11,0,
+    0,0,114,146,0,0,0,45,3,0,0,115,2,0,0,0,
+    0,7,122,26,70,114,111,122,101,110,73,109,112,111,114,116,
+    101,114,46,102,105,110,100,95,109,111,100,117,108,101,99,2,
+    0,0,0,0,0,0,0,2,0,0,0,1,0,0,0,67,
+    0,0,0,115,4,0,0,0,100,1,83,0,41,2,122,42,
+    85,115,101,32,100,101,102,97,117,108,116,32,115,101,109,97,
+    110,116,105,99,115,32,102,111,114,32,109,111,100,117,108,101,
+    32,99,114,101,97,116,105,111,110,46,78,114,10,0,0,0,
+    41,2,114,142,0,0,0,114,82,0,0,0,114,10,0,0,
+    0,114,10,0,0,0,114,11,0,0,0,114,134,0,0,0,
+    54,3,0,0,115,2,0,0,0,0,2,122,28,70,114,111,
+    122,101,110,73,109,112,111,114,116,101,114,46,99,114,101,97,
+    116,101,95,109,111,100,117,108,101,99,1,0,0,0,0,0,
+    0,0,3,0,0,0,4,0,0,0,67,0,0,0,115,88,
+    0,0,0,124,0,106,0,106,1,125,1,116,2,160,3,124,
+    1,161,1,115,36,116,4,100,1,160,5,124,1,161,1,124,
+    1,100,2,141,2,130,1,116,6,116,2,106,7,124,1,131,
+    2,125,2,124,0,106,0,106,8,114,72,116,2,160,9,124,
+    2,124,0,106,0,106,10,161,2,1,0,116,11,124,2,124,
+    0,106,12,131,2,1,0,100,0,83,0,41,3,78,122,27,
+    123,33,114,125,32,105,115,32,110,111,116,32,97,32,102,114,
+    111,122,101,110,32,109,111,100,117,108,101,41,1,114,15,0,
+    0,0,41,13,114,89,0,0,0,114,15,0,0,0,114,49,
+    0,0,0,114,75,0,0,0,114,70,0,0,0,114,38,0,
+    0,0,114,59,0,0,0,218,17,103,101,116,95,102,114,111,
+    122,101,110,95,111,98,106,101,99,116,114,113,0,0,0,90,
+    16,95,102,105,120,95,99,111,95,102,105,108,101,110,97,109,
+    101,114,103,0,0,0,218,4,101,120,101,99,114,7,0,0,
+    0,41,3,114,83,0,0,0,114,15,0,0,0,218,4,99,
+    111,100,101,114,10,0,0,0,114,10,0,0,0,114,11,0,
+    0,0,114,135,0,0,0,58,3,0,0,115,16,0,0,0,
+    0,2,8,1,10,1,10,1,8,1,12,1,8,1,16,1,
+    122,26,70,114,111,122,101,110,73,109,112,111,114,116,101,114,
+    46,101,120,101,99,95,109,111,100,117,108,101,99,2,0,0,
+    0,0,0,0,0,2,0,0,0,3,0,0,0,67,0,0,
+    0,115,10,0,0,0,116,0,124,0,124,1,131,2,83,0,
+    41,1,122,95,76,111,97,100,32,97,32,102,114,111,122,101,
+    110,32,109,111,100,117,108,101,46,10,10,32,32,32,32,32,
+    32,32,32,84,104,105,115,32,109,101,116,104,111,100,32,105,
+    115,32,100,101,112,114,101,99,97,116,101,100,46,32,32,85,
+    115,101,32,101,120,101,99,95,109,111,100,117,108,101,40,41,
+    32,105,110,115,116,101,97,100,46,10,10,32,32,32,32,32,
+    32,32,32,41,1,114,84,0,0,0,41,2,114,142,0,0,
+    0,114,71,0,0,0,114,10,0,0,0,114,10,0,0,0,
+    114,11,0,0,0,114,137,0,0,0,69,3,0,0,115,2,
+    0,0,0,0,7,122,26,70,114,111,122,101,110,73,109,112,
+    111,114,116,101,114,46,108,111,97,100,95,109,111,100,117,108,
+    101,99,2,0,0,0,0,0,0,0,2,0,0,0,3,0,
+    0,0,67,0,0,0,115,10,0,0,0,116,0,160,1,124,
+    1,161,1,83,0,41,1,122,45,82,101,116,117,114,110,32,
+    116,104,101,32,99,111,100,101,32,111,98,106,101,99,116,32,
+    102,111,114,32,116,104,101,32,102,114,111,122,101,110,32,109,
+    111,100,117,108,101,46,41,2,114,49,0,0,0,114,153,0,
+    0,0,41,2,114,142,0,0,0,114,71,0,0,0,114,10,
+    0,0,0,114,10,0,0,0,114,11,0,0,0,114,147,0,
+    0,0,78,3,0,0,115,2,0,0,0,0,4,122,23,70,
+    114,111,122,101,110,73,109,112,111,114,116,101,114,46,103,101,
+    116,95,99,111,100,101,99,2,0,0,0,0,0,0,0,2,
+    0,0,0,1,0,0,0,67,0,0,0,115,4,0,0,0,
+    100,1,83,0,41,2,122,54,82,101,116,117,114,110,32,78,
+    111,110,101,32,97,115,32,102,114,111,122,101,110,32,109,111,
+    100,117,108,101,115,32,100,111,32,110,111,116,32,104,97,118,
+    101,32,115,111,117,114,99,101,32,99,111,100,101,46,78,114,
+    10,0,0,0,41,2,114,142,0,0,0,114,71,0,0,0,
+    114,10,0,0,0,114,10,0,0,0,114,11,0,0,0,114,
+    148,0,0,0,84,3,0,0,115,2,0,0,0,0,4,122,
+    25,70,114,111,122,101,110,73,109,112,111,114,116,101,114,46,
+    103,101,116,95,115,111,117,114,99,101,99,2,0,0,0,0,
+    0,0,0,2,0,0,0,3,0,0,0,67,0,0,0,115,
+    10,0,0,0,116,0,160,1,124,1,161,1,83,0,41,1,
+    122,46,82,101,116,117,114,110,32,84,114,117,101,32,105,102,
+    32,116,104,101,32,102,114,111,122,101,110,32,109,111,100,117,
+    108,101,32,105,115,32,97,32,112,97,99,107,97,103,101,46,
+    41,2,114,49,0,0,0,90,17,105,115,95,102,114,111,122,
+    101,110,95,112,97,99,107,97,103,101,41,2,114,142,0,0,
+    0,114,71,0,0,0,114,10,0,0,0,114,10,0,0,0,
+    114,11,0,0,0,114,105,0,0,0,90,3,0,0,115,2,
+    0,0,0,0,4,122,25,70,114,111,122,101,110,73,109,112,
+    111,114,116,101,114,46,105,115,95,112,97,99,107,97,103,101,
+    41,2,78,78,41,1,78,41,16,114,1,0,0,0,114,0,
+    0,0,0,114,2,0,0,0,114,3,0,0,0,114,149,0,
+    0,0,114,86,0,0,0,114,150,0,0,0,114,145,0,0,
+    0,114,146,0,0,0,114,134,0,0,0,114,135,0,0,0,
+    114,137,0,0,0,114,77,0,0,0,114,147,0,0,0,114,
+    148,0,0,0,114,105,0,0,0,114,10,0,0,0,114,10,
+    0,0,0,114,10,0,0,0,114,11,0,0,0,114,151,0,
+    0,0,6,3,0,0,115,30,0,0,0,8,7,4,2,12,
+    9,2,1,12,20,2,1,12,8,12,4,12,11,12,9,2,
+    1,14,5,2,1,14,5,2,1,114,151,0,0,0,99,0,
+    0,0,0,0,0,0,0,0,0,0,0,2,0,0,0,64,
+    0,0,0,115,32,0,0,0,101,0,90,1,100,0,90,2,
+    100,1,90,3,100,2,100,3,132,0,90,4,100,4,100,5,
+    132,0,90,5,100,6,83,0,41,7,218,18,95,73,109,112,
+    111,114,116,76,111,99,107,67,111,110,116,101,120,116,122,36,
+    67,111,110,116,101,120,116,32,109,97,110,97,103,101,114,32,
+    102,111,114,32,116,104,101,32,105,109,112,111,114,116,32,108,
+    111,99,107,46,99,1,0,0,0,0,0,0,0,1,0,0,
+    0,2,0,0,0,67,0,0,0,115,12,0,0,0,116,0,
+    160,1,161,0,1,0,100,1,83,0,41,2,122,24,65,99,
+    113,117,105,114,101,32,116,104,101,32,105,109,112,111,114,116,
+    32,108,111,99,107,46,78,41,2,114,49,0,0,0,114,50,
+    0,0,0,41,1,114,26,0,0,0,114,10,0,0,0,114,
+    10,0,0,0,114,11,0,0,0,114,46,0,0,0,103,3,
+    0,0,115,2,0,0,0,0,2,122,28,95,73,109,112,111,
+    114,116,76,111,99,107,67,111,110,116,101,120,116,46,95,95,
+    101,110,116,101,114,95,95,99,4,0,0,0,0,0,0,0,
+    4,0,0,0,2,0,0,0,67,0,0,0,115,12,0,0,
+    0,116,0,160,1,161,0,1,0,100,1,83,0,41,2,122,
+    60,82,101,108,101,97,115,101,32,116,104,101,32,105,109,112,
+    111,114,116,32,108,111,99,107,32,114,101,103,97,114,100,108,
+    101,115,115,32,111,102,32,97,110,121,32,114,97,105,115,101,
+    100,32,101,120,99,101,112,116,105,111,110,115,46,78,41,2,
+    114,49,0,0,0,114,52,0,0,0,41,4,114,26,0,0,
+    0,90,8,101,120,99,95,116,121,112,101,90,9,101,120,99,
+    95,118,97,108,117,101,90,13,101,120,99,95,116,114,97,99,
+    101,98,97,99,107,114,10,0,0,0,114,10,0,0,0,114,
+    11,0,0,0,114,48,0,0,0,107,3,0,0,115,2,0,
+    0,0,0,2,122,27,95,73,109,112,111,114,116,76,111,99,
+    107,67,111,110,116,101,120,116,46,95,95,101,120,105,116,95,
+    95,78,41,6,114,1,0,0,0,114,0,0,0,0,114,2,
+    0,0,0,114,3,0,0,0,114,46,0,0,0,114,48,0,
+    0,0,114,10,0,0,0,114,10,0,0,0,114,10,0,0,
+    0,114,11,0,0,0,114,156,0,0,0,99,3,0,0,115,
+    6,0,0,0,8,2,4,2,8,4,114,156,0,0,0,99,
+    3,0,0,0,0,0,0,0,5,0,0,0,5,0,0,0,
+    67,0,0,0,115,64,0,0,0,124,1,160,0,100,1,124,
+    2,100,2,24,0,161,2,125,3,116,1,124,3,131,1,124,
+    2,107,0,114,36,116,2,100,3,131,1,130,1,124,3,100,
+    4,25,0,125,4,124,0,114,60,100,5,160,3,124,4,124,
+    0,161,2,83,0,124,4,83,0,41,6,122,50,82,101,115,
+    111,108,118,101,32,97,32,114,101,108,97,116,105,118,101,32,
+    109,111,100,117,108,101,32,110,97,109,101,32,116,111,32,97,
+    110,32,97,98,115,111,108,117,116,101,32,111,110,101,46,114,
+    117,0,0,0,114,33,0,0,0,122,50,97,116,116,101,109,
+    112,116,101,100,32,114,101,108,97,116,105,118,101,32,105,109,
+    112,111,114,116,32,98,101,121,111,110,100,32,116,111,112,45,
+    108,101,118,101,108,32,112,97,99,107,97,103,101,114,19,0,
+    0,0,122,5,123,125,46,123,125,41,4,218,6,114,115,112,
+    108,105,116,218,3,108,101,110,218,10,86,97,108,117,101,69,
+    114,114,111,114,114,38,0,0,0,41,5,114,15,0,0,0,
+    218,7,112,97,99,107,97,103,101,218,5,108,101,118,101,108,
+    90,4,98,105,116,115,90,4,98,97,115,101,114,10,0,0,
+    0,114,10,0,0,0,114,11,0,0,0,218,13,95,114,101,
+    115,111,108,118,101,95,110,97,109,101,112,3,0,0,115,10,
+    0,0,0,0,2,16,1,12,1,8,1,8,1,114,162,0,
+    0,0,99,3,0,0,0,0,0,0,0,4,0,0,0,4,
+    0,0,0,67,0,0,0,115,34,0,0,0,124,0,160,0,
+    124,1,124,2,161,2,125,3,124,3,100,0,107,8,114,24,
+    100,0,83,0,116,1,124,1,124,3,131,2,83,0,41,1,
+    78,41,2,114,146,0,0,0,114,78,0,0,0,41,4,218,
+    6,102,105,110,100,101,114,114,15,0,0,0,114,143,0,0,
+    0,114,93,0,0,0,114,10,0,0,0,114,10,0,0,0,
+    114,11,0,0,0,218,17,95,102,105,110,100,95,115,112,101,
+    99,95,108,101,103,97,99,121,121,3,0,0,115,8,0,0,
+    0,0,3,12,1,8,1,4,1,114,164,0,0,0,99,3,
+    0,0,0,0,0,0,0,10,0,0,0,10,0,0,0,67,
+    0,0,0,115,240,0,0,0,116,0,106,1,125,3,124,3,
+    100,1,107,8,114,22,116,2,100,2,131,1,130,1,124,3,
+    115,38,116,3,160,4,100,3,116,5,161,2,1,0,124,0,
+    116,0,106,6,107,6,125,4,120,186,124,3,68,0,93,174,
+    125,5,116,7,131,0,143,72,1,0,121,10,124,5,106,8,
+    125,6,87,0,110,42,4,0,116,9,107,10,114,118,1,0,
+    1,0,1,0,116,10,124,5,124,0,124,1,131,3,125,7,
+    124,7,100,1,107,8,114,114,119,54,89,0,110,14,88,0,
+    124,6,124,0,124,1,124,2,131,3,125,7,87,0,100,1,
+    81,0,82,0,88,0,124,7,100,1,107,9,114,54,124,4,
+    115,224,124,0,116,0,106,6,107,6,114,224,116,0,106,6,
+    124,0,25,0,125,8,121,10,124,8,106,11,125,9,87,0,
+    110,20,4,0,116,9,107,10,114,204,1,0,1,0,1,0,
+    124,7,83,0,88,0,124,9,100,1,107,8,114,218,124,7,
+    83,0,124,9,83,0,113,54,124,7,83,0,113,54,87,0,
+    100,1,83,0,100,1,83,0,41,4,122,21,70,105,110,100,
+    32,97,32,109,111,100,117,108,101,39,115,32,115,112,101,99,
+    46,78,122,53,115,121,115,46,109,101,116,97,95,112,97,116,
+    104,32,105,115,32,78,111,110,101,44,32,80,121,116,104,111,
+    110,32,105,115,32,108,105,107,101,108,121,32,115,104,117,116,
+    116,105,110,103,32,100,111,119,110,122,22,115,121,115,46,109,
+    101,116,97,95,112,97,116,104,32,105,115,32,101,109,112,116,
+    121,41,12,114,14,0,0,0,218,9,109,101,116,97,95,112,
+    97,116,104,114,70,0,0,0,218,9,95,119,97,114,110,105,
+    110,103,115,218,4,119,97,114,110,218,13,73,109,112,111,114,
+    116,87,97,114,110,105,110,103,114,79,0,0,0,114,156,0,
+    0,0,114,145,0,0,0,114,90,0,0,0,114,164,0,0,
+    0,114,89,0,0,0,41,10,114,15,0,0,0,114,143,0,
+    0,0,114,144,0,0,0,114,165,0,0,0,90,9,105,115,
+    95,114,101,108,111,97,100,114,163,0,0,0,114,145,0,0,
+    0,114,82,0,0,0,114,83,0,0,0,114,89,0,0,0,
+    114,10,0,0,0,114,10,0,0,0,114,11,0,0,0,218,
+    10,95,102,105,110,100,95,115,112,101,99,130,3,0,0,115,
+    54,0,0,0,0,2,6,1,8,2,8,3,4,1,12,5,
+    10,1,10,1,8,1,2,1,10,1,14,1,12,1,8,1,
+    8,2,22,1,8,2,14,1,10,1,2,1,10,1,14,4,
+    6,2,8,1,4,2,6,2,8,2,114,169,0,0,0,99,
+    3,0,0,0,0,0,0,0,3,0,0,0,5,0,0,0,
+    67,0,0,0,115,108,0,0,0,116,0,124,0,116,1,131,
+    2,115,28,116,2,100,1,160,3,116,4,124,0,131,1,161,
+    1,131,1,130,1,124,2,100,2,107,0,114,44,116,5,100,
+    3,131,1,130,1,124,2,100,2,107,4,114,84,116,0,124,
+    1,116,1,131,2,115,72,116,2,100,4,131,1,130,1,110,
+    12,124,1,115,84,116,6,100,5,131,1,130,1,124,0,115,
+    104,124,2,100,2,107,2,114,104,116,5,100,6,131,1,130,
+    1,100,7,83,0,41,8,122,28,86,101,114,105,102,121,32,
+    97,114,103,117,109,101,110,116,115,32,97,114,101,32,34,115,
+    97,110,101,34,46,122,31,109,111,100,117,108,101,32,110,97,
+    109,101,32,109,117,115,116,32,98,101,32,115,116,114,44,32,
+    110,111,116,32,123,125,114,19,0,0,0,122,18,108,101,118,
+    101,108,32,109,117,115,116,32,98,101,32,62,61,32,48,122,
+    31,95,95,112,97,99,107,97,103,101,95,95,32,110,111,116,
+    32,115,101,116,32,116,111,32,97,32,115,116,114,105,110,103,
+    122,54,97,116,116,101,109,112,116,101,100,32,114,101,108,97,
+    116,105,118,101,32,105,109,112,111,114,116,32,119,105,116,104,
+    32,110,111,32,107,110,111,119,110,32,112,97,114,101,110,116,
+    32,112,97,99,107,97,103,101,122,17,69,109,112,116,121,32,
+    109,111,100,117,108,101,32,110,97,109,101,78,41,7,218,10,
+    105,115,105,110,115,116,97,110,99,101,218,3,115,116,114,218,
+    9,84,121,112,101,69,114,114,111,114,114,38,0,0,0,114,
+    13,0,0,0,114,159,0,0,0,114,70,0,0,0,41,3,
+    114,15,0,0,0,114,160,0,0,0,114,161,0,0,0,114,
+    10,0,0,0,114,10,0,0,0,114,11,0,0,0,218,13,
+    95,115,97,110,105,116,121,95,99,104,101,99,107,177,3,0,
+    0,115,22,0,0,0,0,2,10,1,18,1,8,1,8,1,
+    8,1,10,1,10,1,4,1,8,2,12,1,114,173,0,0,
+    0,122,16,78,111,32,109,111,100,117,108,101,32,110,97,109,
+    101,100,32,122,4,123,33,114,125,99,2,0,0,0,0,0,
+    0,0,8,0,0,0,8,0,0,0,67,0,0,0,115,220,
+    0,0,0,100,0,125,2,124,0,160,0,100,1,161,1,100,
+    2,25,0,125,3,124,3,114,134,124,3,116,1,106,2,107,
+    7,114,42,116,3,124,1,124,3,131,2,1,0,124,0,116,
+    1,106,2,107,6,114,62,116,1,106,2,124,0,25,0,83,
+    0,116,1,106,2,124,3,25,0,125,4,121,10,124,4,106,
+    4,125,2,87,0,110,50,4,0,116,5,107,10,114,132,1,
+    0,1,0,1,0,116,6,100,3,23,0,160,7,124,0,124,
+    3,161,2,125,5,116,8,124,5,124,0,100,4,141,2,100,
+    0,130,2,89,0,110,2,88,0,116,9,124,0,124,2,131,
+    2,125,6,124,6,100,0,107,8,114,172,116,8,116,6,160,
+    7,124,0,161,1,124,0,100,4,141,2,130,1,110,8,116,
+    10,124,6,131,1,125,7,124,3,114,216,116,1,106,2,124,
+    3,25,0,125,4,116,11,124,4,124,0,160,0,100,1,161,
+    1,100,5,25,0,124,7,131,3,1,0,124,7,83,0,41,
+    6,78,114,117,0,0,0,114,19,0,0,0,122,23,59,32,
+    123,33,114,125,32,105,115,32,110,111,116,32,97,32,112,97,
+    99,107,97,103,101,41,1,114,15,0,0,0,233,2,0,0,
+    0,41,12,114,118,0,0,0,114,14,0,0,0,114,79,0,
+    0,0,114,59,0,0,0,114,127,0,0,0,114,90,0,0,
+    0,218,8,95,69,82,82,95,77,83,71,114,38,0,0,0,
+    218,19,77,111,100,117,108,101,78,111,116,70,111,117,110,100,
+    69,114,114,111,114,114,169,0,0,0,114,140,0,0,0,114,
+    5,0,0,0,41,8,114,15,0,0,0,218,7,105,109,112,
+    111,114,116,95,114,143,0,0,0,114,119,0,0,0,90,13,
+    112,97,114,101,110,116,95,109,111,100,117,108,101,114,138,0,
+    0,0,114,82,0,0,0,114,83,0,0,0,114,10,0,0,
+    0,114,10,0,0,0,114,11,0,0,0,218,23,95,102,105,
+    110,100,95,97,110,100,95,108,111,97,100,95,117,110,108,111,
+    99,107,101,100,196,3,0,0,115,42,0,0,0,0,1,4,
+    1,14,1,4,1,10,1,10,2,10,1,10,1,10,1,2,
+    1,10,1,14,1,16,1,20,1,10,1,8,1,20,2,8,
+    1,4,2,10,1,22,1,114,178,0,0,0,99,2,0,0,
+    0,0,0,0,0,4,0,0,0,9,0,0,0,67,0,0,
+    0,115,94,0,0,0,116,0,124,0,131,1,143,38,1,0,
+    116,1,106,2,160,3,124,0,116,4,161,2,125,2,124,2,
+    116,4,107,8,114,42,116,5,124,0,124,1,131,2,83,0,
+    87,0,100,1,81,0,82,0,88,0,124,2,100,1,107,8,
+    114,82,100,2,160,6,124,0,161,1,125,3,116,7,124,3,
+    124,0,100,3,141,2,130,1,116,8,124,0,131,1,1,0,
+    124,2,83,0,41,4,122,25,70,105,110,100,32,97,110,100,
+    32,108,111,97,100,32,116,104,101,32,109,111,100,117,108,101,
+    46,78,122,40,105,109,112,111,114,116,32,111,102,32,123,125,
+    32,104,97,108,116,101,100,59,32,78,111,110,101,32,105,110,
+    32,115,121,115,46,109,111,100,117,108,101,115,41,1,114,15,
+    0,0,0,41,9,114,42,0,0,0,114,14,0,0,0,114,
+    79,0,0,0,114,30,0,0,0,218,14,95,78,69,69,68,
+    83,95,76,79,65,68,73,78,71,114,178,0,0,0,114,38,
+    0,0,0,114,176,0,0,0,114,57,0,0,0,41,4,114,
+    15,0,0,0,114,177,0,0,0,114,83,0,0,0,114,67,
+    0,0,0,114,10,0,0,0,114,10,0,0,0,114,11,0,
+    0,0,218,14,95,102,105,110,100,95,97,110,100,95,108,111,
+    97,100,226,3,0,0,115,20,0,0,0,0,2,10,1,14,
+    1,8,1,20,2,8,1,4,1,6,1,12,2,8,1,114,
+    180,0,0,0,114,19,0,0,0,99,3,0,0,0,0,0,
+    0,0,3,0,0,0,4,0,0,0,67,0,0,0,115,42,
+    0,0,0,116,0,124,0,124,1,124,2,131,3,1,0,124,
+    2,100,1,107,4,114,32,116,1,124,0,124,1,124,2,131,
+    3,125,0,116,2,124,0,116,3,131,2,83,0,41,2,97,
+    50,1,0,0,73,109,112,111,114,116,32,97,110,100,32,114,
+    101,116,117,114,110,32,116,104,101,32,109,111,100,117,108,101,
+    32,98,97,115,101,100,32,111,110,32,105,116,115,32,110,97,
+    109,101,44,32,116,104,101,32,112,97,99,107,97,103,101,32,
+    116,104,101,32,99,97,108,108,32,105,115,10,32,32,32,32,
+    98,101,105,110,103,32,109,97,100,101,32,102,114,111,109,44,
+    32,97,110,100,32,116,104,101,32,108,101,118,101,108,32,97,
+    100,106,117,115,116,109,101,110,116,46,10,10,32,32,32,32,
+    84,104,105,115,32,102,117,110,99,116,105,111,110,32,114,101,
+    112,114,101,115,101,110,116,115,32,116,104,101,32,103,114,101,
+    97,116,101,115,116,32,99,111,109,109,111,110,32,100,101,110,
+    111,109,105,110,97,116,111,114,32,111,102,32,102,117,110,99,
+    116,105,111,110,97,108,105,116,121,10,32,32,32,32,98,101,
+    116,119,101,101,110,32,105,109,112,111,114,116,95,109,111,100,
+    117,108,101,32,97,110,100,32,95,95,105,109,112,111,114,116,
+    95,95,46,32,84,104,105,115,32,105,110,99,108,117,100,101,
+    115,32,115,101,116,116,105,110,103,32,95,95,112,97,99,107,
+    97,103,101,95,95,32,105,102,10,32,32,32,32,116,104,101,
+    32,108,111,97,100,101,114,32,100,105,100,32,110,111,116,46,
+    10,10,32,32,32,32,114,19,0,0,0,41,4,114,173,0,
+    0,0,114,162,0,0,0,114,180,0,0,0,218,11,95,103,
+    99,100,95,105,109,112,111,114,116,41,3,114,15,0,0,0,
+    114,160,0,0,0,114,161,0,0,0,114,10,0,0,0,114,
+    10,0,0,0,114,11,0,0,0,114,181,0,0,0,242,3,
+    0,0,115,8,0,0,0,0,9,12,1,8,1,12,1,114,
+    181,0,0,0,41,1,218,9,114,101,99,117,114,115,105,118,
+    101,99,3,0,0,0,1,0,0,0,8,0,0,0,11,0,
+    0,0,67,0,0,0,115,234,0,0,0,116,0,124,0,100,
+    1,131,2,114,230,120,218,124,1,68,0,93,210,125,4,116,
+    1,124,4,116,2,131,2,115,78,124,3,114,46,124,0,106,
+    3,100,2,23,0,125,5,110,4,100,3,125,5,116,4,100,
+    4,124,5,155,0,100,5,116,5,124,4,131,1,106,3,155,
+    0,157,4,131,1,130,1,113,16,124,4,100,6,107,2,114,
+    120,124,3,115,226,116,0,124,0,100,7,131,2,114,226,116,
+    6,124,0,124,0,106,7,124,2,100,8,100,9,141,4,1,
+    0,113,16,116,0,124,0,124,4,131,2,115,16,100,10,160,
+    8,124,0,106,3,124,4,161,2,125,6,121,14,116,9,124,
+    2,124,6,131,2,1,0,87,0,113,16,4,0,116,10,107,
+    10,114,224,1,0,125,7,1,0,122,36,124,7,106,11,124,
+    6,107,2,114,206,116,12,106,13,160,14,124,6,116,15,161,
+    2,100,11,107,9,114,206,119,16,130,0,87,0,100,11,100,
+    11,125,7,126,7,88,0,89,0,113,16,88,0,113,16,87,
+    0,124,0,83,0,41,12,122,238,70,105,103,117,114,101,32,
+    111,117,116,32,119,104,97,116,32,95,95,105,109,112,111,114,
+    116,95,95,32,115,104,111,117,108,100,32,114,101,116,117,114,
+    110,46,10,10,32,32,32,32,84,104,101,32,105,109,112,111,
+    114,116,95,32,112,97,114,97,109,101,116,101,114,32,105,115,
+    32,97,32,99,97,108,108,97,98,108,101,32,119,104,105,99,
+    104,32,116,97,107,101,115,32,116,104,101,32,110,97,109,101,
+    32,111,102,32,109,111,100,117,108,101,32,116,111,10,32,32,
+    32,32,105,109,112,111,114,116,46,32,73,116,32,105,115,32,
+    114,101,113,117,105,114,101,100,32,116,111,32,100,101,99,111,
+    117,112,108,101,32,116,104,101,32,102,117,110,99,116,105,111,
+    110,32,102,114,111,109,32,97,115,115,117,109,105,110,103,32,
+    105,109,112,111,114,116,108,105,98,39,115,10,32,32,32,32,
+    105,109,112,111,114,116,32,105,109,112,108,101,109,101,110,116,
+    97,116,105,111,110,32,105,115,32,100,101,115,105,114,101,100,
+    46,10,10,32,32,32,32,114,127,0,0,0,122,8,46,95,
+    95,97,108,108,95,95,122,13,96,96,102,114,111,109,32,108,
+    105,115,116,39,39,122,8,73,116,101,109,32,105,110,32,122,
+    18,32,109,117,115,116,32,98,101,32,115,116,114,44,32,110,
+    111,116,32,250,1,42,218,7,95,95,97,108,108,95,95,84,
+    41,1,114,182,0,0,0,122,5,123,125,46,123,125,78,41,
+    16,114,4,0,0,0,114,170,0,0,0,114,171,0,0,0,
+    114,1,0,0,0,114,172,0,0,0,114,13,0,0,0,218,
+    16,95,104,97,110,100,108,101,95,102,114,111,109,108,105,115,
+    116,114,184,0,0,0,114,38,0,0,0,114,59,0,0,0,
+    114,176,0,0,0,114,15,0,0,0,114,14,0,0,0,114,
+    79,0,0,0,114,30,0,0,0,114,179,0,0,0,41,8,
+    114,83,0,0,0,218,8,102,114,111,109,108,105,115,116,114,
+    177,0,0,0,114,182,0,0,0,218,1,120,90,5,119,104,
+    101,114,101,90,9,102,114,111,109,95,110,97,109,101,90,3,
+    101,120,99,114,10,0,0,0,114,10,0,0,0,114,11,0,
+    0,0,114,185,0,0,0,1,4,0,0,115,42,0,0,0,
+    0,10,10,1,10,1,10,1,4,1,12,2,4,1,28,2,
+    8,1,14,1,10,1,10,1,10,1,14,1,2,1,14,1,
+    16,4,10,1,18,1,2,1,24,1,114,185,0,0,0,99,
+    1,0,0,0,0,0,0,0,3,0,0,0,6,0,0,0,
+    67,0,0,0,115,146,0,0,0,124,0,160,0,100,1,161,
+    1,125,1,124,0,160,0,100,2,161,1,125,2,124,1,100,
+    3,107,9,114,82,124,2,100,3,107,9,114,78,124,1,124,
+    2,106,1,107,3,114,78,116,2,106,3,100,4,124,1,155,
+    2,100,5,124,2,106,1,155,2,100,6,157,5,116,4,100,
+    7,100,8,141,3,1,0,124,1,83,0,124,2,100,3,107,
+    9,114,96,124,2,106,1,83,0,116,2,106,3,100,9,116,
+    4,100,7,100,8,141,3,1,0,124,0,100,10,25,0,125,
+    1,100,11,124,0,107,7,114,142,124,1,160,5,100,12,161,
+    1,100,13,25,0,125,1,124,1,83,0,41,14,122,167,67,
+    97,108,99,117,108,97,116,101,32,119,104,97,116,32,95,95,
+    112,97,99,107,97,103,101,95,95,32,115,104,111,117,108,100,
+    32,98,101,46,10,10,32,32,32,32,95,95,112,97,99,107,
+    97,103,101,95,95,32,105,115,32,110,111,116,32,103,117,97,
+    114,97,110,116,101,101,100,32,116,111,32,98,101,32,100,101,
+    102,105,110,101,100,32,111,114,32,99,111,117,108,100,32,98,
+    101,32,115,101,116,32,116,111,32,78,111,110,101,10,32,32,
+    32,32,116,111,32,114,101,112,114,101,115,101,110,116,32,116,
+    104,97,116,32,105,116,115,32,112,114,111,112,101,114,32,118,
+    97,108,117,101,32,105,115,32,117,110,107,110,111,119,110,46,
+    10,10,32,32,32,32,114,130,0,0,0,114,89,0,0,0,
+    78,122,32,95,95,112,97,99,107,97,103,101,95,95,32,33,
+    61,32,95,95,115,112,101,99,95,95,46,112,97,114,101,110,
+    116,32,40,122,4,32,33,61,32,250,1,41,233,3,0,0,
+    0,41,1,90,10,115,116,97,99,107,108,101,118,101,108,122,
+    89,99,97,110,39,116,32,114,101,115,111,108,118,101,32,112,
+    97,99,107,97,103,101,32,102,114,111,109,32,95,95,115,112,
+    101,99,95,95,32,111,114,32,95,95,112,97,99,107,97,103,
+    101,95,95,44,32,102,97,108,108,105,110,103,32,98,97,99,
+    107,32,111,110,32,95,95,110,97,109,101,95,95,32,97,110,
+    100,32,95,95,112,97,116,104,95,95,114,1,0,0,0,114,
+    127,0,0,0,114,117,0,0,0,114,19,0,0,0,41,6,
+    114,30,0,0,0,114,119,0,0,0,114,166,0,0,0,114,
+    167,0,0,0,114,168,0,0,0,114,118,0,0,0,41,3,
+    218,7,103,108,111,98,97,108,115,114,160,0,0,0,114,82,
+    0,0,0,114,10,0,0,0,114,10,0,0,0,114,11,0,
+    0,0,218,17,95,99,97,108,99,95,95,95,112,97,99,107,
+    97,103,101,95,95,39,4,0,0,115,30,0,0,0,0,7,
+    10,1,10,1,8,1,18,1,22,2,10,1,4,1,8,1,
+    6,2,6,2,10,1,8,1,8,1,14,1,114,191,0,0,
+    0,114,10,0,0,0,99,5,0,0,0,0,0,0,0,9,
+    0,0,0,5,0,0,0,67,0,0,0,115,166,0,0,0,
+    124,4,100,1,107,2,114,18,116,0,124,0,131,1,125,5,
+    110,36,124,1,100,2,107,9,114,30,124,1,110,2,105,0,
+    125,6,116,1,124,6,131,1,125,7,116,0,124,0,124,7,
+    124,4,131,3,125,5,124,3,115,150,124,4,100,1,107,2,
+    114,84,116,0,124,0,160,2,100,3,161,1,100,1,25,0,
+    131,1,83,0,124,0,115,92,124,5,83,0,116,3,124,0,
+    131,1,116,3,124,0,160,2,100,3,161,1,100,1,25,0,
+    131,1,24,0,125,8,116,4,106,5,124,5,106,6,100,2,
+    116,3,124,5,106,6,131,1,124,8,24,0,133,2,25,0,
+    25,0,83,0,110,12,116,7,124,5,124,3,116,0,131,3,
+    83,0,100,2,83,0,41,4,97,215,1,0,0,73,109,112,
+    111,114,116,32,97,32,109,111,100,117,108,101,46,10,10,32,
+    32,32,32,84,104,101,32,39,103,108,111,98,97,108,115,39,
+    32,97,114,103,117,109,101,110,116,32,105,115,32,117,115,101,
+    100,32,116,111,32,105,110,102,101,114,32,119,104,101,114,101,
+    32,116,104,101,32,105,109,112,111,114,116,32,105,115,32,111,
+    99,99,117,114,114,105,110,103,32,102,114,111,109,10,32,32,
+    32,32,116,111,32,104,97,110,100,108,101,32,114,101,108,97,
+    116,105,118,101,32,105,109,112,111,114,116,115,46,32,84,104,
+    101,32,39,108,111,99,97,108,115,39,32,97,114,103,117,109,
+    101,110,116,32,105,115,32,105,103,110,111,114,101,100,46,32,
+    84,104,101,10,32,32,32,32,39,102,114,111,109,108,105,115,
+    116,39,32,97,114,103,117,109,101,110,116,32,115,112,101,99,
+    105,102,105,101,115,32,119,104,97,116,32,115,104,111,117,108,
+    100,32,101,120,105,115,116,32,97,115,32,97,116,116,114,105,
+    98,117,116,101,115,32,111,110,32,116,104,101,32,109,111,100,
+    117,108,101,10,32,32,32,32,98,101,105,110,103,32,105,109,
+    112,111,114,116,101,100,32,40,101,46,103,46,32,96,96,102,
+    114,111,109,32,109,111,100,117,108,101,32,105,109,112,111,114,
+    116,32,60,102,114,111,109,108,105,115,116,62,96,96,41,46,
+    32,32,84,104,101,32,39,108,101,118,101,108,39,10,32,32,
+    32,32,97,114,103,117,109,101,110,116,32,114,101,112,114,101,
+    115,101,110,116,115,32,116,104,101,32,112,97,99,107,97,103,
+    101,32,108,111,99,97,116,105,111,110,32,116,111,32,105,109,
+    112,111,114,116,32,102,114,111,109,32,105,110,32,97,32,114,
+    101,108,97,116,105,118,101,10,32,32,32,32,105,109,112,111,
+    114,116,32,40,101,46,103,46,32,96,96,102,114,111,109,32,
+    46,46,112,107,103,32,105,109,112,111,114,116,32,109,111,100,
+    96,96,32,119,111,117,108,100,32,104,97,118,101,32,97,32,
+    39,108,101,118,101,108,39,32,111,102,32,50,41,46,10,10,
+    32,32,32,32,114,19,0,0,0,78,114,117,0,0,0,41,
+    8,114,181,0,0,0,114,191,0,0,0,218,9,112,97,114,
+    116,105,116,105,111,110,114,158,0,0,0,114,14,0,0,0,
+    114,79,0,0,0,114,1,0,0,0,114,185,0,0,0,41,
+    9,114,15,0,0,0,114,190,0,0,0,218,6,108,111,99,
+    97,108,115,114,186,0,0,0,114,161,0,0,0,114,83,0,
+    0,0,90,8,103,108,111,98,97,108,115,95,114,160,0,0,
+    0,90,7,99,117,116,95,111,102,102,114,10,0,0,0,114,
+    10,0,0,0,114,11,0,0,0,218,10,95,95,105,109,112,
+    111,114,116,95,95,66,4,0,0,115,26,0,0,0,0,11,
+    8,1,10,2,16,1,8,1,12,1,4,3,8,1,18,1,
+    4,1,4,4,26,3,32,2,114,194,0,0,0,99,1,0,
     0,0,0,0,0,0,2,0,0,0,3,0,0,0,67,0,
-    0,0,115,10,0,0,0,116,0,124,0,124,1,131,2,83,
-    0,41,1,122,95,76,111,97,100,32,97,32,102,114,111,122,
-    101,110,32,109,111,100,117,108,101,46,10,10,32,32,32,32,
-    32,32,32,32,84,104,105,115,32,109,101,116,104,111,100,32,
-    105,115,32,100,101,112,114,101,99,97,116,101,100,46,32,32,
-    85,115,101,32,101,120,101,99,95,109,111,100,117,108,101,40,
-    41,32,105,110,115,116,101,97,100,46,10,10,32,32,32,32,
-    32,32,32,32,41,1,114,84,0,0,0,41,2,114,142,0,
-    0,0,114,71,0,0,0,114,10,0,0,0,114,10,0,0,
-    0,114,11,0,0,0,114,137,0,0,0,53,3,0,0,115,
-    2,0,0,0,0,7,122,26,70,114,111,122,101,110,73,109,
-    112,111,114,116,101,114,46,108,111,97,100,95,109,111,100,117,
-    108,101,99,2,0,0,0,0,0,0,0,2,0,0,0,3,
-    0,0,0,67,0,0,0,115,10,0,0,0,116,0,160,1,
-    124,1,161,1,83,0,41,1,122,45,82,101,116,117,114,110,
-    32,116,104,101,32,99,111,100,101,32,111,98,106,101,99,116,
-    32,102,111,114,32,116,104,101,32,102,114,111,122,101,110,32,
-    109,111,100,117,108,101,46,41,2,114,49,0,0,0,114,153,
-    0,0,0,41,2,114,142,0,0,0,114,71,0,0,0,114,
-    10,0,0,0,114,10,0,0,0,114,11,0,0,0,114,147,
-    0,0,0,62,3,0,0,115,2,0,0,0,0,4,122,23,
-    70,114,111,122,101,110,73,109,112,111,114,116,101,114,46,103,
-    101,116,95,99,111,100,101,99,2,0,0,0,0,0,0,0,
-    2,0,0,0,1,0,0,0,67,0,0,0,115,4,0,0,
-    0,100,1,83,0,41,2,122,54,82,101,116,117,114,110,32,
-    78,111,110,101,32,97,115,32,102,114,111,122,101,110,32,109,
-    111,100,117,108,101,115,32,100,111,32,110,111,116,32,104,97,
-    118,101,32,115,111,117,114,99,101,32,99,111,100,101,46,78,
-    114,10,0,0,0,41,2,114,142,0,0,0,114,71,0,0,
-    0,114,10,0,0,0,114,10,0,0,0,114,11,0,0,0,
-    114,148,0,0,0,68,3,0,0,115,2,0,0,0,0,4,
-    122,25,70,114,111,122,101,110,73,109,112,111,114,116,101,114,
-    46,103,101,116,95,115,111,117,114,99,101,99,2,0,0,0,
-    0,0,0,0,2,0,0,0,3,0,0,0,67,0,0,0,
-    115,10,0,0,0,116,0,160,1,124,1,161,1,83,0,41,
-    1,122,46,82,101,116,117,114,110,32,84,114,117,101,32,105,
-    102,32,116,104,101,32,102,114,111,122,101,110,32,109,111,100,
-    117,108,101,32,105,115,32,97,32,112,97,99,107,97,103,101,
-    46,41,2,114,49,0,0,0,90,17,105,115,95,102,114,111,
-    122,101,110,95,112,97,99,107,97,103,101,41,2,114,142,0,
-    0,0,114,71,0,0,0,114,10,0,0,0,114,10,0,0,
-    0,114,11,0,0,0,114,105,0,0,0,74,3,0,0,115,
-    2,0,0,0,0,4,122,25,70,114,111,122,101,110,73,109,
-    112,111,114,116,101,114,46,105,115,95,112,97,99,107,97,103,
-    101,41,2,78,78,41,1,78,41,16,114,1,0,0,0,114,
-    0,0,0,0,114,2,0,0,0,114,3,0,0,0,114,149,
-    0,0,0,114,86,0,0,0,114,150,0,0,0,114,145,0,
-    0,0,114,146,0,0,0,114,134,0,0,0,114,135,0,0,
-    0,114,137,0,0,0,114,77,0,0,0,114,147,0,0,0,
-    114,148,0,0,0,114,105,0,0,0,114,10,0,0,0,114,
-    10,0,0,0,114,10,0,0,0,114,11,0,0,0,114,151,
-    0,0,0,6,3,0,0,115,30,0,0,0,8,7,4,2,
-    12,9,2,1,12,6,2,1,12,8,12,4,12,9,12,9,
-    2,1,14,5,2,1,14,5,2,1,114,151,0,0,0,99,
-    0,0,0,0,0,0,0,0,0,0,0,0,2,0,0,0,
-    64,0,0,0,115,32,0,0,0,101,0,90,1,100,0,90,
-    2,100,1,90,3,100,2,100,3,132,0,90,4,100,4,100,
-    5,132,0,90,5,100,6,83,0,41,7,218,18,95,73,109,
-    112,111,114,116,76,111,99,107,67,111,110,116,101,120,116,122,
-    36,67,111,110,116,101,120,116,32,109,97,110,97,103,101,114,
-    32,102,111,114,32,116,104,101,32,105,109,112,111,114,116,32,
-    108,111,99,107,46,99,1,0,0,0,0,0,0,0,1,0,
-    0,0,2,0,0,0,67,0,0,0,115,12,0,0,0,116,
-    0,160,1,161,0,1,0,100,1,83,0,41,2,122,24,65,
-    99,113,117,105,114,101,32,116,104,101,32,105,109,112,111,114,
-    116,32,108,111,99,107,46,78,41,2,114,49,0,0,0,114,
-    50,0,0,0,41,1,114,26,0,0,0,114,10,0,0,0,
-    114,10,0,0,0,114,11,0,0,0,114,46,0,0,0,87,
-    3,0,0,115,2,0,0,0,0,2,122,28,95,73,109,112,
-    111,114,116,76,111,99,107,67,111,110,116,101,120,116,46,95,
-    95,101,110,116,101,114,95,95,99,4,0,0,0,0,0,0,
-    0,4,0,0,0,2,0,0,0,67,0,0,0,115,12,0,
-    0,0,116,0,160,1,161,0,1,0,100,1,83,0,41,2,
-    122,60,82,101,108,101,97,115,101,32,116,104,101,32,105,109,
-    112,111,114,116,32,108,111,99,107,32,114,101,103,97,114,100,
-    108,101,115,115,32,111,102,32,97,110,121,32,114,97,105,115,
-    101,100,32,101,120,99,101,112,116,105,111,110,115,46,78,41,
-    2,114,49,0,0,0,114,52,0,0,0,41,4,114,26,0,
-    0,0,90,8,101,120,99,95,116,121,112,101,90,9,101,120,
-    99,95,118,97,108,117,101,90,13,101,120,99,95,116,114,97,
-    99,101,98,97,99,107,114,10,0,0,0,114,10,0,0,0,
-    114,11,0,0,0,114,48,0,0,0,91,3,0,0,115,2,
-    0,0,0,0,2,122,27,95,73,109,112,111,114,116,76,111,
-    99,107,67,111,110,116,101,120,116,46,95,95,101,120,105,116,
-    95,95,78,41,6,114,1,0,0,0,114,0,0,0,0,114,
-    2,0,0,0,114,3,0,0,0,114,46,0,0,0,114,48,
+    0,0,115,38,0,0,0,116,0,160,1,124,0,161,1,125,
+    1,124,1,100,0,107,8,114,30,116,2,100,1,124,0,23,
+    0,131,1,130,1,116,3,124,1,131,1,83,0,41,2,78,
+    122,25,110,111,32,98,117,105,108,116,45,105,110,32,109,111,
+    100,117,108,101,32,110,97,109,101,100,32,41,4,114,141,0,
+    0,0,114,145,0,0,0,114,70,0,0,0,114,140,0,0,
+    0,41,2,114,15,0,0,0,114,82,0,0,0,114,10,0,
+    0,0,114,10,0,0,0,114,11,0,0,0,218,18,95,98,
+    117,105,108,116,105,110,95,102,114,111,109,95,110,97,109,101,
+    101,4,0,0,115,8,0,0,0,0,1,10,1,8,1,12,
+    1,114,195,0,0,0,99,2,0,0,0,0,0,0,0,10,
+    0,0,0,5,0,0,0,67,0,0,0,115,174,0,0,0,
+    124,1,97,0,124,0,97,1,116,2,116,1,131,1,125,2,
+    120,86,116,1,106,3,160,4,161,0,68,0,93,72,92,2,
+    125,3,125,4,116,5,124,4,124,2,131,2,114,28,124,3,
+    116,1,106,6,107,6,114,62,116,7,125,5,110,18,116,0,
+    160,8,124,3,161,1,114,28,116,9,125,5,110,2,113,28,
+    116,10,124,4,124,5,131,2,125,6,116,11,124,6,124,4,
+    131,2,1,0,113,28,87,0,116,1,106,3,116,12,25,0,
+    125,7,120,54,100,1,68,0,93,46,125,8,124,8,116,1,
+    106,3,107,7,114,144,116,13,124,8,131,1,125,9,110,10,
+    116,1,106,3,124,8,25,0,125,9,116,14,124,7,124,8,
+    124,9,131,3,1,0,113,120,87,0,100,2,83,0,41,3,
+    122,250,83,101,116,117,112,32,105,109,112,111,114,116,108,105,
+    98,32,98,121,32,105,109,112,111,114,116,105,110,103,32,110,
+    101,101,100,101,100,32,98,117,105,108,116,45,105,110,32,109,
+    111,100,117,108,101,115,32,97,110,100,32,105,110,106,101,99,
+    116,105,110,103,32,116,104,101,109,10,32,32,32,32,105,110,
+    116,111,32,116,104,101,32,103,108,111,98,97,108,32,110,97,
+    109,101,115,112,97,99,101,46,10,10,32,32,32,32,65,115,
+    32,115,121,115,32,105,115,32,110,101,101,100,101,100,32,102,
+    111,114,32,115,121,115,46,109,111,100,117,108,101,115,32,97,
+    99,99,101,115,115,32,97,110,100,32,95,105,109,112,32,105,
+    115,32,110,101,101,100,101,100,32,116,111,32,108,111,97,100,
+    32,98,117,105,108,116,45,105,110,10,32,32,32,32,109,111,
+    100,117,108,101,115,44,32,116,104,111,115,101,32,116,119,111,
+    32,109,111,100,117,108,101,115,32,109,117,115,116,32,98,101,
+    32,101,120,112,108,105,99,105,116,108,121,32,112,97,115,115,
+    101,100,32,105,110,46,10,10,32,32,32,32,41,3,114,20,
+    0,0,0,114,166,0,0,0,114,56,0,0,0,78,41,15,
+    114,49,0,0,0,114,14,0,0,0,114,13,0,0,0,114,
+    79,0,0,0,218,5,105,116,101,109,115,114,170,0,0,0,
+    114,69,0,0,0,114,141,0,0,0,114,75,0,0,0,114,
+    151,0,0,0,114,128,0,0,0,114,133,0,0,0,114,1,
+    0,0,0,114,195,0,0,0,114,5,0,0,0,41,10,218,
+    10,115,121,115,95,109,111,100,117,108,101,218,11,95,105,109,
+    112,95,109,111,100,117,108,101,90,11,109,111,100,117,108,101,
+    95,116,121,112,101,114,15,0,0,0,114,83,0,0,0,114,
+    93,0,0,0,114,82,0,0,0,90,11,115,101,108,102,95,
+    109,111,100,117,108,101,90,12,98,117,105,108,116,105,110,95,
+    110,97,109,101,90,14,98,117,105,108,116,105,110,95,109,111,
+    100,117,108,101,114,10,0,0,0,114,10,0,0,0,114,11,
+    0,0,0,218,6,95,115,101,116,117,112,108,4,0,0,115,
+    36,0,0,0,0,9,4,1,4,3,8,1,20,1,10,1,
+    10,1,6,1,10,1,6,2,2,1,10,1,14,3,10,1,
+    10,1,10,1,10,2,10,1,114,199,0,0,0,99,2,0,
+    0,0,0,0,0,0,2,0,0,0,3,0,0,0,67,0,
+    0,0,115,38,0,0,0,116,0,124,0,124,1,131,2,1,
+    0,116,1,106,2,160,3,116,4,161,1,1,0,116,1,106,
+    2,160,3,116,5,161,1,1,0,100,1,83,0,41,2,122,
+    48,73,110,115,116,97,108,108,32,105,109,112,111,114,116,101,
+    114,115,32,102,111,114,32,98,117,105,108,116,105,110,32,97,
+    110,100,32,102,114,111,122,101,110,32,109,111,100,117,108,101,
+    115,78,41,6,114,199,0,0,0,114,14,0,0,0,114,165,
+    0,0,0,114,109,0,0,0,114,141,0,0,0,114,151,0,
+    0,0,41,2,114,197,0,0,0,114,198,0,0,0,114,10,
+    0,0,0,114,10,0,0,0,114,11,0,0,0,218,8,95,
+    105,110,115,116,97,108,108,143,4,0,0,115,6,0,0,0,
+    0,2,10,2,12,1,114,200,0,0,0,99,0,0,0,0,
+    0,0,0,0,1,0,0,0,4,0,0,0,67,0,0,0,
+    115,32,0,0,0,100,1,100,2,108,0,125,0,124,0,97,
+    1,124,0,160,2,116,3,106,4,116,5,25,0,161,1,1,
+    0,100,2,83,0,41,3,122,57,73,110,115,116,97,108,108,
+    32,105,109,112,111,114,116,101,114,115,32,116,104,97,116,32,
+    114,101,113,117,105,114,101,32,101,120,116,101,114,110,97,108,
+    32,102,105,108,101,115,121,115,116,101,109,32,97,99,99,101,
+    115,115,114,19,0,0,0,78,41,6,218,26,95,102,114,111,
+    122,101,110,95,105,109,112,111,114,116,108,105,98,95,101,120,
+    116,101,114,110,97,108,114,115,0,0,0,114,200,0,0,0,
+    114,14,0,0,0,114,79,0,0,0,114,1,0,0,0,41,
+    1,114,201,0,0,0,114,10,0,0,0,114,10,0,0,0,
+    114,11,0,0,0,218,27,95,105,110,115,116,97,108,108,95,
+    101,120,116,101,114,110,97,108,95,105,109,112,111,114,116,101,
+    114,115,151,4,0,0,115,6,0,0,0,0,3,8,1,4,
+    1,114,202,0,0,0,41,2,78,78,41,1,78,41,2,78,
+    114,19,0,0,0,41,4,78,78,114,10,0,0,0,114,19,
+    0,0,0,41,51,114,3,0,0,0,114,115,0,0,0,114,
+    12,0,0,0,114,16,0,0,0,114,51,0,0,0,114,29,
+    0,0,0,114,36,0,0,0,114,17,0,0,0,114,18,0,
+    0,0,114,41,0,0,0,114,42,0,0,0,114,45,0,0,
+    0,114,57,0,0,0,114,59,0,0,0,114,68,0,0,0,
+    114,74,0,0,0,114,77,0,0,0,114,84,0,0,0,114,
+    95,0,0,0,114,96,0,0,0,114,102,0,0,0,114,78,
+    0,0,0,114,128,0,0,0,114,133,0,0,0,114,136,0,
+    0,0,114,91,0,0,0,114,80,0,0,0,114,139,0,0,
+    0,114,140,0,0,0,114,81,0,0,0,114,141,0,0,0,
+    114,151,0,0,0,114,156,0,0,0,114,162,0,0,0,114,
+    164,0,0,0,114,169,0,0,0,114,173,0,0,0,90,15,
+    95,69,82,82,95,77,83,71,95,80,82,69,70,73,88,114,
+    175,0,0,0,114,178,0,0,0,218,6,111,98,106,101,99,
+    116,114,179,0,0,0,114,180,0,0,0,114,181,0,0,0,
+    114,185,0,0,0,114,191,0,0,0,114,194,0,0,0,114,
+    195,0,0,0,114,199,0,0,0,114,200,0,0,0,114,202,
     0,0,0,114,10,0,0,0,114,10,0,0,0,114,10,0,
-    0,0,114,11,0,0,0,114,156,0,0,0,83,3,0,0,
-    115,6,0,0,0,8,2,4,2,8,4,114,156,0,0,0,
-    99,3,0,0,0,0,0,0,0,5,0,0,0,5,0,0,
-    0,67,0,0,0,115,64,0,0,0,124,1,160,0,100,1,
-    124,2,100,2,24,0,161,2,125,3,116,1,124,3,131,1,
-    124,2,107,0,114,36,116,2,100,3,131,1,130,1,124,3,
-    100,4,25,0,125,4,124,0,114,60,100,5,160,3,124,4,
-    124,0,161,2,83,0,124,4,83,0,41,6,122,50,82,101,
-    115,111,108,118,101,32,97,32,114,101,108,97,116,105,118,101,
-    32,109,111,100,117,108,101,32,110,97,109,101,32,116,111,32,
-    97,110,32,97,98,115,111,108,117,116,101,32,111,110,101,46,
-    114,117,0,0,0,114,33,0,0,0,122,50,97,116,116,101,
-    109,112,116,101,100,32,114,101,108,97,116,105,118,101,32,105,
-    109,112,111,114,116,32,98,101,121,111,110,100,32,116,111,112,
-    45,108,101,118,101,108,32,112,97,99,107,97,103,101,114,19,
-    0,0,0,122,5,123,125,46,123,125,41,4,218,6,114,115,
-    112,108,105,116,218,3,108,101,110,218,10,86,97,108,117,101,
-    69,114,114,111,114,114,38,0,0,0,41,5,114,15,0,0,
-    0,218,7,112,97,99,107,97,103,101,218,5,108,101,118,101,
-    108,90,4,98,105,116,115,90,4,98,97,115,101,114,10,0,
-    0,0,114,10,0,0,0,114,11,0,0,0,218,13,95,114,
-    101,115,111,108,118,101,95,110,97,109,101,96,3,0,0,115,
-    10,0,0,0,0,2,16,1,12,1,8,1,8,1,114,162,
-    0,0,0,99,3,0,0,0,0,0,0,0,4,0,0,0,
-    4,0,0,0,67,0,0,0,115,34,0,0,0,124,0,160,
-    0,124,1,124,2,161,2,125,3,124,3,100,0,107,8,114,
-    24,100,0,83,0,116,1,124,1,124,3,131,2,83,0,41,
-    1,78,41,2,114,146,0,0,0,114,78,0,0,0,41,4,
-    218,6,102,105,110,100,101,114,114,15,0,0,0,114,143,0,
-    0,0,114,93,0,0,0,114,10,0,0,0,114,10,0,0,
-    0,114,11,0,0,0,218,17,95,102,105,110,100,95,115,112,
-    101,99,95,108,101,103,97,99,121,105,3,0,0,115,8,0,
-    0,0,0,3,12,1,8,1,4,1,114,164,0,0,0,99,
-    3,0,0,0,0,0,0,0,10,0,0,0,10,0,0,0,
-    67,0,0,0,115,240,0,0,0,116,0,106,1,125,3,124,
-    3,100,1,107,8,114,22,116,2,100,2,131,1,130,1,124,
-    3,115,38,116,3,160,4,100,3,116,5,161,2,1,0,124,
-    0,116,0,106,6,107,6,125,4,120,186,124,3,68,0,93,
-    174,125,5,116,7,131,0,143,72,1,0,121,10,124,5,106,
-    8,125,6,87,0,110,42,4,0,116,9,107,10,114,118,1,
-    0,1,0,1,0,116,10,124,5,124,0,124,1,131,3,125,
-    7,124,7,100,1,107,8,114,114,119,54,89,0,110,14,88,
-    0,124,6,124,0,124,1,124,2,131,3,125,7,87,0,100,
-    1,81,0,82,0,88,0,124,7,100,1,107,9,114,54,124,
-    4,115,224,124,0,116,0,106,6,107,6,114,224,116,0,106,
-    6,124,0,25,0,125,8,121,10,124,8,106,11,125,9,87,
-    0,110,20,4,0,116,9,107,10,114,204,1,0,1,0,1,
-    0,124,7,83,0,88,0,124,9,100,1,107,8,114,218,124,
-    7,83,0,124,9,83,0,113,54,124,7,83,0,113,54,87,
-    0,100,1,83,0,100,1,83,0,41,4,122,21,70,105,110,
-    100,32,97,32,109,111,100,117,108,101,39,115,32,115,112,101,
-    99,46,78,122,53,115,121,115,46,109,101,116,97,95,112,97,
-    116,104,32,105,115,32,78,111,110,101,44,32,80,121,116,104,
-    111,110,32,105,115,32,108,105,107,101,108,121,32,115,104,117,
-    116,116,105,110,103,32,100,111,119,110,122,22,115,121,115,46,
-    109,101,116,97,95,112,97,116,104,32,105,115,32,101,109,112,
-    116,121,41,12,114,14,0,0,0,218,9,109,101,116,97,95,
-    112,97,116,104,114,70,0,0,0,218,9,95,119,97,114,110,
-    105,110,103,115,218,4,119,97,114,110,218,13,73,109,112,111,
-    114,116,87,97,114,110,105,110,103,114,79,0,0,0,114,156,
-    0,0,0,114,145,0,0,0,114,90,0,0,0,114,164,0,
-    0,0,114,89,0,0,0,41,10,114,15,0,0,0,114,143,
-    0,0,0,114,144,0,0,0,114,165,0,0,0,90,9,105,
-    115,95,114,101,108,111,97,100,114,163,0,0,0,114,145,0,
-    0,0,114,82,0,0,0,114,83,0,0,0,114,89,0,0,
-    0,114,10,0,0,0,114,10,0,0,0,114,11,0,0,0,
-    218,10,95,102,105,110,100,95,115,112,101,99,114,3,0,0,
-    115,54,0,0,0,0,2,6,1,8,2,8,3,4,1,12,
-    5,10,1,10,1,8,1,2,1,10,1,14,1,12,1,8,
-    1,8,2,22,1,8,2,14,1,10,1,2,1,10,1,14,
-    4,6,2,8,1,4,2,6,2,8,2,114,169,0,0,0,
-    99,3,0,0,0,0,0,0,0,3,0,0,0,5,0,0,
-    0,67,0,0,0,115,108,0,0,0,116,0,124,0,116,1,
-    131,2,115,28,116,2,100,1,160,3,116,4,124,0,131,1,
-    161,1,131,1,130,1,124,2,100,2,107,0,114,44,116,5,
-    100,3,131,1,130,1,124,2,100,2,107,4,114,84,116,0,
-    124,1,116,1,131,2,115,72,116,2,100,4,131,1,130,1,
-    110,12,124,1,115,84,116,6,100,5,131,1,130,1,124,0,
-    115,104,124,2,100,2,107,2,114,104,116,5,100,6,131,1,
-    130,1,100,7,83,0,41,8,122,28,86,101,114,105,102,121,
-    32,97,114,103,117,109,101,110,116,115,32,97,114,101,32,34,
-    115,97,110,101,34,46,122,31,109,111,100,117,108,101,32,110,
-    97,109,101,32,109,117,115,116,32,98,101,32,115,116,114,44,
-    32,110,111,116,32,123,125,114,19,0,0,0,122,18,108,101,
-    118,101,108,32,109,117,115,116,32,98,101,32,62,61,32,48,
-    122,31,95,95,112,97,99,107,97,103,101,95,95,32,110,111,
-    116,32,115,101,116,32,116,111,32,97,32,115,116,114,105,110,
-    103,122,54,97,116,116,101,109,112,116,101,100,32,114,101,108,
-    97,116,105,118,101,32,105,109,112,111,114,116,32,119,105,116,
-    104,32,110,111,32,107,110,111,119,110,32,112,97,114,101,110,
-    116,32,112,97,99,107,97,103,101,122,17,69,109,112,116,121,
-    32,109,111,100,117,108,101,32,110,97,109,101,78,41,7,218,
-    10,105,115,105,110,115,116,97,110,99,101,218,3,115,116,114,
-    218,9,84,121,112,101,69,114,114,111,114,114,38,0,0,0,
-    114,13,0,0,0,114,159,0,0,0,114,70,0,0,0,41,
-    3,114,15,0,0,0,114,160,0,0,0,114,161,0,0,0,
-    114,10,0,0,0,114,10,0,0,0,114,11,0,0,0,218,
-    13,95,115,97,110,105,116,121,95,99,104,101,99,107,161,3,
-    0,0,115,22,0,0,0,0,2,10,1,18,1,8,1,8,
-    1,8,1,10,1,10,1,4,1,8,2,12,1,114,173,0,
-    0,0,122,16,78,111,32,109,111,100,117,108,101,32,110,97,
-    109,101,100,32,122,4,123,33,114,125,99,2,0,0,0,0,
-    0,0,0,8,0,0,0,8,0,0,0,67,0,0,0,115,
-    220,0,0,0,100,0,125,2,124,0,160,0,100,1,161,1,
-    100,2,25,0,125,3,124,3,114,134,124,3,116,1,106,2,
-    107,7,114,42,116,3,124,1,124,3,131,2,1,0,124,0,
-    116,1,106,2,107,6,114,62,116,1,106,2,124,0,25,0,
-    83,0,116,1,106,2,124,3,25,0,125,4,121,10,124,4,
-    106,4,125,2,87,0,110,50,4,0,116,5,107,10,114,132,
-    1,0,1,0,1,0,116,6,100,3,23,0,160,7,124,0,
-    124,3,161,2,125,5,116,8,124,5,124,0,100,4,141,2,
-    100,0,130,2,89,0,110,2,88,0,116,9,124,0,124,2,
-    131,2,125,6,124,6,100,0,107,8,114,172,116,8,116,6,
-    160,7,124,0,161,1,124,0,100,4,141,2,130,1,110,8,
-    116,10,124,6,131,1,125,7,124,3,114,216,116,1,106,2,
-    124,3,25,0,125,4,116,11,124,4,124,0,160,0,100,1,
-    161,1,100,5,25,0,124,7,131,3,1,0,124,7,83,0,
-    41,6,78,114,117,0,0,0,114,19,0,0,0,122,23,59,
-    32,123,33,114,125,32,105,115,32,110,111,116,32,97,32,112,
-    97,99,107,97,103,101,41,1,114,15,0,0,0,233,2,0,
-    0,0,41,12,114,118,0,0,0,114,14,0,0,0,114,79,
-    0,0,0,114,59,0,0,0,114,127,0,0,0,114,90,0,
-    0,0,218,8,95,69,82,82,95,77,83,71,114,38,0,0,
-    0,218,19,77,111,100,117,108,101,78,111,116,70,111,117,110,
-    100,69,114,114,111,114,114,169,0,0,0,114,140,0,0,0,
-    114,5,0,0,0,41,8,114,15,0,0,0,218,7,105,109,
-    112,111,114,116,95,114,143,0,0,0,114,119,0,0,0,90,
-    13,112,97,114,101,110,116,95,109,111,100,117,108,101,114,138,
-    0,0,0,114,82,0,0,0,114,83,0,0,0,114,10,0,
-    0,0,114,10,0,0,0,114,11,0,0,0,218,23,95,102,
-    105,110,100,95,97,110,100,95,108,111,97,100,95,117,110,108,
-    111,99,107,101,100,180,3,0,0,115,42,0,0,0,0,1,
-    4,1,14,1,4,1,10,1,10,2,10,1,10,1,10,1,
-    2,1,10,1,14,1,16,1,20,1,10,1,8,1,20,2,
-    8,1,4,2,10,1,22,1,114,178,0,0,0,99,2,0,
-    0,0,0,0,0,0,4,0,0,0,9,0,0,0,67,0,
-    0,0,115,94,0,0,0,116,0,124,0,131,1,143,38,1,
-    0,116,1,106,2,160,3,124,0,116,4,161,2,125,2,124,
-    2,116,4,107,8,114,42,116,5,124,0,124,1,131,2,83,
-    0,87,0,100,1,81,0,82,0,88,0,124,2,100,1,107,
-    8,114,82,100,2,160,6,124,0,161,1,125,3,116,7,124,
-    3,124,0,100,3,141,2,130,1,116,8,124,0,131,1,1,
-    0,124,2,83,0,41,4,122,25,70,105,110,100,32,97,110,
-    100,32,108,111,97,100,32,116,104,101,32,109,111,100,117,108,
-    101,46,78,122,40,105,109,112,111,114,116,32,111,102,32,123,
-    125,32,104,97,108,116,101,100,59,32,78,111,110,101,32,105,
-    110,32,115,121,115,46,109,111,100,117,108,101,115,41,1,114,
-    15,0,0,0,41,9,114,42,0,0,0,114,14,0,0,0,
-    114,79,0,0,0,114,30,0,0,0,218,14,95,78,69,69,
-    68,83,95,76,79,65,68,73,78,71,114,178,0,0,0,114,
-    38,0,0,0,114,176,0,0,0,114,57,0,0,0,41,4,
-    114,15,0,0,0,114,177,0,0,0,114,83,0,0,0,114,
-    67,0,0,0,114,10,0,0,0,114,10,0,0,0,114,11,
-    0,0,0,218,14,95,102,105,110,100,95,97,110,100,95,108,
-    111,97,100,210,3,0,0,115,20,0,0,0,0,2,10,1,
-    14,1,8,1,20,2,8,1,4,1,6,1,12,2,8,1,
-    114,180,0,0,0,114,19,0,0,0,99,3,0,0,0,0,
-    0,0,0,3,0,0,0,4,0,0,0,67,0,0,0,115,
-    42,0,0,0,116,0,124,0,124,1,124,2,131,3,1,0,
-    124,2,100,1,107,4,114,32,116,1,124,0,124,1,124,2,
-    131,3,125,0,116,2,124,0,116,3,131,2,83,0,41,2,
-    97,50,1,0,0,73,109,112,111,114,116,32,97,110,100,32,
-    114,101,116,117,114,110,32,116,104,101,32,109,111,100,117,108,
-    101,32,98,97,115,101,100,32,111,110,32,105,116,115,32,110,
-    97,109,101,44,32,116,104,101,32,112,97,99,107,97,103,101,
-    32,116,104,101,32,99,97,108,108,32,105,115,10,32,32,32,
-    32,98,101,105,110,103,32,109,97,100,101,32,102,114,111,109,
-    44,32,97,110,100,32,116,104,101,32,108,101,118,101,108,32,
-    97,100,106,117,115,116,109,101,110,116,46,10,10,32,32,32,
-    32,84,104,105,115,32,102,117,110,99,116,105,111,110,32,114,
-    101,112,114,101,115,101,110,116,115,32,116,104,101,32,103,114,
-    101,97,116,101,115,116,32,99,111,109,109,111,110,32,100,101,
-    110,111,109,105,110,97,116,111,114,32,111,102,32,102,117,110,
-    99,116,105,111,110,97,108,105,116,121,10,32,32,32,32,98,
-    101,116,119,101,101,110,32,105,109,112,111,114,116,95,109,111,
-    100,117,108,101,32,97,110,100,32,95,95,105,109,112,111,114,
-    116,95,95,46,32,84,104,105,115,32,105,110,99,108,117,100,
-    101,115,32,115,101,116,116,105,110,103,32,95,95,112,97,99,
-    107,97,103,101,95,95,32,105,102,10,32,32,32,32,116,104,
-    101,32,108,111,97,100,101,114,32,100,105,100,32,110,111,116,
-    46,10,10,32,32,32,32,114,19,0,0,0,41,4,114,173,
-    0,0,0,114,162,0,0,0,114,180,0,0,0,218,11,95,
-    103,99,100,95,105,109,112,111,114,116,41,3,114,15,0,0,
-    0,114,160,0,0,0,114,161,0,0,0,114,10,0,0,0,
-    114,10,0,0,0,114,11,0,0,0,114,181,0,0,0,226,
-    3,0,0,115,8,0,0,0,0,9,12,1,8,1,12,1,
-    114,181,0,0,0,41,1,218,9,114,101,99,117,114,115,105,
-    118,101,99,3,0,0,0,1,0,0,0,8,0,0,0,11,
-    0,0,0,67,0,0,0,115,234,0,0,0,116,0,124,0,
-    100,1,131,2,114,230,120,218,124,1,68,0,93,210,125,4,
-    116,1,124,4,116,2,131,2,115,78,124,3,114,46,124,0,
-    106,3,100,2,23,0,125,5,110,4,100,3,125,5,116,4,
-    100,4,124,5,155,0,100,5,116,5,124,4,131,1,106,3,
-    155,0,157,4,131,1,130,1,113,16,124,4,100,6,107,2,
-    114,120,124,3,115,226,116,0,124,0,100,7,131,2,114,226,
-    116,6,124,0,124,0,106,7,124,2,100,8,100,9,141,4,
-    1,0,113,16,116,0,124,0,124,4,131,2,115,16,100,10,
-    160,8,124,0,106,3,124,4,161,2,125,6,121,14,116,9,
-    124,2,124,6,131,2,1,0,87,0,113,16,4,0,116,10,
-    107,10,114,224,1,0,125,7,1,0,122,36,124,7,106,11,
-    124,6,107,2,114,206,116,12,106,13,160,14,124,6,116,15,
-    161,2,100,11,107,9,114,206,119,16,130,0,87,0,100,11,
-    100,11,125,7,126,7,88,0,89,0,113,16,88,0,113,16,
-    87,0,124,0,83,0,41,12,122,238,70,105,103,117,114,101,
-    32,111,117,116,32,119,104,97,116,32,95,95,105,109,112,111,
-    114,116,95,95,32,115,104,111,117,108,100,32,114,101,116,117,
-    114,110,46,10,10,32,32,32,32,84,104,101,32,105,109,112,
-    111,114,116,95,32,112,97,114,97,109,101,116,101,114,32,105,
-    115,32,97,32,99,97,108,108,97,98,108,101,32,119,104,105,
-    99,104,32,116,97,107,101,115,32,116,104,101,32,110,97,109,
-    101,32,111,102,32,109,111,100,117,108,101,32,116,111,10,32,
-    32,32,32,105,109,112,111,114,116,46,32,73,116,32,105,115,
-    32,114,101,113,117,105,114,101,100,32,116,111,32,100,101,99,
-    111,117,112,108,101,32,116,104,101,32,102,117,110,99,116,105,
-    111,110,32,102,114,111,109,32,97,115,115,117,109,105,110,103,
-    32,105,109,112,111,114,116,108,105,98,39,115,10,32,32,32,
-    32,105,109,112,111,114,116,32,105,109,112,108,101,109,101,110,
-    116,97,116,105,111,110,32,105,115,32,100,101,115,105,114,101,
-    100,46,10,10,32,32,32,32,114,127,0,0,0,122,8,46,
-    95,95,97,108,108,95,95,122,13,96,96,102,114,111,109,32,
-    108,105,115,116,39,39,122,8,73,116,101,109,32,105,110,32,
-    122,18,32,109,117,115,116,32,98,101,32,115,116,114,44,32,
-    110,111,116,32,250,1,42,218,7,95,95,97,108,108,95,95,
-    84,41,1,114,182,0,0,0,122,5,123,125,46,123,125,78,
-    41,16,114,4,0,0,0,114,170,0,0,0,114,171,0,0,
-    0,114,1,0,0,0,114,172,0,0,0,114,13,0,0,0,
-    218,16,95,104,97,110,100,108,101,95,102,114,111,109,108,105,
-    115,116,114,184,0,0,0,114,38,0,0,0,114,59,0,0,
-    0,114,176,0,0,0,114,15,0,0,0,114,14,0,0,0,
-    114,79,0,0,0,114,30,0,0,0,114,179,0,0,0,41,
-    8,114,83,0,0,0,218,8,102,114,111,109,108,105,115,116,
-    114,177,0,0,0,114,182,0,0,0,218,1,120,90,5,119,
-    104,101,114,101,90,9,102,114,111,109,95,110,97,109,101,90,
-    3,101,120,99,114,10,0,0,0,114,10,0,0,0,114,11,
-    0,0,0,114,185,0,0,0,241,3,0,0,115,42,0,0,
-    0,0,10,10,1,10,1,10,1,4,1,12,2,4,1,28,
-    2,8,1,14,1,10,1,10,1,10,1,14,1,2,1,14,
-    1,16,4,10,1,18,1,2,1,24,1,114,185,0,0,0,
-    99,1,0,0,0,0,0,0,0,3,0,0,0,6,0,0,
-    0,67,0,0,0,115,146,0,0,0,124,0,160,0,100,1,
-    161,1,125,1,124,0,160,0,100,2,161,1,125,2,124,1,
-    100,3,107,9,114,82,124,2,100,3,107,9,114,78,124,1,
-    124,2,106,1,107,3,114,78,116,2,106,3,100,4,124,1,
-    155,2,100,5,124,2,106,1,155,2,100,6,157,5,116,4,
-    100,7,100,8,141,3,1,0,124,1,83,0,124,2,100,3,
-    107,9,114,96,124,2,106,1,83,0,116,2,106,3,100,9,
-    116,4,100,7,100,8,141,3,1,0,124,0,100,10,25,0,
-    125,1,100,11,124,0,107,7,114,142,124,1,160,5,100,12,
-    161,1,100,13,25,0,125,1,124,1,83,0,41,14,122,167,
-    67,97,108,99,117,108,97,116,101,32,119,104,97,116,32,95,
-    95,112,97,99,107,97,103,101,95,95,32,115,104,111,117,108,
-    100,32,98,101,46,10,10,32,32,32,32,95,95,112,97,99,
-    107,97,103,101,95,95,32,105,115,32,110,111,116,32,103,117,
-    97,114,97,110,116,101,101,100,32,116,111,32,98,101,32,100,
-    101,102,105,110,101,100,32,111,114,32,99,111,117,108,100,32,
-    98,101,32,115,101,116,32,116,111,32,78,111,110,101,10,32,
-    32,32,32,116,111,32,114,101,112,114,101,115,101,110,116,32,
-    116,104,97,116,32,105,116,115,32,112,114,111,112,101,114,32,
-    118,97,108,117,101,32,105,115,32,117,110,107,110,111,119,110,
-    46,10,10,32,32,32,32,114,130,0,0,0,114,89,0,0,
-    0,78,122,32,95,95,112,97,99,107,97,103,101,95,95,32,
-    33,61,32,95,95,115,112,101,99,95,95,46,112,97,114,101,
-    110,116,32,40,122,4,32,33,61,32,250,1,41,233,3,0,
-    0,0,41,1,90,10,115,116,97,99,107,108,101,118,101,108,
-    122,89,99,97,110,39,116,32,114,101,115,111,108,118,101,32,
-    112,97,99,107,97,103,101,32,102,114,111,109,32,95,95,115,
-    112,101,99,95,95,32,111,114,32,95,95,112,97,99,107,97,
-    103,101,95,95,44,32,102,97,108,108,105,110,103,32,98,97,
-    99,107,32,111,110,32,95,95,110,97,109,101,95,95,32,97,
-    110,100,32,95,95,112,97,116,104,95,95,114,1,0,0,0,
-    114,127,0,0,0,114,117,0,0,0,114,19,0,0,0,41,
-    6,114,30,0,0,0,114,119,0,0,0,114,166,0,0,0,
-    114,167,0,0,0,114,168,0,0,0,114,118,0,0,0,41,
-    3,218,7,103,108,111,98,97,108,115,114,160,0,0,0,114,
-    82,0,0,0,114,10,0,0,0,114,10,0,0,0,114,11,
-    0,0,0,218,17,95,99,97,108,99,95,95,95,112,97,99,
-    107,97,103,101,95,95,23,4,0,0,115,30,0,0,0,0,
-    7,10,1,10,1,8,1,18,1,22,2,10,1,4,1,8,
-    1,6,2,6,2,10,1,8,1,8,1,14,1,114,191,0,
-    0,0,114,10,0,0,0,99,5,0,0,0,0,0,0,0,
-    9,0,0,0,5,0,0,0,67,0,0,0,115,166,0,0,
-    0,124,4,100,1,107,2,114,18,116,0,124,0,131,1,125,
-    5,110,36,124,1,100,2,107,9,114,30,124,1,110,2,105,
-    0,125,6,116,1,124,6,131,1,125,7,116,0,124,0,124,
-    7,124,4,131,3,125,5,124,3,115,150,124,4,100,1,107,
-    2,114,84,116,0,124,0,160,2,100,3,161,1,100,1,25,
-    0,131,1,83,0,124,0,115,92,124,5,83,0,116,3,124,
-    0,131,1,116,3,124,0,160,2,100,3,161,1,100,1,25,
-    0,131,1,24,0,125,8,116,4,106,5,124,5,106,6,100,
-    2,116,3,124,5,106,6,131,1,124,8,24,0,133,2,25,
-    0,25,0,83,0,110,12,116,7,124,5,124,3,116,0,131,
-    3,83,0,100,2,83,0,41,4,97,215,1,0,0,73,109,
-    112,111,114,116,32,97,32,109,111,100,117,108,101,46,10,10,
-    32,32,32,32,84,104,101,32,39,103,108,111,98,97,108,115,
-    39,32,97,114,103,117,109,101,110,116,32,105,115,32,117,115,
-    101,100,32,116,111,32,105,110,102,101,114,32,119,104,101,114,
-    101,32,116,104,101,32,105,109,112,111,114,116,32,105,115,32,
-    111,99,99,117,114,114,105,110,103,32,102,114,111,109,10,32,
-    32,32,32,116,111,32,104,97,110,100,108,101,32,114,101,108,
-    97,116,105,118,101,32,105,109,112,111,114,116,115,46,32,84,
-    104,101,32,39,108,111,99,97,108,115,39,32,97,114,103,117,
-    109,101,110,116,32,105,115,32,105,103,110,111,114,101,100,46,
-    32,84,104,101,10,32,32,32,32,39,102,114,111,109,108,105,
-    115,116,39,32,97,114,103,117,109,101,110,116,32,115,112,101,
-    99,105,102,105,101,115,32,119,104,97,116,32,115,104,111,117,
-    108,100,32,101,120,105,115,116,32,97,115,32,97,116,116,114,
-    105,98,117,116,101,115,32,111,110,32,116,104,101,32,109,111,
-    100,117,108,101,10,32,32,32,32,98,101,105,110,103,32,105,
-    109,112,111,114,116,101,100,32,40,101,46,103,46,32,96,96,
-    102,114,111,109,32,109,111,100,117,108,101,32,105,109,112,111,
-    114,116,32,60,102,114,111,109,108,105,115,116,62,96,96,41,
-    46,32,32,84,104,101,32,39,108,101,118,101,108,39,10,32,
-    32,32,32,97,114,103,117,109,101,110,116,32,114,101,112,114,
-    101,115,101,110,116,115,32,116,104,101,32,112,97,99,107,97,
-    103,101,32,108,111,99,97,116,105,111,110,32,116,111,32,105,
-    109,112,111,114,116,32,102,114,111,109,32,105,110,32,97,32,
-    114,101,108,97,116,105,118,101,10,32,32,32,32,105,109,112,
-    111,114,116,32,40,101,46,103,46,32,96,96,102,114,111,109,
-    32,46,46,112,107,103,32,105,109,112,111,114,116,32,109,111,
-    100,96,96,32,119,111,117,108,100,32,104,97,118,101,32,97,
-    32,39,108,101,118,101,108,39,32,111,102,32,50,41,46,10,
-    10,32,32,32,32,114,19,0,0,0,78,114,117,0,0,0,
-    41,8,114,181,0,0,0,114,191,0,0,0,218,9,112,97,
-    114,116,105,116,105,111,110,114,158,0,0,0,114,14,0,0,
-    0,114,79,0,0,0,114,1,0,0,0,114,185,0,0,0,
-    41,9,114,15,0,0,0,114,190,0,0,0,218,6,108,111,
-    99,97,108,115,114,186,0,0,0,114,161,0,0,0,114,83,
-    0,0,0,90,8,103,108,111,98,97,108,115,95,114,160,0,
-    0,0,90,7,99,117,116,95,111,102,102,114,10,0,0,0,
-    114,10,0,0,0,114,11,0,0,0,218,10,95,95,105,109,
-    112,111,114,116,95,95,50,4,0,0,115,26,0,0,0,0,
-    11,8,1,10,2,16,1,8,1,12,1,4,3,8,1,18,
-    1,4,1,4,4,26,3,32,2,114,194,0,0,0,99,1,
-    0,0,0,0,0,0,0,2,0,0,0,3,0,0,0,67,
-    0,0,0,115,38,0,0,0,116,0,160,1,124,0,161,1,
-    125,1,124,1,100,0,107,8,114,30,116,2,100,1,124,0,
-    23,0,131,1,130,1,116,3,124,1,131,1,83,0,41,2,
-    78,122,25,110,111,32,98,117,105,108,116,45,105,110,32,109,
-    111,100,117,108,101,32,110,97,109,101,100,32,41,4,114,141,
-    0,0,0,114,145,0,0,0,114,70,0,0,0,114,140,0,
-    0,0,41,2,114,15,0,0,0,114,82,0,0,0,114,10,
-    0,0,0,114,10,0,0,0,114,11,0,0,0,218,18,95,
-    98,117,105,108,116,105,110,95,102,114,111,109,95,110,97,109,
-    101,85,4,0,0,115,8,0,0,0,0,1,10,1,8,1,
-    12,1,114,195,0,0,0,99,2,0,0,0,0,0,0,0,
-    10,0,0,0,5,0,0,0,67,0,0,0,115,174,0,0,
-    0,124,1,97,0,124,0,97,1,116,2,116,1,131,1,125,
-    2,120,86,116,1,106,3,160,4,161,0,68,0,93,72,92,
-    2,125,3,125,4,116,5,124,4,124,2,131,2,114,28,124,
-    3,116,1,106,6,107,6,114,62,116,7,125,5,110,18,116,
-    0,160,8,124,3,161,1,114,28,116,9,125,5,110,2,113,
-    28,116,10,124,4,124,5,131,2,125,6,116,11,124,6,124,
-    4,131,2,1,0,113,28,87,0,116,1,106,3,116,12,25,
-    0,125,7,120,54,100,1,68,0,93,46,125,8,124,8,116,
-    1,106,3,107,7,114,144,116,13,124,8,131,1,125,9,110,
-    10,116,1,106,3,124,8,25,0,125,9,116,14,124,7,124,
-    8,124,9,131,3,1,0,113,120,87,0,100,2,83,0,41,
-    3,122,250,83,101,116,117,112,32,105,109,112,111,114,116,108,
-    105,98,32,98,121,32,105,109,112,111,114,116,105,110,103,32,
-    110,101,101,100,101,100,32,98,117,105,108,116,45,105,110,32,
-    109,111,100,117,108,101,115,32,97,110,100,32,105,110,106,101,
-    99,116,105,110,103,32,116,104,101,109,10,32,32,32,32,105,
-    110,116,111,32,116,104,101,32,103,108,111,98,97,108,32,110,
-    97,109,101,115,112,97,99,101,46,10,10,32,32,32,32,65,
-    115,32,115,121,115,32,105,115,32,110,101,101,100,101,100,32,
-    102,111,114,32,115,121,115,46,109,111,100,117,108,101,115,32,
-    97,99,99,101,115,115,32,97,110,100,32,95,105,109,112,32,
-    105,115,32,110,101,101,100,101,100,32,116,111,32,108,111,97,
-    100,32,98,117,105,108,116,45,105,110,10,32,32,32,32,109,
-    111,100,117,108,101,115,44,32,116,104,111,115,101,32,116,119,
-    111,32,109,111,100,117,108,101,115,32,109,117,115,116,32,98,
-    101,32,101,120,112,108,105,99,105,116,108,121,32,112,97,115,
-    115,101,100,32,105,110,46,10,10,32,32,32,32,41,3,114,
-    20,0,0,0,114,166,0,0,0,114,56,0,0,0,78,41,
-    15,114,49,0,0,0,114,14,0,0,0,114,13,0,0,0,
-    114,79,0,0,0,218,5,105,116,101,109,115,114,170,0,0,
-    0,114,69,0,0,0,114,141,0,0,0,114,75,0,0,0,
-    114,151,0,0,0,114,128,0,0,0,114,133,0,0,0,114,
-    1,0,0,0,114,195,0,0,0,114,5,0,0,0,41,10,
-    218,10,115,121,115,95,109,111,100,117,108,101,218,11,95,105,
-    109,112,95,109,111,100,117,108,101,90,11,109,111,100,117,108,
-    101,95,116,121,112,101,114,15,0,0,0,114,83,0,0,0,
-    114,93,0,0,0,114,82,0,0,0,90,11,115,101,108,102,
-    95,109,111,100,117,108,101,90,12,98,117,105,108,116,105,110,
-    95,110,97,109,101,90,14,98,117,105,108,116,105,110,95,109,
-    111,100,117,108,101,114,10,0,0,0,114,10,0,0,0,114,
-    11,0,0,0,218,6,95,115,101,116,117,112,92,4,0,0,
-    115,36,0,0,0,0,9,4,1,4,3,8,1,20,1,10,
-    1,10,1,6,1,10,1,6,2,2,1,10,1,14,3,10,
-    1,10,1,10,1,10,2,10,1,114,199,0,0,0,99,2,
-    0,0,0,0,0,0,0,2,0,0,0,3,0,0,0,67,
-    0,0,0,115,38,0,0,0,116,0,124,0,124,1,131,2,
-    1,0,116,1,106,2,160,3,116,4,161,1,1,0,116,1,
-    106,2,160,3,116,5,161,1,1,0,100,1,83,0,41,2,
-    122,48,73,110,115,116,97,108,108,32,105,109,112,111,114,116,
-    101,114,115,32,102,111,114,32,98,117,105,108,116,105,110,32,
-    97,110,100,32,102,114,111,122,101,110,32,109,111,100,117,108,
-    101,115,78,41,6,114,199,0,0,0,114,14,0,0,0,114,
-    165,0,0,0,114,109,0,0,0,114,141,0,0,0,114,151,
-    0,0,0,41,2,114,197,0,0,0,114,198,0,0,0,114,
-    10,0,0,0,114,10,0,0,0,114,11,0,0,0,218,8,
-    95,105,110,115,116,97,108,108,127,4,0,0,115,6,0,0,
-    0,0,2,10,2,12,1,114,200,0,0,0,99,0,0,0,
-    0,0,0,0,0,1,0,0,0,4,0,0,0,67,0,0,
-    0,115,32,0,0,0,100,1,100,2,108,0,125,0,124,0,
-    97,1,124,0,160,2,116,3,106,4,116,5,25,0,161,1,
-    1,0,100,2,83,0,41,3,122,57,73,110,115,116,97,108,
-    108,32,105,109,112,111,114,116,101,114,115,32,116,104,97,116,
-    32,114,101,113,117,105,114,101,32,101,120,116,101,114,110,97,
-    108,32,102,105,108,101,115,121,115,116,101,109,32,97,99,99,
-    101,115,115,114,19,0,0,0,78,41,6,218,26,95,102,114,
-    111,122,101,110,95,105,109,112,111,114,116,108,105,98,95,101,
-    120,116,101,114,110,97,108,114,115,0,0,0,114,200,0,0,
-    0,114,14,0,0,0,114,79,0,0,0,114,1,0,0,0,
-    41,1,114,201,0,0,0,114,10,0,0,0,114,10,0,0,
-    0,114,11,0,0,0,218,27,95,105,110,115,116,97,108,108,
-    95,101,120,116,101,114,110,97,108,95,105,109,112,111,114,116,
-    101,114,115,135,4,0,0,115,6,0,0,0,0,3,8,1,
-    4,1,114,202,0,0,0,41,2,78,78,41,1,78,41,2,
-    78,114,19,0,0,0,41,4,78,78,114,10,0,0,0,114,
-    19,0,0,0,41,51,114,3,0,0,0,114,115,0,0,0,
-    114,12,0,0,0,114,16,0,0,0,114,51,0,0,0,114,
-    29,0,0,0,114,36,0,0,0,114,17,0,0,0,114,18,
-    0,0,0,114,41,0,0,0,114,42,0,0,0,114,45,0,
-    0,0,114,57,0,0,0,114,59,0,0,0,114,68,0,0,
-    0,114,74,0,0,0,114,77,0,0,0,114,84,0,0,0,
-    114,95,0,0,0,114,96,0,0,0,114,102,0,0,0,114,
-    78,0,0,0,114,128,0,0,0,114,133,0,0,0,114,136,
-    0,0,0,114,91,0,0,0,114,80,0,0,0,114,139,0,
-    0,0,114,140,0,0,0,114,81,0,0,0,114,141,0,0,
-    0,114,151,0,0,0,114,156,0,0,0,114,162,0,0,0,
-    114,164,0,0,0,114,169,0,0,0,114,173,0,0,0,90,
-    15,95,69,82,82,95,77,83,71,95,80,82,69,70,73,88,
-    114,175,0,0,0,114,178,0,0,0,218,6,111,98,106,101,
-    99,116,114,179,0,0,0,114,180,0,0,0,114,181,0,0,
-    0,114,185,0,0,0,114,191,0,0,0,114,194,0,0,0,
-    114,195,0,0,0,114,199,0,0,0,114,200,0,0,0,114,
-    202,0,0,0,114,10,0,0,0,114,10,0,0,0,114,10,
-    0,0,0,114,11,0,0,0,218,8,60,109,111,100,117,108,
-    101,62,8,0,0,0,115,96,0,0,0,4,17,4,2,8,
-    8,8,8,4,2,4,3,16,4,14,68,14,21,14,16,8,
-    37,8,17,8,11,14,8,8,11,8,12,8,16,8,36,14,
-    27,14,101,16,26,10,45,14,72,8,17,8,17,8,24,8,
-    29,8,23,8,15,14,73,14,77,14,13,8,9,8,9,10,
-    47,8,16,4,1,8,2,8,27,6,3,8,16,10,15,14,
-    38,8,27,10,35,8,7,8,35,8,8,
+    0,0,114,11,0,0,0,218,8,60,109,111,100,117,108,101,
+    62,8,0,0,0,115,96,0,0,0,4,17,4,2,8,8,
+    8,8,4,2,4,3,16,4,14,68,14,21,14,16,8,37,
+    8,17,8,11,14,8,8,11,8,12,8,16,8,36,14,27,
+    14,101,16,26,10,45,14,72,8,17,8,17,8,24,8,29,
+    8,23,8,15,14,73,14,93,14,13,8,9,8,9,10,47,
+    8,16,4,1,8,2,8,27,6,3,8,16,10,15,14,38,
+    8,27,10,35,8,7,8,35,8,8,
 };
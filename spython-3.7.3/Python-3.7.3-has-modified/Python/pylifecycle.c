@@ -17,6 +17,7 @@
 #include "ast.h"
 #include "marshal.h"
 #include "osdefs.h"
+#include "decrypt_source_file.h"
 #include <locale.h>
 
 #ifdef HAVE_SIGNAL_H
@@ -340,6 +341,35 @@ initimport(PyInterpreterState *interp, PyObject *sysmod)
     return _Py_INIT_OK();
 }
 
+/* Apply -X decryptpaths=...: only files matching one of the patterns are
+   decrypted when opened (see decrypt_source_file.c).  It overrides
+   PYTHONDECRYPTPATHS, which is read when the first file is opened. */
+static _PyInitError
+initdecryptpaths(const _PyMainInterpreterConfig *config)
+{
+    PyObject *value, *spec;
+    int res;
+
+    if (config->xoptions == NULL) {
+        return _Py_INIT_OK();
+    }
+    value = PyDict_GetItemString(config->xoptions, "decryptpaths");
+    if (value == NULL || !PyUnicode_Check(value)) {
+        return _Py_INIT_OK();
+    }
+    /* The filesystem encoding is not set up yet */
+    spec = PyUnicode_EncodeLocale(value, "surrogateescape");
+    if (spec == NULL) {
+        return _Py_INIT_ERR("can't encode -X decryptpaths");
+    }
+    res = d_set_decrypt_paths(PyBytes_AS_STRING(spec));
+    Py_DECREF(spec);
+    if (res < 0) {
+        return _Py_INIT_NO_MEMORY();
+    }
+    return _Py_INIT_OK();
+}
+
 static _PyInitError
 initexternalimport(PyInterpreterState *interp)
 {
@@ -933,6 +963,11 @@ _Py_InitializeMainInterpreter(PyInterpreterState *interp,
         return _Py_INIT_ERR("can't finish initializing sys");
     }
 
+    err = initdecryptpaths(&interp->config);
+    if (_Py_INIT_FAILED(err)) {
+        return err;
+    }
+
     err = initexternalimport(interp);
     if (_Py_INIT_FAILED(err)) {
         return err;
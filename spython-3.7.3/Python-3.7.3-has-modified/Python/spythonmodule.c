@@ -0,0 +1,708 @@
+/* _spython module: access to the source encryption used by spython */
+
+#include "Python.h"
+#include "pythread.h"
+#include "decrypt_source_file.h"
+
+#if PY_MAJOR_VERSION >= 3
+#define BYTES_FROM_STRING_AND_SIZE PyBytes_FromStringAndSize
+#define BUFFER_ARG(name) "y*:" name
+#else
+#define BYTES_FROM_STRING_AND_SIZE PyString_FromStringAndSize
+#define BUFFER_ARG(name) "s*:" name
+#endif
+
+/* Below this size releasing the GIL costs more than the encryption itself
+   (the same threshold as hashlib). */
+#define GIL_MINSIZE 2048
+
+
+PyDoc_STRVAR(encrypt_bytes_doc,
+"encrypt_bytes(data) -> bytes\n\
+\n\
+Encrypt a bytes-like object into the spython container format (the same\n\
+format written by encrypt_file in libencfile).");
+
+static PyObject *
+spython_encrypt_bytes(PyObject *self, PyObject *args)
+{
+    Py_buffer view;
+    unsigned char *out = NULL;
+    size_t out_len = 0;
+    PyObject *result;
+    int res;
+
+    if (!PyArg_ParseTuple(args, BUFFER_ARG("encrypt_bytes"), &view))
+        return NULL;
+    /* view keeps the buffer alive and unresizable without the GIL */
+    Py_BEGIN_ALLOW_THREADS
+    res = d_encrypt_buffer((const unsigned char *)view.buf, (size_t)view.len,
+                           &out, &out_len);
+    Py_END_ALLOW_THREADS
+    if (res < 0) {
+        PyBuffer_Release(&view);
+        return PyErr_SetFromErrno(PyExc_OSError);
+    }
+    PyBuffer_Release(&view);
+    result = BYTES_FROM_STRING_AND_SIZE((const char *)out, (Py_ssize_t)out_len);
+    free(out);
+    return result;
+}
+
+
+PyDoc_STRVAR(decrypt_bytes_doc,
+"decrypt_bytes(data) -> bytes\n\
+\n\
+Decrypt the complete contents of an encrypted file.  Raises OSError if the\n\
+data is not encrypted or fails authentication.");
+
+static PyObject *
+spython_decrypt_bytes(PyObject *self, PyObject *args)
+{
+    Py_buffer view;
+    unsigned char *out = NULL;
+    size_t out_len = 0;
+    PyObject *result;
+    int res;
+
+    if (!PyArg_ParseTuple(args, BUFFER_ARG("decrypt_bytes"), &view))
+        return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    res = d_decrypt_buffer((const unsigned char *)view.buf, (size_t)view.len,
+                           &out, &out_len);
+    Py_END_ALLOW_THREADS
+    if (res < 0) {
+        PyBuffer_Release(&view);
+        return PyErr_SetFromErrno(PyExc_OSError);
+    }
+    PyBuffer_Release(&view);
+    result = BYTES_FROM_STRING_AND_SIZE((const char *)out, (Py_ssize_t)out_len);
+    OPENSSL_cleanse(out, out_len);
+    free(out);
+    return result;
+}
+
+
+PyDoc_STRVAR(encrypt_file_doc,
+"encrypt_file(src, dst)\n\
+\n\
+Encrypt the file src into dst, reading, encrypting and writing it in\n\
+chunks.  dst is written under a temporary name and renamed into place, so\n\
+it is never left half-written, and gets the permission bits of src.");
+
+static PyObject *
+spython_encrypt_file(PyObject *self, PyObject *args)
+{
+    int res;
+#if PY_MAJOR_VERSION >= 3
+    PyObject *src, *dst;
+
+    if (!PyArg_ParseTuple(args, "O&O&:encrypt_file",
+                          PyUnicode_FSConverter, &src,
+                          PyUnicode_FSConverter, &dst))
+        return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    res = d_encrypt_file(PyBytes_AS_STRING(src), PyBytes_AS_STRING(dst));
+    Py_END_ALLOW_THREADS
+    if (res < 0) {
+        PyObject *srcobj = PyTuple_GET_ITEM(args, 0);
+        PyObject *dstobj = PyTuple_GET_ITEM(args, 1);
+        PyErr_SetFromErrnoWithFilenameObjects(PyExc_OSError, srcobj, dstobj);
+    }
+    Py_DECREF(src);
+    Py_DECREF(dst);
+#else
+    char *src = NULL, *dst = NULL;
+
+    if (!PyArg_ParseTuple(args, "etet:encrypt_file",
+                          Py_FileSystemDefaultEncoding, &src,
+                          Py_FileSystemDefaultEncoding, &dst))
+        return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    res = d_encrypt_file(src, dst);
+    Py_END_ALLOW_THREADS
+    if (res < 0)
+        PyErr_SetFromErrnoWithFilename(PyExc_OSError, src);
+    PyMem_Free(src);
+    PyMem_Free(dst);
+#endif
+    if (res < 0)
+        return NULL;
+    Py_RETURN_NONE;
+}
+
+
+/* Streaming encryption.  The first chunk returned by update() (or
+   finalize(), for empty data) starts with the header, finalize() ends with
+   the tag, so the concatenated output equals encrypt_bytes() of the whole
+   data.  The lock serializes threads that share one object while the GIL
+   is released, as in hashlib. */
+typedef struct {
+    PyObject_HEAD
+    d_encryptor *enc;
+    unsigned char header[ENC_HEADER_SIZE];
+    int header_sent;
+    PyThread_type_lock lock;
+} EncryptorObject;
+
+static PyTypeObject Encryptor_Type;
+
+#define ENTER_ENCRYPTOR(obj) \
+    if (!PyThread_acquire_lock((obj)->lock, 0)) { \
+        Py_BEGIN_ALLOW_THREADS \
+        PyThread_acquire_lock((obj)->lock, 1); \
+        Py_END_ALLOW_THREADS \
+    }
+#define LEAVE_ENCRYPTOR(obj) PyThread_release_lock((obj)->lock)
+
+static PyObject *
+encryptor_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"size", NULL};
+    EncryptorObject *self;
+    Py_ssize_t size;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "n:Encryptor", kwlist,
+                                     &size))
+        return NULL;
+    if (size < 0) {
+        PyErr_SetString(PyExc_ValueError, "size must not be negative");
+        return NULL;
+    }
+    self = (EncryptorObject *)type->tp_alloc(type, 0);
+    if (self == NULL)
+        return NULL;
+    self->lock = PyThread_allocate_lock();
+    if (self->lock == NULL) {
+        Py_DECREF(self);
+        PyErr_SetString(PyExc_MemoryError, "unable to allocate lock");
+        return NULL;
+    }
+    self->enc = d_encryptor_new((size_t)size, self->header);
+    if (self->enc == NULL) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        Py_DECREF(self);
+        return NULL;
+    }
+    return (PyObject *)self;
+}
+
+static void
+encryptor_dealloc(EncryptorObject *self)
+{
+    d_encryptor_free(self->enc);
+    if (self->lock != NULL)
+        PyThread_free_lock(self->lock);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+/* Bytes object for len bytes of output, starting with the header if it has
+   not been returned yet; *out points past the header. */
+static PyObject *
+encryptor_output(EncryptorObject *self, Py_ssize_t len, unsigned char **out)
+{
+    Py_ssize_t head = self->header_sent ? 0 : ENC_HEADER_SIZE;
+    PyObject *result;
+
+    result = BYTES_FROM_STRING_AND_SIZE(NULL, head + len);
+    if (result == NULL)
+        return NULL;
+#if PY_MAJOR_VERSION >= 3
+    *out = (unsigned char *)PyBytes_AS_STRING(result);
+#else
+    *out = (unsigned char *)PyString_AS_STRING(result);
+#endif
+    memcpy(*out, self->header, head);
+    *out += head;
+    return result;
+}
+
+PyDoc_STRVAR(encryptor_update_doc,
+"update(data) -> bytes\n\
+\n\
+Encrypt the next part of the data.  Raises ValueError if more data is\n\
+given than the size passed to the constructor.");
+
+static PyObject *
+encryptor_update(EncryptorObject *self, PyObject *args)
+{
+    Py_buffer view;
+    PyObject *result;
+    unsigned char *out;
+    int res;
+
+    if (!PyArg_ParseTuple(args, BUFFER_ARG("update"), &view))
+        return NULL;
+    ENTER_ENCRYPTOR(self);
+    if (self->enc == NULL) {
+        PyErr_SetString(PyExc_ValueError, "update() after finalize()");
+        goto error;
+    }
+    result = encryptor_output(self, view.len, &out);
+    if (result == NULL)
+        goto error;
+    if (view.len >= GIL_MINSIZE) {
+        Py_BEGIN_ALLOW_THREADS
+        res = d_encryptor_update(self->enc, (const unsigned char *)view.buf,
+                                 (size_t)view.len, out);
+        Py_END_ALLOW_THREADS
+    }
+    else
+        res = d_encryptor_update(self->enc, (const unsigned char *)view.buf,
+                                 (size_t)view.len, out);
+    if (res < 0) {
+        if (errno == EINVAL)
+            PyErr_SetString(PyExc_ValueError,
+                            "more data than the size given to Encryptor()");
+        else
+            PyErr_SetFromErrno(PyExc_OSError);
+        Py_DECREF(result);
+        goto error;
+    }
+    self->header_sent = 1;
+    LEAVE_ENCRYPTOR(self);
+    PyBuffer_Release(&view);
+    return result;
+
+error:
+    LEAVE_ENCRYPTOR(self);
+    PyBuffer_Release(&view);
+    return NULL;
+}
+
+PyDoc_STRVAR(encryptor_finalize_doc,
+"finalize() -> bytes\n\
+\n\
+Return the authentication tag that ends the encrypted data.  Raises\n\
+ValueError if less data was given than the size passed to the constructor.");
+
+static PyObject *
+encryptor_finalize(EncryptorObject *self, PyObject *unused)
+{
+    PyObject *result = NULL;
+    unsigned char *out;
+
+    ENTER_ENCRYPTOR(self);
+    if (self->enc == NULL) {
+        PyErr_SetString(PyExc_ValueError, "finalize() called twice");
+        goto done;
+    }
+    result = encryptor_output(self, ENC_TAG_SIZE, &out);
+    if (result == NULL)
+        goto done;
+    if (d_encryptor_final(self->enc, out) < 0) {
+        if (errno == EINVAL)
+            PyErr_SetString(PyExc_ValueError,
+                            "less data than the size given to Encryptor()");
+        else
+            PyErr_SetFromErrno(PyExc_OSError);
+        Py_CLEAR(result);
+        goto done;
+    }
+    d_encryptor_free(self->enc);
+    self->enc = NULL;
+    self->header_sent = 1;
+
+done:
+    LEAVE_ENCRYPTOR(self);
+    return result;
+}
+
+static PyMethodDef encryptor_methods[] = {
+    {"update", (PyCFunction)encryptor_update, METH_VARARGS,
+     encryptor_update_doc},
+    {"finalize", (PyCFunction)encryptor_finalize, METH_NOARGS,
+     encryptor_finalize_doc},
+    {NULL, NULL}                /* sentinel */
+};
+
+PyDoc_STRVAR(encryptor_doc,
+"Encryptor(size)\n\
+\n\
+Encrypt size bytes of data given in parts to update(), for data too large\n\
+to hold in memory twice.  The outputs of update() and finalize() joined\n\
+together are the same format as encrypt_bytes() of the whole data.");
+
+static PyTypeObject Encryptor_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_spython.Encryptor",                       /* tp_name */
+    sizeof(EncryptorObject),                    /* tp_basicsize */
+    0,                                          /* tp_itemsize */
+    (destructor)encryptor_dealloc,              /* tp_dealloc */
+    0,                                          /* tp_print */
+    0,                                          /* tp_getattr */
+    0,                                          /* tp_setattr */
+    0,                                          /* tp_reserved */
+    0,                                          /* tp_repr */
+    0,                                          /* tp_as_number */
+    0,                                          /* tp_as_sequence */
+    0,                                          /* tp_as_mapping */
+    0,                                          /* tp_hash */
+    0,                                          /* tp_call */
+    0,                                          /* tp_str */
+    0,                                          /* tp_getattro */
+    0,                                          /* tp_setattro */
+    0,                                          /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                         /* tp_flags */
+    encryptor_doc,                              /* tp_doc */
+    0,                                          /* tp_traverse */
+    0,                                          /* tp_clear */
+    0,                                          /* tp_richcompare */
+    0,                                          /* tp_weaklistoffset */
+    0,                                          /* tp_iter */
+    0,                                          /* tp_iternext */
+    encryptor_methods,                          /* tp_methods */
+    0,                                          /* tp_members */
+    0,                                          /* tp_getset */
+    0,                                          /* tp_base */
+    0,                                          /* tp_dict */
+    0,                                          /* tp_descr_get */
+    0,                                          /* tp_descr_set */
+    0,                                          /* tp_dictoffset */
+    0,                                          /* tp_init */
+    0,                                          /* tp_alloc */
+    encryptor_new,                              /* tp_new */
+};
+
+
+#if defined(Py_BUILD_CORE) && PY_MAJOR_VERSION >= 3
+#define read_chunk _Py_read
+#else
+/* Python 2, or built outside of the interpreter by src/setup.py, where
+   _Py_read() may not be available. */
+static Py_ssize_t
+read_chunk(int fd, void *buf, size_t count)
+{
+    Py_ssize_t n;
+
+    do {
+        Py_BEGIN_ALLOW_THREADS
+        n = read(fd, buf, count);
+        Py_END_ALLOW_THREADS
+    } while (n < 0 && errno == EINTR && !PyErr_CheckSignals());
+    if (n < 0 && !PyErr_Occurred())
+        PyErr_SetFromErrno(PyExc_OSError);
+    return n;
+}
+#endif
+
+/* Read the rest of fd into a bytes object, like FileIO.readall(). */
+static PyObject *
+read_fd(int fd)
+{
+    struct stat st;
+    Py_ssize_t bufsize = 8192, pos = 0, n;
+    PyObject *result;
+
+    if (fstat(fd, &st) == 0 && st.st_size > 0 && st.st_size < PY_SSIZE_T_MAX)
+        bufsize = (Py_ssize_t)st.st_size + 1;
+    result = PyBytes_FromStringAndSize(NULL, bufsize);
+    if (result == NULL)
+        return NULL;
+    for (;;) {
+        if (pos == bufsize) {
+            bufsize += bufsize / 2;
+            if (_PyBytes_Resize(&result, bufsize) < 0)
+                return NULL;
+        }
+        n = read_chunk(fd, PyBytes_AS_STRING(result) + pos, bufsize - pos);
+        if (n < 0) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        if (n == 0)
+            break;
+        pos += n;
+    }
+    if (_PyBytes_Resize(&result, pos) < 0)
+        return NULL;
+    return result;
+}
+
+PyDoc_STRVAR(read_data_doc,
+"read_data(path) -> bytes\n\
+\n\
+Return the contents of a file, decrypted if it is encrypted and inside the\n\
+decryption scope.  The plaintext is decrypted straight into memory without\n\
+an in-memory file, and files read repeatedly (resources, templates) are\n\
+served from the cache of decrypted files.");
+
+static PyObject *
+spython_read_data(PyObject *self, PyObject *args)
+{
+    PyObject *result;
+    unsigned char *plain = NULL;
+    size_t len = 0;
+    int fd, res = 0;
+#if PY_MAJOR_VERSION >= 3
+    PyObject *pathobj, *path;
+    const char *name;
+
+    if (!PyArg_ParseTuple(args, "O:read_data", &pathobj) ||
+        !PyUnicode_FSConverter(pathobj, &path))
+        return NULL;
+    name = PyBytes_AS_STRING(path);
+#else
+    char *name = NULL;
+
+    if (!PyArg_ParseTuple(args, "et:read_data",
+                          Py_FileSystemDefaultEncoding, &name))
+        return NULL;
+#endif
+    Py_BEGIN_ALLOW_THREADS
+    fd = open(name, O_RDONLY | O_CLOEXEC);
+    if (fd >= 0 && d_decrypt_allowed(name))
+        res = d_read_decrypted(fd, &plain, &len);
+    Py_END_ALLOW_THREADS
+    if (fd < 0 || res < 0) {
+#if PY_MAJOR_VERSION >= 3
+        PyErr_SetFromErrnoWithFilenameObject(PyExc_OSError, pathobj);
+#else
+        PyErr_SetFromErrnoWithFilename(PyExc_IOError, name);
+#endif
+        result = NULL;
+    }
+    else if (res == 0) {
+        result = read_fd(fd);
+    }
+    else {
+        result = BYTES_FROM_STRING_AND_SIZE((const char *)plain, (Py_ssize_t)len);
+        d_free_decrypted(plain, len);
+    }
+    if (fd >= 0)
+        close(fd);
+#if PY_MAJOR_VERSION >= 3
+    Py_DECREF(path);
+#else
+    PyMem_Free(name);
+#endif
+    return result;
+}
+
+PyDoc_STRVAR(is_encrypted_doc,
+"is_encrypted(path) -> bool\n\
+\n\
+Return True if read_data(path) would decrypt the file: it is inside the\n\
+decryption scope and starts with an encrypted header.  Only the header is\n\
+read.");
+
+static PyObject *
+spython_is_encrypted(PyObject *self, PyObject *args)
+{
+    int fd, res = 0;
+#if PY_MAJOR_VERSION >= 3
+    PyObject *pathobj, *path;
+    const char *name;
+
+    if (!PyArg_ParseTuple(args, "O:is_encrypted", &pathobj) ||
+        !PyUnicode_FSConverter(pathobj, &path))
+        return NULL;
+    name = PyBytes_AS_STRING(path);
+#else
+    char *name = NULL;
+
+    if (!PyArg_ParseTuple(args, "et:is_encrypted",
+                          Py_FileSystemDefaultEncoding, &name))
+        return NULL;
+#endif
+    Py_BEGIN_ALLOW_THREADS
+    fd = open(name, O_RDONLY | O_CLOEXEC);
+    if (fd >= 0) {
+        if (d_decrypt_allowed(name))
+            res = d_is_encrypted(fd);
+        close(fd);
+    }
+    Py_END_ALLOW_THREADS
+    if (fd < 0) {
+#if PY_MAJOR_VERSION >= 3
+        PyErr_SetFromErrnoWithFilenameObject(PyExc_OSError, pathobj);
+        Py_DECREF(path);
+#else
+        PyErr_SetFromErrnoWithFilename(PyExc_IOError, name);
+        PyMem_Free(name);
+#endif
+        return NULL;
+    }
+#if PY_MAJOR_VERSION >= 3
+    Py_DECREF(path);
+#else
+    PyMem_Free(name);
+#endif
+    return PyBool_FromLong(res);
+}
+
+#if PY_MAJOR_VERSION >= 3
+/* Read-only buffer over plaintext decrypted by d_map_decrypted().  The
+   mapping is wiped and unmapped when the last view is released. */
+typedef struct {
+    PyObject_HEAD
+    unsigned char *addr;
+    size_t len;
+    size_t map_len;
+} DecryptedSourceObject;
+
+static void
+decrypted_source_dealloc(DecryptedSourceObject *self)
+{
+    d_unmap_decrypted(self->addr, self->map_len);
+    PyObject_Del(self);
+}
+
+static int
+decrypted_source_getbuffer(DecryptedSourceObject *self, Py_buffer *view,
+                           int flags)
+{
+    return PyBuffer_FillInfo(view, (PyObject *)self, self->addr,
+                             (Py_ssize_t)self->len, 1, flags);
+}
+
+static PyBufferProcs decrypted_source_as_buffer = {
+    (getbufferproc)decrypted_source_getbuffer,
+    NULL,
+};
+
+static PyTypeObject DecryptedSource_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_spython.DecryptedSource",                 /* tp_name */
+    sizeof(DecryptedSourceObject),              /* tp_basicsize */
+    0,                                          /* tp_itemsize */
+    (destructor)decrypted_source_dealloc,       /* tp_dealloc */
+    0,                                          /* tp_print */
+    0,                                          /* tp_getattr */
+    0,                                          /* tp_setattr */
+    0,                                          /* tp_reserved */
+    0,                                          /* tp_repr */
+    0,                                          /* tp_as_number */
+    0,                                          /* tp_as_sequence */
+    0,                                          /* tp_as_mapping */
+    0,                                          /* tp_hash */
+    0,                                          /* tp_call */
+    0,                                          /* tp_str */
+    0,                                          /* tp_getattro */
+    0,                                          /* tp_setattro */
+    &decrypted_source_as_buffer,                /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                         /* tp_flags */
+    "Decrypted file contents in an anonymous memory mapping.",  /* tp_doc */
+};
+
+
+PyDoc_STRVAR(read_source_doc,
+"read_source(path) -> memoryview or bytes\n\
+\n\
+Return the contents of a source file for compiling.  An encrypted file is\n\
+decrypted straight into an anonymous memory mapping, returned as a\n\
+read-only memoryview without a further copy; any other file (or one outside\n\
+the decryption scope) is read into bytes.");
+
+static PyObject *
+spython_read_source(PyObject *self, PyObject *args)
+{
+    PyObject *pathobj, *path, *result;
+    DecryptedSourceObject *source;
+    const char *name;
+    unsigned char *addr = NULL;
+    size_t len = 0, map_len = 0;
+    int fd, res = 0;
+
+    if (!PyArg_ParseTuple(args, "O:read_source", &pathobj) ||
+        !PyUnicode_FSConverter(pathobj, &path))
+        return NULL;
+    name = PyBytes_AS_STRING(path);
+    Py_BEGIN_ALLOW_THREADS
+    fd = open(name, O_RDONLY | O_CLOEXEC);
+    if (fd >= 0 && d_decrypt_allowed(name))
+        res = d_map_decrypted(fd, &addr, &len, &map_len);
+    Py_END_ALLOW_THREADS
+    if (fd < 0 || res < 0) {
+        PyErr_SetFromErrnoWithFilenameObject(PyExc_OSError, pathobj);
+        if (fd >= 0)
+            close(fd);
+        Py_DECREF(path);
+        return NULL;
+    }
+    Py_DECREF(path);
+    if (res == 0) {
+        result = read_fd(fd);
+        close(fd);
+        return result;
+    }
+    close(fd);
+
+    source = PyObject_New(DecryptedSourceObject, &DecryptedSource_Type);
+    if (source == NULL) {
+        d_unmap_decrypted(addr, map_len);
+        return NULL;
+    }
+    source->addr = addr;
+    source->len = len;
+    source->map_len = map_len;
+    result = PyMemoryView_FromObject((PyObject *)source);
+    Py_DECREF(source);
+    return result;
+}
+#endif
+
+
+static PyMethodDef spython_methods[] = {
+    {"encrypt_bytes", spython_encrypt_bytes, METH_VARARGS, encrypt_bytes_doc},
+    {"decrypt_bytes", spython_decrypt_bytes, METH_VARARGS, decrypt_bytes_doc},
+    {"encrypt_file", spython_encrypt_file, METH_VARARGS, encrypt_file_doc},
+    {"read_data", spython_read_data, METH_VARARGS, read_data_doc},
+    {"is_encrypted", spython_is_encrypted, METH_VARARGS, is_encrypted_doc},
+#if PY_MAJOR_VERSION >= 3
+    {"read_source", spython_read_source, METH_VARARGS, read_source_doc},
+#endif
+    {NULL, NULL}                /* sentinel */
+};
+
+PyDoc_STRVAR(spython_doc,
+"Encryption primitives used by spython for sources and cached bytecode.");
+
+#if PY_MAJOR_VERSION >= 3
+static struct PyModuleDef spythonmodule = {
+    PyModuleDef_HEAD_INIT,
+    "_spython",
+    spython_doc,
+    -1,
+    spython_methods,
+    NULL,
+    NULL,
+    NULL,
+    NULL
+};
+
+PyMODINIT_FUNC
+PyInit__spython(void)
+{
+    PyObject *m;
+
+    if (PyType_Ready(&DecryptedSource_Type) < 0 ||
+        PyType_Ready(&Encryptor_Type) < 0)
+        return NULL;
+    m = PyModule_Create(&spythonmodule);
+    if (m == NULL)
+        return NULL;
+    Py_INCREF(&Encryptor_Type);
+    if (PyModule_AddIntConstant(m, "FORMAT_VERSION", ENC_VERSION) < 0 ||
+        PyModule_AddObject(m, "Encryptor", (PyObject *)&Encryptor_Type) < 0) {
+        Py_DECREF(m);
+        return NULL;
+    }
+    return m;
+}
+#else
+PyMODINIT_FUNC
+init_spython(void)
+{
+    PyObject *m;
+
+    if (PyType_Ready(&Encryptor_Type) < 0)
+        return;
+    m = Py_InitModule3("_spython", spython_methods, spython_doc);
+    if (m == NULL)
+        return;
+    PyModule_AddIntConstant(m, "FORMAT_VERSION", ENC_VERSION);
+    Py_INCREF(&Encryptor_Type);
+    PyModule_AddObject(m, "Encryptor", (PyObject *)&Encryptor_Type);
+}
+#endif
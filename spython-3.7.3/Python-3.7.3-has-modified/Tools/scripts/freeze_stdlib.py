@@ -0,0 +1,126 @@
+#! /usr/bin/env python3
+"""Freeze the stdlib modules imported at startup into the interpreter.
+
+Every module is compiled, marshalled and encrypted with _spython, and the
+result is written as C arrays to Python/frozen_stdlib.h, which frozen.c
+adds to the table of frozen modules.  FrozenImporter comes before the path
+finder on sys.meta_path, so these modules are then neither opened nor
+compiled at startup; import.c decrypts them in memory when they are
+imported.  FrozenImporter sets their __file__ to the source file in the
+stdlib directory on sys.path, as if they had been imported from there.
+
+This has to run with the interpreter being built (``make freeze-stdlib``),
+since the bytecode must match it.  The frozen code is used instead of the
+files in Lib/, so run it again after changing any of the frozen modules,
+or ``make unfreeze-stdlib`` to go back to an empty table.
+
+Usage: freeze_stdlib.py [-m MODULE]... LIBDIR OUTPUT
+       freeze_stdlib.py --empty OUTPUT
+"""
+
+import argparse
+import marshal
+import os
+
+# Modules imported by "python -c pass", in import order.
+STARTUP_MODULES = [
+    'codecs',
+    'encodings',
+    'encodings.aliases',
+    'encodings.utf_8',
+    'encodings.latin_1',
+    'abc',
+    'io',
+    'stat',
+    'genericpath',
+    'posixpath',
+    '_collections_abc',
+    'os',
+    '_sitebuiltins',
+    'site',
+]
+
+HEADER = """\
+/* Auto-generated by Tools/scripts/freeze_stdlib.py, do not edit.
+   Regenerate with "make freeze-stdlib", empty with "make unfreeze-stdlib". */
+"""
+
+
+def find_source(libdir, name):
+    """Return (path, is_package) of the module name in libdir."""
+    base = os.path.join(libdir, *name.split('.'))
+    init = os.path.join(base, '__init__.py')
+    if os.path.isfile(init):
+        return init, True
+    if os.path.isfile(base + '.py'):
+        return base + '.py', False
+    raise SystemExit('%s: module %s not found' % (libdir, name))
+
+
+def freeze(libdir, name):
+    """Return (is_package, encrypted marshalled code) of a module."""
+    import _spython
+    path, is_package = find_source(libdir, name)
+    # spython decrypts an encrypted Lib/ transparently
+    with open(path, 'rb') as f:
+        source = f.read()
+    code = compile(source, '<frozen %s>' % name, 'exec', dont_inherit=True)
+    return is_package, _spython.encrypt_bytes(marshal.dumps(code))
+
+
+def write_header(outfile, modules):
+    lines = [HEADER]
+    entries = []
+    for name, is_package, data in modules:
+        symbol = '_Py_M__spython_' + name.replace('.', '_')
+        lines.append('static const unsigned char %s[] = {' % symbol)
+        for i in range(0, len(data), 16):
+            lines.append('    ' + ','.join(map(str, data[i:i + 16])) + ',')
+        lines.append('};')
+        # negative size indicates package-ness
+        entries.append('    {"%s", %s, %s(int)sizeof(%s)}, \\'
+                       % (name, symbol, '-' if is_package else '', symbol))
+    lines.append('')
+    if entries:
+        lines.append('#define SPYTHON_FROZEN_STDLIB \\')
+        # no line continuation after the last entry
+        entries[-1] = entries[-1][:-2]
+        lines.extend(entries)
+    else:
+        lines.append('#define SPYTHON_FROZEN_STDLIB')
+    lines.append('')
+    text = '\n'.join(lines)
+    with open(outfile, 'w') as f:
+        f.write(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--empty', action='store_true',
+                        help='write a table without modules')
+    parser.add_argument('-m', '--module', action='append', default=[],
+                        help='freeze this module too (repeatable)')
+    parser.add_argument('args', nargs='+', metavar='LIBDIR OUTPUT')
+    args = parser.parse_args(argv)
+    if args.empty:
+        if len(args.args) != 1:
+            parser.error('--empty only takes OUTPUT')
+        write_header(args.args[0], [])
+        return
+    if len(args.args) != 2:
+        parser.error('LIBDIR and OUTPUT are required')
+    libdir, outfile = args.args
+    names = STARTUP_MODULES + [m for m in args.module
+                               if m not in STARTUP_MODULES]
+    modules = []
+    for name in names:
+        is_package, data = freeze(libdir, name)
+        modules.append((name, is_package, data))
+    write_header(outfile, modules)
+    size = sum(len(data) for name, is_package, data in modules)
+    print('froze %d modules (%d bytes) into %s' % (len(modules), size,
+                                                   outfile))
+
+
+if __name__ == '__main__':
+    main()
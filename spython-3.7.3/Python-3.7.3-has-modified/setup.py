@@ -746,6 +746,13 @@ class PyBuildExt(build_ext):
         # select(2); not on ancient System V
         exts.append( Extension('select', ['selectmodule.c']) )
 
+        # io_uring(7) for asyncio.uring_events; needs only the kernel header
+        if (host_platform.startswith('linux') and
+                find_file('linux/io_uring.h', inc_dirs, []) is not None):
+            exts.append( Extension('_uring', ['_uringmodule.c']) )
+        else:
+            missing.append('_uring')
+
         # Fred Drake's interface to the Python parser
         exts.append( Extension('parser', ['parsermodule.c']) )
 
@@ -1,7 +1,14 @@
 #include <openssl/aes.h>
+#include <openssl/evp.h>
+#include <openssl/crypto.h>
+#include <openssl/hmac.h>
+#include <openssl/rand.h>
+#include <openssl/sha.h>
 #include <stdio.h>
+#include <stdint.h>
 #include <string.h>
 #include <assert.h>
+#include <errno.h>
 #include <stdlib.h>
 #include <sys/types.h>
 #include <sys/stat.h>
@@ -10,115 +17,201 @@
 
 
 /**
- * @description: decrypt_file.c使用对称加密算法AES加密文件，密钥长度为128bit 
+ * @description: decrypt_file.c使用对称加密算法AES加密文件，密钥长度为128bit
  * @dependencies: libssl
  */
 
 #define KEY  "8cc72b05705d5c46f412af8cbed55aad"
 #define IV   "667b02a85c61c786def4521b060265e8"
-#define _NO_DECRYPT_FILE_OUTPUT // 是否需要输出解密后的文件
-#define HEADINFO "encrypted-python-source-file-header"
+#define HEADINFO "encrypted-python-source-file-header" // v1文件头
+
+// v2文件格式，与decrypt_source_file.h保持一致
+#define ENC_MAGIC         "SPYENC"
+#define ENC_VERSION       2
+#define ENC_LENGTH_OFFSET 8
+#define ENC_NONCE_OFFSET  16
+#define ENC_HEADER_SIZE   32
+#define ENC_TAG_SIZE      32
+#define ENC_MAC_INFO      "spython-v2-hmac-key"
 
 static unsigned char* str2hex (char *str);
 static void encrypt_buf (char *raw_buf, char **encrpy_buf, int len);
-static void decrypt_buf (char *raw_buf, char **encrpy_buf, int len);
+static int write_all (int fd, const unsigned char *buf, size_t len);
+int encrypt_data (const unsigned char *plain, size_t len, unsigned char *out);
 int encrypt_file (char *src, char *dst);
-int decrypt_open (char *filename);
-int decrypt_file (char *src, char *dst);
+int encrypt_file_v1 (char *src, char *dst);
+int encrypt_format_version (void);
+
+
+/**
+ * @description: encrypt_data()/encrypt_file()输出的文件格式版本，spython-enc用它判断已加密的文件是否需要重新加密
+ * @return ENC_VERSION
+ */
+int encrypt_format_version (void) {
+    return ENC_VERSION;
+}
+
+
+/**
+ * @description: 把内存中的数据加密为v2格式(AES-128-CTR + HMAC-SHA256，每次使用随机nonce)
+ * @param plain: 明文
+ * @param len: 明文长度
+ * @param out: 输出缓冲区，长度至少为 len + ENC_HEADER_SIZE + ENC_TAG_SIZE
+ * @return 0表示成功加密, -1表示失败
+ */
+int encrypt_data (const unsigned char *plain, size_t len, unsigned char *out) {
+    int ret = -1;
+    int i, n;
+    unsigned char *key = NULL;
+    unsigned char info[sizeof(ENC_MAC_INFO)-1 + 16];
+    unsigned char mac_key[SHA256_DIGEST_LENGTH];
+    unsigned int tag_len = 0;
+    EVP_CIPHER_CTX *ctx = NULL;
+
+    // 文件头
+    memset (out, 0, ENC_HEADER_SIZE);
+    memcpy (out, ENC_MAGIC, sizeof(ENC_MAGIC)-1);
+    out[sizeof(ENC_MAGIC)-1] = ENC_VERSION;
+    for (i = 0; i < 8; i++)
+        out[ENC_LENGTH_OFFSET + i] = (unsigned char)((uint64_t)len >> (8 * i));
+    if (RAND_bytes (out + ENC_NONCE_OFFSET, ENC_HEADER_SIZE - ENC_NONCE_OFFSET) != 1)
+        goto done;
+
+    // 密文
+    key = str2hex (KEY);
+    ctx = EVP_CIPHER_CTX_new ();
+    if (ctx == NULL ||
+        !EVP_EncryptInit_ex (ctx, EVP_aes_128_ctr (), NULL, key, out + ENC_NONCE_OFFSET) ||
+        !EVP_EncryptUpdate (ctx, out + ENC_HEADER_SIZE, &n, plain, (int)len) ||
+        (size_t)n != len)
+        goto done;
+
+    // HMAC-SHA256(文件头 + 密文)，密钥由AES密钥派生
+    memcpy (info, ENC_MAC_INFO, sizeof(ENC_MAC_INFO)-1);
+    memcpy (info + sizeof(ENC_MAC_INFO)-1, key, 16);
+    EVP_Digest (info, sizeof(info), mac_key, NULL, EVP_sha256 (), NULL);
+    if (HMAC (EVP_sha256 (), mac_key, sizeof(mac_key), out, ENC_HEADER_SIZE + len,
+              out + ENC_HEADER_SIZE + len, &tag_len) == NULL)
+        goto done;
+    ret = 0;
 
+done:
+    EVP_CIPHER_CTX_free (ctx);
+    if (key != NULL) {
+        OPENSSL_cleanse (key, 16);
+        free (key);
+    }
+    OPENSSL_cleanse (info, sizeof(info));
+    OPENSSL_cleanse (mac_key, sizeof(mac_key));
+    return ret;
+}
 
 /**
- * @description: 加密文件
+ * @description: 加密文件(v2格式，见encrypt_data)
  * @param src: 未加密源文件的名字
  * @param dst: 加密后文件的名字
  * @return 0表示成功加密, -1表示失败
  */
 int encrypt_file (char *src, char *dst) {
+    int ret = -1;
+    int src_fd = -1, dst_fd = -1;
+    struct stat st;
+    unsigned char *plain = NULL;
+    unsigned char *data = NULL;
+    size_t len = 0;
+    ssize_t size;
+
+    src_fd = open (src, O_RDONLY);
+    if (src_fd == -1 || fstat (src_fd, &st) == -1)
+        goto done;
+    plain = (unsigned char *) malloc (st.st_size ? st.st_size : 1);
+    data = (unsigned char *) malloc (ENC_HEADER_SIZE + st.st_size + ENC_TAG_SIZE);
+    if (plain == NULL || data == NULL)
+        goto done;
+    while (len < (size_t)st.st_size &&
+           (size = read (src_fd, plain + len, st.st_size - len)) != 0) {
+        if (size < 0) {
+            if (errno == EINTR)
+                continue;
+            goto done;
+        }
+        len += size;
+    }
+    if (encrypt_data (plain, len, data) == -1)
+        goto done;
+
+    dst_fd = open (dst, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+    if (dst_fd == -1)
+        goto done;
+    if (write_all (dst_fd, data, ENC_HEADER_SIZE + len + ENC_TAG_SIZE) == -1)
+        goto done;
+    ret = 0;
+
+done:
+    if (plain != NULL) {
+        OPENSSL_cleanse (plain, len);
+        free (plain);
+    }
+    free (data);
+    if (src_fd != -1)
+        close (src_fd);
+    if (dst_fd != -1 && close (dst_fd) == -1)
+        ret = -1;
+    return ret;
+}
+
+/**
+ * @description: 按旧的v1格式加密文件(HEADINFO + 64字节块，末尾补0)，用于兼容旧版本的解释器
+ * @param src: 未加密源文件的名字
+ * @param dst: 加密后文件的名字
+ * @return 0表示成功加密, -1表示失败
+ */
+int encrypt_file_v1 (char *src, char *dst) {
     int src_fd = open (src, O_RDONLY);
-    int dst_fd = open (dst, O_RDWR | O_CREAT);
+    int dst_fd;
     int size;
     char buf[64] ={0};
-    char *en_buf = (char *) malloc (64);
-    write(dst_fd, HEADINFO, sizeof(HEADINFO)-1);
+    char *en_buf;
     if (src_fd == -1)
         return -1;
-    if (dst_fd == -1)
+    dst_fd = open (dst, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+    if (dst_fd == -1) {
+        close (src_fd);
         return -1;
-    while( (size = read (src_fd, buf, 64)) > 0) {
-        encrypt_buf (buf, &en_buf, 64); 
-        if (write (dst_fd, en_buf, 64) == -1)
-            return -1;
-        memset (buf, 0, 64);
-        memset (en_buf, 0, 64);
     }
+    en_buf = (char *) malloc (64);
+    if (write (dst_fd, HEADINFO, sizeof(HEADINFO)-1) == -1)
+        size = -1;
+    else
+        while( (size = read (src_fd, buf, 64)) > 0) {
+            encrypt_buf (buf, &en_buf, 64);
+            if (write (dst_fd, en_buf, 64) == -1) {
+                size = -1;
+                break;
+            }
+            memset (buf, 0, 64);
+            memset (en_buf, 0, 64);
+        }
     free (en_buf);
     close (src_fd);
     close (dst_fd);
+    return size < 0 ? -1 : 0;
 }
 
-/**
- * @description: 打开加密文件，返回文件描述符
- * @param filename 表示需要解密的文件
- * @return 返回解密后的文件的文件描述符，失败返回-1
- */
-int decrypt_open (char *filename)
+static int write_all (int fd, const unsigned char *buf, size_t len)
 {
-    int ret = -1;
-    int original_file_fd = open (filename, O_RDWR);
-    int size = 0;
-    char buf[64] = {0};
-    char filehead[512] = {0};
-    char *de_buf = (char *)malloc (64);
-
-    char template[] = "decrypt-file-XXXXXX"; 
-    ret = mkstemp (template);
-    if (ret == -1){
-        close(original_file_fd);
-        return -1;
-    }
-        
-    // 是否输出解密后的文件
-#ifdef _NO_DECRYPT_FILE_OUTPUT
-    unlink (template); 
-#endif
-    
-    // 读取文件头
-    size = read (original_file_fd, filehead, sizeof(HEADINFO)-1);
-    if ( size < 0 ){
-        close (original_file_fd);
-        close (ret);
-        return -1;
-    }
-    filehead[size] = 0;
-    // 普通文件直接打开
-    if(strcmp(filehead, HEADINFO) != 0) {
-        close (ret);
-        ret = original_file_fd;
-        lseek (ret, 0, SEEK_SET);
-        return ret;
-    }
-
-    // 加密文件解密后打开
-    while ((size = read (original_file_fd, buf, 64)) > 0) {
-        int end_pos = 0;
-        decrypt_buf (buf, &de_buf, 64);
-        for (int i = 63; i >= 0; i--) {
-            if (de_buf[i] != 0) {
-                end_pos = i + 1;
-                break;
-            }
-        }
-        if (write (ret, de_buf, end_pos) == -1) {
-            close(original_file_fd);
-            close(ret);
+    ssize_t n;
+    while (len > 0) {
+        n = write (fd, buf, len);
+        if (n < 0) {
+            if (errno == EINTR)
+                continue;
             return -1;
         }
-        memset (buf,0,64);
+        buf += n;
+        len -= n;
     }
-    lseek (ret,0,SEEK_SET);
-    free (de_buf);
-    close(original_file_fd);
-    return ret;
+    return 0;
 }
 
 unsigned char* str2hex (char *str) {
@@ -126,7 +219,7 @@ unsigned char* str2hex (char *str) {
     int str_len = strlen (str);
     int i = 0;
     assert ((str_len%2) == 0);
-    ret = (char *) malloc (str_len/2);
+    ret = (unsigned char *) malloc (str_len/2);
     for (i =0;i < str_len; i = i + 2 ) {
         sscanf (str + i, "%2hhx", &ret[i / 2]);
     }
@@ -142,13 +235,3 @@ void encrypt_buf (char *raw_buf, char **encrpy_buf, int len) {
     free (key);
     free (iv);
 }
-
-void decrypt_buf (char *raw_buf, char **encrpy_buf, int len ) {
-    AES_KEY aes;
-    unsigned char *key = str2hex (KEY);
-    unsigned char *iv  = str2hex (IV);
-    AES_set_decrypt_key (key,128,&aes);
-    AES_cbc_encrypt (raw_buf, *encrpy_buf, len, &aes, iv, AES_DECRYPT);
-    free (key);
-    free (iv);
-}
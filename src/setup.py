@@ -0,0 +1,32 @@
+# coding=utf-8
+"""Build the _spython extension for an interpreter that is not spython.
+
+spython has _spython built in.  A stock CPython (2.7 or 3.x) can build it
+from the same sources so that spython-enc and other build tools encrypt
+through it instead of calling libencfile.so with ctypes:
+
+    cd src && python setup.py build_ext --inplace
+"""
+import os
+
+try:
+    from setuptools import setup, Extension
+except ImportError:
+    from distutils.core import setup, Extension
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+setup(
+    name="spython-ext",
+    version="1.0",
+    description="Encryption primitives of spython",
+    ext_modules=[
+        Extension(
+            "_spython",
+            sources=[os.path.join("Python", "spythonmodule.c"),
+                     os.path.join("Python", "decrypt_source_file.c")],
+            include_dirs=[os.path.join(HERE, "Include")],
+            libraries=["crypto", "pthread"],
+        ),
+    ],
+)
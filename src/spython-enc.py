@@ -1,20 +1,426 @@
 #!/bin/python2
 # coding=utf-8
+"""spython-enc: encrypt python sources for spython.
+
+    spython-enc <need_to_enc_file_name> <after_enc_file_name>
+    spython-enc [-j N] [--force] [-n] <src_file|src_dir|glob>... <dst_dir>
+    spython-enc --archive [-j N] <src_file|src_dir|glob>... <dst.spya>
+
+Directories are walked (a single one is mirrored into dst_dir, otherwise
+each lands in dst_dir/<name>) and the files matching --include (default
+*.py) are encrypted in a thread pool. A manifest in dst_dir records the
+size/mtime/sha256 of every encrypted source, the mtime of its output and
+the format version of libencfile.so, so that the next run only encrypts
+what changed, like make: unchanged sources whose output is still in place
+are skipped, everything is encrypted again when the format changes, and
+the outputs of sources that are gone are deleted. The manifest is only
+rewritten when something changed, so it can serve as a make target.
+
+Encryption goes through the _spython extension when the interpreter has it
+(spython itself, or a stock Python with the extension built by
+src/setup.py), which releases the GIL in C for every file; otherwise
+libencfile.so is called through ctypes.
+
+With --archive the files are packed into a single encrypted archive that
+spython imports through spyarchive.install() (see Lib/spyarchive.py for the
+format).
+"""
 from ctypes import *
-import sys
+import argparse
+import errno
+import fnmatch
+import glob
+import hashlib
+import json
 import os
+import stat
+import struct
+import sys
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+MANIFEST_NAME = ".spython-enc-manifest"
+MANIFEST_VERSION = 2
+
+# 与Lib/spyarchive.py保持一致
+ARCHIVE_MAGIC = b"SPYARC"
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER = struct.Struct("<6sBBQQ")
+ARCHIVE_COUNT = struct.Struct("<I")
+ARCHIVE_ENTRY = struct.Struct("<HQQ")
+ENC_OVERHEAD = 64    # ENC_HEADER_SIZE + ENC_TAG_SIZE
+
+# ctypes需要bytes类型的路径
+fsencode = getattr(os, "fsencode", lambda name: name)
+
+
+class LibEncFile(object):
+    """The part of the _spython interface spython-enc uses, on top of
+    libencfile.so, for interpreters without the extension."""
+
+    def __init__(self):
+        try:
+            lib = CDLL("./libencfile.so", use_errno=True)
+        except OSError:
+            lib = CDLL("libencfile.so", use_errno=True)
+        lib.encrypt_file.argtypes = [c_char_p, c_char_p]
+        lib.encrypt_file.restype = c_int
+        lib.encrypt_data.argtypes = [c_char_p, c_size_t, c_char_p]
+        lib.encrypt_data.restype = c_int
+        self.lib = lib
+        # 太旧的libencfile.so没有encrypt_format_version
+        self.FORMAT_VERSION = None
+        if hasattr(lib, "encrypt_format_version"):
+            lib.encrypt_format_version.argtypes = []
+            lib.encrypt_format_version.restype = c_int
+            self.FORMAT_VERSION = lib.encrypt_format_version()
+
+    def encrypt_file(self, src, dst):
+        if self.lib.encrypt_file(fsencode(src), fsencode(dst)) != 0:
+            err = get_errno()
+            raise OSError(err, os.strerror(err))
+        os.chmod(dst, stat.S_IMODE(os.stat(src).st_mode))
+
+    def encrypt_bytes(self, data):
+        out = create_string_buffer(len(data) + ENC_OVERHEAD)
+        if self.lib.encrypt_data(data, len(data), out) != 0:
+            raise OSError("encrypt_data failed")
+        return out.raw
+
+
+def load_encrypter():
+    try:
+        import _spython
+    except ImportError:
+        return LibEncFile()
+    return _spython
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def expand_sources(sources, includes):
+    """Yield (src_path, relative_dst_path) for every file to encrypt.
+
+    A lone source directory is mirrored into dst_dir itself, otherwise each
+    directory becomes dst_dir/<its name>, like cp -r.
+    """
+    matches = []
+    for source in sources:
+        if glob.has_magic(source):
+            found = sorted(glob.glob(source))
+            if not found:
+                sys.stderr.write("%s: no match\n" % source)
+            matches.extend(found)
+        else:
+            matches.append(source)
+    for path in matches:
+        if os.path.isdir(path):
+            base = path if len(matches) == 1 else os.path.dirname(
+                os.path.normpath(path))
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if any(fnmatch.fnmatch(name, p) for p in includes):
+                        src = os.path.join(root, name)
+                        yield src, os.path.relpath(src, base or os.curdir)
+        elif os.path.isfile(path):
+            yield path, os.path.basename(path)
+        else:
+            sys.stderr.write("%s is not a file or directory\n" % path)
+
+
+def load_manifest(path):
+    """Return (format, files) of the manifest at path.
+
+    Version 1 manifests have neither the format nor the output mtimes; their
+    files are still returned so removed sources can be cleaned up, and get
+    encrypted again.
+    """
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None, {}
+    if manifest.get("version") not in (1, MANIFEST_VERSION):
+        return None, {}
+    return manifest.get("format"), manifest.get("files", {})
+
+
+def save_manifest(path, fmt, files):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "format": fmt,
+                   "files": files}, f, indent=1, sort_keys=True)
+    os.rename(tmp, path)
+
+
+def remove_output(dst_dir, rel):
+    """Delete dst_dir/rel and the directories it leaves empty."""
+    path = os.path.join(dst_dir, rel)
+    try:
+        os.unlink(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+    parent = os.path.dirname(rel)
+    while parent:
+        try:
+            os.rmdir(os.path.join(dst_dir, parent))
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+
+class Encryptor(object):
+    """Encrypt single files, skipping those the manifest says are current.
+
+    A file is current when its output still has the mtime recorded after it
+    was written and the source has the recorded size and mtime, or failing
+    that the recorded sha256 (touched but not modified).
+
+    encrypt_file() releases the GIL (in _spython, or as a plain ctypes
+    call), so one Encryptor can be shared by all the threads of a pool.
+    """
+
+    def __init__(self, lib, manifest, force=False, dry_run=False):
+        self.lib = lib
+        self.manifest = manifest
+        self.force = force
+        self.dry_run = dry_run
+        self.changed = False
+        self.lock = threading.Lock()
+
+    def __call__(self, job):
+        src, rel, dst = job
+        try:
+            st = os.stat(src)
+            entry = self.manifest.get(rel)
+            current = {"source": src, "size": st.st_size,
+                       "mtime": st.st_mtime}
+            if not self.force and entry is not None and self.output_current(
+                    entry, dst):
+                current["output_mtime"] = entry["output_mtime"]
+                if (entry.get("size") == st.st_size and
+                        entry.get("mtime") == st.st_mtime):
+                    return rel, "skipped", None
+                current["sha256"] = file_sha256(src)
+                if entry.get("sha256") == current["sha256"]:
+                    self.update(rel, current)
+                    return rel, "skipped", None
+            if self.dry_run:
+                return rel, "encrypted", None
+            if "sha256" not in current:
+                current["sha256"] = file_sha256(src)
+            self.lib.encrypt_file(src, dst)
+            current["output_mtime"] = os.stat(dst).st_mtime
+            self.update(rel, current)
+            return rel, "encrypted", None
+        except (IOError, OSError) as e:
+            self.discard(rel)
+            return rel, "failed", "%s: %s" % (src, e)
+
+    @staticmethod
+    def output_current(entry, dst):
+        try:
+            return os.stat(dst).st_mtime == entry.get("output_mtime")
+        except OSError:
+            return False
+
+    def update(self, rel, entry):
+        if self.dry_run:
+            return
+        with self.lock:
+            self.manifest[rel] = entry
+            self.changed = True
+
+    def discard(self, rel):
+        if self.dry_run:
+            return
+        with self.lock:
+            if self.manifest.pop(rel, None) is not None:
+                self.changed = True
+
+
+def encrypt_one(lib, src, dst):
+    if not os.path.isfile(src):
+        print("%s is not a file" % src)
+        return 1
+    try:
+        lib.encrypt_file(src, dst)
+    except (IOError, OSError) as e:
+        print("failed to encrypt %s: %s" % (src, e))
+        return 1
+    return 0
+
+
+def encrypt_tree(lib, args):
+    dst_dir = args.dst
+    jobs = []
+    seen = set()
+    for src, rel in expand_sources(args.sources, args.include):
+        if rel in seen:
+            sys.stderr.write("%s: duplicate output %s\n" % (src, rel))
+            continue
+        seen.add(rel)
+        jobs.append((src, rel, os.path.join(dst_dir, rel)))
+    for parent in sorted(set(os.path.dirname(job[2]) for job in jobs)):
+        makedirs(parent)
+
+    manifest_path = os.path.join(dst_dir, MANIFEST_NAME)
+    fmt = lib.FORMAT_VERSION
+    old_fmt, manifest = (None, {}) if args.no_manifest else load_manifest(
+        manifest_path)
+    # 格式变化（或者旧版本的manifest）时全部重新加密
+    encryptor = Encryptor(lib, manifest, args.force or old_fmt != fmt,
+                          args.dry_run)
+    verb = "would encrypt" if args.dry_run else "encrypted"
+    counts = {"encrypted": 0, "skipped": 0, "removed": 0, "failed": 0}
+    start = time.time()
+    pool = ThreadPool(args.jobs)
+    try:
+        for rel, status, error in pool.imap_unordered(encryptor, jobs, 16):
+            counts[status] += 1
+            if error is not None:
+                sys.stderr.write(error + "\n")
+            elif (args.verbose or args.dry_run) and status == "encrypted":
+                sys.stderr.write("%s %s\n" % (verb, rel))
+        if not args.keep_removed:
+            for rel in sorted(set(manifest) - seen):
+                counts["removed"] += 1
+                if args.verbose or args.dry_run:
+                    sys.stderr.write("%s %s\n" % (
+                        "would remove" if args.dry_run else "removed", rel))
+                if not args.dry_run:
+                    try:
+                        remove_output(dst_dir, rel)
+                    except OSError as e:
+                        counts["failed"] += 1
+                        sys.stderr.write("%s: %s\n" % (rel, e))
+                        continue
+                    del manifest[rel]
+                    encryptor.changed = True
+    finally:
+        pool.close()
+        pool.join()
+        if (not args.no_manifest and not args.dry_run and
+                (encryptor.changed or old_fmt != fmt or
+                 not os.path.exists(manifest_path))):
+            save_manifest(manifest_path, fmt, manifest)
+    elapsed = time.time() - start
+    sys.stderr.write(
+        "%d %s, %d skipped, %d %sremoved, %d failed in %.2fs (%.1f files/s)\n"
+        % (counts["encrypted"], verb, counts["skipped"], counts["removed"],
+           "to be " if args.dry_run else "", counts["failed"], elapsed,
+           len(jobs) / elapsed if elapsed > 0 else 0.0))
+    return 1 if counts["failed"] else 0
+
+
+def write_archive(lib, args):
+    members = []
+    seen = set()
+    for src, rel in expand_sources(args.sources, args.include):
+        name = rel.replace(os.sep, "/")
+        if name in seen:
+            sys.stderr.write("%s: duplicate member %s\n" % (src, name))
+            continue
+        seen.add(name)
+        members.append((src, name))
+
+    def encrypt(member):
+        with open(member[0], "rb") as f:
+            return lib.encrypt_bytes(f.read())
+
+    start = time.time()
+    entries = []
+    tmp = args.dst + ".tmp"
+    pool = ThreadPool(args.jobs)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(b"\0" * ARCHIVE_HEADER.size)
+            for (src, name), blob in zip(members,
+                                         pool.imap(encrypt, members, 16)):
+                entries.append((name.encode("utf-8"), f.tell(), len(blob)))
+                f.write(blob)
+                if args.verbose:
+                    sys.stderr.write("added %s\n" % name)
+            toc = [ARCHIVE_COUNT.pack(len(entries))]
+            for name, offset, size in entries:
+                toc.append(ARCHIVE_ENTRY.pack(len(name), offset, size))
+                toc.append(name)
+            blob = lib.encrypt_bytes(b"".join(toc))
+            toc_offset = f.tell()
+            f.write(blob)
+            f.seek(0)
+            f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, 0,
+                                        toc_offset, len(blob)))
+        os.rename(tmp, args.dst)
+    except (IOError, OSError) as e:
+        sys.stderr.write("%s: %s\n" % (args.dst, e))
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        return 1
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.time() - start
+    sys.stderr.write("%d files archived in %.2fs (%.1f files/s)\n"
+                     % (len(entries), elapsed,
+                        len(entries) / elapsed if elapsed > 0 else 0.0))
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="spython-enc", description="Encrypt python sources for spython.")
+    parser.add_argument("sources", nargs="+", metavar="src",
+                        help="file, directory or glob to encrypt")
+    parser.add_argument("dst", help="output file, directory or archive")
+    parser.add_argument("-a", "--archive", action="store_true",
+                        help="pack everything into the archive dst")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker threads (default: CPU count)")
+    parser.add_argument("-i", "--include", action="append", default=None,
+                        metavar="PATTERN",
+                        help="file name pattern to encrypt inside directories "
+                             "(default: *.py, may be repeated)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="encrypt every file even if it is unchanged")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="only print what would be encrypted or removed")
+    parser.add_argument("--keep-removed", action="store_true",
+                        help="keep the outputs of sources that no longer "
+                             "exist")
+    parser.add_argument("--no-manifest", action="store_true",
+                        help="neither read nor write the manifest")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    if args.include is None:
+        args.include = ["*.py"]
+
+    lib = load_encrypter()
+    if args.archive:
+        return write_archive(lib, args)
+    if (len(args.sources) == 1 and not glob.has_magic(args.sources[0]) and
+            not os.path.isdir(args.sources[0]) and
+            not os.path.isdir(args.dst)):
+        return encrypt_one(lib, args.sources[0], args.dst)
+    return encrypt_tree(lib, args)
+
 
-if len(sys.argv) == 3:
-    need_to_enc_file_name, after_enc_file_name = sys.argv[1:3]
-    if not os.path.isfile(need_to_enc_file_name):
-        print ("%s is not a file"%need_to_enc_file_name)
-else:
-    print ("need 2 args: %s <need_to_enc_file_name> <after_enc_file_name>"%sys.argv[0])
-    exit(-1)
-
-try:
-    libdecfile = CDLL("./libencfile.so")
-except:
-    libdecfile = CDLL("libencfile.so")
-libdecfile.encrypt_file(need_to_enc_file_name, after_enc_file_name)
-os.system("chmod 0755 %s"%after_enc_file_name)
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))